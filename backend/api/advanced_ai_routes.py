@@ -207,6 +207,34 @@ async def get_anomaly_summary(
             detail="Failed to get anomaly summary"
         )
 
+@router.post("/api/ai/anomalies/{client_id}/metrics", summary="Ingest Performance Metrics")
+async def ingest_performance_metrics(
+    client_id: str,
+    data_points: List[Dict[str, Any]] = Body(..., description="New performance data points, oldest first"),
+    ai_service: AdvancedAIService = Depends(get_ai_service)
+):
+    """
+    Score newly arrived performance data against the client's baseline.
+    Returns any anomalies detected in the new data points.
+    """
+    try:
+        anomalies = await ai_service.ingest_performance_metrics(client_id, data_points)
+
+        return {
+            "client_id": client_id,
+            "ingested": len(data_points),
+            "anomalies": [
+                AnomalyDetectionResponse(**{**anomaly.__dict__, "detected_at": anomaly.detected_at.isoformat()})
+                for anomaly in anomalies
+            ]
+        }
+    except Exception as e:
+        logger.error(f"Error ingesting performance metrics for client {client_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to ingest performance metrics"
+        )
+
 # Trend Analysis Endpoints
 @router.get("/api/ai/trends/{client_id}", response_model=List[TrendAnalysisResponse], summary="Analyze Trends")
 async def analyze_trends(
@@ -14,6 +14,7 @@ from services.advanced_analytics_service import (
     get_advanced_analytics_service, AdvancedAnalyticsService,
     ReportConfig, ReportFormat, ReportType, ChartConfig, DashboardType
 )
+from services.report_jobs import JobPriority
 from database.mongodb import get_database
 
 router = APIRouter()
@@ -418,16 +419,25 @@ async def execute_scheduled_report(
 ):
     """
     Manually execute a scheduled report.
+    The run is queued ahead of scheduled runs; poll the run for its result.
     """
     try:
-        report_result = await analytics_service.scheduled_report_manager.execute_scheduled_report(report_id)
+        run = await analytics_service.scheduled_report_manager.execute_scheduled_report(
+            report_id, priority=JobPriority.INTERACTIVE
+        )
         
         return {
             "report_id": report_id,
-            "execution_status": "completed",
-            "generated_at": report_result["generated_at"],
-            "file_size": report_result["file_size"]
+            "run_id": run["run_id"],
+            "execution_status": run["status"],
+            "generated_at": run.get("generated_at"),
+            "file_size": run.get("file_size")
         }
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error executing scheduled report {report_id}: {e}")
         raise HTTPException(
@@ -435,6 +445,39 @@ async def execute_scheduled_report(
             detail="Failed to execute scheduled report"
         )
 
+@router.get("/api/analytics/reports/scheduled/{report_id}/runs/{run_id}", summary="Get Scheduled Report Run")
+async def get_scheduled_report_run(
+    report_id: str,
+    run_id: str,
+    analytics_service: AdvancedAnalyticsService = Depends(get_analytics_service)
+):
+    """
+    Get the status of a scheduled report run.
+    """
+    try:
+        run = await analytics_service.scheduled_report_manager.get_run(report_id, run_id)
+        
+        return {
+            "report_id": report_id,
+            "run_id": run_id,
+            "execution_status": run["status"],
+            "attempts": run.get("attempts", 0),
+            "generated_at": run.get("generated_at"),
+            "file_size": run.get("file_size"),
+            "error_message": run.get("error_message")
+        }
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error getting run {run_id} of scheduled report {report_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get scheduled report run"
+        )
+
 # Audience Insights Endpoints
 @router.get("/api/analytics/audience/{client_id}", response_model=AudienceInsightsResponse, summary="Get Audience Insights")
 async def get_audience_insights(
@@ -3,7 +3,8 @@ Advanced Reporting & BI API Routes
 Production-grade API endpoints for custom dashboards, data visualization, and executive reports
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
@@ -33,6 +34,7 @@ class ReportGenerationRequest(BaseModel):
     template_id: str = Field(..., description="Template ID")
     parameters: Dict[str, Any] = Field(..., description="Report parameters")
     created_by: str = Field(..., description="Creator user ID")
+    organization_id: Optional[str] = Field(None, description="Organization the report is generated for")
 
 class ReportExportRequest(BaseModel):
     report_id: str = Field(..., description="Report ID")
@@ -217,13 +219,14 @@ async def generate_report(
 ):
     """
     Generate a report from a template.
-    Creates a new report instance and starts generation process.
+    Queues a new report instance, or returns an identical recent one.
     """
     try:
         report_id = await reporting_service.generate_report(
             request.template_id,
             request.parameters,
-            request.created_by
+            request.created_by,
+            request.organization_id
         )
         
         # Get created report
@@ -307,16 +310,21 @@ async def get_report_details(
 ):
     """
     Get detailed report information.
-    Returns complete report data including charts and metrics.
+    Returns the report's metadata; its data, charts and metrics are
+    downloaded from ``data_url``.
     """
     try:
         report = await reporting_service.get_report(report_id)
+        has_data = "report_data" in report or bool(report.get("file_path"))
+        # Reports generated before artifacts kept their data inline
+        report.pop("report_data", None)
         
         return {
             "report": report,
             "status": report["status"],
             "generated_at": report.get("generated_at"),
-            "has_data": "report_data" in report
+            "has_data": has_data,
+            "data_url": f"/api/reporting/reports/{report_id}/data" if has_data else None
         }
         
     except ValueError as e:
@@ -331,6 +339,40 @@ async def get_report_details(
             detail="Failed to get report details"
         )
 
+@router.get("/api/reporting/reports/{report_id}/data", summary="Download Report Data")
+async def download_report_data(
+    report_id: str,
+    reporting_service: AdvancedReportingService = Depends(get_reporting_service)
+):
+    """
+    Download a report's data as JSON.
+    Streams the stored data artifact rather than loading it into memory.
+    """
+    try:
+        report = await reporting_service.get_report(report_id)
+        if "report_data" not in report and not report.get("file_path"):
+            raise ValueError(f"Report {report_id} has no data yet")
+        
+        return StreamingResponse(
+            reporting_service.iter_report_data(report),
+            media_type="application/json",
+            headers={
+                "Content-Disposition": f"attachment; filename=report_{report_id}.json"
+            }
+        )
+        
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error downloading report data: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to download report data"
+        )
+
 # Report Export
 @router.post("/api/reporting/reports/{report_id}/export", summary="Export Report")
 async def export_report(
@@ -340,7 +382,7 @@ async def export_report(
 ):
     """
     Export report in specified format.
-    Returns report file in PDF, Excel, CSV, or other formats.
+    Streams the report file in PDF, Excel or CSV format.
     """
     try:
         # Validate format
@@ -353,7 +395,7 @@ async def export_report(
             )
         
         # Export report
-        file_content = await reporting_service.export_report(report_id, export_format)
+        chunks = await reporting_service.export_report(report_id, export_format)
         
         # Determine content type
         content_types = {
@@ -366,8 +408,8 @@ async def export_report(
         
         content_type = content_types.get(export_format, "application/octet-stream")
         
-        return Response(
-            content=file_content,
+        return StreamingResponse(
+            chunks,
             media_type=content_type,
             headers={
                 "Content-Disposition": f"attachment; filename=report_{report_id}.{format}"
@@ -414,28 +456,28 @@ async def generate_chart(
         chart_generator = reporting_service.report_generator.chart_generator
         
         if chart_type == ChartType.LINE:
-            chart_json = chart_generator.generate_line_chart(
-                data["dataframe"], data["x_col"], data["y_col"], data["title"], config
+            chart_json = await chart_generator.render(
+                ChartType.LINE, data["dataframe"], data["x_col"], data["y_col"], data["title"], config=config
             )
         elif chart_type == ChartType.BAR:
-            chart_json = chart_generator.generate_bar_chart(
-                data["dataframe"], data["x_col"], data["y_col"], data["title"], config
+            chart_json = await chart_generator.render(
+                ChartType.BAR, data["dataframe"], data["x_col"], data["y_col"], data["title"], config=config
             )
         elif chart_type == ChartType.PIE:
-            chart_json = chart_generator.generate_pie_chart(
-                data["dataframe"], data["labels_col"], data["values_col"], data["title"], config
+            chart_json = await chart_generator.render(
+                ChartType.PIE, data["dataframe"], data["labels_col"], data["values_col"], data["title"], config=config
             )
         elif chart_type == ChartType.HEATMAP:
-            chart_json = chart_generator.generate_heatmap(
-                data["dataframe"], data["x_col"], data["y_col"], data["z_col"], data["title"], config
+            chart_json = await chart_generator.render(
+                ChartType.HEATMAP, data["dataframe"], data["x_col"], data["y_col"], data["z_col"], data["title"], config=config
             )
         elif chart_type == ChartType.FUNNEL:
-            chart_json = chart_generator.generate_funnel_chart(
-                data["dataframe"], data["stage_col"], data["value_col"], data["title"], config
+            chart_json = await chart_generator.render(
+                ChartType.FUNNEL, data["dataframe"], data["stage_col"], data["value_col"], data["title"], config=config
             )
         elif chart_type == ChartType.GAUGE:
-            chart_json = chart_generator.generate_gauge_chart(
-                data["value"], data["title"], config
+            chart_json = await chart_generator.render(
+                ChartType.GAUGE, data["value"], data["title"], config=config
             )
         else:
             raise HTTPException(
@@ -5,6 +5,7 @@ Production-grade API endpoints for AI/ML features
 
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 from typing import Dict, List, Any, Optional
 import pandas as pd
 import logging
@@ -82,7 +83,9 @@ async def train_model(
         target_column = training_request["target_column"]
         
         # Train model
-        result = await service.train_model(model_id, training_data, target_column)
+        result = await service.train_model(
+            model_id, training_data, target_column, organization_id=current_user["organization_id"]
+        )
         
         return JSONResponse(content=result)
         
@@ -90,6 +93,56 @@ async def train_model(
         logger.error(f"Error training model: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/training-jobs/{job_id}")
+async def get_training_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_database),
+    redis_client = Depends(get_redis_client)
+):
+    """Get training job status and progress"""
+    try:
+        service = get_ai_ml_enhancements_service(db, redis_client)
+        job = await service.get_training_job(job_id, current_user["organization_id"])
+        
+        if not job:
+            raise HTTPException(status_code=404, detail="Training job not found")
+        
+        return JSONResponse(content=jsonable_encoder(job))
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting training job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/training-jobs/{job_id}/cancel")
+async def cancel_training_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_database),
+    redis_client = Depends(get_redis_client)
+):
+    """Cancel a queued or running training job"""
+    try:
+        service = get_ai_ml_enhancements_service(db, redis_client)
+        cancelled = await service.cancel_training_job(job_id, current_user["organization_id"])
+        
+        if not cancelled:
+            raise HTTPException(status_code=404, detail="No active training job found")
+        
+        return JSONResponse(content={
+            "job_id": job_id,
+            "message": "Cancellation requested",
+            "status": "cancelling"
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error cancelling training job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/models/{model_id}/predict")
 async def make_prediction(
     model_id: str,
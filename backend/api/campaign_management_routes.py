@@ -14,6 +14,7 @@ from services.campaign_management_service import (
     get_campaign_management_service, CampaignManagementService,
     CampaignStatus, CampaignType, CreativeType, AssetType
 )
+from services.asset_pipeline import iter_file
 from database.mongodb import get_database
 
 router = APIRouter()
@@ -72,7 +73,7 @@ class AssetResponse(BaseModel):
     mime_type: str
     dimensions: Optional[Dict[str, int]]
     url: str
-    thumbnail_url: str
+    thumbnail_url: Optional[str]
     tags: List[str]
     created_at: str
 
@@ -319,11 +320,8 @@ async def upload_asset(
                 detail=f"Invalid asset type: {asset_type}"
             )
         
-        # Read file data
-        file_data = await file.read()
-        
-        # Upload asset
-        asset = await campaign_service.upload_asset(client_id, file_data, file.filename, asset_type_enum)
+        # Stream the upload in chunks rather than reading it into memory
+        asset = await campaign_service.upload_asset_stream(client_id, iter_file(file), file.filename, asset_type_enum)
         
         return AssetResponse(
             asset_id=asset.asset_id,
@@ -466,6 +464,32 @@ async def get_ab_test_results(
             detail="Failed to retrieve A/B test results"
         )
 
+@router.post("/api/campaigns/ab-tests/{test_id}/variants/{variant_id}/metrics", summary="Record A/B Test Metrics")
+async def record_ab_test_metrics(
+    test_id: str,
+    variant_id: str,
+    client_id: str = Query(..., description="Client ID"),
+    observations: List[Dict[str, Any]] = Body(..., description="Per-unit observations (impressions, clicks, conversions, cost, revenue)"),
+    campaign_service: CampaignManagementService = Depends(get_campaign_service)
+):
+    """
+    Record observations for an A/B test variant.
+    Updates the variant's running statistics used for significance testing.
+    """
+    try:
+        return await campaign_service.record_ab_test_metrics(test_id, client_id, variant_id, observations)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error recording A/B test metrics for {test_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to record A/B test metrics"
+        )
+
 # Campaign Performance Endpoints
 @router.get("/api/campaigns/{campaign_id}/performance", summary="Get Campaign Performance")
 async def get_campaign_performance(
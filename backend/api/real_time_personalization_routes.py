@@ -13,8 +13,9 @@ import redis
 
 from services.real_time_personalization_service import (
     get_real_time_personalization_service, RealTimePersonalizationService,
-    PersonalizationType, AudienceSegment, ContentType, BehavioralEvent
+    PersonalizationType, AudienceSegmentType, ContentType, BehavioralEventType
 )
+from services.event_ingestion import IngestionBufferFull
 from database.mongodb import get_database
 
 router = APIRouter()
@@ -201,17 +202,18 @@ async def update_user_profile(
         )
 
 # Behavioral Event Tracking Endpoints
-@router.post("/api/personalization/events", summary="Track Behavioral Event")
+@router.post("/api/personalization/events", summary="Track Behavioral Event", status_code=status.HTTP_202_ACCEPTED)
 async def track_behavioral_event(
     request: BehavioralEventRequest = Body(...),
     personalization_service: RealTimePersonalizationService = Depends(get_personalization_service)
 ):
     """
     Track a behavioral event for personalization.
-    Records user behavior for real-time personalization.
+    The event is accepted into the ingestion buffer and applied to the
+    user's profile within the flush interval.
     """
     try:
-        event_type = BehavioralEvent(request.event_type)
+        event_type = BehavioralEventType(request.event_type)
         
         await personalization_service.track_user_event(
             request.user_id,
@@ -225,7 +227,7 @@ async def track_behavioral_event(
             "user_id": request.user_id,
             "event_type": request.event_type,
             "tracked_at": datetime.utcnow().isoformat(),
-            "status": "tracked"
+            "status": "accepted"
         }
         
     except ValueError:
@@ -233,6 +235,12 @@ async def track_behavioral_event(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Invalid event type: {request.event_type}"
         )
+    except IngestionBufferFull as e:
+        logger.warning(f"Rejected behavioral event: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Event ingestion is at capacity, retry shortly"
+        )
     except Exception as e:
         logger.error(f"Error tracking behavioral event: {e}")
         raise HTTPException(
@@ -313,6 +321,11 @@ async def create_audience_segment(
             created_at=segment_doc["created_at"]
         )
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error creating audience segment: {e}")
         raise HTTPException(
@@ -387,6 +400,31 @@ async def get_segment_users(
             detail="Failed to get segment users"
         )
 
+@router.post("/api/personalization/segments/{segment_id}/refresh", summary="Refresh Segment Membership")
+async def refresh_segment(
+    segment_id: str,
+    full: bool = Query(False, description="Rebuild the segment instead of re-evaluating updated profiles"),
+    personalization_service: RealTimePersonalizationService = Depends(get_personalization_service)
+):
+    """
+    Refresh audience segment membership.
+    Re-evaluates profiles updated since the last refresh, or rebuilds the segment.
+    """
+    try:
+        return await personalization_service.refresh_audience_segment(segment_id, full)
+
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error refreshing segment: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to refresh segment"
+        )
+
 @router.get("/api/personalization/segments/{segment_id}/performance", summary="Get Segment Performance")
 async def get_segment_performance(
     segment_id: str,
@@ -642,9 +680,9 @@ async def personalization_health_check(
                 "dynamic_content": True
             },
             "supported_personalization_types": [pt.value for pt in PersonalizationType],
-            "supported_audience_segments": [as.value for as in AudienceSegment],
+            "supported_audience_segments": [st.value for st in AudienceSegmentType],
             "supported_content_types": [ct.value for ct in ContentType],
-            "supported_behavioral_events": [be.value for be in BehavioralEvent],
+            "supported_behavioral_events": [be.value for be in BehavioralEventType],
             "timestamp": datetime.utcnow().isoformat()
         }
         
@@ -5,13 +5,17 @@ import uuid
 import os
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 
+from services.llm_cache import llm_response_cache
+
 logger = logging.getLogger(__name__)
 
+LLM_PROVIDER = "openai"
+LLM_MODEL = "gpt-4o-mini"
+
 class CreativeIntelligence:
     """Creative Intelligence Module for AI-powered content processing"""
     
     def __init__(self):
-        self.content_cache = {}
         self.brand_profiles = {}
         self._ai_api_key = None
         self._ai_available = None
@@ -36,7 +40,17 @@ class CreativeIntelligence:
             api_key=self.ai_api_key,
             session_id=f"creative_{uuid.uuid4()}",
             system_message=system_message
-        ).with_model("openai", "gpt-4o-mini")
+        ).with_model(LLM_PROVIDER, LLM_MODEL)
+    
+    async def _complete(self, system_message: str, prompt: str) -> str:
+        """Send a prompt through the shared LLM response cache"""
+        async def send() -> str:
+            chat = self._get_llm_chat(system_message)
+            return await chat.send_message(UserMessage(text=prompt))
+        
+        return await llm_response_cache.complete(
+            "creative", f"{LLM_PROVIDER}/{LLM_MODEL}", system_message, prompt, send
+        )
         
     async def analyze_content(self, content: str, context: Dict[Any, Any] = None) -> Dict[Any, Any]:
         """Analyze content using AI intelligence"""
@@ -45,7 +59,7 @@ class CreativeIntelligence:
         if self.ai_available:
             try:
                 # Real AI-powered content analysis
-                chat = self._get_llm_chat(
+                system_message = (
                     "You are an expert content analyst. Analyze content and provide detailed insights in JSON format."
                 )
                 
@@ -67,8 +81,7 @@ class CreativeIntelligence:
                 
                 Return only valid JSON, no other text."""
                 
-                message = UserMessage(text=prompt)
-                response = await chat.send_message(message)
+                response = await self._complete(system_message, prompt)
                 
                 # Parse AI response
                 import json
@@ -102,7 +115,6 @@ class CreativeIntelligence:
         else:
             analysis = self._fallback_analysis(analysis_id, content, context)
         
-        self.content_cache[analysis_id] = analysis
         return analysis
     
     def _fallback_analysis(self, analysis_id: str, content: str, context: Dict[Any, Any] = None) -> Dict[Any, Any]:
@@ -149,7 +161,7 @@ class CreativeIntelligence:
                     brand = self.brand_profiles[brand_id]
                     brand_context = f"\nBrand Guidelines:\n- Name: {brand.get('name')}\n- Tone: {brand.get('tone')}\n- Values: {', '.join(brand.get('values', []))}"
                 
-                chat = self._get_llm_chat(
+                system_message = (
                     f"You are an expert content repurposing specialist. Transform content into different formats while maintaining key messages.{brand_context}"
                 )
                 
@@ -170,8 +182,7 @@ Requirements:
 
 Provide the repurposed content only, no explanations."""
                 
-                message = UserMessage(text=prompt)
-                repurposed = await chat.send_message(message)
+                repurposed = await self._complete(system_message, prompt)
                 
                 result = {
                     'id': repurposing_id,
@@ -255,7 +266,7 @@ Provide the repurposed content only, no explanations."""
             try:
                 specs = platform_specs.get(platform, {'ideal_length': '100-200 chars', 'hashtags': '3-5', 'tone': 'engaging'})
                 
-                chat = self._get_llm_chat(
+                system_message = (
                     f"You are a social media optimization expert specializing in {platform}. Optimize content for maximum {objective}."
                 )
                 
@@ -281,8 +292,7 @@ Please provide:
 
 Format as JSON with keys: optimized_content, hashtags (array), posting_time, engagement_score, recommendations (array)"""
                 
-                message = UserMessage(text=prompt)
-                response = await chat.send_message(message)
+                response = await self._complete(system_message, prompt)
                 
                 import json
                 try:
@@ -5,8 +5,13 @@ import uuid
 import os
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 
+from services.llm_cache import llm_response_cache
+
 logger = logging.getLogger(__name__)
 
+LLM_PROVIDER = "openai"
+LLM_MODEL = "gpt-4o-mini"
+
 class MarketIntelligence:
     """Market Intelligence Module for industry analysis and trends"""
     
@@ -57,7 +62,17 @@ class MarketIntelligence:
             api_key=self.ai_api_key,
             session_id=f"market_{uuid.uuid4()}",
             system_message=system_message
-        ).with_model("openai", "gpt-4o-mini")
+        ).with_model(LLM_PROVIDER, LLM_MODEL)
+    
+    async def _complete(self, system_message: str, prompt: str) -> str:
+        """Send a prompt through the shared LLM response cache"""
+        async def send() -> str:
+            chat = self._get_llm_chat(system_message)
+            return await chat.send_message(UserMessage(text=prompt))
+        
+        return await llm_response_cache.complete(
+            "market", f"{LLM_PROVIDER}/{LLM_MODEL}", system_message, prompt, send
+        )
     
     async def analyze_vertical(self, vertical: str, data: Dict[Any, Any] = None) -> Dict[Any, Any]:
         """Analyze specific industry vertical with AI-powered insights"""
@@ -73,7 +88,7 @@ class MarketIntelligence:
         
         if self.ai_available:
             try:
-                chat = self._get_llm_chat(
+                system_message = (
                     f"You are a market research analyst specializing in {vertical} industry. Provide data-driven insights and analysis."
                 )
                 
@@ -95,8 +110,7 @@ Provide analysis with these fields:
 
 Focus on 2024-2025 data and emerging trends. Return valid JSON only."""
                 
-                message = UserMessage(text=prompt)
-                response = await chat.send_message(message)
+                response = await self._complete(system_message, prompt)
                 
                 import json
                 try:
@@ -198,7 +212,7 @@ Focus on 2024-2025 data and emerging trends. Return valid JSON only."""
         
         if self.ai_available:
             try:
-                chat = self._get_llm_chat(
+                system_message = (
                     f"You are a market trend analyst and futurist specializing in {vertical} industry predictions."
                 )
                 
@@ -222,8 +236,7 @@ Provide predictions in JSON format with:
 
 Base predictions on current market data, emerging technologies, and industry patterns. Return valid JSON only."""
                 
-                message = UserMessage(text=prompt)
-                response = await chat.send_message(message)
+                response = await self._complete(system_message, prompt)
                 
                 import json
                 try:
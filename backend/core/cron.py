@@ -0,0 +1,159 @@
+"""
+Cron Expression Support
+Parses standard 5-field cron expressions and computes next fire times
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Set
+
+
+class CronError(ValueError):
+    """Raised when a cron expression cannot be parsed"""
+    pass
+
+
+# Common aliases accepted in place of a 5-field expression
+CRON_ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+# How far ahead next_after() searches before giving up (e.g. "0 0 30 2 *")
+MAX_SEARCH_YEARS = 5
+
+
+def _parse_field(field: str, minimum: int, maximum: int) -> Set[int]:
+    """Parse a single cron field (supports *, lists, ranges and steps)"""
+    values: Set[int] = set()
+
+    for part in field.split(','):
+        if not part:
+            raise CronError(f"Empty element in cron field '{field}'")
+
+        step = 1
+        if '/' in part:
+            part, step_str = part.split('/', 1)
+            if not step_str.isdigit() or int(step_str) == 0:
+                raise CronError(f"Invalid step '{step_str}' in cron field '{field}'")
+            step = int(step_str)
+
+        if part == '*':
+            start, end = minimum, maximum
+        elif '-' in part:
+            start_str, end_str = part.split('-', 1)
+            if not (start_str.isdigit() and end_str.isdigit()):
+                raise CronError(f"Invalid range '{part}' in cron field '{field}'")
+            start, end = int(start_str), int(end_str)
+        elif part.isdigit():
+            start = int(part)
+            # "5/15" means "starting at 5, every 15"
+            end = maximum if step > 1 else start
+        else:
+            raise CronError(f"Invalid value '{part}' in cron field '{field}'")
+
+        if start < minimum or end > maximum or start > end:
+            raise CronError(f"Value out of range in cron field '{field}' ({minimum}-{maximum})")
+
+        values.update(range(start, end + 1, step))
+
+    return values
+
+
+class CronExpression:
+    """
+    Standard 5-field cron expression: minute hour day-of-month month day-of-week
+
+    Day-of-week uses 0-6 with 0 (or 7) as Sunday. As in Vixie cron, when both
+    day-of-month and day-of-week are restricted a day matches if either does.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        normalized = CRON_ALIASES.get(self.expression.lower(), self.expression)
+        fields = normalized.split()
+        if len(fields) != 5:
+            raise CronError(f"Cron expression must have 5 fields: '{expression}'")
+
+        minute, hour, day, month, weekday = fields
+        self.minutes = _parse_field(minute, 0, 59)
+        self.hours = _parse_field(hour, 0, 23)
+        self.days = _parse_field(day, 1, 31)
+        self.months = _parse_field(month, 1, 12)
+        weekdays = _parse_field(weekday, 0, 7)
+        if 7 in weekdays:
+            weekdays.discard(7)
+            weekdays.add(0)
+        self.weekdays = weekdays
+
+        self._day_restricted = day != '*'
+        self._weekday_restricted = weekday != '*'
+
+    @staticmethod
+    def is_valid(expression: str) -> bool:
+        """Check whether an expression parses"""
+        try:
+            CronExpression(expression)
+            return True
+        except CronError:
+            return False
+
+    def _day_matches(self, dt: datetime) -> bool:
+        # Python: Monday=0; cron: Sunday=0
+        cron_weekday = (dt.weekday() + 1) % 7
+        day_ok = dt.day in self.days
+        weekday_ok = cron_weekday in self.weekdays
+
+        if self._day_restricted and self._weekday_restricted:
+            return day_ok or weekday_ok
+        if self._day_restricted:
+            return day_ok
+        if self._weekday_restricted:
+            return weekday_ok
+        return True
+
+    def next_after(self, after: datetime) -> datetime:
+        """Return the first fire time strictly after ``after``"""
+        dt = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = after + timedelta(days=366 * MAX_SEARCH_YEARS)
+
+        while dt <= limit:
+            if dt.month not in self.months:
+                # Jump to the first minute of the next month
+                if dt.month == 12:
+                    dt = dt.replace(year=dt.year + 1, month=1, day=1, hour=0, minute=0)
+                else:
+                    dt = dt.replace(month=dt.month + 1, day=1, hour=0, minute=0)
+                continue
+
+            if not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+
+            if dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+                continue
+
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+
+            return dt
+
+        raise CronError(f"Cron expression '{self.expression}' never fires")
+
+    def next_times(self, after: datetime, count: int) -> List[datetime]:
+        """Return the next ``count`` fire times after ``after``"""
+        times: List[datetime] = []
+        current = after
+        for _ in range(count):
+            current = self.next_after(current)
+            times.append(current)
+        return times
+
+    def __repr__(self) -> str:
+        return f"CronExpression('{self.expression}')"
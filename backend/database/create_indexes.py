@@ -64,6 +64,10 @@ async def create_indexes():
         await db.analytics.create_index("platform", name="platform_idx")
         await db.analytics.create_index([("campaign_id", 1), ("timestamp", -1)], name="campaign_timestamp_compound_idx")
         
+        # Campaign metrics, joined to campaigns by report aggregation
+        logger.info("Creating indexes for 'campaign_metrics' collection...")
+        await db.campaign_metrics.create_index("campaign_id", name="campaign_id_idx")
+        
         # Agents collection
         logger.info("Creating indexes for 'agents' collection...")
         await db.agents.create_index("organization_id", name="organization_id_idx")
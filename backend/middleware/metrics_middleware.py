@@ -14,6 +14,22 @@ from services.prometheus_metrics import metrics_collector
 
 logger = logging.getLogger(__name__)
 
+# Label used for requests that did not match any route (404s, scanners)
+UNMATCHED_ROUTE = "__unmatched__"
+
+
+def get_route_template(request: Request) -> str:
+    """
+    Return the path template of the route that handled the request
+    (e.g. ``/api/campaigns/{campaign_id}``) rather than the raw URL, so
+    that IDs never leak into metric labels.
+    """
+    route = request.scope.get("route")
+    path = getattr(route, "path", None)
+    if path:
+        return path
+    return UNMATCHED_ROUTE
+
 
 class MetricsMiddleware(BaseHTTPMiddleware):
     """Middleware to record HTTP metrics"""
@@ -21,16 +37,6 @@ class MetricsMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         """Process request and record metrics"""
         start_time = time.time()
-        
-        # Get endpoint path (normalize)
-        endpoint = request.url.path
-        # Remove IDs from path for better aggregation
-        if '/api/' in endpoint:
-            # Replace UUIDs and IDs with placeholders
-            import re
-            endpoint = re.sub(r'/[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}', '/{id}', endpoint)
-            endpoint = re.sub(r'/\d+', '/{id}', endpoint)
-        
         method = request.method
         
         try:
@@ -42,6 +48,9 @@ class MetricsMiddleware(BaseHTTPMiddleware):
             raise
         finally:
             duration = time.time() - start_time
+            # The router stores the matched route in the scope, so it is
+            # only available once the request has been dispatched
+            endpoint = get_route_template(request)
             
             # Record metrics
             try:
@@ -33,6 +33,11 @@ from brain_logic.customization_engine import customization_engine
 from shared_components.analytics_engine import analytics_engine
 from shared_components.integration_hub import integration_hub
 
+# Import services with state to release on shutdown
+from services.real_time_personalization_service import close_real_time_personalization_service
+from services.advanced_reporting_service import close_advanced_reporting_service
+from services.training_jobs import close_training_job_manager
+
 # Import models
 from models.platform_models import *
 from models.brain_models import *
@@ -414,5 +419,11 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Apply buffered personalization events while the database is still open
+    await close_real_time_personalization_service()
+    # Hand running report jobs back to the queue for another instance
+    await close_advanced_reporting_service()
+    # Stop training workers so their processes do not outlive the server
+    await close_training_job_manager()
     client.close()
     logger.info("Omnify Cloud Connect - Shutting down...")
@@ -0,0 +1,199 @@
+"""
+A/B Test Statistics
+Sufficient statistics per variant and vectorized significance tests over
+all variants at once
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy import stats
+
+# Per-observation metrics tracked for every variant
+AB_TEST_METRICS = ["impressions", "clicks", "conversions", "cost", "revenue"]
+
+# Ratio metrics are evaluated on the per-observation metric that drives them
+SUCCESS_METRIC_STATS = {
+    "ctr": "clicks",
+    "conversion_rate": "conversions",
+    "cpa": "conversions",
+    "roas": "revenue"
+}
+
+# Posterior draws for the beta-binomial evaluation
+BAYESIAN_SAMPLES = 20000
+
+
+@dataclass
+class VariantStats:
+    """
+    Sufficient statistics for a set of variants
+
+    ``n`` is observations per variant; ``sums`` and ``sums_sq`` are
+    (variants, metrics) sums and sums of squares of each metric over those
+    observations. Means and variances follow without revisiting events.
+    """
+    metrics: List[str]
+    n: np.ndarray
+    sums: np.ndarray
+    sums_sq: np.ndarray
+
+    def column(self, metric: str) -> int:
+        return self.metrics.index(metric)
+
+    def mean(self, metric: str) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.n > 0, self.sums[:, self.column(metric)] / self.n, 0.0)
+
+    def variance(self, metric: str) -> np.ndarray:
+        """Sample variance (ddof=1) per variant"""
+        i = self.column(metric)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var = (self.sums_sq[:, i] - self.sums[:, i] ** 2 / self.n) / (self.n - 1)
+        return np.where(self.n > 1, np.maximum(var, 0.0), 0.0)
+
+    def is_binary(self, metric: str) -> bool:
+        """True when every observation was 0 or 1 (x^2 == x, so sums match)"""
+        i = self.column(metric)
+        return bool(np.allclose(self.sums_sq[:, i], self.sums[:, i]))
+
+
+def observation_increments(observations: Sequence[Dict[str, Any]], metrics: List[str] = AB_TEST_METRICS) -> Dict[str, float]:
+    """Reduce a batch of observations to ``$inc`` increments of n, sums and sums of squares"""
+    values = np.array(
+        [[observation.get(metric) or 0 for metric in metrics] for observation in observations],
+        dtype=np.float64
+    ).reshape(len(observations), len(metrics))
+
+    increments = {"n": len(observations)}
+    for metric, total, total_sq in zip(metrics, values.sum(axis=0), (values ** 2).sum(axis=0)):
+        increments[f"sum.{metric}"] = float(total)
+        increments[f"sum_sq.{metric}"] = float(total_sq)
+    return increments
+
+
+def z_test_proportions(successes: np.ndarray, n: np.ndarray, control: int = 0):
+    """Pooled two-proportion z-test of every variant against ``control``"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = np.where(n > 0, successes / n, 0.0)
+        pooled = (successes + successes[control]) / (n + n[control])
+        se = np.sqrt(pooled * (1 - pooled) * (1 / n + 1 / n[control]))
+        z = np.where(se > 0, (p - p[control]) / se, 0.0)
+    return z, 2 * stats.norm.sf(np.abs(z))
+
+
+def welch_t_test(mean: np.ndarray, var: np.ndarray, n: np.ndarray, control: int = 0):
+    """Welch's unequal-variance t-test of every variant against ``control``"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a, b = var / n, var[control] / n[control]
+        se = np.sqrt(a + b)
+        t = np.where(se > 0, (mean - mean[control]) / se, 0.0)
+        df = (a + b) ** 2 / (a ** 2 / (n - 1) + b ** 2 / (n[control] - 1))
+    df = np.where(np.isfinite(df) & (df > 0), df, 1.0)
+    return t, 2 * stats.t.sf(np.abs(t), df)
+
+
+def beta_binomial(
+    successes: np.ndarray,
+    n: np.ndarray,
+    control: int = 0,
+    prior: Sequence[float] = (1.0, 1.0),
+    samples: int = BAYESIAN_SAMPLES,
+    seed: int = 0
+) -> Dict[str, np.ndarray]:
+    """
+    Beta-binomial posterior comparison
+
+    Draws ``samples`` conversion rates per variant from
+    Beta(prior_a + successes, prior_b + failures) in one call and returns
+    each variant's probability of beating the control and of being best.
+    """
+    rng = np.random.default_rng(seed)
+    a = prior[0] + successes
+    b = prior[1] + np.maximum(n - successes, 0)
+    draws = rng.beta(a[:, None], b[:, None], size=(len(n), samples))
+
+    return {
+        "prob_beats_control": (draws > draws[control]).mean(axis=1),
+        "prob_best": np.bincount(draws.argmax(axis=0), minlength=len(n)) / samples,
+        "expected_lift": (draws / draws[control] - 1).mean(axis=1)
+    }
+
+
+def obrien_fleming_boundary(alpha: float, information_fraction: float) -> float:
+    """
+    Two-sided z boundary for an interim look (Lan-DeMets O'Brien-Fleming)
+
+    Early looks need very strong evidence; at full information the boundary
+    is the fixed-sample critical value, so repeated looks keep the overall
+    type I error at ``alpha``.
+    """
+    t = min(max(information_fraction, 1e-6), 1.0)
+    return float(stats.norm.ppf(1 - alpha / 2) / np.sqrt(t))
+
+
+def evaluate(
+    variant_stats: VariantStats,
+    metric: str,
+    alpha: float = 0.05,
+    planned_n: Optional[int] = None,
+    control: int = 0
+) -> Dict[str, Any]:
+    """
+    Evaluate every variant against the control on ``metric``
+
+    0/1 metrics use the two-proportion z-test plus the beta-binomial
+    posterior; other metrics use Welch's t-test. Alpha is Bonferroni
+    corrected over the treatment variants. With ``planned_n`` (observations
+    per variant) the test is sequential: it may stop once a statistic
+    crosses the O'Brien-Fleming boundary for the current information
+    fraction, and otherwise concludes at the planned sample size.
+    """
+    metric = SUCCESS_METRIC_STATS.get(metric, metric)
+    n = variant_stats.n.astype(np.float64)
+    mean = variant_stats.mean(metric)
+    comparisons = max(len(n) - 1, 1)
+    corrected_alpha = alpha / comparisons
+
+    binary = variant_stats.is_binary(metric)
+    if binary:
+        statistic, p_values = z_test_proportions(variant_stats.sums[:, variant_stats.column(metric)], n, control)
+        method = "two_proportion_z_test"
+    else:
+        statistic, p_values = welch_t_test(mean, variant_stats.variance(metric), n, control)
+        method = "welch_t_test"
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lift = np.where(mean[control] != 0, mean / mean[control] - 1, 0.0)
+        pooled_sd = np.sqrt((variant_stats.variance(metric) + variant_stats.variance(metric)[control]) / 2)
+        effect_size = np.where(pooled_sd > 0, (mean - mean[control]) / pooled_sd, 0.0)
+
+    information_fraction = 1.0
+    if planned_n:
+        information_fraction = float(min(n.min(), planned_n) / planned_n) if len(n) else 0.0
+    boundary = obrien_fleming_boundary(corrected_alpha, information_fraction)
+
+    treatment = np.arange(len(n)) != control
+    crossed = treatment & (np.abs(statistic) >= boundary) & (n > 1)
+    complete = information_fraction >= 1.0
+
+    result = {
+        "metric": metric,
+        "method": method,
+        "alpha": alpha,
+        "corrected_alpha": corrected_alpha,
+        "information_fraction": information_fraction,
+        "boundary": boundary,
+        "means": mean,
+        "lift": lift,
+        "effect_size": effect_size,
+        "statistic": statistic,
+        "p_values": np.where(treatment, p_values, 1.0),
+        "significant": crossed,
+        "stopped_early": bool(crossed.any() and not complete),
+        "complete": bool(complete or crossed.any())
+    }
+    if binary:
+        result["bayesian"] = beta_binomial(variant_stats.sums[:, variant_stats.column(metric)], n, control)
+    return result
@@ -6,23 +6,23 @@ Production-grade AI capabilities with market intelligence, anomaly detection, an
 import asyncio
 import json
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from enum import Enum
 import uuid
+from collections import defaultdict
 import numpy as np
-import pandas as pd
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel, Field
+from pymongo.errors import DuplicateKeyError
 import aiohttp
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
 import requests
 import re
 from bs4 import BeautifulSoup
 
+from services.anomaly_baselines import ANOMALY_Z_THRESHOLD, EWMABaseline
+
 logger = logging.getLogger(__name__)
 
 class AnomalyType(str, Enum):
@@ -269,67 +269,165 @@ class MarketIntelligenceEngine:
             raise
 
 class AnomalyDetectionEngine:
-    """Engine for detecting anomalies in campaign performance"""
-    
+    """
+    Engine for detecting anomalies in campaign performance
+
+    Each client has a streaming EWMA baseline per metric, persisted in
+    ``anomaly_baselines``. New data points are scored against the baseline
+    and then folded into it. Each point costs the same however much history
+    there is, and nothing is refit. Detected anomalies are bulk-inserted into
+    ``anomaly_detections``, so reads are a query over stored results.
+    """
+
+    FEATURES = ['impressions', 'clicks', 'conversions', 'cost', 'revenue', 'ctr', 'conversion_rate']
+
+    # Attempts to commit a baseline update when another writer got there first
+    MAX_COMMIT_ATTEMPTS = 3
+
     def __init__(self, db: AsyncIOMotorClient):
         self.db = db
-        self.isolation_forest = IsolationForest(contamination=0.1, random_state=42)
-        self.scaler = StandardScaler()
-    
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._indexes_ready = False
+
+    async def ingest_metrics(self, client_id: str, data_points: List[Dict[str, Any]]) -> List[AnomalyDetection]:
+        """Score new performance data points (oldest first) as they arrive"""
+        try:
+            async with self._locks[client_id]:
+                for _ in range(self.MAX_COMMIT_ATTEMPTS):
+                    baseline, previous_count = await self._get_baseline(client_id)
+                    anomalies = self._observe(baseline, data_points)
+                    if await self._commit(client_id, baseline, previous_count, anomalies):
+                        return anomalies
+                raise RuntimeError(f"Anomaly baseline for client {client_id} kept changing concurrently")
+
+        except Exception as e:
+            logger.error(f"Error ingesting metrics for anomaly detection: {e}")
+            raise
+
     async def detect_anomalies(self, client_id: str, days: int = 30) -> List[AnomalyDetection]:
-        """Detect anomalies in campaign performance data"""
+        """
+        Get anomalies detected for the client in the last ``days`` days
+
+        Days completed since the baseline last advanced are scored first,
+        so the baseline is written at most once a day rather than on every
+        read.
+        """
         try:
-            # Get performance data
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=days)
-            
-            performance_data = await self._get_performance_data(client_id, start_date, end_date)
-            
-            if len(performance_data) < 10:
-                logger.warning(f"Insufficient data for anomaly detection: {len(performance_data)} records")
-                return []
-            
-            # Convert to DataFrame for analysis
-            df = pd.DataFrame(performance_data)
-            
-            # Prepare features for anomaly detection
-            features = ['impressions', 'clicks', 'conversions', 'cost', 'revenue', 'ctr', 'conversion_rate']
-            feature_data = df[features].fillna(0)
-            
-            # Scale features
-            scaled_features = self.scaler.fit_transform(feature_data)
-            
-            # Detect anomalies
-            anomaly_labels = self.isolation_forest.fit_predict(scaled_features)
-            anomaly_scores = self.isolation_forest.decision_function(scaled_features)
-            
-            # Process anomalies
-            anomalies = []
-            for i, (label, score) in enumerate(zip(anomaly_labels, anomaly_scores)):
-                if label == -1:  # Anomaly detected
-                    anomaly = await self._analyze_anomaly(df.iloc[i], score, features)
-                    anomalies.append(anomaly)
-            
-            # Save anomalies to database
-            for anomaly in anomalies:
-                await self._save_anomaly(anomaly, client_id)
-            
-            logger.info(f"Detected {len(anomalies)} anomalies for client {client_id}")
-            return anomalies
-            
+            await self.refresh_baseline(client_id, days)
+
+            since = datetime.utcnow() - timedelta(days=days)
+            docs = await self.db.anomaly_detections.find(
+                {"client_id": client_id, "detected_at": {"$gte": since.isoformat()}},
+                {"_id": 0}
+            ).sort("detected_at", -1).to_list(length=None)
+
+            return [self._anomaly_from_document(doc) for doc in docs]
+
         except Exception as e:
             logger.error(f"Error detecting anomalies: {e}")
             raise
-    
-    async def _get_performance_data(self, client_id: str, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
-        """Get performance data for anomaly detection"""
+
+    async def refresh_baseline(self, client_id: str, days: int = 30) -> List[AnomalyDetection]:
+        """
+        Fold complete days the baseline has not seen yet into it
+
+        A new client's baseline is seeded from the last ``days`` days.
+        After that, only rows dated after the baseline's last point are
+        read. Today is still accumulating, so it is left for the next
+        day's refresh rather than scored and committed as the last point.
+        """
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        yesterday = (today - timedelta(days=1)).date().isoformat()
+
+        async with self._locks[client_id]:
+            for _ in range(self.MAX_COMMIT_ATTEMPTS):
+                baseline, previous_count = await self._get_baseline(client_id)
+                if baseline.last_date and baseline.last_date >= yesterday:
+                    return []
+
+                data_points = await self._get_performance_data(
+                    client_id, today - timedelta(days=days), today, after=baseline.last_date
+                )
+                if not data_points:
+                    return []
+
+                anomalies = self._observe(baseline, data_points)
+                if await self._commit(client_id, baseline, previous_count, anomalies):
+                    return anomalies
+            return []
+
+    def _observe(self, baseline: EWMABaseline, data_points: List[Dict[str, Any]]) -> List[AnomalyDetection]:
+        anomalies = []
+        for data_point in data_points:
+            z_scores = baseline.observe(data_point)
+            if z_scores is not None:
+                anomalies.append(self._analyze_anomaly(data_point, z_scores))
+        return anomalies
+
+    async def _get_baseline(self, client_id: str) -> Tuple[EWMABaseline, int]:
+        """Load the client's baseline and the point count it was stored with"""
+        doc = await self.db.anomaly_baselines.find_one({"client_id": client_id})
+        if not doc:
+            return EWMABaseline(metrics=self.FEATURES), 0
+        return EWMABaseline.from_document(doc, self.FEATURES), doc.get("count", 0)
+
+    async def _commit(
+        self,
+        client_id: str,
+        baseline: EWMABaseline,
+        previous_count: int,
+        anomalies: List[AnomalyDetection]
+    ) -> bool:
+        """
+        Persist the updated baseline and its anomalies
+
+        The baseline write is conditional on the stored point count, so
+        another replica that advanced the baseline in the meantime wins.
+        The caller then reloads and re-scores instead of double counting.
+        """
+        await self._ensure_indexes()
+        try:
+            await self.db.anomaly_baselines.update_one(
+                {"client_id": client_id, "count": previous_count},
+                {"$set": {"client_id": client_id, **baseline.to_document()}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+
+        await self._save_anomalies(anomalies, client_id)
+        if anomalies:
+            logger.info(f"Detected {len(anomalies)} anomalies for client {client_id}")
+        return True
+
+    async def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        await self.db.anomaly_baselines.create_index("client_id", unique=True)
+        await self.db.anomaly_detections.create_index([("client_id", 1), ("detected_at", -1)])
+        self._indexes_ready = True
+
+    async def _get_performance_data(
+        self,
+        client_id: str,
+        start_date: datetime,
+        end_date: datetime,
+        after: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get daily performance data dated before the day of ``end_date``,
+        optionally only rows dated after ``after``
+        """
         try:
+            date_range = {"$gt": after} if after else {"$gte": start_date.date().isoformat()}
+            date_range["$lt"] = end_date.date().isoformat()
+
             # Query performance metrics
             pipeline = [
                 {
                     "$match": {
                         "client_id": client_id,
-                        "date": {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()}
+                        "date": date_range
                     }
                 },
                 {
@@ -369,25 +467,33 @@ class AnomalyDetectionEngine:
             logger.error(f"Error getting performance data: {e}")
             return []
     
-    async def _analyze_anomaly(self, data_point: pd.Series, score: float, features: List[str]) -> AnomalyDetection:
-        """Analyze a detected anomaly"""
+    def _analyze_anomaly(self, data_point: Dict[str, Any], z_scores: np.ndarray) -> AnomalyDetection:
+        """Analyze a data point that deviated from the baseline"""
         try:
             anomaly_id = str(uuid.uuid4())
-            
+            values = {metric: data_point.get(metric) or 0 for metric in self.FEATURES}
+
+            # Metrics that moved past the threshold
+            affected_metrics = [
+                metric for metric, z in zip(self.FEATURES, z_scores) if abs(z) >= ANOMALY_Z_THRESHOLD
+            ]
+
             # Determine anomaly type based on metrics
-            anomaly_type = self._classify_anomaly_type(data_point, features)
-            
-            # Calculate severity and confidence
-            severity = abs(score) * 10  # Scale to 0-10
-            confidence = min(0.95, 0.5 + abs(score) * 2)  # Scale to 0.5-0.95
-            
+            anomaly_type = self._classify_anomaly_type(values, affected_metrics)
+
+            # Severity scales with the largest deviation: 3 sigma -> 6, 5+ sigma -> 10
+            max_z = float(np.max(np.abs(z_scores)))
+            severity = min(10.0, max_z * 2)
+            # Chebyshev bound on how unlikely the deviation is, kept within 0.5-0.95
+            confidence = float(np.clip(1 - 1 / max_z ** 2, 0.5, 0.95))
+
             # Generate description and recommendations
-            description = self._generate_anomaly_description(data_point, anomaly_type)
-            recommendations = self._generate_recommendations(data_point, anomaly_type)
-            
+            description = self._generate_anomaly_description(values, anomaly_type)
+            recommendations = self._generate_recommendations(values, anomaly_type)
+
             # Calculate impact score
-            impact_score = self._calculate_impact_score(data_point, anomaly_type)
-            
+            impact_score = self._calculate_impact_score(values, anomaly_type)
+
             return AnomalyDetection(
                 anomaly_id=anomaly_id,
                 anomaly_type=anomaly_type,
@@ -395,16 +501,16 @@ class AnomalyDetectionEngine:
                 confidence=confidence,
                 description=description,
                 detected_at=datetime.utcnow(),
-                affected_metrics=features,
+                affected_metrics=affected_metrics,
                 recommendations=recommendations,
                 impact_score=impact_score
             )
-            
+
         except Exception as e:
             logger.error(f"Error analyzing anomaly: {e}")
             raise
-    
-    def _classify_anomaly_type(self, data_point: pd.Series, features: List[str]) -> AnomalyType:
+
+    def _classify_anomaly_type(self, data_point: Dict[str, Any], features: List[str]) -> AnomalyType:
         """Classify the type of anomaly"""
         try:
             # Simple classification based on metric values
@@ -423,7 +529,7 @@ class AnomalyDetectionEngine:
             logger.error(f"Error classifying anomaly type: {e}")
             return AnomalyType.PERFORMANCE_DROP
     
-    def _generate_anomaly_description(self, data_point: pd.Series, anomaly_type: AnomalyType) -> str:
+    def _generate_anomaly_description(self, data_point: Dict[str, Any], anomaly_type: AnomalyType) -> str:
         """Generate description for anomaly"""
         descriptions = {
             AnomalyType.PERFORMANCE_SPIKE: f"Unusual performance spike detected with {data_point['ctr']:.2%} CTR",
@@ -435,7 +541,7 @@ class AnomalyDetectionEngine:
         }
         return descriptions.get(anomaly_type, "Anomaly detected in campaign performance")
     
-    def _generate_recommendations(self, data_point: pd.Series, anomaly_type: AnomalyType) -> List[str]:
+    def _generate_recommendations(self, data_point: Dict[str, Any], anomaly_type: AnomalyType) -> List[str]:
         """Generate recommendations for anomaly"""
         recommendations = {
             AnomalyType.PERFORMANCE_SPIKE: [
@@ -471,7 +577,7 @@ class AnomalyDetectionEngine:
         }
         return recommendations.get(anomaly_type, ["Investigate anomaly", "Monitor performance", "Take corrective action"])
     
-    def _calculate_impact_score(self, data_point: pd.Series, anomaly_type: AnomalyType) -> float:
+    def _calculate_impact_score(self, data_point: Dict[str, Any], anomaly_type: AnomalyType) -> float:
         """Calculate impact score for anomaly"""
         try:
             # Base impact on revenue and cost
@@ -497,29 +603,53 @@ class AnomalyDetectionEngine:
             logger.error(f"Error calculating impact score: {e}")
             return 0.5
     
-    async def _save_anomaly(self, anomaly: AnomalyDetection, client_id: str):
-        """Save anomaly to database"""
+    async def _save_anomalies(
+        self,
+        anomalies: List[AnomalyDetection],
+        client_id: str
+    ):
+        """Save detected anomalies to database in one round trip"""
+        if not anomalies:
+            return
         try:
-            anomaly_doc = {
-                "anomaly_id": anomaly.anomaly_id,
-                "client_id": client_id,
-                "anomaly_type": anomaly.anomaly_type.value,
-                "severity": anomaly.severity,
-                "confidence": anomaly.confidence,
-                "description": anomaly.description,
-                "detected_at": anomaly.detected_at.isoformat(),
-                "affected_metrics": anomaly.affected_metrics,
-                "recommendations": anomaly.recommendations,
-                "impact_score": anomaly.impact_score,
-                "created_at": datetime.utcnow().isoformat()
-            }
-            
-            await self.db.anomaly_detections.insert_one(anomaly_doc)
-            
+            created_at = datetime.utcnow().isoformat()
+            anomaly_docs = [
+                {
+                    "anomaly_id": anomaly.anomaly_id,
+                    "client_id": client_id,
+                    "anomaly_type": anomaly.anomaly_type.value,
+                    "severity": anomaly.severity,
+                    "confidence": anomaly.confidence,
+                    "description": anomaly.description,
+                    "detected_at": anomaly.detected_at.isoformat(),
+                    "affected_metrics": anomaly.affected_metrics,
+                    "recommendations": anomaly.recommendations,
+                    "impact_score": anomaly.impact_score,
+                    "created_at": created_at
+                }
+                for anomaly in anomalies
+            ]
+
+            await self.db.anomaly_detections.insert_many(anomaly_docs, ordered=False)
+
         except Exception as e:
-            logger.error(f"Error saving anomaly: {e}")
+            logger.error(f"Error saving anomalies: {e}")
             raise
 
+    @staticmethod
+    def _anomaly_from_document(doc: Dict[str, Any]) -> AnomalyDetection:
+        return AnomalyDetection(
+            anomaly_id=doc["anomaly_id"],
+            anomaly_type=AnomalyType(doc["anomaly_type"]),
+            severity=doc["severity"],
+            confidence=doc["confidence"],
+            description=doc["description"],
+            detected_at=datetime.fromisoformat(doc["detected_at"]),
+            affected_metrics=doc.get("affected_metrics", []),
+            recommendations=doc.get("recommendations", []),
+            impact_score=doc.get("impact_score", 0.0)
+        )
+
 class TrendAnalysisEngine:
     """Engine for analyzing trends and making predictions"""
     
@@ -913,6 +1043,10 @@ class AdvancedAIService:
     async def detect_anomalies(self, client_id: str, days: int = 30) -> List[AnomalyDetection]:
         """Detect anomalies in client data"""
         return await self.anomaly_detection_engine.detect_anomalies(client_id, days)
+
+    async def ingest_performance_metrics(self, client_id: str, data_points: List[Dict[str, Any]]) -> List[AnomalyDetection]:
+        """Score newly arrived performance data for anomalies"""
+        return await self.anomaly_detection_engine.ingest_metrics(client_id, data_points)
     
     async def analyze_trends(self, client_id: str, metrics: List[str], days: int = 90) -> List[TrendAnalysis]:
         """Analyze trends for client metrics"""
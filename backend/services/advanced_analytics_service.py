@@ -8,7 +8,8 @@ import json
 import logging
 from typing import Dict, List, Any, Optional, Union
 from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
+from functools import partial
 from enum import Enum
 import uuid
 import pandas as pd
@@ -26,6 +27,9 @@ from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
 
+from services.chart_render import chart_cache, chart_key, columnar, downsample_frame, figure_spec, frame_version
+from services.report_jobs import JobPriority, ReportJobQueue, request_hash
+
 logger = logging.getLogger(__name__)
 
 class ReportFormat(str, Enum):
@@ -302,6 +306,9 @@ class AnalyticsDataProcessor:
 class ChartGenerator:
     """Generates interactive charts for dashboards and reports"""
     
+    # Chart types plotted point by point, downsampled when series are large
+    SERIES_CHART_TYPES = {"line", "scatter", "area"}
+    
     def __init__(self):
         self.chart_templates = {
             "line": self._create_line_chart,
@@ -319,17 +326,24 @@ class ChartGenerator:
             if chart_config.chart_type not in self.chart_templates:
                 raise ValueError(f"Unsupported chart type: {chart_config.chart_type}")
             
+            df = pd.DataFrame(data)
+            if chart_config.chart_type in self.SERIES_CHART_TYPES:
+                df = downsample_frame(df, chart_config.x_axis, chart_config.y_axis, group_col=chart_config.color_by)
+            
             chart_func = self.chart_templates[chart_config.chart_type]
-            fig = chart_func(chart_config, data)
+            fig = chart_func(chart_config, df)
             
-            # Convert to JSON
-            chart_json = json.dumps(fig, cls=PlotlyJSONEncoder)
+            # Layout and trace styling only; the points are sent once, by column
+            chart_json = json.dumps(figure_spec(fig), cls=PlotlyJSONEncoder)
             
             return {
                 "chart_id": str(uuid.uuid4()),
                 "chart_type": chart_config.chart_type,
                 "title": chart_config.title,
-                "data": chart_json,
+                "figure": chart_json,
+                "dataset": columnar(df, [
+                    column for column in (chart_config.x_axis, chart_config.y_axis, chart_config.color_by) if column
+                ]),
                 "config": asdict(chart_config),
                 "generated_at": datetime.utcnow().isoformat()
             }
@@ -338,6 +352,28 @@ class ChartGenerator:
             logger.error(f"Error generating chart: {e}")
             raise
     
+    async def render_chart(
+        self,
+        chart_config: Union[ChartConfig, Dict[str, Any]],
+        data: List[Dict[str, Any]],
+        data_version: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Cached chart, built and serialized off the event loop
+        
+        Charts are keyed by their configuration and a hash of their data
+        (or ``data_version`` when the caller has one), so every viewer of
+        an unchanged chart gets the same rendering.
+        """
+        if isinstance(chart_config, dict):
+            names = {field.name for field in fields(ChartConfig)}
+            chart_config = ChartConfig(**{k: v for k, v in chart_config.items() if k in names})
+        
+        df = pd.DataFrame(data)
+        key = chart_key(asdict(chart_config), data_version or frame_version(df))
+        chart = await chart_cache.get(key, partial(self.generate_chart, chart_config, df))
+        return {**chart, "chart_id": key}
+    
     def _create_line_chart(self, config: ChartConfig, data: List[Dict[str, Any]]) -> go.Figure:
         """Create line chart"""
         df = pd.DataFrame(data)
@@ -481,7 +517,7 @@ class ReportGenerator:
             if report_config.charts:
                 for chart_config in report_config.charts:
                     chart_data = self._extract_chart_data(chart_config, data)
-                    chart = self.chart_generator.generate_chart(chart_config, chart_data)
+                    chart = await self.chart_generator.render_chart(chart_config, chart_data)
                     charts.append(chart)
             
             # Generate report content
@@ -672,7 +708,7 @@ class DashboardManager:
             charts = []
             for chart_config in dashboard.get("charts", []):
                 chart_data = self._extract_chart_data(chart_config, metrics_data)
-                chart = self.chart_generator.generate_chart(chart_config, chart_data)
+                chart = await self.chart_generator.render_chart(chart_config, chart_data)
                 charts.append(chart)
             
             return {
@@ -706,6 +742,12 @@ class ScheduledReportManager:
         self.db = db
         self.report_generator = report_generator
         self.scheduled_reports = {}
+        self.run_queue = ReportJobQueue(db.scheduled_report_runs, self._run_scheduled_report, id_field="run_id")
+        try:
+            # Resume runs left queued or generating by a previous process
+            self.run_queue.start()
+        except RuntimeError:
+            logger.warning("No running event loop; scheduled report runs start with the first execution")
     
     async def create_scheduled_report(self, client_id: str, report_config: ReportConfig) -> Dict[str, Any]:
         """Create a scheduled report"""
@@ -745,68 +787,102 @@ class ScheduledReportManager:
             logger.error(f"Error creating scheduled report: {e}")
             raise
     
-    async def execute_scheduled_report(self, report_id: str) -> Dict[str, Any]:
-        """Execute a scheduled report"""
+    async def execute_scheduled_report(self, report_id: str, priority: int = JobPriority.SCHEDULED) -> Dict[str, Any]:
+        """
+        Queue a run of a scheduled report
+        
+        Returns the run; a run of the same report queued or finished within
+        the dedupe window is returned instead of queueing another.
+        """
         try:
             scheduled_report = await self.db.scheduled_reports.find_one({"report_id": report_id})
             if not scheduled_report:
                 raise ValueError(f"Scheduled report {report_id} not found")
             
-            # Get data processor
-            data_processor = AnalyticsDataProcessor(self.db)
-            
-            # Calculate time range
-            end_date = datetime.utcnow()
-            if scheduled_report["time_range"] == "7d":
-                start_date = end_date - timedelta(days=7)
-            elif scheduled_report["time_range"] == "30d":
-                start_date = end_date - timedelta(days=30)
-            elif scheduled_report["time_range"] == "90d":
-                start_date = end_date - timedelta(days=90)
-            else:
-                start_date = end_date - timedelta(days=30)
-            
-            # Get metrics data
-            metrics_data = await data_processor.get_campaign_metrics(
-                scheduled_report["client_id"], start_date, end_date
-            )
-            
-            # Generate report
-            report_config = ReportConfig(
-                name=scheduled_report["name"],
-                description=scheduled_report["description"],
-                report_type=scheduled_report["report_type"],
-                format=scheduled_report["format"],
-                charts=[ChartConfig(**chart) for chart in scheduled_report["charts"]],
-                filters=scheduled_report["filters"],
-                time_range=scheduled_report["time_range"]
-            )
-            
-            report_result = await self.report_generator.generate_report(report_config, metrics_data)
-            
-            # Send report to recipients
-            if scheduled_report["recipients"]:
-                await self._send_report_email(report_result, scheduled_report["recipients"])
-            
-            # Update last run time
-            await self.db.scheduled_reports.update_one(
-                {"report_id": report_id},
-                {
-                    "$set": {
-                        "last_run": datetime.utcnow().isoformat(),
-                        "next_run": self._calculate_next_run(scheduled_report["schedule"])
-                    }
-                }
+            run, shared = await self.run_queue.submit(
+                {"run_id": str(uuid.uuid4()), "report_id": report_id},
+                tenant_id=scheduled_report["client_id"],
+                priority=priority,
+                dedupe_key=request_hash("scheduled_report", report_id)
             )
             
-            logger.info(f"Executed scheduled report {report_id}")
-            
-            return report_result
+            if not shared:
+                logger.info(f"Queued run {run['run_id']} of scheduled report {report_id}")
+            return run
             
         except Exception as e:
             logger.error(f"Error executing scheduled report: {e}")
             raise
     
+    async def get_run(self, report_id: str, run_id: str) -> Dict[str, Any]:
+        """Get a scheduled report run"""
+        run = await self.db.scheduled_report_runs.find_one({"run_id": run_id, "report_id": report_id}, {"_id": 0})
+        if not run:
+            raise ValueError(f"Run {run_id} of scheduled report {report_id} not found")
+        return run
+    
+    async def _run_scheduled_report(self, run: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate and send a queued scheduled report run; returns the fields recorded on the run"""
+        report_id = run["report_id"]
+        scheduled_report = await self.db.scheduled_reports.find_one({"report_id": report_id})
+        if not scheduled_report:
+            raise ValueError(f"Scheduled report {report_id} not found")
+        
+        # Get data processor
+        data_processor = AnalyticsDataProcessor(self.db)
+        
+        # Calculate time range
+        end_date = datetime.utcnow()
+        if scheduled_report["time_range"] == "7d":
+            start_date = end_date - timedelta(days=7)
+        elif scheduled_report["time_range"] == "30d":
+            start_date = end_date - timedelta(days=30)
+        elif scheduled_report["time_range"] == "90d":
+            start_date = end_date - timedelta(days=90)
+        else:
+            start_date = end_date - timedelta(days=30)
+        
+        # Get metrics data
+        metrics_data = await data_processor.get_campaign_metrics(
+            scheduled_report["client_id"], start_date, end_date
+        )
+        
+        # Generate report
+        report_config = ReportConfig(
+            name=scheduled_report["name"],
+            description=scheduled_report["description"],
+            report_type=scheduled_report["report_type"],
+            format=scheduled_report["format"],
+            charts=[ChartConfig(**chart) for chart in scheduled_report["charts"]],
+            filters=scheduled_report["filters"],
+            time_range=scheduled_report["time_range"]
+        )
+        
+        report_result = await self.report_generator.generate_report(report_config, metrics_data)
+        
+        # Send report to recipients
+        if scheduled_report["recipients"]:
+            await self._send_report_email(report_result, scheduled_report["recipients"])
+        
+        # Update last run time
+        await self.db.scheduled_reports.update_one(
+            {"report_id": report_id},
+            {
+                "$set": {
+                    "last_run": datetime.utcnow().isoformat(),
+                    "next_run": self._calculate_next_run(scheduled_report["schedule"])
+                }
+            }
+        )
+        
+        logger.info(f"Executed scheduled report {report_id}")
+        
+        return {
+            "generated_at": report_result["generated_at"],
+            "file_size": report_result["file_size"],
+            "generated_report_id": report_result["report_id"]
+        }
+    
     def _calculate_next_run(self, schedule: str) -> str:
         """Calculate next run time based on schedule"""
         now = datetime.utcnow()
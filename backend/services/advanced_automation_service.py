@@ -6,14 +6,15 @@ Production-grade automation with complex multi-step workflows, conditional logic
 import asyncio
 import json
 import logging
-from typing import Dict, List, Any, Optional, Union, Callable
+from typing import Dict, List, Any, Optional, Union, Callable, Set, Tuple
 from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from enum import Enum
 import uuid
 # Phase 1 deprecated - MongoDB archived (MVP uses Supabase)
 # from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel, Field
+from pymongo import ReplaceOne
 import aiohttp
 from celery import Celery
 from celery.result import AsyncResult
@@ -113,6 +114,7 @@ class WorkflowExecution:
     context: Dict[str, Any]
     error_message: Optional[str]
     retry_count: int
+    completed_steps: Set[str] = field(default_factory=set)
 
 @dataclass
 class StepExecution:
@@ -131,6 +133,9 @@ class StepExecution:
 class WorkflowEngine:
     """Core workflow execution engine"""
     
+    # Buffered step-state documents flushed per bulk_write
+    STEP_WRITE_BATCH_SIZE = 20
+    
     def __init__(self, db=None, redis_client: redis.Redis=None, celery_app=None):
         # Phase 1/3 deprecated - MongoDB and Celery archived for MVP
         self.db = None  # Phase 1: MongoDB archived
@@ -138,6 +143,10 @@ class WorkflowEngine:
         self.celery = None  # Phase 3: Celery archived
         self.action_handlers = self._initialize_action_handlers()
         self.condition_evaluators = self._initialize_condition_evaluators()
+        # workflow_id -> (updated_at, compiled steps)
+        self._compiled_workflows: Dict[str, Tuple[Any, List[WorkflowStep]]] = {}
+        # execution_id -> {step_execution_id: latest step document}
+        self._pending_step_writes: Dict[str, Dict[str, Dict[str, Any]]] = {}
     
     def _initialize_action_handlers(self) -> Dict[ActionType, Callable]:
         """Initialize action handlers for different action types"""
@@ -207,14 +216,19 @@ class WorkflowEngine:
     async def execute_workflow(self, workflow_id: str, trigger_data: Optional[Dict[str, Any]] = None) -> str:
         """Execute a workflow"""
         try:
-            # Get workflow definition
-            workflow_doc = await self.db.workflows.find_one({"workflow_id": workflow_id})
+            # Get workflow header; steps come from the compiled definition cache
+            workflow_doc = await self.db.workflows.find_one(
+                {"workflow_id": workflow_id},
+                {"_id": 0, "status": 1, "updated_at": 1}
+            )
             if not workflow_doc:
                 raise ValueError(f"Workflow {workflow_id} not found")
             
             if workflow_doc["status"] != WorkflowStatus.ACTIVE.value:
                 raise ValueError(f"Workflow {workflow_id} is not active")
             
+            steps = await self._get_compiled_steps(workflow_id, workflow_doc.get("updated_at"))
+            
             # Create execution instance
             execution_id = str(uuid.uuid4())
             execution = WorkflowExecution(
@@ -233,7 +247,7 @@ class WorkflowEngine:
             await self._save_execution(execution)
             
             # Start workflow execution asynchronously
-            await self._execute_workflow_async(execution)
+            await self._execute_workflow_async(execution, steps)
             
             logger.info(f"Started workflow execution {execution_id} for workflow {workflow_id}")
             return execution_id
@@ -242,23 +256,49 @@ class WorkflowEngine:
             logger.error(f"Error executing workflow {workflow_id}: {e}")
             raise
     
-    async def _execute_workflow_async(self, execution: WorkflowExecution):
+    async def _get_compiled_steps(self, workflow_id: str, updated_at: Any = None) -> List[WorkflowStep]:
+        """
+        Get the parsed steps of a workflow, re-reading the definition only
+        when its updated_at has changed since it was last compiled
+        """
+        cached = self._compiled_workflows.get(workflow_id)
+        if cached and updated_at is not None and cached[0] == updated_at:
+            return cached[1]
+        
+        workflow_doc = await self.db.workflows.find_one(
+            {"workflow_id": workflow_id},
+            {"_id": 0, "steps": 1, "updated_at": 1}
+        )
+        if not workflow_doc:
+            raise ValueError(f"Workflow {workflow_id} not found")
+        
+        steps = [WorkflowStep(**step_data) for step_data in workflow_doc["steps"]]
+        self._compiled_workflows[workflow_id] = (workflow_doc.get("updated_at"), steps)
+        return steps
+    
+    def invalidate_workflow_cache(self, workflow_id: Optional[str] = None):
+        """Drop compiled workflow definitions (all of them if no ID is given)"""
+        if workflow_id is None:
+            self._compiled_workflows.clear()
+        else:
+            self._compiled_workflows.pop(workflow_id, None)
+    
+    async def _execute_workflow_async(self, execution: WorkflowExecution, steps: Optional[List[WorkflowStep]] = None):
         """Execute workflow asynchronously"""
         try:
-            # Get workflow definition
-            workflow_doc = await self.db.workflows.find_one({"workflow_id": execution.workflow_id})
-            steps = workflow_doc["steps"]
+            if steps is None:
+                steps = await self._get_compiled_steps(execution.workflow_id)
             
             # Execute steps in order
-            for step_data in steps:
-                step = WorkflowStep(**step_data)
-                
+            for step in steps:
                 # Check if step should be executed based on dependencies
-                if not await self._check_step_dependencies(execution.execution_id, step.depends_on):
+                if not self._check_step_dependencies(execution, step.depends_on):
                     continue
                 
                 # Execute step
-                await self._execute_step(execution, step)
+                step_execution = await self._execute_step(execution, step)
+                if step_execution.status == StepStatus.COMPLETED:
+                    execution.completed_steps.add(step.step_id)
                 
                 # Check if workflow should continue
                 if execution.status in [WorkflowStatus.FAILED, WorkflowStatus.CANCELLED]:
@@ -269,6 +309,7 @@ class WorkflowEngine:
                 execution.status = WorkflowStatus.COMPLETED
                 execution.completed_at = datetime.utcnow()
             
+            await self._flush_step_executions(execution.execution_id)
             await self._save_execution(execution)
             
         except Exception as e:
@@ -276,9 +317,12 @@ class WorkflowEngine:
             execution.status = WorkflowStatus.FAILED
             execution.error_message = str(e)
             execution.completed_at = datetime.utcnow()
-            await self._save_execution(execution)
+            try:
+                await self._flush_step_executions(execution.execution_id)
+            finally:
+                await self._save_execution(execution)
     
-    async def _execute_step(self, execution: WorkflowExecution, step: WorkflowStep):
+    async def _execute_step(self, execution: WorkflowExecution, step: WorkflowStep) -> StepExecution:
         """Execute a single workflow step"""
         try:
             # Create step execution
@@ -294,16 +338,19 @@ class WorkflowEngine:
                 error_message=None,
                 retry_count=0
             )
-            
-            # Save step execution
-            await self._save_step_execution(step_execution)
+            execution.current_step = step.step_id
             
             # Check conditions
             if not await self._evaluate_conditions(step.conditions, execution.context):
                 step_execution.status = StepStatus.SKIPPED
                 step_execution.completed_at = datetime.utcnow()
                 await self._save_step_execution(step_execution)
-                return
+                return step_execution
+            
+            # Record step start; make it visible before potentially long waits
+            await self._save_step_execution(step_execution)
+            if step.action_type == ActionType.WAIT:
+                await self._flush_step_executions(execution.execution_id)
             
             # Execute action
             action_handler = self.action_handlers.get(step.action_type)
@@ -327,6 +374,7 @@ class WorkflowEngine:
                         step_execution.retry_count += 1
                         step_execution.status = StepStatus.RETRYING
                         await self._save_step_execution(step_execution)
+                        await self._flush_step_executions(execution.execution_id)
                         await asyncio.sleep(retry_delay * (attempt + 1))
                     else:
                         step_execution.status = StepStatus.FAILED
@@ -341,6 +389,7 @@ class WorkflowEngine:
             
             # Save step execution
             await self._save_step_execution(step_execution)
+            return step_execution
             
         except Exception as e:
             logger.error(f"Error executing step {step.step_id}: {e}")
@@ -395,26 +444,12 @@ class WorkflowEngine:
             logger.error(f"Error getting nested value for {field_path}: {e}")
             return None
     
-    async def _check_step_dependencies(self, execution_id: str, depends_on: List[str]) -> bool:
+    def _check_step_dependencies(self, execution: WorkflowExecution, depends_on: List[str]) -> bool:
         """Check if step dependencies are satisfied"""
-        try:
-            if not depends_on:
-                return True
-            
-            # Get completed steps for this execution
-            completed_steps = await self.db.step_executions.find({
-                "workflow_execution_id": execution_id,
-                "status": StepStatus.COMPLETED.value
-            }).to_list(length=None)
-            
-            completed_step_ids = [step["step_id"] for step in completed_steps]
-            
-            # Check if all dependencies are completed
-            return all(dep in completed_step_ids for dep in depends_on)
-            
-        except Exception as e:
-            logger.error(f"Error checking step dependencies: {e}")
-            return False
+        if not depends_on:
+            return True
+        
+        return all(dep in execution.completed_steps for dep in depends_on)
     
     # Action Handlers
     async def _handle_send_email(self, config: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
@@ -818,6 +853,7 @@ class WorkflowEngine:
                 "context": execution.context,
                 "error_message": execution.error_message,
                 "retry_count": execution.retry_count,
+                "completed_steps": sorted(execution.completed_steps),
                 "updated_at": datetime.utcnow().isoformat()
             }
             
@@ -832,41 +868,78 @@ class WorkflowEngine:
             raise
     
     async def _save_step_execution(self, step_execution: StepExecution):
-        """Save step execution to database"""
+        """
+        Queue a step execution state for saving
+        
+        Only the latest state of each step is kept, and queued states are
+        written together with a single bulk_write once the batch is full
+        (see _flush_step_executions for the other flush points).
+        """
+        step_execution_doc = {
+            "step_execution_id": step_execution.step_execution_id,
+            "workflow_execution_id": step_execution.workflow_execution_id,
+            "step_id": step_execution.step_id,
+            "status": step_execution.status.value,
+            "started_at": step_execution.started_at.isoformat(),
+            "completed_at": step_execution.completed_at.isoformat() if step_execution.completed_at else None,
+            "input_data": dict(step_execution.input_data),
+            "output_data": step_execution.output_data,
+            "error_message": step_execution.error_message,
+            "retry_count": step_execution.retry_count,
+            "updated_at": datetime.utcnow().isoformat()
+        }
+        
+        pending = self._pending_step_writes.setdefault(step_execution.workflow_execution_id, {})
+        pending[step_execution.step_execution_id] = step_execution_doc
+        
+        if len(pending) >= self.STEP_WRITE_BATCH_SIZE:
+            await self._flush_step_executions(step_execution.workflow_execution_id)
+    
+    async def _flush_step_executions(self, execution_id: str):
+        """Write all queued step execution states for an execution in one bulk_write"""
+        pending = self._pending_step_writes.pop(execution_id, None)
+        if not pending:
+            return
+        
         try:
-            step_execution_doc = {
-                "step_execution_id": step_execution.step_execution_id,
-                "workflow_execution_id": step_execution.workflow_execution_id,
-                "step_id": step_execution.step_id,
-                "status": step_execution.status.value,
-                "started_at": step_execution.started_at.isoformat(),
-                "completed_at": step_execution.completed_at.isoformat() if step_execution.completed_at else None,
-                "input_data": step_execution.input_data,
-                "output_data": step_execution.output_data,
-                "error_message": step_execution.error_message,
-                "retry_count": step_execution.retry_count,
-                "updated_at": datetime.utcnow().isoformat()
-            }
-            
-            await self.db.step_executions.replace_one(
-                {"step_execution_id": step_execution.step_execution_id},
-                step_execution_doc,
-                upsert=True
+            await self.db.step_executions.bulk_write(
+                [
+                    ReplaceOne({"step_execution_id": step_execution_id}, doc, upsert=True)
+                    for step_execution_id, doc in pending.items()
+                ],
+                ordered=False
             )
             
         except Exception as e:
-            logger.error(f"Error saving step execution: {e}")
+            logger.error(f"Error saving step executions: {e}")
             raise
 
 class WorkflowTriggerManager:
     """Manages workflow triggers and scheduling"""
     
-    def __init__(self, db=None, redis_client: redis.Redis=None, celery_app=None):
+    EVENT_KEY_PREFIX = "workflow_events:"
+    
+    def __init__(self, db=None, redis_client: redis.Redis=None, celery_app=None,
+                 workflow_engine: Optional[WorkflowEngine] = None,
+                 max_in_flight_dispatches: int = 100,
+                 default_trigger_concurrency: int = 5):
         # Phase 1/3 deprecated - MongoDB and Celery archived for MVP
         self.db = None  # Phase 1: MongoDB archived
         self.redis = redis_client
         self.celery = None  # Phase 3: Celery archived
         self.active_triggers = {}
+        self.workflow_engine = workflow_engine
+        
+        # event_type -> {trigger_id: trigger}; one dispatcher serves all of them
+        self.event_index: Dict[str, Dict[str, WorkflowTrigger]] = {}
+        self._dispatcher_task: Optional[asyncio.Task] = None
+        # Global cap on trigger runs in flight; when full the dispatcher stops
+        # reading so unprocessed events stay queued in Redis
+        self.max_in_flight_dispatches = max_in_flight_dispatches
+        self._dispatch_slots = asyncio.Semaphore(max_in_flight_dispatches)
+        self._dispatches: Set[asyncio.Task] = set()
+        self.default_trigger_concurrency = default_trigger_concurrency
+        self._trigger_semaphores: Dict[str, asyncio.Semaphore] = {}
     
     async def create_trigger(self, trigger_data: Dict[str, Any]) -> str:
         """Create a new workflow trigger"""
@@ -934,23 +1007,21 @@ class WorkflowTriggerManager:
             if cron_expression:
                 # Schedule with Celery Beat
                 # Phase 3 deprecated - Celery archived (MVP uses Vercel Cron)
-                # self.celery.conf.beat_schedule[f"trigger_{trigger.trigger_id}"] = {
                 logger.warning("Celery deprecated - trigger not scheduled (MVP uses Vercel Cron)")
                 # self.celery.conf.beat_schedule[f"trigger_{trigger.trigger_id}"] = {
-                    "task": "workflow_engine.execute_scheduled_workflow",
-                    "schedule": cron_expression,
-                    "args": (trigger.trigger_id,)
-                }
+                #     "task": "workflow_engine.execute_scheduled_workflow",
+                #     "schedule": cron_expression,
+                #     "args": (trigger.trigger_id,)
+                # }
             elif interval:
                 # Schedule with interval
                 # Phase 3 deprecated - Celery archived (MVP uses Vercel Cron)
-                # self.celery.conf.beat_schedule[f"trigger_{trigger.trigger_id}"] = {
                 logger.warning("Celery deprecated - trigger not scheduled (MVP uses Vercel Cron)")
                 # self.celery.conf.beat_schedule[f"trigger_{trigger.trigger_id}"] = {
-                    "task": "workflow_engine.execute_scheduled_workflow",
-                    "schedule": interval,
-                    "args": (trigger.trigger_id,)
-                }
+                #     "task": "workflow_engine.execute_scheduled_workflow",
+                #     "schedule": interval,
+                #     "args": (trigger.trigger_id,)
+                # }
             
         except Exception as e:
             logger.error(f"Error activating scheduled trigger: {e}")
@@ -962,17 +1033,33 @@ class WorkflowTriggerManager:
             event_config = trigger.config
             event_type = event_config.get("event_type")
             
-            # Subscribe to Redis events
+            # Register with the shared event dispatcher
             if event_type:
-                await self.redis.subscribe(f"workflow_events:{event_type}")
-                
-                # Start event listener task
-                asyncio.create_task(self._listen_for_events(trigger))
+                self.event_index.setdefault(event_type, {})[trigger.trigger_id] = trigger
+                self._trigger_semaphores[trigger.trigger_id] = asyncio.Semaphore(
+                    event_config.get("max_concurrency", self.default_trigger_concurrency)
+                )
+                self._ensure_event_dispatcher()
             
         except Exception as e:
             logger.error(f"Error activating event trigger: {e}")
             raise
     
+    def _unregister_event_trigger(self, trigger: WorkflowTrigger):
+        """Remove an event trigger from the dispatcher index"""
+        event_type = trigger.config.get("event_type")
+        triggers = self.event_index.get(event_type)
+        if triggers is not None:
+            triggers.pop(trigger.trigger_id, None)
+            if not triggers:
+                del self.event_index[event_type]
+        self._trigger_semaphores.pop(trigger.trigger_id, None)
+    
+    def _ensure_event_dispatcher(self):
+        """Start the event dispatcher if it is not already running"""
+        if self._dispatcher_task is None or self._dispatcher_task.done():
+            self._dispatcher_task = asyncio.create_task(self._dispatch_events())
+    
     async def _activate_webhook_trigger(self, trigger: WorkflowTrigger):
         """Activate webhook trigger"""
         try:
@@ -994,20 +1081,71 @@ class WorkflowTriggerManager:
             logger.error(f"Error activating webhook trigger: {e}")
             raise
     
-    async def _listen_for_events(self, trigger: WorkflowTrigger):
-        """Listen for events and trigger workflows"""
-        try:
-            event_config = trigger.config
-            event_type = event_config.get("event_type")
-            
-            while True:
-                message = await self.redis.blpop(f"workflow_events:{event_type}", timeout=1)
-                if message:
-                    event_data = json.loads(message[1])
-                    await self._trigger_workflow(trigger, event_data)
+    async def publish_event(self, event_type: str, event_data: Dict[str, Any]):
+        """Queue an event for the triggers registered on its type"""
+        await self.redis.rpush(f"{self.EVENT_KEY_PREFIX}{event_type}", json.dumps(event_data, default=str))
+    
+    async def _dispatch_events(self):
+        """
+        Read events for every registered event type with one blocking call
+        and fan each event out to all triggers on that type
+        """
+        while self.event_index:
+            try:
+                keys = [f"{self.EVENT_KEY_PREFIX}{event_type}" for event_type in self.event_index]
+                message = await self.redis.blpop(keys, timeout=1)
+                if not message:
+                    continue
                 
-        except Exception as e:
-            logger.error(f"Error listening for events: {e}")
+                key, payload = message
+                if isinstance(key, bytes):
+                    key = key.decode()
+                event_type = key[len(self.EVENT_KEY_PREFIX):]
+                event_data = json.loads(payload)
+                
+                for trigger in list(self.event_index.get(event_type, {}).values()):
+                    # Blocks the reader while the in-flight budget is exhausted
+                    await self._dispatch_slots.acquire()
+                    task = asyncio.create_task(self._run_event_trigger(trigger, event_data))
+                    self._dispatches.add(task)
+                    task.add_done_callback(self._dispatch_done)
+                
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error dispatching workflow events: {e}")
+                await asyncio.sleep(1)
+    
+    async def _run_event_trigger(self, trigger: WorkflowTrigger, event_data: Dict[str, Any]):
+        """Run one trigger for one event within its concurrency limit"""
+        try:
+            semaphore = self._trigger_semaphores.get(trigger.trigger_id)
+            if semaphore is None:
+                return  # Trigger was deactivated after the event was read
+            async with semaphore:
+                await self._trigger_workflow(trigger, event_data)
+        finally:
+            self._dispatch_slots.release()
+    
+    def _dispatch_done(self, task: asyncio.Task):
+        self._dispatches.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error running event trigger: {task.exception()}")
+    
+    async def stop_event_dispatcher(self):
+        """Stop reading workflow events and cancel the trigger runs in flight"""
+        if self._dispatcher_task and not self._dispatcher_task.done():
+            self._dispatcher_task.cancel()
+            try:
+                await self._dispatcher_task
+            except asyncio.CancelledError:
+                pass
+        self._dispatcher_task = None
+        
+        dispatches = list(self._dispatches)
+        for task in dispatches:
+            task.cancel()
+        await asyncio.gather(*dispatches, return_exceptions=True)
     
     async def _trigger_workflow(self, trigger: WorkflowTrigger, event_data: Dict[str, Any]):
         """Trigger workflow execution"""
@@ -1017,8 +1155,9 @@ class WorkflowTriggerManager:
                 return
             
             # Execute workflow with event data
-            workflow_engine = WorkflowEngine(self.db, self.redis, self.celery)
-            await workflow_engine.execute_workflow(workflow_id, event_data)
+            if self.workflow_engine is None:
+                self.workflow_engine = WorkflowEngine(self.db, self.redis, self.celery)
+            await self.workflow_engine.execute_workflow(workflow_id, event_data)
             
         except Exception as e:
             logger.error(f"Error triggering workflow: {e}")
@@ -1031,8 +1170,10 @@ class WorkflowTriggerManager:
                 
                 if trigger.trigger_type == TriggerType.SCHEDULED:
                     # Remove from Celery Beat schedule
-                    if f"trigger_{trigger_id}" in self.celery.conf.beat_schedule:
+                    if self.celery and f"trigger_{trigger_id}" in self.celery.conf.beat_schedule:
                         del self.celery.conf.beat_schedule[f"trigger_{trigger_id}"]
+                elif trigger.trigger_type == TriggerType.EVENT_BASED:
+                    self._unregister_event_trigger(trigger)
                 
                 del self.active_triggers[trigger_id]
             
@@ -1055,7 +1196,9 @@ class AdvancedAutomationService:
         self.redis = redis_client
         self.celery = None  # Phase 3: Celery archived
         self.workflow_engine = WorkflowEngine(db, redis_client, celery_app)
-        self.trigger_manager = WorkflowTriggerManager(db, redis_client, celery_app)
+        self.trigger_manager = WorkflowTriggerManager(
+            db, redis_client, celery_app, workflow_engine=self.workflow_engine
+        )
     
     async def create_workflow(self, workflow_data: Dict[str, Any]) -> str:
         """Create a new workflow"""
@@ -18,6 +18,8 @@ import requests
 import stripe
 from urllib.parse import urlencode
 
+from services.dashboard_stats import invalidate_dashboard_stats
+
 logger = logging.getLogger(__name__)
 
 class PlatformType(str, Enum):
@@ -699,6 +701,8 @@ class AdvancedPlatformIntegrationsService:
                 }
                 
                 await self.db.campaigns.insert_one(campaign_doc)
+                # Platform campaigns carry no organization, so every cached dashboard is dropped
+                invalidate_dashboard_stats()
                 
                 return {
                     "campaign_id": campaign.campaign_id,
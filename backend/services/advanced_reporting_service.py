@@ -6,9 +6,10 @@ Production-grade reporting with custom dashboards, data visualization, and execu
 import asyncio
 import json
 import logging
-from typing import Dict, List, Any, Optional, Union, Tuple
+from typing import AsyncIterator, Dict, List, Any, Optional, Union, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
+from functools import partial
 from enum import Enum
 import uuid
 import pandas as pd
@@ -20,17 +21,39 @@ import plotly.express as px
 from plotly.utils import PlotlyJSONEncoder
 import matplotlib.pyplot as plt
 import seaborn as sns
-from io import BytesIO
 import base64
 import aiohttp
 import jinja2
-from weasyprint import HTML, CSS
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
 
+from services.chart_render import chart_cache, chart_key, downsample_frame, frame_version
+from services.report_frames import (
+    AUDIENCE_COLUMNS,
+    CAMPAIGN_COLUMNS,
+    FINANCIAL_COLUMNS,
+    campaign_metrics_pipeline,
+    load_frame,
+    projection,
+)
+from services.report_jobs import JobPriority, ReportJobQueue, request_hash
+from services.report_export import (
+    REPORT_EXPORT_CHUNK_ROWS,
+    artifact_key,
+    get_render_executor,
+    get_report_blob_store,
+    iter_artifact,
+    iter_csv,
+    load_json,
+    render_pdf,
+    store_artifact,
+    store_json,
+    write_xlsx,
+)
+
 logger = logging.getLogger(__name__)
 
 class ReportType(str, Enum):
@@ -69,6 +92,7 @@ class ReportFormat(str, Enum):
 class ReportStatus(str, Enum):
     """Report status"""
     DRAFT = "draft"
+    QUEUED = "queued"
     GENERATING = "generating"
     COMPLETED = "completed"
     FAILED = "failed"
@@ -119,47 +143,83 @@ class DataAggregator:
     def __init__(self, db: AsyncIOMotorClient):
         self.db = db
     
+    def _campaign_query(self, date_range: Tuple[datetime, datetime], filters: Dict[str, Any]) -> Dict[str, Any]:
+        start_date, end_date = date_range
+        query = {
+            "created_at": {
+                "$gte": start_date.isoformat(),
+                "$lte": end_date.isoformat()
+            }
+        }
+        
+        if filters.get("platform"):
+            query["platform"] = filters["platform"]
+        if filters.get("status"):
+            query["status"] = filters["status"]
+        if filters.get("campaign_type"):
+            query["campaign_type"] = filters["campaign_type"]
+        
+        return query
+    
+    def _financial_query(self, date_range: Tuple[datetime, datetime], filters: Dict[str, Any]) -> Dict[str, Any]:
+        start_date, end_date = date_range
+        query = {
+            "date": {
+                "$gte": start_date.isoformat(),
+                "$lte": end_date.isoformat()
+            }
+        }
+        
+        if filters.get("account_id"):
+            query["account_id"] = filters["account_id"]
+        
+        return query
+    
+    def _audience_query(self, date_range: Tuple[datetime, datetime], filters: Dict[str, Any]) -> Dict[str, Any]:
+        start_date, end_date = date_range
+        query = {
+            "created_at": {
+                "$gte": start_date.isoformat(),
+                "$lte": end_date.isoformat()
+            }
+        }
+        
+        if filters.get("segment_id"):
+            query["segment_id"] = filters["segment_id"]
+        
+        return query
+    
+    def detail_rows(self, report_type: ReportType, parameters: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Cursor over the source rows of a report, fetched in export-sized batches"""
+        date_range = (
+            datetime.fromisoformat(parameters["start_date"]),
+            datetime.fromisoformat(parameters["end_date"])
+        )
+        filters = parameters.get("filters", {})
+        
+        if report_type == ReportType.FINANCIAL_SUMMARY:
+            collection, query = self.db.financial_transactions, self._financial_query(date_range, filters)
+        elif report_type == ReportType.EXECUTIVE_SUMMARY:
+            collection, query = self.db.campaigns, self._campaign_query(date_range, {})
+        else:
+            collection, query = self.db.campaigns, self._campaign_query(date_range, filters)
+        
+        return collection.find(query, {"_id": 0}).batch_size(REPORT_EXPORT_CHUNK_ROWS)
+    
     async def aggregate_campaign_data(self, date_range: Tuple[datetime, datetime], filters: Dict[str, Any]) -> pd.DataFrame:
         """Aggregate campaign data for reporting"""
         try:
-            start_date, end_date = date_range
+            query = self._campaign_query(date_range, filters)
             
-            # Build query
-            query = {
-                "created_at": {
-                    "$gte": start_date.isoformat(),
-                    "$lte": end_date.isoformat()
-                }
-            }
-            
-            # Add filters
-            if filters.get("platform"):
-                query["platform"] = filters["platform"]
-            if filters.get("status"):
-                query["status"] = filters["status"]
-            if filters.get("campaign_type"):
-                query["campaign_type"] = filters["campaign_type"]
-            
-            # Get campaign data
-            campaigns = await self.db.campaigns.find(query).to_list(length=None)
+            # Campaigns joined to their metrics in MongoDB, only the columns reports use
+            cursor = self.db.campaigns.aggregate(
+                campaign_metrics_pipeline(query), batchSize=REPORT_EXPORT_CHUNK_ROWS
+            )
+            df = await load_frame(cursor, CAMPAIGN_COLUMNS)
             
-            if not campaigns:
+            if df.empty:
                 return pd.DataFrame()
             
-            # Convert to DataFrame
-            df = pd.DataFrame(campaigns)
-            
-            # Get metrics for each campaign
-            campaign_ids = [c["campaign_id"] for c in campaigns]
-            metrics = await self.db.campaign_metrics.find({
-                "campaign_id": {"$in": campaign_ids}
-            }).to_list(length=None)
-            
-            # Merge metrics with campaigns
-            metrics_df = pd.DataFrame(metrics)
-            if not metrics_df.empty:
-                df = df.merge(metrics_df, on="campaign_id", how="left")
-            
             # Calculate derived metrics
             df["roas"] = df["revenue"] / df["spend"]
             df["cpa"] = df["spend"] / df["conversions"]
@@ -175,26 +235,17 @@ class DataAggregator:
     async def aggregate_financial_data(self, date_range: Tuple[datetime, datetime], filters: Dict[str, Any]) -> pd.DataFrame:
         """Aggregate financial data for reporting"""
         try:
-            start_date, end_date = date_range
-            
             # Get financial transactions
-            query = {
-                "date": {
-                    "$gte": start_date.isoformat(),
-                    "$lte": end_date.isoformat()
-                }
-            }
-            
-            if filters.get("account_id"):
-                query["account_id"] = filters["account_id"]
+            query = self._financial_query(date_range, filters)
             
-            transactions = await self.db.financial_transactions.find(query).to_list(length=None)
+            cursor = self.db.financial_transactions.find(
+                query, projection(FINANCIAL_COLUMNS)
+            ).batch_size(REPORT_EXPORT_CHUNK_ROWS)
+            df = await load_frame(cursor, FINANCIAL_COLUMNS)
             
-            if not transactions:
+            if df.empty:
                 return pd.DataFrame()
             
-            df = pd.DataFrame(transactions)
-            
             # Calculate financial metrics
             df["net_revenue"] = df["revenue"] - df["costs"]
             df["profit_margin"] = df["net_revenue"] / df["revenue"]
@@ -208,26 +259,17 @@ class DataAggregator:
     async def aggregate_audience_data(self, date_range: Tuple[datetime, datetime], filters: Dict[str, Any]) -> pd.DataFrame:
         """Aggregate audience data for reporting"""
         try:
-            start_date, end_date = date_range
-            
             # Get audience data
-            query = {
-                "created_at": {
-                    "$gte": start_date.isoformat(),
-                    "$lte": end_date.isoformat()
-                }
-            }
+            query = self._audience_query(date_range, filters)
             
-            if filters.get("segment_id"):
-                query["segment_id"] = filters["segment_id"]
+            cursor = self.db.audience_analytics.find(
+                query, projection(AUDIENCE_COLUMNS)
+            ).batch_size(REPORT_EXPORT_CHUNK_ROWS)
+            df = await load_frame(cursor, AUDIENCE_COLUMNS)
             
-            audience_data = await self.db.audience_analytics.find(query).to_list(length=None)
-            
-            if not audience_data:
+            if df.empty:
                 return pd.DataFrame()
             
-            df = pd.DataFrame(audience_data)
-            
             # Calculate audience metrics
             df["engagement_rate"] = df["engagements"] / df["reach"]
             df["growth_rate"] = df["new_followers"] / df["total_followers"]
@@ -303,6 +345,42 @@ class ChartGenerator:
             }
         }
     
+    async def render(self, chart_type: str, data: Any, *args: Any, config: Dict[str, Any] = None, data_version: Optional[str] = None) -> str:
+        """
+        Cached chart JSON, built and serialized off the event loop
+        
+        ``data`` and ``args`` are what the matching ``generate_*`` method
+        takes; records or columns are accepted in place of a DataFrame.
+        Charts are keyed by their arguments and a hash of their data (or
+        ``data_version``), and line series are downsampled before plotting.
+        """
+        generators = {
+            ChartType.LINE: self.generate_line_chart,
+            ChartType.BAR: self.generate_bar_chart,
+            ChartType.PIE: self.generate_pie_chart,
+            ChartType.HEATMAP: self.generate_heatmap,
+            ChartType.FUNNEL: self.generate_funnel_chart,
+            ChartType.GAUGE: self.generate_gauge_chart
+        }
+        chart_type = ChartType(chart_type)
+        if chart_type not in generators:
+            raise ValueError(f"Chart generation not implemented for type: {chart_type.value}")
+        generate = generators[chart_type]
+        
+        if chart_type == ChartType.GAUGE:
+            key = chart_key(chart_type.value, data, args, config, data_version)
+            return await chart_cache.get(key, partial(generate, data, *args, config))
+        
+        if not isinstance(data, pd.DataFrame):
+            data = pd.DataFrame(data)
+        key = chart_key(chart_type.value, args, config, data_version or frame_version(data))
+        
+        def build() -> str:
+            frame = downsample_frame(data, args[0], args[1]) if chart_type == ChartType.LINE else data
+            return generate(frame, *args, config)
+        
+        return await chart_cache.get(key, build)
+    
     def generate_line_chart(self, data: pd.DataFrame, x_col: str, y_col: str, title: str, config: Dict[str, Any] = None) -> str:
         """Generate line chart"""
         try:
@@ -495,15 +573,15 @@ class ReportGenerator:
             
             # ROAS over time
             if "date" in campaign_data.columns and "roas" in campaign_data.columns:
-                charts["roas_trend"] = self.chart_generator.generate_line_chart(
-                    campaign_data, "date", "roas", "ROAS Trend"
+                charts["roas_trend"] = await self.chart_generator.render(
+                    ChartType.LINE, campaign_data, "date", "roas", "ROAS Trend"
                 )
             
             # Campaign performance by platform
             if "platform" in campaign_data.columns and "spend" in campaign_data.columns:
                 platform_performance = campaign_data.groupby("platform")["spend"].sum().reset_index()
-                charts["platform_performance"] = self.chart_generator.generate_bar_chart(
-                    platform_performance, "platform", "spend", "Spend by Platform"
+                charts["platform_performance"] = await self.chart_generator.render(
+                    ChartType.BAR, platform_performance, "platform", "spend", "Spend by Platform"
                 )
             
             # Conversion funnel
@@ -516,8 +594,8 @@ class ReportGenerator:
                         campaign_data["conversions"].sum()
                     ]
                 })
-                charts["conversion_funnel"] = self.chart_generator.generate_funnel_chart(
-                    funnel_data, "stage", "value", "Conversion Funnel"
+                charts["conversion_funnel"] = await self.chart_generator.render(
+                    ChartType.FUNNEL, funnel_data, "stage", "value", "Conversion Funnel"
                 )
             
             # Calculate summary metrics
@@ -566,22 +644,22 @@ class ReportGenerator:
             
             # Revenue trend
             if "date" in financial_data.columns and "revenue" in financial_data.columns:
-                charts["revenue_trend"] = self.chart_generator.generate_line_chart(
-                    financial_data, "date", "revenue", "Revenue Trend"
+                charts["revenue_trend"] = await self.chart_generator.render(
+                    ChartType.LINE, financial_data, "date", "revenue", "Revenue Trend"
                 )
             
             # Profit margin gauge
             if "profit_margin" in financial_data.columns:
                 avg_profit_margin = financial_data["profit_margin"].mean() * 100
-                charts["profit_margin_gauge"] = self.chart_generator.generate_gauge_chart(
-                    avg_profit_margin, "Average Profit Margin (%)"
+                charts["profit_margin_gauge"] = await self.chart_generator.render(
+                    ChartType.GAUGE, avg_profit_margin, "Average Profit Margin (%)"
                 )
             
             # Revenue by category
             if "category" in financial_data.columns and "revenue" in financial_data.columns:
                 category_revenue = financial_data.groupby("category")["revenue"].sum().reset_index()
-                charts["revenue_by_category"] = self.chart_generator.generate_pie_chart(
-                    category_revenue, "category", "revenue", "Revenue by Category"
+                charts["revenue_by_category"] = await self.chart_generator.render(
+                    ChartType.PIE, category_revenue, "category", "revenue", "Revenue by Category"
                 )
             
             # Calculate summary metrics
@@ -651,8 +729,8 @@ class ReportGenerator:
             # Overall performance gauge
             if kpis.get("campaign_performance", {}).get("average_roas"):
                 roas_percentage = kpis["campaign_performance"]["average_roas"] * 100
-                charts["overall_performance"] = self.chart_generator.generate_gauge_chart(
-                    roas_percentage, "Overall ROAS Performance"
+                charts["overall_performance"] = await self.chart_generator.render(
+                    ChartType.GAUGE, roas_percentage, "Overall ROAS Performance"
                 )
             
             # Revenue vs Spend trend
@@ -662,8 +740,8 @@ class ReportGenerator:
                     "spend": "sum"
                 }).reset_index()
                 
-                charts["revenue_vs_spend"] = self.chart_generator.generate_line_chart(
-                    daily_data, "date", "revenue", "Revenue vs Spend Trend"
+                charts["revenue_vs_spend"] = await self.chart_generator.render(
+                    ChartType.LINE, daily_data, "date", "revenue", "Revenue vs Spend Trend"
                 )
             
             return {
@@ -718,63 +796,45 @@ class ReportExporter:
     def __init__(self):
         self.template_env = jinja2.Environment(loader=jinja2.DictLoader({}))
     
-    async def export_to_pdf(self, report_data: Dict[str, Any], template: str) -> bytes:
-        """Export report to PDF"""
+    async def export_to_pdf(self, report_data: Dict[str, Any], template: str, output_path: str):
+        """Export report to a PDF file, rendered in the render process pool"""
         try:
             # Render HTML template
             html_template = self.template_env.from_string(template)
             html_content = html_template.render(report_data)
             
-            # Generate PDF
-            pdf_bytes = HTML(string=html_content).write_pdf()
-            
-            return pdf_bytes
+            # Generate PDF off the event loop
+            await asyncio.get_running_loop().run_in_executor(
+                get_render_executor(), render_pdf, html_content, output_path
+            )
             
         except Exception as e:
             logger.error(f"Error exporting to PDF: {e}")
             raise
     
-    async def export_to_excel(self, report_data: Dict[str, Any]) -> bytes:
-        """Export report to Excel"""
-        try:
-            # Create Excel file in memory
-            output = BytesIO()
-            
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                # Write summary metrics
-                if "summary_metrics" in report_data:
-                    metrics_df = pd.DataFrame([report_data["summary_metrics"]])
-                    metrics_df.to_excel(writer, sheet_name='Summary', index=False)
-                
-                # Write KPIs
-                if "kpis" in report_data:
-                    for kpi_name, kpi_data in report_data["kpis"].items():
-                        kpi_df = pd.DataFrame([kpi_data])
-                        kpi_df.to_excel(writer, sheet_name=kpi_name.title(), index=False)
-            
-            output.seek(0)
-            return output.getvalue()
-            
-        except Exception as e:
-            logger.error(f"Error exporting to Excel: {e}")
-            raise
-    
-    async def export_to_csv(self, report_data: Dict[str, Any]) -> str:
-        """Export report to CSV"""
+    async def export_to_excel(self, report_data: Dict[str, Any], rows: AsyncIterator[Dict[str, Any]], output_path: str):
+        """Export report to an Excel file, streaming its source rows into a Data sheet"""
         try:
-            # Convert report data to CSV format
-            csv_data = []
+            sheets = {}
             
+            # Summary metrics
             if "summary_metrics" in report_data:
-                csv_data.append("Metric,Value")
-                for metric, value in report_data["summary_metrics"].items():
-                    csv_data.append(f"{metric},{value}")
+                sheets["Summary"] = [report_data["summary_metrics"]]
+            
+            # KPIs
+            if "kpis" in report_data:
+                for kpi_name, kpi_data in report_data["kpis"].items():
+                    sheets[kpi_name.title()] = [kpi_data]
             
-            return "\n".join(csv_data)
+            await write_xlsx(output_path, sheets, rows)
             
         except Exception as e:
-            logger.error(f"Error exporting to CSV: {e}")
+            logger.error(f"Error exporting to Excel: {e}")
             raise
+    
+    def export_to_csv(self, rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+        """Export report source rows to CSV, chunk by chunk"""
+        return iter_csv(rows)
 
 class AdvancedReportingService:
     """Main service for advanced reporting and BI"""
@@ -783,6 +843,13 @@ class AdvancedReportingService:
         self.db = db
         self.report_generator = ReportGenerator(db)
         self.report_exporter = ReportExporter()
+        self.artifacts = get_report_blob_store()
+        self.report_jobs = ReportJobQueue(db.reports, self._generate_report_job)
+        try:
+            # Resume reports left queued or generating by a previous process
+            self.report_jobs.start()
+        except RuntimeError:
+            logger.warning("No running event loop; report jobs start with the first report request")
         self.templates = {}
         self._initialize_templates()
     
@@ -856,8 +923,21 @@ class AdvancedReportingService:
             logger.error(f"Error creating report template: {e}")
             raise
     
-    async def generate_report(self, template_id: str, parameters: Dict[str, Any], created_by: str) -> str:
-        """Generate a report from template"""
+    async def generate_report(
+        self,
+        template_id: str,
+        parameters: Dict[str, Any],
+        created_by: str,
+        organization_id: Optional[str] = None,
+        priority: int = JobPriority.INTERACTIVE
+    ) -> str:
+        """
+        Queue a report for generation from a template
+        
+        An identical request (same template, parameters and tenant) made
+        while an earlier one is queued, generating or recently completed
+        returns the earlier report instead of generating it again.
+        """
         try:
             report_id = str(uuid.uuid4())
             
@@ -871,7 +951,7 @@ class AdvancedReportingService:
                 report_id=report_id,
                 template_id=template_id,
                 name=f"{template_doc['name']} - {datetime.utcnow().strftime('%Y-%m-%d')}",
-                status=ReportStatus.GENERATING,
+                status=ReportStatus.QUEUED,
                 parameters=parameters,
                 generated_at=None,
                 file_path=None,
@@ -880,12 +960,12 @@ class AdvancedReportingService:
                 created_at=datetime.utcnow()
             )
             
-            # Save report instance
+            # Queue report instance
             report_doc = {
                 "report_id": report_id,
                 "template_id": template_id,
+                "report_type": template_doc["report_type"],
                 "name": report_instance.name,
-                "status": report_instance.status.value,
                 "parameters": parameters,
                 "generated_at": None,
                 "file_path": None,
@@ -894,58 +974,51 @@ class AdvancedReportingService:
                 "created_at": report_instance.created_at.isoformat()
             }
             
-            await self.db.reports.insert_one(report_doc)
-            
-            # Generate report asynchronously
-            asyncio.create_task(self._generate_report_async(report_id, template_doc, parameters))
+            tenant_id = organization_id or created_by
+            report_doc, shared = await self.report_jobs.submit(
+                report_doc,
+                tenant_id=tenant_id,
+                priority=priority,
+                dedupe_key=request_hash(template_id, parameters, tenant_id)
+            )
             
-            logger.info(f"Started generating report {report_id}")
-            return report_id
+            if shared:
+                logger.info(f"Report request matches report {report_doc['report_id']}")
+            else:
+                logger.info(f"Queued report {report_id}")
+            return report_doc["report_id"]
             
         except Exception as e:
             logger.error(f"Error generating report: {e}")
             raise
     
-    async def _generate_report_async(self, report_id: str, template_doc: Dict[str, Any], parameters: Dict[str, Any]):
-        """Generate report asynchronously"""
-        try:
-            report_type = ReportType(template_doc["report_type"])
-            
-            # Generate report data based on type
-            if report_type == ReportType.CAMPAIGN_PERFORMANCE:
-                report_data = await self.report_generator.generate_campaign_performance_report(parameters)
-            elif report_type == ReportType.FINANCIAL_SUMMARY:
-                report_data = await self.report_generator.generate_financial_summary_report(parameters)
-            elif report_type == ReportType.EXECUTIVE_SUMMARY:
-                report_data = await self.report_generator.generate_executive_summary_report(parameters)
-            else:
-                raise ValueError(f"Unsupported report type: {report_type}")
-            
-            # Update report status
-            await self.db.reports.update_one(
-                {"report_id": report_id},
-                {
-                    "$set": {
-                        "status": ReportStatus.COMPLETED.value,
-                        "generated_at": datetime.utcnow().isoformat(),
-                        "report_data": report_data
-                    }
-                }
-            )
-            
-            logger.info(f"Completed generating report {report_id}")
-            
-        except Exception as e:
-            logger.error(f"Error in async report generation: {e}")
-            await self.db.reports.update_one(
-                {"report_id": report_id},
-                {
-                    "$set": {
-                        "status": ReportStatus.FAILED.value,
-                        "error_message": str(e)
-                    }
-                }
-            )
+    async def _generate_report_job(self, report_doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate a queued report; returns the fields recorded on completion"""
+        report_id = report_doc["report_id"]
+        parameters = report_doc["parameters"]
+        report_type = await self._report_type(report_doc)
+        
+        # Generate report data based on type
+        if report_type == ReportType.CAMPAIGN_PERFORMANCE:
+            report_data = await self.report_generator.generate_campaign_performance_report(parameters)
+        elif report_type == ReportType.FINANCIAL_SUMMARY:
+            report_data = await self.report_generator.generate_financial_summary_report(parameters)
+        elif report_type == ReportType.EXECUTIVE_SUMMARY:
+            report_data = await self.report_generator.generate_executive_summary_report(parameters)
+        else:
+            raise ValueError(f"Unsupported report type: {report_type}")
+        
+        # Store report data as an artifact; the report keeps a pointer
+        data_key = artifact_key(report_id, "data.json")
+        data_size = await store_json(self.artifacts, data_key, report_data)
+        
+        logger.info(f"Completed generating report {report_id}")
+        
+        return {
+            "generated_at": datetime.utcnow().isoformat(),
+            "file_path": data_key,
+            "file_size": data_size
+        }
     
     async def get_report(self, report_id: str) -> Dict[str, Any]:
         """Get generated report"""
@@ -960,31 +1033,89 @@ class AdvancedReportingService:
             logger.error(f"Error getting report: {e}")
             raise
     
-    async def export_report(self, report_id: str, format: ReportFormat) -> bytes:
-        """Export report in specified format"""
+    async def load_report_data(self, report_doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Report data from its stored artifact"""
+        # Reports generated before artifacts kept their data inline
+        if "report_data" in report_doc:
+            return report_doc["report_data"]
+        if not report_doc.get("file_path"):
+            return {}
+        return await load_json(self.artifacts, report_doc["file_path"])
+    
+    async def iter_report_data(self, report_doc: Dict[str, Any]) -> AsyncIterator[bytes]:
+        """Report data as a stream of JSON chunks, without loading the artifact whole"""
+        if "report_data" in report_doc or not report_doc.get("file_path"):
+            yield json.dumps(report_doc.get("report_data", {}), default=str).encode("utf-8")
+            return
+        async for chunk in iter_artifact(self.artifacts, report_doc["file_path"]):
+            yield chunk
+    
+    async def export_report(self, report_id: str, format: ReportFormat) -> AsyncIterator[bytes]:
+        """
+        Export report in specified format, as a stream of chunks
+        
+        CSV is streamed from the report's source rows. PDF and Excel files
+        are built once into the artifact store and streamed from there.
+        """
         try:
             report_doc = await self.get_report(report_id)
             
             if report_doc["status"] != ReportStatus.COMPLETED.value:
                 raise ValueError("Report not completed yet")
             
-            report_data = report_doc.get("report_data", {})
-            
-            if format == ReportFormat.PDF:
-                template = self._get_pdf_template(report_doc["template_id"])
-                return await self.report_exporter.export_to_pdf(report_data, template)
-            elif format == ReportFormat.EXCEL:
-                return await self.report_exporter.export_to_excel(report_data)
-            elif format == ReportFormat.CSV:
-                csv_content = await self.report_exporter.export_to_csv(report_data)
-                return csv_content.encode('utf-8')
-            else:
+            if format not in (ReportFormat.PDF, ReportFormat.EXCEL, ReportFormat.CSV):
                 raise ValueError(f"Unsupported export format: {format}")
             
+            if format == ReportFormat.CSV:
+                return self.report_exporter.export_to_csv(await self._detail_rows(report_doc))
+            
+            export = report_doc.get("exports", {}).get(format.value)
+            if not export or not await asyncio.to_thread(self.artifacts.exists, export["key"]):
+                report_data = await self.load_report_data(report_doc)
+                
+                if format == ReportFormat.PDF:
+                    template = self._get_pdf_template(report_doc["template_id"])
+                    
+                    async def build(path: str):
+                        await self.report_exporter.export_to_pdf(report_data, template, path)
+                    
+                    key = artifact_key(report_id, "export.pdf")
+                    size = await store_artifact(self.artifacts, key, build, ".pdf")
+                else:
+                    rows = await self._detail_rows(report_doc)
+                    
+                    async def build(path: str):
+                        await self.report_exporter.export_to_excel(report_data, rows, path)
+                    
+                    key = artifact_key(report_id, "export.xlsx")
+                    size = await store_artifact(self.artifacts, key, build, ".xlsx")
+                
+                export = {"key": key, "size": size, "created_at": datetime.utcnow().isoformat()}
+                await self.db.reports.update_one(
+                    {"report_id": report_id},
+                    {"$set": {f"exports.{format.value}": export}}
+                )
+            
+            return iter_artifact(self.artifacts, export["key"])
+            
         except Exception as e:
             logger.error(f"Error exporting report: {e}")
             raise
     
+    async def _report_type(self, report_doc: Dict[str, Any]) -> ReportType:
+        # Reports queued before the type was recorded on them
+        if not report_doc.get("report_type"):
+            template_doc = await self.db.report_templates.find_one({"template_id": report_doc["template_id"]})
+            if not template_doc:
+                raise ValueError(f"Template {report_doc['template_id']} not found")
+            return ReportType(template_doc["report_type"])
+        return ReportType(report_doc["report_type"])
+    
+    async def _detail_rows(self, report_doc: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Source rows of a report"""
+        report_type = await self._report_type(report_doc)
+        return self.report_generator.data_aggregator.detail_rows(report_type, report_doc["parameters"])
+    
     def _get_pdf_template(self, template_id: str) -> str:
         """Get PDF template for report"""
         return """
@@ -1031,6 +1162,10 @@ class AdvancedReportingService:
         </html>
         """
     
+    async def close(self):
+        """Stop the report job queue, handing running jobs back for another process"""
+        await self.report_jobs.close()
+    
     async def get_reporting_dashboard(self, organization_id: str) -> Dict[str, Any]:
         """Get comprehensive reporting dashboard"""
         try:
@@ -1075,3 +1210,10 @@ def get_advanced_reporting_service(db: AsyncIOMotorClient) -> AdvancedReportingS
     if advanced_reporting_service is None:
         advanced_reporting_service = AdvancedReportingService(db)
     return advanced_reporting_service
+
+async def close_advanced_reporting_service():
+    """Close the service instance, if one was created, requeueing its running reports"""
+    global advanced_reporting_service
+    if advanced_reporting_service is not None:
+        await advanced_reporting_service.close()
+        advanced_reporting_service = None
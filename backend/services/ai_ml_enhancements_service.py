@@ -6,6 +6,7 @@ Production-grade AI models, machine learning pipelines, and predictive analytics
 import asyncio
 import json
 import logging
+import os
 from typing import Dict, List, Any, Optional, Union, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
@@ -19,8 +20,7 @@ import redis
 import aiohttp
 import pickle
 import joblib
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.linear_model import LogisticRegression
 from sklearn.cluster import KMeans, DBSCAN
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.model_selection import train_test_split, cross_val_score
@@ -31,7 +31,6 @@ from tensorflow.keras import layers
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from transformers import pipeline, AutoTokenizer, AutoModel
 import openai
 import anthropic
 import cohere
@@ -42,6 +41,11 @@ import seaborn as sns
 from io import BytesIO
 import base64
 
+from services.model_registry import get_model_registry
+from services.training_jobs import get_training_job_manager
+from services.nlp_inference import BatchedTextPipeline, transformers_pipeline_factory
+from services.recommender import ImplicitALSModel, interactions_matrix
+
 logger = logging.getLogger(__name__)
 
 class ModelType(str, Enum):
@@ -189,161 +193,6 @@ class DataPreprocessor:
             logger.error(f"Error preprocessing customer data: {e}")
             raise
 
-class ModelTrainer:
-    """ML model training and management"""
-    
-    def __init__(self):
-        self.models = {}
-        self.training_history = {}
-    
-    async def train_campaign_performance_model(self, data: pd.DataFrame, target_column: str) -> str:
-        """Train campaign performance prediction model"""
-        try:
-            model_id = str(uuid.uuid4())
-            
-            # Prepare data
-            X = data.drop(columns=[target_column])
-            y = data[target_column]
-            
-            # Split data
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-            
-            # Train multiple models
-            models = {
-                'random_forest': RandomForestRegressor(n_estimators=100, random_state=42),
-                'gradient_boosting': GradientBoostingRegressor(n_estimators=100, random_state=42),
-                'linear_regression': LinearRegression()
-            }
-            
-            best_model = None
-            best_score = -np.inf
-            best_model_name = None
-            
-            for name, model in models.items():
-                model.fit(X_train, y_train)
-                score = model.score(X_test, y_test)
-                
-                if score > best_score:
-                    best_score = score
-                    best_model = model
-                    best_model_name = name
-            
-            # Save model
-            self.models[model_id] = {
-                'model': best_model,
-                'model_name': best_model_name,
-                'score': best_score,
-                'feature_columns': list(X.columns),
-                'target_column': target_column
-            }
-            
-            # Store training history
-            self.training_history[model_id] = {
-                'model_id': model_id,
-                'model_name': best_model_name,
-                'score': best_score,
-                'training_samples': len(X_train),
-                'test_samples': len(X_test),
-                'created_at': datetime.utcnow().isoformat()
-            }
-            
-            logger.info(f"Trained campaign performance model {model_id}: {best_model_name} (score: {best_score:.3f})")
-            return model_id
-            
-        except Exception as e:
-            logger.error(f"Error training campaign performance model: {e}")
-            raise
-    
-    async def train_customer_ltv_model(self, data: pd.DataFrame, target_column: str) -> str:
-        """Train customer LTV prediction model"""
-        try:
-            model_id = str(uuid.uuid4())
-            
-            # Prepare data
-            X = data.drop(columns=[target_column])
-            y = data[target_column]
-            
-            # Split data
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-            
-            # Train model
-            model = GradientBoostingRegressor(n_estimators=200, learning_rate=0.1, random_state=42)
-            model.fit(X_train, y_train)
-            
-            # Evaluate model
-            score = model.score(X_test, y_test)
-            
-            # Save model
-            self.models[model_id] = {
-                'model': model,
-                'model_name': 'gradient_boosting',
-                'score': score,
-                'feature_columns': list(X.columns),
-                'target_column': target_column
-            }
-            
-            # Store training history
-            self.training_history[model_id] = {
-                'model_id': model_id,
-                'model_name': 'gradient_boosting',
-                'score': score,
-                'training_samples': len(X_train),
-                'test_samples': len(X_test),
-                'created_at': datetime.utcnow().isoformat()
-            }
-            
-            logger.info(f"Trained customer LTV model {model_id} (score: {score:.3f})")
-            return model_id
-            
-        except Exception as e:
-            logger.error(f"Error training customer LTV model: {e}")
-            raise
-    
-    async def train_churn_prediction_model(self, data: pd.DataFrame, target_column: str) -> str:
-        """Train customer churn prediction model"""
-        try:
-            model_id = str(uuid.uuid4())
-            
-            # Prepare data
-            X = data.drop(columns=[target_column])
-            y = data[target_column]
-            
-            # Split data
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-            
-            # Train model
-            model = RandomForestRegressor(n_estimators=100, random_state=42)
-            model.fit(X_train, y_train)
-            
-            # Evaluate model
-            score = model.score(X_test, y_test)
-            
-            # Save model
-            self.models[model_id] = {
-                'model': model,
-                'model_name': 'random_forest',
-                'score': score,
-                'feature_columns': list(X.columns),
-                'target_column': target_column
-            }
-            
-            # Store training history
-            self.training_history[model_id] = {
-                'model_id': model_id,
-                'model_name': 'random_forest',
-                'score': score,
-                'training_samples': len(X_train),
-                'test_samples': len(X_test),
-                'created_at': datetime.utcnow().isoformat()
-            }
-            
-            logger.info(f"Trained churn prediction model {model_id} (score: {score:.3f})")
-            return model_id
-            
-        except Exception as e:
-            logger.error(f"Error training churn prediction model: {e}")
-            raise
-
 class DeepLearningTrainer:
     """Deep learning model training"""
     
@@ -420,57 +269,55 @@ class NLPProcessor:
     """Natural Language Processing"""
     
     def __init__(self):
-        self.sentiment_analyzer = None
-        self.text_classifier = None
-        self._initialize_models()
-    
-    def _initialize_models(self):
-        """Initialize NLP models"""
-        try:
-            # Initialize sentiment analysis
-            self.sentiment_analyzer = pipeline("sentiment-analysis")
-            
-            # Initialize text classification
-            self.text_classifier = pipeline("text-classification")
-            
-        except Exception as e:
-            logger.error(f"Error initializing NLP models: {e}")
+        # Models load on first use, off the event loop
+        self.sentiment_analyzer = BatchedTextPipeline(
+            transformers_pipeline_factory("sentiment-analysis", os.environ.get("NLP_SENTIMENT_MODEL")),
+            name="sentiment-analysis"
+        )
+        self.text_classifier = BatchedTextPipeline(
+            transformers_pipeline_factory("text-classification", os.environ.get("NLP_CLASSIFICATION_MODEL")),
+            name="text-classification"
+        )
     
     async def analyze_sentiment(self, text: str) -> Dict[str, Any]:
         """Analyze sentiment of text"""
+        results = await self.analyze_sentiment_batch([text])
+        return results[0]
+    
+    async def analyze_sentiment_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Analyze sentiment of texts in batched model calls"""
         try:
-            if not self.sentiment_analyzer:
-                return {"sentiment": "neutral", "confidence": 0.5}
+            outputs = await self.sentiment_analyzer.run(texts)
             
-            result = self.sentiment_analyzer(text)
-            
-            return {
-                "sentiment": result[0]["label"].lower(),
-                "confidence": result[0]["score"],
-                "text": text
-            }
+            return [
+                {"sentiment": output["label"].lower(), "confidence": output["score"], "text": text}
+                if output else {"sentiment": "neutral", "confidence": 0.5}
+                for text, output in zip(texts, outputs)
+            ]
             
         except Exception as e:
             logger.error(f"Error analyzing sentiment: {e}")
-            return {"sentiment": "neutral", "confidence": 0.5}
+            return [{"sentiment": "neutral", "confidence": 0.5} for _ in texts]
     
     async def classify_text(self, text: str, categories: List[str] = None) -> Dict[str, Any]:
         """Classify text into categories"""
+        results = await self.classify_text_batch([text], categories)
+        return results[0]
+    
+    async def classify_text_batch(self, texts: List[str], categories: List[str] = None) -> List[Dict[str, Any]]:
+        """Classify texts in batched model calls"""
         try:
-            if not self.text_classifier:
-                return {"category": "unknown", "confidence": 0.5}
-            
-            result = self.text_classifier(text)
+            outputs = await self.text_classifier.run(texts)
             
-            return {
-                "category": result[0]["label"],
-                "confidence": result[0]["score"],
-                "text": text
-            }
+            return [
+                {"category": output["label"], "confidence": output["score"], "text": text}
+                if output else {"category": "unknown", "confidence": 0.5}
+                for text, output in zip(texts, outputs)
+            ]
             
         except Exception as e:
             logger.error(f"Error classifying text: {e}")
-            return {"category": "unknown", "confidence": 0.5}
+            return [{"category": "unknown", "confidence": 0.5} for _ in texts]
     
     async def extract_keywords(self, text: str, num_keywords: int = 10) -> List[str]:
         """Extract keywords from text"""
@@ -542,7 +389,6 @@ class RecommendationEngine:
     
     def __init__(self):
         self.models = {}
-        self.user_item_matrix = None
     
     async def train_collaborative_filtering(self, user_data: pd.DataFrame, item_data: pd.DataFrame, 
                                           interaction_data: pd.DataFrame) -> str:
@@ -550,28 +396,24 @@ class RecommendationEngine:
         try:
             model_id = str(uuid.uuid4())
             
-            # Create user-item matrix
-            user_item_matrix = interaction_data.pivot_table(
-                index='user_id', 
-                columns='item_id', 
-                values='rating', 
-                fill_value=0
-            )
-            
-            # Train model using matrix factorization
-            from sklearn.decomposition import NMF
+            # Sparse user x item matrix; ratings (or interaction counts) are confidence weights
+            interactions, user_ids, item_ids = interactions_matrix(interaction_data)
             
-            model = NMF(n_components=50, random_state=42)
-            model.fit(user_item_matrix)
+            # Implicit-feedback ALS, fitted off the event loop
+            model = ImplicitALSModel(factors=min(50, max(1, min(interactions.shape))))
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, model.fit, interactions, user_ids, item_ids)
             
             # Save model
             self.models[model_id] = {
                 'model': model,
-                'user_item_matrix': user_item_matrix,
                 'model_name': 'collaborative_filtering'
             }
             
-            logger.info(f"Trained collaborative filtering model {model_id}")
+            logger.info(
+                f"Trained collaborative filtering model {model_id} on {interactions.nnz} interactions "
+                f"({len(user_ids)} users x {len(item_ids)} items)"
+            )
             return model_id
             
         except Exception as e:
@@ -579,33 +421,25 @@ class RecommendationEngine:
             raise
     
     async def get_recommendations(self, user_id: str, model_id: str, num_recommendations: int = 10) -> List[str]:
-        """Get recommendations for user"""
+        """Get recommended item ids for user (popular items for unknown users)"""
         try:
             if model_id not in self.models:
                 raise ValueError(f"Model {model_id} not found")
             
             model = self.models[model_id]['model']
-            user_item_matrix = self.models[model_id]['user_item_matrix']
-            
-            # Get user preferences
-            if user_id in user_item_matrix.index:
-                user_preferences = user_item_matrix.loc[user_id]
-                
-                # Generate recommendations
-                recommendations = model.transform(user_preferences.values.reshape(1, -1))
-                
-                # Get top recommendations
-                top_items = np.argsort(recommendations[0])[-num_recommendations:][::-1]
-                
-                return [str(item) for item in top_items]
-            else:
-                # Return popular items for new users
-                popular_items = user_item_matrix.sum().sort_values(ascending=False).head(num_recommendations)
-                return [str(item) for item in popular_items.index]
+            return [str(item) for item in model.recommend(user_id, num_recommendations)]
                 
         except Exception as e:
             logger.error(f"Error getting recommendations: {e}")
             return []
+    
+    async def add_user_interactions(self, user_id: str, model_id: str, interactions: Dict[str, float]):
+        """Fold a new or updated user's interactions into a trained model"""
+        if model_id not in self.models:
+            raise ValueError(f"Model {model_id} not found")
+        
+        model = self.models[model_id]['model']
+        model.fold_in(user_id, list(interactions.keys()), list(interactions.values()))
 
 class AIMLEnhancementsService:
     """Main service for AI/ML enhancements"""
@@ -614,11 +448,12 @@ class AIMLEnhancementsService:
         self.db = db
         self.redis = redis_client
         self.data_preprocessor = DataPreprocessor()
-        self.model_trainer = ModelTrainer()
         self.deep_learning_trainer = DeepLearningTrainer()
         self.nlp_processor = NLPProcessor()
         self.anomaly_detector = AnomalyDetector()
         self.recommendation_engine = RecommendationEngine()
+        self.model_registry = get_model_registry(db)
+        self.training_jobs = get_training_job_manager(db)
     
     async def create_ml_model(self, model_data: Dict[str, Any]) -> str:
         """Create ML model"""
@@ -666,45 +501,51 @@ class AIMLEnhancementsService:
             logger.error(f"Error creating ML model: {e}")
             raise
     
-    async def train_model(self, model_id: str, training_data: pd.DataFrame, target_column: str) -> Dict[str, Any]:
-        """Train ML model"""
+    async def train_model(
+        self,
+        model_id: str,
+        training_data: pd.DataFrame,
+        target_column: str,
+        organization_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Queue ML model training; the model is fitted in a background worker process"""
         try:
             # Get model
             model_doc = await self.db.ml_models.find_one({"model_id": model_id})
             if not model_doc:
                 raise ValueError(f"Model {model_id} not found")
             
-            # Preprocess data
-            processed_data = self.data_preprocessor.preprocess_campaign_data(training_data)
-            
-            # Train model based on type
+            # Pick the trainer based on type
             if model_doc["model_type"] == ModelType.REGRESSION.value:
-                trained_model_id = await self.model_trainer.train_campaign_performance_model(
-                    processed_data, target_column
-                )
+                trainer = "campaign_performance"
             elif model_doc["model_type"] == ModelType.CLASSIFICATION.value:
-                trained_model_id = await self.model_trainer.train_churn_prediction_model(
-                    processed_data, target_column
-                )
+                trainer = "churn_prediction"
             else:
                 raise ValueError(f"Unsupported model type: {model_doc['model_type']}")
             
-            # Update model status
-            await self.db.ml_models.update_one(
-                {"model_id": model_id},
-                {
-                    "$set": {
-                        "status": ModelStatus.TRAINED.value,
-                        "trained_model_id": trained_model_id,
-                        "updated_at": datetime.utcnow().isoformat()
-                    }
-                }
+            # Preprocess data
+            processed_data = self.data_preprocessor.preprocess_campaign_data(training_data)
+            
+            # Retraining warm-starts from the model's last registered version
+            job_id = await self.training_jobs.submit(
+                model_id,
+                trainer,
+                params={"data": processed_data, "target_column": target_column},
+                warm_start=True,
+                on_success=self._on_model_trained,
+                organization_id=organization_id
             )
             
+            # Update model status; a trained model keeps serving while it retrains
+            update = {"training_job_id": job_id, "updated_at": datetime.utcnow().isoformat()}
+            if model_doc.get("status") != ModelStatus.TRAINED.value:
+                update["status"] = ModelStatus.TRAINING.value
+            await self.db.ml_models.update_one({"model_id": model_id}, {"$set": update})
+            
             return {
                 "model_id": model_id,
-                "trained_model_id": trained_model_id,
-                "status": "trained",
+                "job_id": job_id,
+                "status": "training",
                 "training_samples": len(training_data)
             }
             
@@ -712,6 +553,30 @@ class AIMLEnhancementsService:
             logger.error(f"Error training model: {e}")
             raise
     
+    async def _on_model_trained(self, job: Dict[str, Any]):
+        """Mark a model trained once its job has registered a new version"""
+        await self.db.ml_models.update_one(
+            {"model_id": job["model_name"]},
+            {
+                "$set": {
+                    "status": ModelStatus.TRAINED.value,
+                    "trained_model_id": job["model_name"],
+                    "registry_version": job.get("registry_version"),
+                    "accuracy_score": job.get("metrics", {}).get("score"),
+                    "updated_at": datetime.utcnow().isoformat()
+                }
+            }
+        )
+        logger.info(f"Trained ML model {job['model_name']} (version {job.get('registry_version')})")
+    
+    async def get_training_job(self, job_id: str, organization_id: str) -> Optional[Dict[str, Any]]:
+        """Get an organization's training job status and progress"""
+        return await self.training_jobs.get_job(job_id, organization_id)
+    
+    async def cancel_training_job(self, job_id: str, organization_id: str) -> bool:
+        """Cancel an organization's queued or running training job"""
+        return await self.training_jobs.cancel_job(job_id, organization_id)
+    
     async def make_prediction(self, model_id: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Make prediction using trained model"""
         try:
@@ -725,10 +590,10 @@ class AIMLEnhancementsService:
             
             # Get trained model
             trained_model_id = model_doc.get("trained_model_id")
-            if not trained_model_id or trained_model_id not in self.model_trainer.models:
+            model_info = await self._get_trained_model(trained_model_id) if trained_model_id else None
+            if not model_info:
                 raise ValueError(f"Trained model not found for {model_id}")
             
-            model_info = self.model_trainer.models[trained_model_id]
             model = model_info['model']
             feature_columns = model_info['feature_columns']
             
@@ -761,16 +626,24 @@ class AIMLEnhancementsService:
             logger.error(f"Error making prediction: {e}")
             raise
     
+    async def _get_trained_model(self, trained_model_id: str) -> Optional[Dict[str, Any]]:
+        """Get a trained model from the model registry"""
+        registered = await self.model_registry.load(trained_model_id)
+        if registered is None:
+            return None
+        
+        return {
+            'model': registered.model,
+            'model_name': registered.metadata.get('model_name'),
+            'score': registered.metrics.get('score'),
+            'feature_columns': registered.metadata.get('feature_columns', []),
+            'target_column': registered.metadata.get('target_column')
+        }
+    
     async def analyze_sentiment_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
         """Analyze sentiment for multiple texts"""
         try:
-            results = []
-            
-            for text in texts:
-                sentiment_result = await self.nlp_processor.analyze_sentiment(text)
-                results.append(sentiment_result)
-            
-            return results
+            return await self.nlp_processor.analyze_sentiment_batch(texts)
             
         except Exception as e:
             logger.error(f"Error analyzing sentiment batch: {e}")
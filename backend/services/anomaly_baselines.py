@@ -0,0 +1,116 @@
+"""
+Streaming Anomaly Baselines
+Per-client exponentially weighted mean/variance of performance metrics,
+scored and updated in O(1) per data point
+"""
+
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Weight of the newest point; 0.1 is roughly a 19-point (span) window
+EWMA_ALPHA = float(os.environ.get('ANOMALY_EWMA_ALPHA', '0.1'))
+
+# Points a baseline must absorb before it starts flagging anomalies
+MIN_BASELINE_POINTS = 10
+
+# Deviation, in baseline standard deviations, that counts as anomalous
+ANOMALY_Z_THRESHOLD = float(os.environ.get('ANOMALY_Z_THRESHOLD', '3.0'))
+
+# Standard deviation floor as a fraction of the mean, so a flat history does
+# not turn every small change into an anomaly
+MIN_STD_FRACTION = 0.01
+
+
+@dataclass
+class EWMABaseline:
+    """
+    Exponentially weighted mean and variance of a fixed set of metrics
+
+    Uses the incremental update
+        diff = x - mean; mean += alpha * diff
+        var = (1 - alpha) * (var + alpha * diff ** 2)
+    so scoring and updating a point costs the same however long the
+    history is.
+    """
+    metrics: List[str]
+    alpha: float = EWMA_ALPHA
+    mean: np.ndarray = None
+    var: np.ndarray = None
+    count: int = 0
+    last_date: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+    def __post_init__(self):
+        size = len(self.metrics)
+        self.mean = np.zeros(size) if self.mean is None else np.asarray(self.mean, dtype=np.float64)
+        self.var = np.zeros(size) if self.var is None else np.asarray(self.var, dtype=np.float64)
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= MIN_BASELINE_POINTS
+
+    def vector(self, data_point: Dict[str, Any]) -> np.ndarray:
+        """Metric values of a data point in baseline order (missing -> 0)"""
+        return np.array([data_point.get(m) or 0 for m in self.metrics], dtype=np.float64)
+
+    def z_scores(self, values: np.ndarray) -> np.ndarray:
+        """Signed deviation of each metric from the baseline, in standard deviations"""
+        std = np.maximum(np.sqrt(self.var), MIN_STD_FRACTION * np.abs(self.mean) + 1e-9)
+        return (values - self.mean) / std
+
+    def update(self, values: np.ndarray):
+        """Fold one observation into the baseline"""
+        if self.count == 0:
+            self.mean = values.astype(np.float64)
+        else:
+            diff = values - self.mean
+            self.mean = self.mean + self.alpha * diff
+            self.var = (1 - self.alpha) * (self.var + self.alpha * diff ** 2)
+        self.count += 1
+
+    def observe(self, data_point: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Score a data point against the baseline, then absorb it
+
+        Returns the z-scores when the baseline is ready and at least one
+        metric crosses ``ANOMALY_Z_THRESHOLD``, otherwise None.
+        """
+        values = self.vector(data_point)
+        z = self.z_scores(values) if self.ready else None
+        self.update(values)
+        if data_point.get("date") is not None:
+            self.last_date = data_point["date"]
+
+        if z is not None and np.max(np.abs(z)) >= ANOMALY_Z_THRESHOLD:
+            return z
+        return None
+
+    def to_document(self) -> Dict[str, Any]:
+        return {
+            "metrics": list(self.metrics),
+            "alpha": self.alpha,
+            "mean": self.mean.tolist(),
+            "var": self.var.tolist(),
+            "count": self.count,
+            "last_date": self.last_date,
+            "updated_at": datetime.utcnow()
+        }
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any], metrics: Sequence[str]) -> "EWMABaseline":
+        """Restore a baseline; a stored baseline over other metrics starts fresh"""
+        if list(doc.get("metrics", [])) != list(metrics):
+            return cls(metrics=list(metrics))
+        return cls(
+            metrics=list(metrics),
+            alpha=doc.get("alpha", EWMA_ALPHA),
+            mean=doc["mean"],
+            var=doc["var"],
+            count=doc.get("count", 0),
+            last_date=doc.get("last_date"),
+            updated_at=doc.get("updated_at")
+        )
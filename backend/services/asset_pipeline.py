@@ -0,0 +1,282 @@
+"""
+Asset Ingestion Pipeline
+Streams uploads to disk while hashing them, stores content-addressed blobs
+and derives image variants in a process pool
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ASSET_STORAGE_ROOT = os.environ.get('ASSET_STORAGE_ROOT', './storage/assets')
+
+# Bytes read from the request and written to the spool file per step
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Longest edge, in pixels, of each derived image variant
+IMAGE_VARIANTS = {"thumbnail": 300, "preview": 1080}
+
+_media_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_media_executor() -> ProcessPoolExecutor:
+    """Get the process pool used for decoding and resizing media"""
+    global _media_executor
+    if _media_executor is None:
+        _media_executor = ProcessPoolExecutor(
+            max_workers=int(os.getenv("ASSET_PROCESSING_WORKERS", "2")),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _media_executor
+
+
+class BlobStore(ABC):
+    """Interface for asset blob storage"""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def put_file(self, key: str, source: str):
+        """Store a local file under ``key``; the source file is consumed"""
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """Open a stored blob for reading"""
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        ...
+
+
+class LocalBlobStore(BlobStore):
+    """Blob store on a local or shared (NFS/EFS) directory"""
+
+    def __init__(self, root: Optional[str] = None, url_prefix: str = "/assets"):
+        self.root = Path(root or ASSET_STORAGE_ROOT)
+        self.url_prefix = url_prefix.rstrip("/")
+
+    def path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Invalid blob key '{key}'")
+        return path
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).exists()
+
+    def put_file(self, key: str, source: str):
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A rename when the spool directory is on the same filesystem
+        shutil.move(source, path)
+
+    def open(self, key: str) -> BinaryIO:
+        return self.path(key).open("rb")
+
+    def delete(self, key: str):
+        self.path(key).unlink(missing_ok=True)
+
+    def url(self, key: str) -> str:
+        return f"{self.url_prefix}/{key}"
+
+
+@dataclass
+class SpooledUpload:
+    """An upload written to a local spool file"""
+    path: str
+    size: int
+    sha256: str
+
+
+async def spool_upload(chunks: AsyncIterator[bytes], spool_dir: Path, max_size: int) -> SpooledUpload:
+    """
+    Write an upload to a spool file chunk by chunk, hashing as it goes
+
+    Writes and hashing run in the default executor; at most one chunk is
+    held in memory. Raises ``ValueError`` as soon as the upload exceeds
+    ``max_size`` and removes the partial file.
+    """
+    loop = asyncio.get_running_loop()
+    hasher = hashlib.sha256()
+    fd, path = tempfile.mkstemp(dir=spool_dir, suffix=".upload")
+    size = 0
+
+    def write(handle, chunk: bytes):
+        handle.write(chunk)
+        hasher.update(chunk)
+
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise ValueError(f"File too large: more than {max_size} bytes")
+                await loop.run_in_executor(None, write, handle, chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    return SpooledUpload(path=path, size=size, sha256=hasher.hexdigest())
+
+
+def process_media(path: str, asset_type: str, output_dir: str) -> Dict[str, Any]:
+    """
+    Probe dimensions and derive variants of a stored media file
+
+    Runs in a worker process. Images are decoded from ``path`` (JPEG with
+    draft mode, so large photos decode at reduced scale) and each
+    ``IMAGE_VARIANTS`` entry is written as a JPEG into ``output_dir``.
+    Video dimensions come from ffprobe when it is installed.
+    """
+    result: Dict[str, Any] = {"dimensions": None, "variants": {}}
+
+    if asset_type == "video":
+        result["dimensions"] = _probe_video(path)
+        return result
+
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            result["dimensions"] = {"width": image.width, "height": image.height}
+            largest = max(IMAGE_VARIANTS.values())
+            image.draft("RGB", (largest, largest))
+            image = image.convert("RGB")
+
+            for name, edge in sorted(IMAGE_VARIANTS.items(), key=lambda item: -item[1]):
+                image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+                variant_path = os.path.join(output_dir, f"{name}.jpg")
+                image.save(variant_path, format="JPEG", quality=85)
+                result["variants"][name] = variant_path
+    except Exception as e:
+        # Formats PIL cannot decode (e.g. SVG) are stored without variants
+        logger.warning(f"Could not process image {path}: {e}")
+
+    return result
+
+
+def _probe_video(path: str) -> Optional[Dict[str, int]]:
+    if not shutil.which("ffprobe"):
+        return None
+    try:
+        output = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=width,height", "-of", "json", path],
+            capture_output=True, check=True, timeout=30
+        ).stdout
+        stream = json.loads(output)["streams"][0]
+        return {"width": int(stream["width"]), "height": int(stream["height"])}
+    except Exception as e:
+        logger.warning(f"Could not probe video {path}: {e}")
+        return None
+
+
+class AssetIngestor:
+    """
+    Stores uploads as content-addressed blobs and derives their variants
+
+    Originals are keyed by SHA-256 (``{hash[:2]}/{hash}/original.{ext}``),
+    so identical uploads share one blob and are processed once. Uploads
+    are spooled to ``spool_dir``. Dimension probing and variant generation
+    run on the spool file in a worker process. The original and its
+    variants are then handed to the blob store, so any ``BlobStore`` can
+    be plugged in.
+    """
+
+    def __init__(self, blob_store: Optional[BlobStore] = None, spool_dir: Optional[str] = None, executor=None):
+        self.blob_store = blob_store or LocalBlobStore()
+        self.spool_dir = Path(spool_dir or os.path.join(ASSET_STORAGE_ROOT, ".spool"))
+        self.executor = executor
+
+    def original_key(self, sha256: str, extension: str) -> str:
+        return f"{sha256[:2]}/{sha256}/original.{extension}"
+
+    def variant_key(self, sha256: str, name: str) -> str:
+        return f"{sha256[:2]}/{sha256}/{name}.jpg"
+
+    async def ingest(
+        self,
+        chunks: AsyncIterator[bytes],
+        extension: str,
+        asset_type: str,
+        max_size: int,
+        find_processed: Optional[Callable[[str], Awaitable[Optional[Dict[str, Any]]]]] = None
+    ) -> Tuple[SpooledUpload, Dict[str, Any]]:
+        """
+        Spool, process and store an upload
+
+        ``find_processed(sha256)`` returns the recorded processing result
+        of an earlier asset with the same content, if any. When that blob
+        is still stored its result is reused and the file is not decoded
+        again. Returns the spooled upload and
+        ``{"key", "dimensions", "variants": {name: key}, "deduplicated"}``.
+        """
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        upload = await spool_upload(chunks, self.spool_dir, max_size)
+        key = self.original_key(upload.sha256, extension)
+        loop = asyncio.get_running_loop()
+        output_dir = self.spool_dir / uuid.uuid4().hex
+
+        try:
+            stored = await loop.run_in_executor(None, self.blob_store.exists, key)
+            processed = await find_processed(upload.sha256) if stored and find_processed else None
+            if processed is not None:
+                return upload, {**processed, "key": key, "deduplicated": True}
+
+            result = {"key": key, "dimensions": None, "variants": {}, "deduplicated": stored}
+            if asset_type in ("image", "video", "logo", "icon"):
+                output_dir.mkdir()
+                media_type = "video" if asset_type == "video" else "image"
+                media = await loop.run_in_executor(
+                    self.executor or get_media_executor(), process_media, upload.path, media_type, str(output_dir)
+                )
+
+                result["dimensions"] = media["dimensions"]
+                for name, variant_path in media["variants"].items():
+                    variant_key = self.variant_key(upload.sha256, name)
+                    await loop.run_in_executor(None, self.blob_store.put_file, variant_key, variant_path)
+                    result["variants"][name] = variant_key
+
+            if not stored:
+                await loop.run_in_executor(None, self.blob_store.put_file, key, upload.path)
+            return upload, result
+
+        finally:
+            if os.path.exists(upload.path):
+                os.unlink(upload.path)
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+
+async def iter_bytes(data: bytes, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Adapt an in-memory payload to the chunked upload interface"""
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+async def iter_file(file, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Read an async file-like object (e.g. an ``UploadFile``) in chunks"""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
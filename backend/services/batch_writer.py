@@ -0,0 +1,112 @@
+"""
+Batched Inserts
+Buffers documents in memory and writes them with insert_many, so
+fire-and-forget records stay off the request path
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+BATCH_WRITE_SIZE = int(os.getenv("BATCH_WRITE_SIZE", "500"))
+
+# Seconds a buffered document may wait before it is written
+BATCH_WRITE_INTERVAL = float(os.getenv("BATCH_WRITE_INTERVAL", "1.0"))
+
+# Buffered documents beyond which new ones are dropped while the database is unavailable
+BATCH_WRITE_MAX_PENDING = int(os.getenv("BATCH_WRITE_MAX_PENDING", "100000"))
+
+
+class BatchInsertWriter:
+    """
+    Buffered ``insert_many`` writer for one collection
+
+    ``add`` only appends to the buffer. It is flushed once ``batch_size``
+    documents are pending, and by a background task every
+    ``flush_interval`` seconds. Inserts are unordered, so one bad document
+    does not hold back the rest of its batch; rejected documents are
+    dropped. When the write itself fails the batch is put back at the
+    front of the buffer, up to ``max_pending`` documents, for the next
+    flush.
+    """
+
+    def __init__(
+        self,
+        collection,
+        batch_size: int = BATCH_WRITE_SIZE,
+        flush_interval: float = BATCH_WRITE_INTERVAL,
+        max_pending: int = BATCH_WRITE_MAX_PENDING
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    async def add(self, document: Dict[str, Any]):
+        if len(self._buffer) >= self.max_pending:
+            self.dropped += 1
+            return
+
+        self._buffer.append(document)
+        self._start_flushing()
+        if len(self._buffer) >= self.batch_size and not self._lock.locked():
+            await self.flush()
+
+    async def flush(self):
+        """Write everything buffered so far"""
+        async with self._lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:len(batch)]
+                try:
+                    await self.collection.insert_many(batch, ordered=False)
+                    self.written += len(batch)
+                except BulkWriteError as e:
+                    # Rejected documents (e.g. duplicate keys) would fail again
+                    inserted = e.details.get("nInserted", 0)
+                    self.written += inserted
+                    self.dropped += len(batch) - inserted
+                    logger.error(f"Dropped {len(batch) - inserted} rejected documents: {e}")
+                except Exception as e:
+                    logger.error(f"Error writing batch of {len(batch)} documents: {e}")
+                    room = max(self.max_pending - len(self._buffer), 0)
+                    self.dropped += max(len(batch) - room, 0)
+                    self._buffer[:0] = batch[:room]
+                    break
+
+    def _start_flushing(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing batch writer: {e}")
+
+    async def close(self):
+        """Stop the background flush and write what is left"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
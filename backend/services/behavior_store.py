@@ -0,0 +1,201 @@
+"""
+Behavior Storage
+Per-event-type daily behavior counters with constant-time windowed counts,
+and a compact binary encoding of cached user profiles
+"""
+
+import json
+import os
+import struct
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Most recent behaviors kept on a profile
+BEHAVIOR_HISTORY = int(os.getenv("BEHAVIOR_HISTORY", "100"))
+
+# Days of daily counters kept per event type; longer criteria windows are capped
+BEHAVIOR_COUNT_DAYS = int(os.getenv("BEHAVIOR_COUNT_DAYS", "90"))
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def epoch_day(when: datetime) -> int:
+    """Days since the Unix epoch of a naive UTC datetime"""
+    return (when - EPOCH).days
+
+
+def _epoch_micros(timestamp: Any) -> int:
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+
+class BehaviorCounts:
+    """
+    Daily event counts per event type
+
+    Stored on the profile as ``{event_type: {epoch_day: count}}`` so each
+    event is a single ``$inc``. Windowed counts come from a cumulative sum
+    per event type, built on first use, so any window is two lookups.
+    """
+
+    def __init__(self, counts: Optional[Dict[str, Dict[int, int]]] = None):
+        self.counts: Dict[str, Dict[int, int]] = {
+            event_type: dict(days) for event_type, days in (counts or {}).items()
+        }
+        self._cumulative: Dict[str, Tuple[int, List[int]]] = {}
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Dict[str, int]]) -> "BehaviorCounts":
+        return cls({
+            event_type: {int(day): int(count) for day, count in days.items()}
+            for event_type, days in document.items()
+        })
+
+    @classmethod
+    def from_behaviors(cls, behaviors: Iterable[Dict[str, Any]]) -> "BehaviorCounts":
+        """Counters for a profile stored before counters existed"""
+        counts = cls()
+        for behavior in behaviors:
+            timestamp = behavior["timestamp"]
+            if isinstance(timestamp, str):
+                timestamp = datetime.fromisoformat(timestamp)
+            counts.add(behavior["event_type"], epoch_day(timestamp))
+        return counts
+
+    def to_document(self) -> Dict[str, Dict[str, int]]:
+        return {
+            event_type: {str(day): count for day, count in days.items()}
+            for event_type, days in self.counts.items()
+        }
+
+    def add(self, event_type: str, day: int, count: int = 1):
+        days = self.counts.setdefault(event_type, {})
+        days[day] = days.get(day, 0) + count
+        self._cumulative.pop(event_type, None)
+
+    def count(self, event_type: str, window_days: int, today: int) -> int:
+        """Events of ``event_type`` in the ``window_days`` days ending ``today``"""
+        if event_type not in self.counts:
+            return 0
+        if event_type not in self._cumulative:
+            days = self.counts[event_type]
+            first, last = min(days), max(days)
+            cumulative, total = [], 0
+            for day in range(first, last + 1):
+                total += days.get(day, 0)
+                cumulative.append(total)
+            self._cumulative[event_type] = (first, cumulative)
+
+        first, cumulative = self._cumulative[event_type]
+
+        def through(day: int) -> int:
+            if day < first:
+                return 0
+            return cumulative[min(day - first, len(cumulative) - 1)]
+
+        window_days = min(window_days, BEHAVIOR_COUNT_DAYS)
+        return through(today) - through(today - window_days)
+
+    def total(self, window_days: int, today: int) -> int:
+        return sum(self.count(event_type, window_days, today) for event_type in self.counts)
+
+    def stale(self, today: int) -> List[Tuple[str, int]]:
+        """(event_type, day) counters older than ``BEHAVIOR_COUNT_DAYS``"""
+        cutoff = today - BEHAVIOR_COUNT_DAYS
+        return [
+            (event_type, day)
+            for event_type, days in self.counts.items()
+            for day in days if day <= cutoff
+        ]
+
+    def prune(self, today: int) -> List[Tuple[str, int]]:
+        stale = self.stale(today)
+        for event_type, day in stale:
+            del self.counts[event_type][day]
+            if not self.counts[event_type]:
+                del self.counts[event_type]
+            self._cumulative.pop(event_type, None)
+        return stale
+
+
+def counts_from_document(doc: Dict[str, Any]) -> BehaviorCounts:
+    """Counters of a stored profile, rebuilt from its behaviors if it predates them"""
+    if "behavior_counts" in doc:
+        return BehaviorCounts.from_document(doc["behavior_counts"] or {})
+    return BehaviorCounts.from_behaviors(doc.get("behaviors") or [])
+
+
+# Cached profile layout: magic, header length, JSON header, packed
+# behaviors, packed counters. Event types live once in the header and are
+# referenced by index; the remaining behavior fields (properties, event
+# ids) are listed in the header in behavior order.
+PROFILE_CACHE_MAGIC = b"UPB1"
+_HEADER_LENGTH = struct.Struct("<I")
+_BEHAVIOR = struct.Struct("<Hq")
+_COUNTER = struct.Struct("<HiI")
+
+
+def encode_profile(fields: Dict[str, Any], behaviors: List[Dict[str, Any]], counts: BehaviorCounts) -> bytes:
+    """
+    Encode a profile for the cache
+
+    ``fields`` holds the JSON-serializable profile fields. Behavior event
+    types become indexes and timestamps 8-byte microsecond counts, so a
+    cached profile is a fraction of its JSON size and decodes without
+    parsing timestamps.
+    """
+    event_types: Dict[str, int] = {}
+    extras: List[Dict[str, Any]] = []
+    packed_behaviors = bytearray()
+
+    for behavior in behaviors:
+        code = event_types.setdefault(behavior["event_type"], len(event_types))
+        packed_behaviors += _BEHAVIOR.pack(code, _epoch_micros(behavior["timestamp"]))
+        extras.append({k: v for k, v in behavior.items() if k not in ("event_type", "timestamp")})
+
+    packed_counts = bytearray()
+    for event_type, days in counts.counts.items():
+        code = event_types.setdefault(event_type, len(event_types))
+        for day, count in days.items():
+            packed_counts += _COUNTER.pack(code, day, count)
+
+    header = json.dumps({
+        "fields": fields,
+        "event_types": list(event_types),
+        "extras": extras,
+        "behaviors": len(behaviors)
+    }, default=str, separators=(",", ":")).encode("utf-8")
+
+    return b"".join([
+        PROFILE_CACHE_MAGIC, _HEADER_LENGTH.pack(len(header)), header,
+        bytes(packed_behaviors), bytes(packed_counts)
+    ])
+
+
+def decode_profile(data: bytes) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]], BehaviorCounts]]:
+    """Inverse of ``encode_profile``; None for data in any other format"""
+    if not data.startswith(PROFILE_CACHE_MAGIC):
+        return None
+
+    offset = len(PROFILE_CACHE_MAGIC)
+    (header_length,) = _HEADER_LENGTH.unpack_from(data, offset)
+    offset += _HEADER_LENGTH.size
+    header = json.loads(data[offset:offset + header_length])
+    offset += header_length
+
+    event_types = header["event_types"]
+    behaviors_end = offset + header["behaviors"] * _BEHAVIOR.size
+    behaviors = []
+    for (code, micros), extra in zip(_BEHAVIOR.iter_unpack(data[offset:behaviors_end]), header["extras"]):
+        behaviors.append({
+            "event_type": event_types[code],
+            "timestamp": (EPOCH + timedelta(microseconds=micros)).isoformat(),
+            **extra
+        })
+
+    counts = BehaviorCounts()
+    for code, day, count in _COUNTER.iter_unpack(data[behaviors_end:]):
+        counts.counts.setdefault(event_types[code], {})[day] = count
+
+    return header["fields"], behaviors, counts
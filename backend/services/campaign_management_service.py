@@ -6,19 +6,23 @@ Production-grade campaign creation, management, and optimization system
 import asyncio
 import json
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, AsyncIterator, Optional, Union
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from enum import Enum
 import uuid
 import base64
-import io
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel, Field
 import aiohttp
-from PIL import Image
 import mimetypes
 import os
+import numpy as np
+
+from services.asset_pipeline import AssetIngestor, iter_bytes
+from services.ab_testing_stats import AB_TEST_METRICS, VariantStats, evaluate, observation_increments
+from services.dashboard_stats import invalidate_dashboard_stats
+from services.prometheus_metrics import metrics_collector
 
 logger = logging.getLogger(__name__)
 
@@ -143,46 +147,50 @@ class AssetManager:
             'icon': 5 * 1024 * 1024,     # 5MB
             'logo': 10 * 1024 * 1024     # 10MB
         }
+        self.ingestor = AssetIngestor()
     
     async def upload_asset(self, client_id: str, file_data: bytes, file_name: str, asset_type: AssetType) -> CreativeAsset:
-        """Upload and process a creative asset"""
+        """Upload and process a creative asset held in memory"""
+        return await self.upload_asset_stream(client_id, iter_bytes(file_data), file_name, asset_type)
+    
+    async def upload_asset_stream(self, client_id: str, chunks: AsyncIterator[bytes], file_name: str,
+                                  asset_type: AssetType) -> CreativeAsset:
+        """
+        Upload and process a creative asset from a stream of chunks
+        
+        The upload is spooled to disk while it is hashed, stored once per
+        distinct content, and probed/resized in a worker process, so API
+        memory stays flat however many uploads run concurrently.
+        """
         try:
             # Validate file
             file_extension = file_name.split('.')[-1].lower()
             if file_extension not in self.supported_formats[asset_type.value]:
                 raise ValueError(f"Unsupported file format for {asset_type.value}: {file_extension}")
             
-            # Check file size
-            file_size = len(file_data)
-            if file_size > self.max_file_sizes[asset_type.value]:
-                raise ValueError(f"File too large for {asset_type.value}: {file_size} bytes")
+            # Spool, dedupe by content hash, derive variants; size is checked while streaming
+            upload, stored = await self.ingestor.ingest(
+                chunks,
+                file_extension,
+                asset_type.value,
+                self.max_file_sizes[asset_type.value],
+                find_processed=self._find_processed
+            )
             
-            # Generate asset ID and URLs
             asset_id = str(uuid.uuid4())
-            file_url = f"/assets/{client_id}/{asset_id}/{file_name}"
-            thumbnail_url = f"/assets/{client_id}/{asset_id}/thumbnail_{file_name}"
-            
-            # Process asset based on type
-            dimensions = None
-            if asset_type in [AssetType.IMAGE, AssetType.VIDEO]:
-                dimensions = await self._get_asset_dimensions(file_data, asset_type)
-            
-            # Create thumbnail for images
-            if asset_type == AssetType.IMAGE:
-                thumbnail_data = await self._create_thumbnail(file_data)
-                # In production, this would be saved to storage
-                logger.info(f"Created thumbnail for asset {asset_id}")
+            blob_store = self.ingestor.blob_store
+            thumbnail_key = stored["variants"].get("thumbnail")
             
             # Create asset record
             asset = CreativeAsset(
                 asset_id=asset_id,
                 asset_type=asset_type,
                 file_name=file_name,
-                file_size=file_size,
+                file_size=upload.size,
                 mime_type=mimetypes.guess_type(file_name)[0] or 'application/octet-stream',
-                dimensions=dimensions,
-                url=file_url,
-                thumbnail_url=thumbnail_url,
+                dimensions=stored["dimensions"],
+                url=blob_store.url(stored["key"]),
+                thumbnail_url=blob_store.url(thumbnail_key) if thumbnail_key else None,
                 tags=[],
                 created_at=datetime.utcnow()
             )
@@ -198,6 +206,9 @@ class AssetManager:
                 "dimensions": asset.dimensions,
                 "url": asset.url,
                 "thumbnail_url": asset.thumbnail_url,
+                "content_hash": upload.sha256,
+                "storage_key": stored["key"],
+                "variants": stored["variants"],
                 "tags": asset.tags,
                 "created_at": asset.created_at.isoformat(),
                 "is_active": True
@@ -205,39 +216,25 @@ class AssetManager:
             
             await self.db.creative_assets.insert_one(asset_doc)
             
-            logger.info(f"Uploaded asset {asset_id} for client {client_id}")
+            logger.info(
+                f"Uploaded asset {asset_id} for client {client_id}"
+                f"{' (deduplicated)' if stored['deduplicated'] else ''}"
+            )
             return asset
             
         except Exception as e:
             logger.error(f"Error uploading asset: {e}")
             raise
     
-    async def _get_asset_dimensions(self, file_data: bytes, asset_type: AssetType) -> Dict[str, int]:
-        """Get asset dimensions"""
-        try:
-            if asset_type == AssetType.IMAGE:
-                image = Image.open(io.BytesIO(file_data))
-                return {"width": image.width, "height": image.height}
-            elif asset_type == AssetType.VIDEO:
-                # In production, use ffprobe or similar to get video dimensions
-                return {"width": 1920, "height": 1080}  # Placeholder
+    async def _find_processed(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Processing result recorded for an earlier upload of the same content"""
+        doc = await self.db.creative_assets.find_one(
+            {"content_hash": content_hash},
+            {"_id": 0, "dimensions": 1, "variants": 1}
+        )
+        if not doc:
             return None
-        except Exception as e:
-            logger.error(f"Error getting asset dimensions: {e}")
-            return None
-    
-    async def _create_thumbnail(self, image_data: bytes) -> bytes:
-        """Create thumbnail for image"""
-        try:
-            image = Image.open(io.BytesIO(image_data))
-            image.thumbnail((300, 300), Image.Resampling.LANCZOS)
-            
-            output = io.BytesIO()
-            image.save(output, format='JPEG', quality=85)
-            return output.getvalue()
-        except Exception as e:
-            logger.error(f"Error creating thumbnail: {e}")
-            return image_data
+        return {"dimensions": doc.get("dimensions"), "variants": doc.get("variants", {})}
     
     async def get_client_assets(self, client_id: str, asset_type: Optional[AssetType] = None) -> List[CreativeAsset]:
         """Get all assets for a client"""
@@ -389,6 +386,7 @@ class CampaignBuilder:
             
             # Save to database
             await self.db.campaigns.insert_one(campaign_doc)
+            invalidate_dashboard_stats(client_id)
             
             logger.info(f"Created campaign {campaign_id} from template {template_id} for client {client_id}")
             
@@ -445,6 +443,7 @@ class CampaignBuilder:
             
             # Save to database
             await self.db.campaigns.insert_one(campaign_doc)
+            invalidate_dashboard_stats(client_id)
             
             logger.info(f"Created custom campaign {campaign_id} for client {client_id}")
             
@@ -491,6 +490,7 @@ class CampaignBuilder:
             
             if result.matched_count == 0:
                 raise ValueError(f"Campaign {campaign_id} not found")
+            invalidate_dashboard_stats(client_id)
             
             # Get updated campaign
             updated_campaign = await self.get_campaign(campaign_id, client_id)
@@ -575,6 +575,8 @@ class CampaignBuilder:
                 {"campaign_id": campaign_id, "client_id": client_id},
                 {"$set": updates}
             )
+            invalidate_dashboard_stats(client_id)
+            metrics_collector.remove_campaign_metrics(campaign_id)
             
             logger.info(f"Archived campaign {campaign_id}")
             
@@ -640,18 +642,21 @@ class A_BTestingManager:
             if not test:
                 raise ValueError(f"A/B test {test_id} not found")
             
-            # Get performance data for each variant
-            results = []
-            for variant in test["variants"]:
-                variant_performance = await self._get_variant_performance(test_id, variant["variant_id"])
-                results.append({
+            # Sufficient statistics for every variant in one round trip
+            variant_ids = [variant["variant_id"] for variant in test["variants"]]
+            variant_stats = await self._get_variant_stats(test_id, variant_ids)
+            
+            results = [
+                {
                     "variant_id": variant["variant_id"],
                     "variant_name": variant["name"],
-                    "performance": variant_performance
-                })
+                    "performance": self._variant_performance(variant_stats, i)
+                }
+                for i, variant in enumerate(test["variants"])
+            ]
             
             # Calculate statistical significance
-            significance = await self._calculate_significance(results)
+            significance = self._calculate_significance(test, variant_stats, results)
             
             return {
                 "test_id": test_id,
@@ -667,41 +672,154 @@ class A_BTestingManager:
             logger.error(f"Error getting A/B test results: {e}")
             raise
     
-    async def _get_variant_performance(self, test_id: str, variant_id: str) -> Dict[str, Any]:
-        """Get performance data for a variant"""
-        # This would query actual performance data
-        # For now, return mock data
+    async def record_metrics(
+        self, test_id: str, client_id: str, variant_id: str, observations: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Fold a batch of observations (e.g. one per exposed user) into a variant's statistics
+
+        Each observation carries per-unit metric values (impressions, clicks,
+        conversions, cost, revenue). Only counts, sums and sums of squares
+        are stored, updated atomically with ``$inc``. The test must belong to
+        ``client_id`` and define ``variant_id``.
+        """
+        try:
+            test = await self.db.ab_tests.find_one(
+                {"test_id": test_id, "client_id": client_id, "is_active": True},
+                {"variants": 1}
+            )
+            
+            if not test:
+                raise ValueError(f"A/B test {test_id} not found")
+            if variant_id not in {variant["variant_id"] for variant in test["variants"]}:
+                raise ValueError(f"Variant {variant_id} not found in A/B test {test_id}")
+            
+            if not observations:
+                return {"test_id": test_id, "variant_id": variant_id, "recorded": 0}
+            
+            await self.db.ab_test_variant_stats.update_one(
+                {"test_id": test_id, "variant_id": variant_id},
+                {
+                    "$inc": observation_increments(observations),
+                    "$set": {"updated_at": datetime.utcnow().isoformat()}
+                },
+                upsert=True
+            )
+            
+            return {"test_id": test_id, "variant_id": variant_id, "recorded": len(observations)}
+            
+        except Exception as e:
+            logger.error(f"Error recording A/B test metrics: {e}")
+            raise
+    
+    async def _get_variant_stats(self, test_id: str, variant_ids: List[str]) -> VariantStats:
+        """Get sufficient statistics for all variants with one aggregation"""
+        group = {"_id": "$variant_id", "n": {"$sum": "$n"}}
+        for metric in AB_TEST_METRICS:
+            group[f"sum_{metric}"] = {"$sum": f"$sum.{metric}"}
+            group[f"sum_sq_{metric}"] = {"$sum": f"$sum_sq.{metric}"}
+        
+        rows = await self.db.ab_test_variant_stats.aggregate([
+            {"$match": {"test_id": test_id}},
+            {"$group": group}
+        ]).to_list(length=None)
+        by_variant = {row["_id"]: row for row in rows}
+        
+        n = np.zeros(len(variant_ids))
+        sums = np.zeros((len(variant_ids), len(AB_TEST_METRICS)))
+        sums_sq = np.zeros_like(sums)
+        for i, variant_id in enumerate(variant_ids):
+            row = by_variant.get(variant_id)
+            if row:
+                n[i] = row["n"]
+                sums[i] = [row[f"sum_{metric}"] for metric in AB_TEST_METRICS]
+                sums_sq[i] = [row[f"sum_sq_{metric}"] for metric in AB_TEST_METRICS]
+        
+        return VariantStats(metrics=list(AB_TEST_METRICS), n=n, sums=sums, sums_sq=sums_sq)
+    
+    @staticmethod
+    def _variant_performance(variant_stats: VariantStats, index: int) -> Dict[str, Any]:
+        """Performance totals and ratios for one variant"""
+        totals = {metric: float(variant_stats.sums[index, i]) for i, metric in enumerate(variant_stats.metrics)}
+        
+        def ratio(numerator: float, denominator: float) -> float:
+            return numerator / denominator if denominator else 0.0
+        
         return {
-            "impressions": 10000,
-            "clicks": 500,
-            "conversions": 25,
-            "cost": 1000.0,
-            "revenue": 2500.0,
-            "ctr": 5.0,
-            "conversion_rate": 5.0,
-            "cpa": 40.0,
-            "roas": 2.5
+            "observations": int(variant_stats.n[index]),
+            "impressions": int(totals["impressions"]),
+            "clicks": int(totals["clicks"]),
+            "conversions": int(totals["conversions"]),
+            "cost": totals["cost"],
+            "revenue": totals["revenue"],
+            "ctr": ratio(totals["clicks"], totals["impressions"]) * 100,
+            "conversion_rate": ratio(totals["conversions"], totals["clicks"]) * 100,
+            "cpa": ratio(totals["cost"], totals["conversions"]),
+            "roas": ratio(totals["revenue"], totals["cost"])
         }
     
-    async def _calculate_significance(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Calculate statistical significance"""
-        # This would implement proper statistical significance testing
-        # For now, return mock data
+    def _calculate_significance(self, test: Dict[str, Any], variant_stats: VariantStats,
+                                results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Calculate statistical significance of every variant against the control (first variant)"""
+        alpha = test.get("alpha", 0.05)
+        evaluation = evaluate(
+            variant_stats,
+            test.get("success_metric", "conversions"),
+            alpha=alpha,
+            planned_n=test.get("minimum_sample_size")
+        )
+        
+        comparisons = []
+        for i, result in enumerate(results[1:], start=1):
+            comparison = {
+                "variant_id": result["variant_id"],
+                "variant_name": result["variant_name"],
+                "lift": float(evaluation["lift"][i]),
+                "effect_size": float(evaluation["effect_size"][i]),
+                "statistic": float(evaluation["statistic"][i]),
+                "p_value": float(evaluation["p_values"][i]),
+                "is_significant": bool(evaluation["significant"][i])
+            }
+            if "bayesian" in evaluation:
+                comparison["prob_beats_control"] = float(evaluation["bayesian"]["prob_beats_control"][i])
+                comparison["prob_best"] = float(evaluation["bayesian"]["prob_best"][i])
+            comparisons.append(comparison)
+        
+        # Headline numbers come from the strongest comparison
+        lead = min(comparisons, key=lambda c: c["p_value"]) if comparisons else None
+        
         return {
-            "is_significant": True,
-            "confidence_level": 95.0,
-            "p_value": 0.03,
-            "effect_size": 0.15
+            "is_significant": bool(evaluation["significant"].any()),
+            "confidence_level": (1 - alpha) * 100,
+            "p_value": lead["p_value"] if lead else 1.0,
+            "effect_size": lead["effect_size"] if lead else 0.0,
+            "metric": evaluation["metric"],
+            "method": evaluation["method"],
+            "information_fraction": evaluation["information_fraction"],
+            "boundary": evaluation["boundary"],
+            "stopped_early": evaluation["stopped_early"],
+            "complete": evaluation["complete"],
+            "control_variant_id": results[0]["variant_id"] if results else None,
+            "comparisons": comparisons
         }
     
     def _get_recommendation(self, results: List[Dict[str, Any]], significance: Dict[str, Any]) -> str:
         """Get recommendation based on results"""
         if not significance["is_significant"]:
+            if significance.get("complete"):
+                return "No variant differs significantly from the control at the planned sample size. Keep the control."
             return "Test is not statistically significant. Continue testing or increase sample size."
         
-        # Find best performing variant
-        best_variant = max(results, key=lambda x: x["performance"]["roas"])
-        return f"Variant '{best_variant['variant_name']}' is performing best with {best_variant['performance']['roas']:.2f}x ROAS. Consider implementing this variant."
+        # Best significant variant, or the control if every significant variant is worse
+        winners = [c for c in significance["comparisons"] if c["is_significant"] and c["lift"] > 0]
+        if not winners:
+            return f"Control '{results[0]['variant_name']}' outperforms the significant variants. Keep the control."
+        
+        best = max(winners, key=lambda c: c["lift"])
+        return (
+            f"Variant '{best['variant_name']}' beats the control on {significance['metric']} "
+            f"by {best['lift']:.1%} (p={best['p_value']:.4f}). Consider implementing this variant."
+        )
 
 class CampaignManagementService:
     """Main service for campaign management"""
@@ -752,6 +870,11 @@ class CampaignManagementService:
         """Upload creative asset"""
         return await self.asset_manager.upload_asset(client_id, file_data, file_name, asset_type)
     
+    async def upload_asset_stream(self, client_id: str, chunks: AsyncIterator[bytes], file_name: str,
+                                  asset_type: AssetType) -> CreativeAsset:
+        """Upload creative asset from a stream of chunks"""
+        return await self.asset_manager.upload_asset_stream(client_id, chunks, file_name, asset_type)
+    
     async def get_client_assets(self, client_id: str, asset_type: Optional[AssetType] = None) -> List[CreativeAsset]:
         """Get client assets"""
         return await self.asset_manager.get_client_assets(client_id, asset_type)
@@ -767,6 +890,12 @@ class CampaignManagementService:
     async def get_ab_test_results(self, test_id: str, client_id: str) -> Dict[str, Any]:
         """Get A/B test results"""
         return await self.ab_testing_manager.get_ab_test_results(test_id, client_id)
+    
+    async def record_ab_test_metrics(
+        self, test_id: str, client_id: str, variant_id: str, observations: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Record observations for an A/B test variant"""
+        return await self.ab_testing_manager.record_metrics(test_id, client_id, variant_id, observations)
 
 # Global instance
 campaign_management_service = None
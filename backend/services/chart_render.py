@@ -0,0 +1,198 @@
+"""
+Chart Rendering
+Content-addressed cache of serialized charts, rendered in a thread pool
+off the event loop, with large series downsampled by LTTB before plotting
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.single_flight_cache import SingleFlightCache
+
+logger = logging.getLogger(__name__)
+
+# Seconds a rendered chart is served; the key already changes with the data
+CHART_CACHE_TTL = float(os.getenv("CHART_CACHE_TTL", "600"))
+
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "2000"))
+
+# Points per series above which series charts are downsampled
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "1000"))
+
+# Trace attributes holding per-point data, sent once in the chart's dataset instead
+TRACE_DATA_KEYS = frozenset({"x", "y", "z", "values", "labels", "text", "customdata", "ids", "hovertext"})
+
+_chart_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_chart_executor() -> ThreadPoolExecutor:
+    """Get the thread pool charts are built and serialized in"""
+    global _chart_executor
+    if _chart_executor is None:
+        _chart_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("CHART_RENDER_WORKERS", "4")),
+            thread_name_prefix="chart-render"
+        )
+    return _chart_executor
+
+
+def chart_key(*parts: Any) -> str:
+    """Stable hash of a chart's configuration and data version"""
+    canonical = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def frame_version(df: pd.DataFrame) -> str:
+    """Content hash of a frame, computed column-wise"""
+    digest = hashlib.sha256(json.dumps([str(column) for column in df.columns]).encode("utf-8"))
+    try:
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    except TypeError:
+        # Unhashable cells, such as nested documents
+        digest.update(json.dumps(df.to_dict("split")["data"], default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: positions of ``threshold`` points that
+    keep the visual shape of the series
+
+    ``x`` must be sorted. The first and last points are always kept; each
+    bucket in between contributes the point forming the largest triangle
+    with the previously kept point and the next bucket's average.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def _axis_values(values: pd.Series) -> np.ndarray:
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+    # Ordinal axes (ISO dates, labels) are spaced by position
+    return np.arange(len(values), dtype=np.float64)
+
+
+def downsample_frame(
+    df: pd.DataFrame,
+    x_col: str,
+    y_col: str,
+    threshold: int = CHART_MAX_POINTS,
+    group_col: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Rows of ``df`` reduced by LTTB to about ``threshold`` points per chart
+
+    Series are sorted by ``x_col`` first; with ``group_col`` each group is
+    one series and the points are shared between them. Frames already
+    small enough, or without the plotted columns, are returned as they are.
+    """
+    if len(df) <= threshold or x_col not in df or y_col not in df:
+        return df
+
+    if group_col and group_col in df:
+        groups = df.groupby(group_col, sort=False, observed=True, dropna=False)
+        per_group = max(threshold // max(groups.ngroups, 1), 3)
+        return pd.concat([
+            _downsample_series(group, x_col, y_col, per_group) for _, group in groups
+        ])
+    return _downsample_series(df, x_col, y_col, threshold)
+
+
+def _downsample_series(df: pd.DataFrame, x_col: str, y_col: str, threshold: int) -> pd.DataFrame:
+    if len(df) <= threshold:
+        return df
+    df = df.sort_values(x_col, kind="stable")
+    y = pd.to_numeric(df[y_col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return df.iloc[lttb_indices(_axis_values(df[x_col]), y, threshold)]
+
+
+def columnar(df: pd.DataFrame, columns: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+    """JSON-ready columns of ``df``, names once rather than per row"""
+    data = {}
+    for column in columns or list(df.columns):
+        if column not in df:
+            continue
+        values = df[column]
+        data[column] = values.astype(object).where(values.notna(), None).tolist()
+    return data
+
+
+def figure_spec(fig: Any) -> Dict[str, Any]:
+    """
+    A Plotly figure's layout and trace styling, without per-point arrays
+
+    Traces keep their type, name and styling; clients bind them to the
+    chart's columnar dataset using the chart configuration.
+    """
+    spec = fig.to_plotly_json()
+    spec["data"] = [
+        {key: value for key, value in trace.items() if key not in TRACE_DATA_KEYS}
+        for trace in spec.get("data", [])
+    ]
+    return spec
+
+
+class ChartCache(SingleFlightCache):
+    """
+    LRU/TTL cache of rendered charts keyed by content hash
+
+    Misses are rendered in the chart thread pool; concurrent misses for
+    the same key share one render. Empty results, which the chart
+    generators return on failure, are not cached.
+    """
+
+    def __init__(self, ttl: float = CHART_CACHE_TTL, max_entries: int = CHART_CACHE_SIZE):
+        super().__init__(ttl, max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, render: Callable[[], Any]) -> Any:
+        result = self._cached(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        loop = asyncio.get_running_loop()
+
+        def render_in_pool():
+            self.misses += 1
+            return loop.run_in_executor(get_chart_executor(), render)
+
+        result, shared = await self._load(key, render_in_pool)
+        if shared:
+            self.hits += 1
+        return result
+
+
+# Global instance
+chart_cache = ChartCache()
@@ -0,0 +1,182 @@
+"""
+Dashboard Statistics
+Campaign rollups computed in MongoDB, with the dashboard's independent
+queries run concurrently and results cached per (organization, days)
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from services.single_flight_cache import SingleFlightCache
+
+logger = logging.getLogger(__name__)
+
+# Seconds a computed dashboard is served; also bounds staleness across processes
+DASHBOARD_STATS_CACHE_TTL = float(os.getenv("DASHBOARD_STATS_CACHE_TTL", "30"))
+
+DASHBOARD_STATS_CACHE_SIZE = int(os.getenv("DASHBOARD_STATS_CACHE_SIZE", "10000"))
+
+RECENT_ACTIVITY_LIMIT = 10
+
+ACTIVITY_PROJECTION = {"_id": 0, "type": 1, "description": 1, "timestamp": 1, "user_id": 1}
+
+_METRICS = ("spend", "revenue", "impressions", "clicks", "conversions")
+
+
+def campaign_rollup_pipeline(organization_id: str, start_date: datetime, days: int) -> List[Dict[str, Any]]:
+    """
+    Totals and per-platform breakdown of an organization's campaigns in one pass
+
+    Spend is approximated as the daily budget over the whole window, as
+    the dashboard has always reported it.
+    """
+    sums = {metric: {"$sum": f"${metric}"} for metric in _METRICS}
+    sums["campaigns"] = {"$sum": 1}
+
+    return [
+        {"$match": {
+            "organization_id": organization_id,
+            "created_at": {"$gte": start_date.isoformat()}
+        }},
+        {"$project": {
+            "_id": 0,
+            "status": 1,
+            "platform": {"$ifNull": ["$platform", "unknown"]},
+            "spend": {"$multiply": [{"$ifNull": ["$budget.daily_budget", 0]}, days]},
+            "revenue": {"$ifNull": ["$performance.revenue", 0]},
+            "impressions": {"$ifNull": ["$performance.impressions", 0]},
+            "clicks": {"$ifNull": ["$performance.clicks", 0]},
+            "conversions": {"$ifNull": ["$performance.conversions", 0]}
+        }},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "active": {"$sum": {"$cond": [{"$eq": ["$status", "active"]}, 1, 0]}},
+                "paused": {"$sum": {"$cond": [{"$eq": ["$status", "paused"]}, 1, 0]}},
+                **sums
+            }}],
+            "platforms": [{"$group": {"_id": "$platform", **sums}}]
+        }}
+    ]
+
+
+def _ratio(numerator: float, denominator: float, scale: float = 1.0) -> float:
+    return numerator / denominator * scale if denominator > 0 else 0.0
+
+
+def _platform_stats(group: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "campaigns": group["campaigns"],
+        "spend": float(group["spend"]),
+        "revenue": float(group["revenue"]),
+        "impressions": group["impressions"],
+        "clicks": group["clicks"],
+        "conversions": group["conversions"],
+        "roas": _ratio(group["revenue"], group["spend"]),
+        "ctr": _ratio(group["clicks"], group["impressions"], 100)
+    }
+
+
+async def compute_dashboard_stats(db, organization_id: str, days: int, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Dashboard statistics, with the campaign, user and activity queries run concurrently"""
+    now = now or datetime.utcnow()
+    start_date = now - timedelta(days=days)
+
+    rollup, active_users, recent_activity = await asyncio.gather(
+        db.campaigns.aggregate(campaign_rollup_pipeline(organization_id, start_date, days)).to_list(length=1),
+        db.users.count_documents({
+            "organization_id": organization_id,
+            "last_login": {"$gte": (now - timedelta(days=30)).isoformat()}
+        }),
+        db.activity_logs.find(
+            {"organization_id": organization_id, "timestamp": {"$gte": start_date.isoformat()}},
+            ACTIVITY_PROJECTION
+        ).sort("timestamp", -1).limit(RECENT_ACTIVITY_LIMIT).to_list(length=RECENT_ACTIVITY_LIMIT)
+    )
+
+    facets = rollup[0] if rollup else {"totals": [], "platforms": []}
+    totals = facets["totals"][0] if facets["totals"] else {
+        "campaigns": 0, "active": 0, "paused": 0, **{metric: 0 for metric in _METRICS}
+    }
+
+    return {
+        "total_campaigns": totals["campaigns"],
+        "active_campaigns": totals["active"],
+        "paused_campaigns": totals["paused"],
+        "total_spend": float(totals["spend"]),
+        "total_revenue": float(totals["revenue"]),
+        "roas": _ratio(totals["revenue"], totals["spend"]),
+        "active_users": active_users,
+        "total_impressions": totals["impressions"],
+        "total_clicks": totals["clicks"],
+        "total_conversions": totals["conversions"],
+        "avg_ctr": _ratio(totals["clicks"], totals["impressions"], 100),
+        "avg_cpa": _ratio(totals["spend"], totals["conversions"]),
+        "platform_breakdown": {group["_id"]: _platform_stats(group) for group in facets["platforms"]},
+        "recent_activity": [
+            {
+                "type": activity.get("type", "unknown"),
+                "description": activity.get("description", ""),
+                "timestamp": activity.get("timestamp", ""),
+                "user": activity.get("user_id", "")
+            }
+            for activity in recent_activity
+        ]
+    }
+
+
+class DashboardStatsCache(SingleFlightCache):
+    """
+    LRU/TTL cache of dashboard statistics keyed by (organization, days)
+
+    Concurrent misses for the same key share one computation. Invalidation
+    bumps a generation counter, so a computation that started before a
+    campaign write is returned to its callers but not cached.
+    """
+
+    def __init__(self, ttl: float = DASHBOARD_STATS_CACHE_TTL, max_entries: int = DASHBOARD_STATS_CACHE_SIZE):
+        super().__init__(ttl, max_entries)
+        self._generations: Dict[str, int] = {}
+        self._generation = 0
+
+    def _generation_of(self, organization_id: str) -> Tuple[int, int]:
+        return self._generation, self._generations.get(organization_id, 0)
+
+    async def get(
+        self,
+        organization_id: str,
+        days: int,
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        key = (organization_id, days)
+        stats = self._cached(key)
+        if stats is not None:
+            return stats
+
+        generation = self._generation_of(organization_id)
+        stats, _ = await self._load(
+            key, compute, store=lambda _: self._generation_of(organization_id) == generation
+        )
+        return stats
+
+    def invalidate(self, organization_id: Optional[str] = None):
+        """Drop an organization's dashboards, or every dashboard when the organization is unknown"""
+        if organization_id is None:
+            self._generation += 1
+            self._discard()
+            return
+
+        self._generations[organization_id] = self._generations.get(organization_id, 0) + 1
+        self._discard(lambda key: key[0] == organization_id)
+
+
+# Global instance
+dashboard_stats_cache = DashboardStatsCache()
+
+
+def invalidate_dashboard_stats(organization_id: Optional[str] = None):
+    """Called after campaign writes"""
+    dashboard_stats_cache.invalidate(organization_id)
@@ -0,0 +1,135 @@
+"""
+Event Ingestion
+Accepts behavioral events into an in-memory buffer and acknowledges them
+immediately; a background flush writes the event log in batches and
+applies profile updates once per user per flush window
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from services.batch_writer import BatchInsertWriter
+
+logger = logging.getLogger(__name__)
+
+# Buffered events that trigger a flush before the interval elapses
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+
+# Seconds an accepted event may wait before it is applied
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "0.5"))
+
+# Buffered events beyond which new events are rejected
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "100000"))
+
+# Users whose profile updates are applied concurrently
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "50"))
+
+
+class IngestionBufferFull(Exception):
+    """Raised when events arrive faster than the buffer is flushed"""
+
+
+class EventIngestionBuffer:
+    """
+    Buffered event ingestion
+
+    ``submit`` only appends to the buffer. Each flush takes every event
+    accepted so far, hands the event documents to a ``BatchInsertWriter``
+    and calls ``apply_events(user_id, events)`` once per user with that
+    user's events in arrival order. Flushes never overlap, so a user's
+    events are always applied in the order they were submitted.
+    """
+
+    def __init__(
+        self,
+        events_collection,
+        apply_events: Callable[[str, List[Any]], Awaitable[None]],
+        batch_size: int = INGEST_BATCH_SIZE,
+        flush_interval: float = INGEST_FLUSH_INTERVAL,
+        max_pending: int = INGEST_MAX_PENDING,
+        concurrency: int = INGEST_CONCURRENCY
+    ):
+        self.event_writer = BatchInsertWriter(events_collection, flush_interval=flush_interval)
+        self.apply_events = apply_events
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.concurrency = concurrency
+        self._buffer: List[tuple] = []
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.applied = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def submit(self, user_id: str, document: Dict[str, Any], event: Any):
+        """Accept an event; ``document`` is its event log record"""
+        if len(self._buffer) >= self.max_pending:
+            raise IngestionBufferFull(f"{len(self._buffer)} events waiting to be flushed")
+
+        self._buffer.append((user_id, document, event))
+        self._start_flushing()
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self):
+        """Write and apply everything accepted so far"""
+        async with self._lock:
+            while self._buffer:
+                window, self._buffer = self._buffer, []
+
+                # Dicts keep insertion order, and so each user's event order
+                by_user: Dict[str, List[Any]] = {}
+                for user_id, document, event in window:
+                    await self.event_writer.add(document)
+                    by_user.setdefault(user_id, []).append(event)
+                await self.event_writer.flush()
+
+                semaphore = asyncio.Semaphore(self.concurrency)
+
+                async def apply(user_id: str, events: List[Any]):
+                    async with semaphore:
+                        try:
+                            await self.apply_events(user_id, events)
+                            self.applied += len(events)
+                        except Exception as e:
+                            self.failed += len(events)
+                            logger.error(f"Error applying {len(events)} events for user {user_id}: {e}")
+
+                await asyncio.gather(*(apply(user_id, events) for user_id, events in by_user.items()))
+
+    def _start_flushing(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing event buffer: {e}")
+
+    async def close(self):
+        """Stop the background flush and apply what is left"""
+        # Holding the lock, the task is between flushes and cancelling it loses nothing
+        async with self._lock:
+            if self._flush_task is not None:
+                self._flush_task.cancel()
+                try:
+                    await self._flush_task
+                except asyncio.CancelledError:
+                    pass
+                self._flush_task = None
+        await self.flush()
+        await self.event_writer.close()
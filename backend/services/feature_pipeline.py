@@ -0,0 +1,267 @@
+"""
+Columnar Feature Pipeline
+Vectorized feature extraction for the fatigue, LTV and anomaly models
+
+Daily performance history is held in one long-format DataFrame (one row per
+creative per day) with a ``creative_idx`` column giving the creative's
+position in the accompanying creatives frame. Rows for a creative are in
+chronological order. Every feature is computed for all creatives at once with
+grouped aggregations, producing the same feature layout as the per-record
+extractors in ``predictive_intelligence``.
+"""
+
+from itertools import chain
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Days of history used for the fatigue model's level/spread/trend features
+FATIGUE_WINDOW_DAYS = 30
+
+# Trailing days treated as "recent" for CTR and conversion-rate decline
+RECENT_WINDOW_DAYS = 7
+
+DAILY_METRIC_COLUMNS = ["impressions", "clicks", "spend", "frequency", "ctr", "conversion_rate"]
+
+
+def _column(records: Sequence[Dict[str, Any]], getter: Callable[[Dict[str, Any]], Any]) -> np.ndarray:
+    """Pull one numeric field out of every record (missing or None -> 0)"""
+    return np.fromiter((getter(r) or 0 for r in records), dtype=np.float64, count=len(records))
+
+
+def daily_metrics_frame(
+    histories: Sequence[Optional[List[Dict[str, Any]]]],
+    columns: List[str] = DAILY_METRIC_COLUMNS
+) -> pd.DataFrame:
+    """Flatten per-creative lists of daily metric dicts into one long frame"""
+    histories = [h or [] for h in histories]
+    lengths = np.fromiter((len(h) for h in histories), dtype=np.int64, count=len(histories))
+
+    metrics = pd.DataFrame.from_records(chain.from_iterable(histories), columns=columns)
+    metrics = metrics.fillna(0).astype(np.float64)
+    metrics["creative_idx"] = np.repeat(np.arange(len(histories)), lengths)
+    return metrics
+
+
+def creative_frames(
+    creatives: Sequence[Dict[str, Any]],
+    history_key: str = "daily_metrics"
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Convert creative documents into (daily metrics, creatives) frames
+
+    Each document's ``history_key`` list is flattened once; the creatives
+    frame holds the per-creative attributes the fatigue model uses.
+    """
+    metrics = daily_metrics_frame([c.get(history_key) for c in creatives])
+
+    attributes = pd.DataFrame({
+        "age_days": _column(creatives, lambda c: c.get("age_days")),
+        "format": [c.get("format", "image") for c in creatives],
+        "audience_saturation": _column(creatives, lambda c: c.get("audience_saturation")),
+        "competing_creatives": _column(creatives, lambda c: len(c.get("competing_creatives") or [])),
+        "platform_load": _column(creatives, lambda c: c.get("platform_load"))
+    })
+    return metrics, attributes
+
+
+def align_daily_metrics(
+    metrics: pd.DataFrame,
+    creative_ids: Sequence[Any],
+    id_column: str = "creative_id",
+    date_column: Optional[str] = "date"
+) -> pd.DataFrame:
+    """
+    Prepare a daily metrics frame loaded straight from storage
+
+    Adds ``creative_idx`` (position of the row's creative in
+    ``creative_ids``), drops rows for unknown creatives and orders each
+    creative's rows by ``date_column``.
+    """
+    codes = pd.Index(creative_ids).get_indexer(metrics[id_column])
+    aligned = metrics.loc[codes >= 0].copy()
+    aligned["creative_idx"] = codes[codes >= 0]
+
+    sort_columns = ["creative_idx"] + ([date_column] if date_column else [])
+    aligned = aligned.sort_values(sort_columns, kind="stable", ignore_index=True)
+
+    for column in DAILY_METRIC_COLUMNS:
+        if column in aligned:
+            aligned[column] = aligned[column].fillna(0).astype(np.float64)
+        else:
+            aligned[column] = 0.0
+    return aligned
+
+
+def _positions_from_end(codes: np.ndarray, n_creatives: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-creative row counts and each row's distance from its creative's last day"""
+    counts = np.bincount(codes, minlength=n_creatives)
+    # Stable sort keeps each creative's rows in chronological order
+    order = np.argsort(codes, kind="stable")
+    ends = np.cumsum(counts)
+
+    positions = np.empty(len(codes), dtype=np.int64)
+    positions[order] = ends[codes[order]] - 1 - np.arange(len(codes))
+    return counts, positions
+
+
+def _grouped(values: pd.DataFrame, codes: np.ndarray, n_creatives: int, how: str, **kwargs) -> pd.DataFrame:
+    """Aggregate rows by creative, with creatives that have no rows filled with 0"""
+    result = getattr(values.groupby(codes, sort=True), how)(**kwargs)
+    return result.reindex(range(n_creatives), fill_value=0.0)
+
+
+def fatigue_feature_matrix(metrics: pd.DataFrame, creatives: pd.DataFrame) -> np.ndarray:
+    """
+    Build the (n_creatives, 20) fatigue feature matrix
+
+    Same features as ``PredictiveIntelligenceEngine._extract_fatigue_features``:
+    30-day level, spread, extremes and trend of delivery metrics, creative
+    age and format, saturation inputs and 7-day CTR. Creatives without
+    history get an all-zero row.
+    """
+    n = len(creatives)
+    codes = metrics["creative_idx"].to_numpy()
+    counts, from_end = _positions_from_end(codes, n)
+
+    window = from_end < FATIGUE_WINDOW_DAYS
+    columns = ["impressions", "clicks", "spend", "frequency"]
+    recent = metrics.loc[window, columns]
+    recent_codes = codes[window]
+
+    means = _grouped(recent, recent_codes, n, "mean")
+    stds = _grouped(recent[["impressions", "clicks"]], recent_codes, n, "std", ddof=0)
+    maxes = _grouped(recent[["impressions", "frequency"]], recent_codes, n, "max")
+    mins = _grouped(recent[["impressions", "frequency"]], recent_codes, n, "min")
+    firsts = _grouped(recent[["impressions", "clicks"]], recent_codes, n, "first")
+    lasts = _grouped(recent[["impressions", "clicks"]], recent_codes, n, "last")
+
+    last_week = from_end < RECENT_WINDOW_DAYS
+    ctr_7d = _grouped(metrics.loc[last_week, ["ctr"]], codes[last_week], n, "mean")
+
+    format_type = creatives["format"].to_numpy()
+
+    X = np.column_stack([
+        means["impressions"], means["clicks"], means["spend"], means["frequency"],
+        stds["impressions"], stds["clicks"],
+        creatives["age_days"],
+        format_type == "video",
+        format_type == "carousel",
+        counts,
+        maxes["impressions"], mins["impressions"],
+        maxes["frequency"], mins["frequency"],
+        lasts["impressions"] - firsts["impressions"],
+        lasts["clicks"] - firsts["clicks"],
+        creatives["audience_saturation"],
+        creatives["competing_creatives"],
+        creatives["platform_load"],
+        ctr_7d["ctr"]
+    ]).astype(np.float64)
+
+    X[counts == 0] = 0.0
+    return X
+
+
+def fatigue_decline_frame(metrics: pd.DataFrame, n_creatives: int) -> pd.DataFrame:
+    """
+    Recent-vs-earlier CTR and conversion-rate decline for every creative,
+    with the recent impressions average
+
+    "Recent" is the trailing 7 days; earlier days fall back to the recent
+    average when a creative has no older history. Decline is the relative
+    drop, 0 when the earlier average is 0.
+    """
+    codes = metrics["creative_idx"].to_numpy()
+    counts, from_end = _positions_from_end(codes, n_creatives)
+
+    recent_mask = from_end < RECENT_WINDOW_DAYS
+    columns = ["ctr", "conversion_rate", "impressions"]
+    recent = _grouped(metrics.loc[recent_mask, columns], codes[recent_mask], n_creatives, "mean").to_numpy()
+    older = _grouped(metrics.loc[~recent_mask, columns], codes[~recent_mask], n_creatives, "mean").to_numpy()
+
+    has_older = (counts > RECENT_WINDOW_DAYS)[:, None]
+    older = np.where(has_older, older, recent)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        decline = np.where(older > 0, (older - recent) / older, 0.0)
+
+    return pd.DataFrame({
+        "days_active": counts,
+        "recent_ctr": recent[:, 0],
+        "older_ctr": older[:, 0],
+        "recent_conversion_rate": recent[:, 1],
+        "older_conversion_rate": older[:, 1],
+        "recent_impressions": recent[:, 2],
+        "ctr_decline": decline[:, 0],
+        "conversion_decline": decline[:, 1]
+    })
+
+
+def ltv_feature_matrix(customers: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """
+    Build the (n_customers, 16) LTV feature matrix
+
+    Same features as ``PredictiveIntelligenceEngine._extract_ltv_features``;
+    purchase histories are flattened once and summed per customer.
+    """
+    n = len(customers)
+    histories = [c.get("purchase_history") or [] for c in customers]
+    purchase_counts = np.fromiter((len(h) for h in histories), dtype=np.int64, count=n)
+    values = np.fromiter(
+        (p.get("value") or 0 for p in chain.from_iterable(histories)),
+        dtype=np.float64, count=int(purchase_counts.sum())
+    )
+    total_spend = np.bincount(np.repeat(np.arange(n), purchase_counts), weights=values, minlength=n)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_order = np.where(purchase_counts > 0, total_spend / purchase_counts, 0.0)
+
+    def engagement(key: str) -> np.ndarray:
+        return _column(customers, lambda c: (c.get("engagement_metrics") or {}).get(key))
+
+    return np.column_stack([
+        purchase_counts,
+        total_spend,
+        avg_order,
+        _column(customers, lambda c: c.get("days_since_first_purchase")),
+        _column(customers, lambda c: c.get("days_since_last_purchase")),
+        engagement("email_open_rate"),
+        engagement("click_rate"),
+        engagement("session_count"),
+        _column(customers, lambda c: c.get("acquisition_channel_score")),
+        _column(customers, lambda c: c.get("segment_score")),
+        _column(customers, lambda c: bool(c.get("is_repeat_customer"))),
+        _column(customers, lambda c: c.get("lifetime_value_current")),
+        _column(customers, lambda c: c.get("predicted_churn_risk")),
+        _column(customers, lambda c: len(c.get("product_categories") or [])),
+        _column(customers, lambda c: c.get("geographic_score")),
+        _column(customers, lambda c: c.get("device_type_score"))
+    ]).astype(np.float64)
+
+
+def anomaly_feature_matrix(records: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """
+    Build the (n_records, 14) anomaly feature matrix
+
+    Same features as ``PredictiveIntelligenceEngine._extract_anomaly_features``.
+    """
+    def metric(key: str) -> np.ndarray:
+        return _column(records, lambda r: (r.get("metrics") or {}).get(key))
+
+    return np.column_stack([
+        metric("impressions"),
+        metric("clicks"),
+        metric("spend"),
+        metric("conversions"),
+        metric("ctr"),
+        metric("cpc"),
+        metric("cpm"),
+        metric("roas"),
+        metric("frequency"),
+        _column(records, lambda r: r.get("campaign_age_days")),
+        _column(records, lambda r: r.get("budget_utilization")),
+        _column(records, lambda r: len(r.get("targeting_criteria") or [])),
+        _column(records, lambda r: r.get("competition_level")),
+        _column(records, lambda r: r.get("platform_performance_index"))
+    ]).astype(np.float64)
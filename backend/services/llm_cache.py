@@ -0,0 +1,141 @@
+"""
+LLM Response Cache
+Content-addressed cache of LLM completions keyed on the normalized
+(model, system prompt, prompt), with an in-process LRU/TTL tier, an
+optional Redis tier shared between processes, and coalescing of
+identical in-flight prompts
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, Optional
+
+import redis.asyncio as redis
+
+from services.prometheus_metrics import metrics_collector
+from services.single_flight_cache import SingleFlightCache
+
+logger = logging.getLogger(__name__)
+
+# Seconds a completion is reused, in memory and in Redis
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "5000"))
+
+# Redis for the shared tier; the cache is process-local when unset
+LLM_CACHE_REDIS_URL = os.getenv("LLM_CACHE_REDIS_URL") or os.getenv("REDIS_URL")
+
+LLM_CACHE_PREFIX = "omnify:llm:"
+
+# Rough characters per token, for the token savings estimate
+CHARS_PER_TOKEN = 4
+
+
+def normalize_prompt(text: Optional[str]) -> str:
+    """Prompt text with whitespace runs collapsed, so indentation does not change the key"""
+    return " ".join((text or "").split())
+
+
+def prompt_key(model: str, system_message: Optional[str], prompt: str) -> str:
+    canonical = json.dumps([model, normalize_prompt(system_message), normalize_prompt(prompt)])
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(*texts: str) -> int:
+    return sum(len(text or "") for text in texts) // CHARS_PER_TOKEN
+
+
+class LlmResponseCache(SingleFlightCache):
+    """
+    Cache in front of LLM calls
+
+    ``complete`` returns a cached completion for the same model and
+    normalized prompts when there is one, from memory and then from
+    Redis; otherwise it calls the model once, even when the same prompt
+    is requested concurrently. Redis errors fall back to calling the
+    model. Empty completions are not cached.
+    """
+
+    def __init__(
+        self,
+        ttl: float = LLM_CACHE_TTL,
+        max_entries: int = LLM_CACHE_SIZE,
+        redis_client: Optional[Any] = None,
+        redis_url: Optional[str] = LLM_CACHE_REDIS_URL
+    ):
+        super().__init__(ttl, max_entries)
+        self.redis_url = redis_url
+        self._redis = redis_client
+        self.stats = {"memory": 0, "redis": 0, "coalesced": 0, "miss": 0, "tokens_saved": 0}
+
+    @property
+    def hit_rate(self) -> float:
+        requests = sum(self.stats[result] for result in ("memory", "redis", "coalesced", "miss"))
+        return (requests - self.stats["miss"]) / requests if requests else 0.0
+
+    def _redis_client(self):
+        if self._redis is None and self.redis_url:
+            self._redis = redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    def _record(self, module: str, result: str, tokens_saved: int = 0):
+        self.stats[result] += 1
+        self.stats["tokens_saved"] += tokens_saved
+        metrics_collector.record_llm_cache(module, result, tokens_saved)
+
+    async def _redis_get(self, key: str) -> Optional[str]:
+        client = self._redis_client()
+        if client is None:
+            return None
+        try:
+            return await client.get(LLM_CACHE_PREFIX + key)
+        except Exception as e:
+            logger.warning(f"Error reading LLM cache from Redis: {e}")
+            return None
+
+    async def _redis_set(self, key: str, response: str):
+        client = self._redis_client()
+        if client is None:
+            return
+        try:
+            await client.set(LLM_CACHE_PREFIX + key, response, ex=max(int(self.ttl), 1))
+        except Exception as e:
+            logger.warning(f"Error writing LLM cache to Redis: {e}")
+
+    async def complete(
+        self,
+        module: str,
+        model: str,
+        system_message: Optional[str],
+        prompt: str,
+        call: Callable[[], Awaitable[str]]
+    ) -> str:
+        """Completion of ``prompt``; ``call()`` sends it to the model on a miss"""
+        key = prompt_key(model, system_message, prompt)
+
+        response = self._cached(key)
+        if response is not None:
+            self._record(module, "memory", estimate_tokens(system_message, prompt, response))
+            return response
+
+        async def send():
+            response = await self._redis_get(key)
+            if response:
+                self._record(module, "redis", estimate_tokens(system_message, prompt, response))
+                return response
+            response = await call()
+            self._record(module, "miss")
+            if response:
+                await self._redis_set(key, response)
+            return response
+
+        response, shared = await self._load(key, send)
+        if shared:
+            self._record(module, "coalesced", estimate_tokens(system_message, prompt, response))
+        return response
+
+
+# Global instance
+llm_response_cache = LlmResponseCache()
@@ -0,0 +1,159 @@
+"""
+Micro-batched Model Inference
+Coalesces concurrent single-row predictions into vectorized model calls
+that run off the event loop
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Shared pool for model inference. sklearn tree ensembles release the GIL in
+# their Cython prediction loops, so threads keep the event loop responsive
+# without paying to pickle the model into a worker process on every call.
+_inference_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    """Get the process-wide inference thread pool"""
+    global _inference_executor
+    if _inference_executor is None:
+        _inference_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("ML_INFERENCE_WORKERS", "4")),
+            thread_name_prefix="ml-inference"
+        )
+    return _inference_executor
+
+
+class MicroBatchPredictor:
+    """
+    Batches concurrent predictions for one model
+
+    Rows submitted through :meth:`predict` within ``max_wait_ms`` of each other
+    (up to ``max_batch_size`` rows) are stacked into a single matrix and
+    scored with one call to the model method in a worker thread. ``method``
+    is either the name of a model method or a ``fn(model, X)`` callable.
+
+    The model is looked up through ``model_getter`` on every batch so a model
+    swapped in by retraining or the model registry is picked up immediately.
+    """
+
+    def __init__(
+        self,
+        model_getter: Callable[[], Any],
+        method: Union[str, Callable[[Any, np.ndarray], np.ndarray]] = "predict",
+        max_batch_size: int = 256,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None,
+        name: Optional[str] = None
+    ):
+        self.model_getter = model_getter
+        self.method = method
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.executor = executor
+        self.name = name or (method if isinstance(method, str) else "model")
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.stats: Dict[str, Any] = {
+            "requests": 0,
+            "batches": 0,
+            "rows": 0,
+            "total_inference_seconds": 0.0
+        }
+
+    async def predict(self, features: Sequence[float]) -> np.ndarray:
+        """Score one row; returns that row's output (e.g. class probabilities)"""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((features, future))
+        self.stats["requests"] += 1
+        return await future
+
+    async def predict_many(self, rows: Sequence[Sequence[float]], chunk_size: int = 4096) -> np.ndarray:
+        """Score many rows directly (bypassing the queue), in chunks of ``chunk_size``"""
+        if len(rows) == 0:
+            return np.empty((0,))
+
+        X = np.asarray(rows, dtype=np.float64)
+        outputs = []
+        for start in range(0, len(X), chunk_size):
+            outputs.append(await self._run_batch(X[start:start + chunk_size]))
+        return np.concatenate(outputs)
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._batch_loop())
+
+    async def _batch_loop(self):
+        """Collect queued rows into batches and score them"""
+        while True:
+            batch: List[Tuple[Sequence[float], asyncio.Future]] = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_wait_ms / 1000.0
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                outputs = await self._run_batch(np.asarray([row for row, _ in batch], dtype=np.float64))
+                for (_, future), output in zip(batch, outputs):
+                    if not future.done():
+                        future.set_result(output)
+            except Exception as e:
+                logger.error(f"Batched inference failed for {self.name}: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _run_batch(self, X: np.ndarray) -> np.ndarray:
+        model = self.model_getter()
+        if model is None:
+            raise RuntimeError(f"Model for {self.name} is not loaded")
+
+        if isinstance(self.method, str):
+            call = (getattr(model, self.method), X)
+        else:
+            call = (self.method, model, X)
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        output = await loop.run_in_executor(self.executor or get_inference_executor(), *call)
+
+        self.stats["batches"] += 1
+        self.stats["rows"] += len(X)
+        self.stats["total_inference_seconds"] += time.perf_counter() - started
+        return output
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return batching statistics"""
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "avg_batch_size": round(self.stats["rows"] / batches, 2) if batches else 0.0
+        }
+
+    async def close(self):
+        """Stop the batching worker"""
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
@@ -0,0 +1,307 @@
+"""
+Model Registry
+Versioned on-disk model artifacts with a MongoDB metadata pointer,
+lazy memory-mapped loading and a process-wide LRU of loaded models
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Local or shared (NFS/EFS) directory holding model artifacts
+MODEL_REGISTRY_ROOT = os.environ.get('MODEL_REGISTRY_ROOT', './storage/models')
+
+# Number of loaded models kept in memory per process
+MODEL_CACHE_SIZE = int(os.environ.get('MODEL_REGISTRY_CACHE_SIZE', '16'))
+
+ARTIFACT_FILENAME = 'model.joblib'
+
+_MODEL_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+
+@dataclass
+class RegisteredModel:
+    """A loaded model version and its registry metadata"""
+    name: str
+    version: int
+    model: Any
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    created_at: Optional[datetime] = None
+
+
+class LoadedModelCache:
+    """Thread-safe LRU of loaded model artifacts, keyed by artifact path"""
+
+    def __init__(self, max_size: int = MODEL_CACHE_SIZE):
+        self.max_size = max_size
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                self.misses += 1
+                return None
+            self._models.move_to_end(key)
+            self.hits += 1
+            return model
+
+    def put(self, key: str, model: Any):
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_size:
+                evicted, _ = self._models.popitem(last=False)
+                logger.debug(f"Evicted model artifact {evicted} from cache")
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+
+# Shared by every registry in the process so services constructed per request
+# (e.g. the ORACLE service) reuse models loaded by others
+loaded_models = LoadedModelCache()
+
+
+class ModelRegistry:
+    """
+    Versioned model registry
+
+    ``register`` writes the model with joblib, uncompressed, to
+    ``{root}/{name}/{version}/model.joblib`` and records a metadata document
+    in the ``model_registry`` collection. Versions are allocated from an
+    atomic counter so concurrent trainers never collide.
+
+    ``load`` resolves the latest version through a pointer cached for
+    ``pointer_ttl_seconds``, so a version registered by any replica is
+    picked up (hot-swapped) within that window. Artifacts are opened with
+    ``mmap_mode='r'``: numpy arrays held by the estimator stay
+    memory-mapped and are shared between worker processes through the OS
+    page cache (tree ensembles copy their node arrays on load, but still
+    skip the Mongo round trip and unpickling a BSON blob).
+    """
+
+    COLLECTION = 'model_registry'
+    COUNTERS_COLLECTION = 'model_registry_counters'
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        root: Optional[str] = None,
+        pointer_ttl_seconds: float = 30.0,
+        cache: Optional[LoadedModelCache] = None
+    ):
+        self.db = db
+        self.root = Path(root or MODEL_REGISTRY_ROOT)
+        self.pointer_ttl_seconds = pointer_ttl_seconds
+        self.cache = cache if cache is not None else loaded_models
+
+        # name -> (latest version document, monotonic fetch time)
+        self._latest: Dict[str, Tuple[Optional[Dict[str, Any]], float]] = {}
+        self._indexes_ready = False
+
+    async def register(
+        self,
+        name: str,
+        model: Any,
+        metrics: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """Persist a new version of a model and return its version number"""
+        self._validate_name(name)
+        await self._ensure_indexes()
+
+        version = await self._next_version(name)
+        relative_path = f"{name}/{version}/{ARTIFACT_FILENAME}"
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write_artifact, model, self.root / relative_path)
+
+        await self._record_version(
+            name, version, relative_path,
+            f"{type(model).__module__}.{type(model).__qualname__}", metrics, metadata
+        )
+        self.cache.put(str(self.root / relative_path), model)
+        return version
+
+    async def register_artifact(
+        self,
+        name: str,
+        artifact_path: str,
+        model_class: Optional[str] = None,
+        metrics: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """
+        Register a model already dumped with joblib (e.g. by a training worker)
+
+        The file is moved into the registry, so it should be written under
+        :meth:`staging_path` to stay on the same filesystem.
+        """
+        self._validate_name(name)
+        await self._ensure_indexes()
+
+        version = await self._next_version(name)
+        relative_path = f"{name}/{version}/{ARTIFACT_FILENAME}"
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._move_artifact, Path(artifact_path), self.root / relative_path)
+
+        await self._record_version(name, version, relative_path, model_class, metrics, metadata)
+        return version
+
+    def artifact_file(self, doc: Dict[str, Any]) -> str:
+        """Absolute artifact path for a version document"""
+        return str(self.root / doc["artifact_path"])
+
+    def staging_path(self, key: str) -> str:
+        """Path where a worker process can write an artifact before registration"""
+        self._validate_name(key)
+        staging_dir = self.root / ".staging"
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        return str(staging_dir / f"{key}.joblib")
+
+    async def _record_version(
+        self,
+        name: str,
+        version: int,
+        relative_path: str,
+        model_class: Optional[str],
+        metrics: Optional[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]]
+    ):
+        doc = {
+            "name": name,
+            "version": version,
+            "artifact_path": relative_path,
+            "model_class": model_class,
+            "metrics": metrics or {},
+            "metadata": metadata or {},
+            "created_at": datetime.utcnow()
+        }
+        await self.db[self.COLLECTION].insert_one(dict(doc))
+
+        self._latest[name] = (doc, time.monotonic())
+        logger.info(f"Registered model {name} version {version}")
+
+    async def load(self, name: str, version: Optional[int] = None) -> Optional[RegisteredModel]:
+        """Load a model version (latest by default); None if nothing is registered"""
+        if version is None:
+            doc = await self.get_latest(name)
+        else:
+            doc = await self.db[self.COLLECTION].find_one({"name": name, "version": version})
+        if not doc:
+            return None
+
+        path = self.artifact_file(doc)
+        model = self.cache.get(path)
+        if model is None:
+            loop = asyncio.get_running_loop()
+            model = await loop.run_in_executor(None, self._read_artifact, path)
+            self.cache.put(path, model)
+            logger.info(f"Loaded model {name} version {doc['version']} from {path}")
+
+        return RegisteredModel(
+            name=name,
+            version=doc["version"],
+            model=model,
+            metrics=doc.get("metrics", {}),
+            metadata=doc.get("metadata", {}),
+            created_at=doc.get("created_at")
+        )
+
+    async def get_latest(self, name: str, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Get the latest version document, cached for ``pointer_ttl_seconds``"""
+        cached = self._latest.get(name)
+        if not refresh and cached and time.monotonic() - cached[1] < self.pointer_ttl_seconds:
+            return cached[0]
+
+        doc = await self.db[self.COLLECTION].find_one({"name": name}, sort=[("version", -1)])
+        self._latest[name] = (doc, time.monotonic())
+        return doc
+
+    async def list_versions(self, name: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """List registered versions of a model, newest first"""
+        cursor = self.db[self.COLLECTION].find({"name": name}, {"_id": 0}).sort("version", -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def _next_version(self, name: str) -> int:
+        counter = await self.db[self.COUNTERS_COLLECTION].find_one_and_update(
+            {"_id": name},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return counter["version"]
+
+    async def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        await self.db[self.COLLECTION].create_index([("name", 1), ("version", -1)], unique=True)
+        self._indexes_ready = True
+
+    @staticmethod
+    def _validate_name(name: str):
+        if not _MODEL_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid model name '{name}'")
+
+    @staticmethod
+    def _write_artifact(model: Any, path: Path):
+        # Write then rename so readers on other replicas never see a partial file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _move_artifact(source: Path, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, path)
+
+    @staticmethod
+    def _read_artifact(path: str) -> Any:
+        return joblib.load(path, mmap_mode='r')
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return loaded-model cache statistics"""
+        return {
+            "root": str(self.root),
+            "cached_models": len(self.cache),
+            "cache_size": self.cache.max_size,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses
+        }
+
+
+# Global instance
+model_registry = None
+
+
+def get_model_registry(db: AsyncIOMotorDatabase) -> ModelRegistry:
+    """Get model registry instance"""
+    global model_registry
+    if model_registry is None:
+        model_registry = ModelRegistry(db)
+    return model_registry
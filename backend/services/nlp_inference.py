@@ -0,0 +1,195 @@
+"""
+Batched Text Inference
+Lazily loaded transformer pipelines scored in batches off the event loop,
+with a result cache keyed by text hash
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+NLP_BATCH_SIZE = int(os.environ.get('NLP_BATCH_SIZE', '32'))
+
+# Longer inputs are truncated to this many tokens
+NLP_MAX_LENGTH = int(os.environ.get('NLP_MAX_LENGTH', '512'))
+
+# Cached results per pipeline
+NLP_CACHE_SIZE = int(os.environ.get('NLP_CACHE_SIZE', '10000'))
+
+# After a failed load, wait this long before retrying; the delay doubles
+# with each further failure up to NLP_LOAD_RETRY_MAX_SECONDS
+NLP_LOAD_RETRY_SECONDS = float(os.environ.get('NLP_LOAD_RETRY_SECONDS', '30'))
+NLP_LOAD_RETRY_MAX_SECONDS = float(os.environ.get('NLP_LOAD_RETRY_MAX_SECONDS', '3600'))
+
+# Separate from the sklearn inference pool so a large text batch does not
+# hold up tabular predictions; torch already parallelizes within a batch
+_nlp_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_nlp_executor() -> ThreadPoolExecutor:
+    """Get the process-wide NLP inference thread pool"""
+    global _nlp_executor
+    if _nlp_executor is None:
+        _nlp_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("NLP_INFERENCE_WORKERS", "2")),
+            thread_name_prefix="nlp-inference"
+        )
+    return _nlp_executor
+
+
+def transformers_pipeline_factory(task: str, model: Optional[str] = None) -> Callable[[], Any]:
+    """Factory that builds a HuggingFace pipeline, importing transformers on first use"""
+    def load():
+        from transformers import pipeline
+        return pipeline(task, model=model) if model else pipeline(task)
+    return load
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class BatchedTextPipeline:
+    """
+    Batched, cached wrapper around a text pipeline
+
+    The pipeline is built by ``loader`` the first time texts are scored. Its
+    load runs in the executor, so neither import nor startup pays for it.
+    ``run`` looks every text up in an LRU keyed by its SHA-1 and sends only
+    the distinct misses to the pipeline. They go in one executor call with
+    ``batch_size`` and truncation to ``max_length`` tokens. If the model
+    cannot be loaded, ``run`` returns None for every text and the caller
+    falls back until the load is retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Any],
+        batch_size: int = NLP_BATCH_SIZE,
+        max_length: int = NLP_MAX_LENGTH,
+        cache_size: int = NLP_CACHE_SIZE,
+        executor: Optional[Executor] = None,
+        name: str = "pipeline"
+    ):
+        self.loader = loader
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self.executor = executor
+        self.name = name
+
+        self._pipeline: Any = None
+        self._load_failures = 0
+        self._retry_load_at = 0.0
+        self._load_lock: Optional[asyncio.Lock] = None
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        self.stats: Dict[str, Any] = {
+            "texts": 0,
+            "cache_hits": 0,
+            "batches": 0,
+            "inferred": 0,
+            "total_inference_seconds": 0.0
+        }
+
+    @property
+    def loaded(self) -> bool:
+        return self._pipeline is not None
+
+    async def run(self, texts: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Score texts, returning the pipeline's top result for each"""
+        self.stats["texts"] += len(texts)
+        keys = [text_key(text) for text in texts]
+
+        results: Dict[str, Dict[str, Any]] = {}
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            cached = self._cache_get(key)
+            if cached is not None:
+                results[key] = cached
+                self.stats["cache_hits"] += 1
+            else:
+                missing.setdefault(key, text)
+
+        if missing:
+            pipe = await self._get_pipeline()
+            if pipe is None:
+                return [results.get(key) for key in keys]
+
+            outputs = await self._infer(pipe, list(missing.values()))
+            for key, output in zip(missing, outputs):
+                results[key] = output
+                self._cache_put(key, output)
+
+        return [results.get(key) for key in keys]
+
+    def _load_due(self) -> bool:
+        return self._pipeline is None and time.monotonic() >= self._retry_load_at
+
+    async def _get_pipeline(self) -> Any:
+        if not self._load_due():
+            return self._pipeline
+
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self._load_due():
+                loop = asyncio.get_running_loop()
+                start = time.perf_counter()
+                try:
+                    self._pipeline = await loop.run_in_executor(self._executor(), self.loader)
+                    self._load_failures = 0
+                    logger.info(f"Loaded NLP {self.name} pipeline in {time.perf_counter() - start:.1f}s")
+                except Exception as e:
+                    delay = min(NLP_LOAD_RETRY_SECONDS * 2 ** self._load_failures, NLP_LOAD_RETRY_MAX_SECONDS)
+                    self._load_failures += 1
+                    self._retry_load_at = time.monotonic() + delay
+                    logger.error(f"Error loading NLP {self.name} pipeline, retrying in {delay:.0f}s: {e}")
+        return self._pipeline
+
+    async def _infer(self, pipe: Any, texts: List[str]) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        outputs = await loop.run_in_executor(self._executor(), self._call_pipeline, pipe, texts)
+
+        self.stats["batches"] += -(-len(texts) // self.batch_size)
+        self.stats["inferred"] += len(texts)
+        self.stats["total_inference_seconds"] += time.perf_counter() - start
+        return outputs
+
+    def _call_pipeline(self, pipe: Any, texts: List[str]) -> List[Dict[str, Any]]:
+        outputs = pipe(texts, batch_size=self.batch_size, truncation=True, max_length=self.max_length)
+        # Pipelines return a list of results per text when top_k is set
+        return [output[0] if isinstance(output, list) else output for output in outputs]
+
+    def _executor(self) -> Executor:
+        return self.executor or get_nlp_executor()
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        result = self._cache.get(key)
+        if result is not None:
+            self._cache.move_to_end(key)
+        return result
+
+    def _cache_put(self, key: str, result: Dict[str, Any]):
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "loaded": self.loaded,
+            "load_failures": self._load_failures,
+            "cached_results": len(self._cache),
+            "batch_size": self.batch_size,
+            "max_length": self.max_length
+        }
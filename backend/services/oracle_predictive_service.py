@@ -3,19 +3,41 @@ ORACLE - Predictive Intelligence Brain Module
 Creative fatigue prediction, LTV forecasting, performance anomaly detection
 """
 
+import asyncio
 import logging
+import time
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import numpy as np
-from sklearn.ensemble import IsolationForest, RandomForestRegressor
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
-import pickle
-import base64
+from services.model_registry import get_model_registry
+from services.feature_pipeline import align_daily_metrics, daily_metrics_frame, fatigue_decline_frame
 
 logger = logging.getLogger(__name__)
 
+# Registry names for ORACLE's models
+FATIGUE_MODEL_NAME = "oracle_fatigue_prediction"
+LTV_MODEL_NAME = "oracle_ltv_forecast"
+
+# Seconds before a failed model load is retried
+MODEL_LOAD_RETRY_SECONDS = 60
+
+# Days of history needed before predicting fatigue
+MIN_FATIGUE_HISTORY_DAYS = 7
+
+# (urgency, recommendation) for rapid decline, moderate decline,
+# long-running and stable creatives
+FATIGUE_RULE_TIERS = [
+    ("critical", "Creative showing significant performance decline. Replace immediately."),
+    ("high", "Creative performance declining. Prepare replacement creative."),
+    ("medium", "Creative has been running for extended period. Consider refreshing."),
+    ("low", "Creative performing well. Monitor for changes."),
+]
+
 
 @dataclass
 class FatiguePrediction:
@@ -49,21 +71,35 @@ class OraclePredictiveService:
         self.fatigue_model = None
         self.ltv_model = None
         self.scaler = StandardScaler()
-        self._load_models()
+        self.model_registry = get_model_registry(db)
+        self._models_loaded = False
+        self._retry_load_at = 0.0
+        self._load_lock = asyncio.Lock()
+    
+    async def _ensure_models_loaded(self):
+        """Load the registered models on the first prediction; a failed load is retried later"""
+        if self._models_loaded or time.monotonic() < self._retry_load_at:
+            return
+        async with self._load_lock:
+            if self._models_loaded or time.monotonic() < self._retry_load_at:
+                return
+            self._models_loaded = await self._load_models()
+            if not self._models_loaded:
+                self._retry_load_at = time.monotonic() + MODEL_LOAD_RETRY_SECONDS
     
-    def _load_models(self):
-        """Load pre-trained models or initialize new ones"""
+    async def _load_models(self) -> bool:
+        """Load the latest registered models (served from the process-wide model cache)"""
         try:
-            # Try to load from database
-            model_doc = self.db.ml_models.find_one({"type": "fatigue_prediction"})
-            if model_doc and model_doc.get("model_data"):
-                self.fatigue_model = pickle.loads(base64.b64decode(model_doc["model_data"]))
-            
-            model_doc = self.db.ml_models.find_one({"type": "ltv_forecast"})
-            if model_doc and model_doc.get("model_data"):
-                self.ltv_model = pickle.loads(base64.b64decode(model_doc["model_data"]))
+            for attr, name in (
+                ("fatigue_model", FATIGUE_MODEL_NAME),
+                ("ltv_model", LTV_MODEL_NAME),
+            ):
+                registered = await self.model_registry.load(name)
+                setattr(self, attr, registered.model if registered else None)
+            return True
         except Exception as e:
             logger.warning(f"Could not load models: {e}. Will use rule-based predictions.")
+            return False
     
     async def predict_creative_fatigue(
         self,
@@ -73,8 +109,103 @@ class OraclePredictiveService:
     ) -> FatiguePrediction:
         """Predict when a creative will experience fatigue"""
         try:
-            if not performance_history or len(performance_history) < 7:
-                return FatiguePrediction(
+            predictions = await self.predict_creative_fatigue_many([{
+                "creative_id": creative_id,
+                "campaign_id": campaign_id,
+                "performance_history": performance_history
+            }])
+            return predictions[0]
+            
+        except Exception as e:
+            logger.error(f"Error predicting creative fatigue: {e}")
+            raise
+    
+    async def predict_creative_fatigue_many(
+        self,
+        creatives: List[Dict[str, Any]]
+    ) -> List[FatiguePrediction]:
+        """
+        Predict fatigue for many creatives in one vectorized pass
+        
+        Each item carries creative_id, campaign_id and performance_history
+        (daily dicts, oldest first).
+        """
+        await self._ensure_models_loaded()
+        metrics = daily_metrics_frame([c.get("performance_history") for c in creatives])
+        return self._fatigue_predictions(
+            metrics,
+            [c.get("creative_id") for c in creatives],
+            [c.get("campaign_id") for c in creatives]
+        )
+    
+    async def predict_creative_fatigue_frame(
+        self,
+        daily_metrics: pd.DataFrame,
+        creatives: pd.DataFrame
+    ) -> List[FatiguePrediction]:
+        """
+        Predict fatigue for every creative from columnar history
+        
+        daily_metrics has one row per creative per day (creative_id, date,
+        ctr, conversion_rate, ...); creatives has creative_id and campaign_id.
+        """
+        await self._ensure_models_loaded()
+        metrics = align_daily_metrics(daily_metrics, creatives["creative_id"])
+        return self._fatigue_predictions(
+            metrics,
+            creatives["creative_id"].tolist(),
+            creatives["campaign_id"].tolist()
+        )
+    
+    def _fatigue_predictions(
+        self,
+        metrics: pd.DataFrame,
+        creative_ids: List[str],
+        campaign_ids: List[str]
+    ) -> List[FatiguePrediction]:
+        """Apply the fatigue rules to recent-vs-earlier decline for all creatives"""
+        decline = fatigue_decline_frame(metrics, len(creative_ids))
+        days_active = decline["days_active"].to_numpy()
+        ctr_decline = decline["ctr_decline"].to_numpy()
+        conversion_decline = decline["conversion_decline"].to_numpy()
+        recent_ctr = decline["recent_ctr"].to_numpy()
+        
+        # Rule-based prediction, with days until fatigue taken from the
+        # trained model when one is registered:
+        # rapid decline, moderate decline, long-running, otherwise stable
+        conditions = [
+            (ctr_decline > 0.3) | (conversion_decline > 0.3),
+            (ctr_decline > 0.15) | (conversion_decline > 0.15),
+            days_active > 21
+        ]
+        days_until_fatigue = np.select(conditions, [
+            np.maximum(1, 7 - days_active // 2),
+            np.maximum(3, 14 - days_active // 2),
+            np.maximum(5, 21 - days_active)
+        ], np.maximum(7, 14 - days_active // 3))
+        tier = np.select(conditions, [0, 1, 2], 3)
+        
+        if self.fatigue_model is not None:
+            # Same features as train_fatigue_model, over the recent window
+            features = np.column_stack([
+                days_active,
+                recent_ctr,
+                decline["recent_conversion_rate"].to_numpy(),
+                decline["recent_impressions"].to_numpy(),
+                ctr_decline
+            ])
+            days_until_fatigue = np.maximum(1, np.rint(self.fatigue_model.predict(features)))
+        
+        # Confidence based on data quality
+        confidence = np.minimum(0.9, 0.5 + (days_active / 30) * 0.4)
+        
+        # Predict future performance
+        predicted_performance = recent_ctr * (1 - ctr_decline * 0.5)
+        
+        predictions = []
+        for i, (creative_id, campaign_id) in enumerate(zip(creative_ids, campaign_ids)):
+            if days_active[i] < MIN_FATIGUE_HISTORY_DAYS:
+                predictions.append(FatiguePrediction(
                     creative_id=creative_id,
                     campaign_id=campaign_id,
                     days_until_fatigue=14,  # Default
@@ -83,68 +214,22 @@ class OraclePredictiveService:
                     predicted_performance=0.0,
                     recommendation="Insufficient data for prediction. Monitor for 7+ days.",
                     urgency="low"
-                )
+                ))
+                continue
             
-            # Extract features from performance history
-            recent_performance = performance_history[-7:]  # Last 7 days
-            older_performance = performance_history[:-7] if len(performance_history) > 7 else []
-            
-            # Calculate metrics
-            recent_ctr = np.mean([p.get("ctr", 0) for p in recent_performance])
-            older_ctr = np.mean([p.get("ctr", 0) for p in older_performance]) if older_performance else recent_ctr
-            
-            recent_conversion_rate = np.mean([p.get("conversion_rate", 0) for p in recent_performance])
-            older_conversion_rate = np.mean([p.get("conversion_rate", 0) for p in older_performance]) if older_performance else recent_conversion_rate
-            
-            # Calculate decline rate
-            ctr_decline = (older_ctr - recent_ctr) / older_ctr if older_ctr > 0 else 0
-            conversion_decline = (older_conversion_rate - recent_conversion_rate) / older_conversion_rate if older_conversion_rate > 0 else 0
-            
-            # Days since creative started
-            days_active = len(performance_history)
-            
-            # Rule-based prediction (can be replaced with ML model)
-            if ctr_decline > 0.3 or conversion_decline > 0.3:
-                # Rapid decline - fatigue imminent
-                days_until_fatigue = max(1, 7 - days_active // 2)
-                urgency = "critical"
-                recommendation = "Creative showing significant performance decline. Replace immediately."
-            elif ctr_decline > 0.15 or conversion_decline > 0.15:
-                # Moderate decline - fatigue approaching
-                days_until_fatigue = max(3, 14 - days_active // 2)
-                urgency = "high"
-                recommendation = "Creative performance declining. Prepare replacement creative."
-            elif days_active > 21:
-                # Long-running creative - likely fatigued soon
-                days_until_fatigue = max(5, 21 - days_active)
-                urgency = "medium"
-                recommendation = "Creative has been running for extended period. Consider refreshing."
-            else:
-                # Stable performance
-                days_until_fatigue = max(7, 14 - days_active // 3)
-                urgency = "low"
-                recommendation = "Creative performing well. Monitor for changes."
-            
-            # Confidence based on data quality
-            confidence = min(0.9, 0.5 + (len(performance_history) / 30) * 0.4)
-            
-            # Predict future performance
-            predicted_performance = recent_ctr * (1 - ctr_decline * 0.5)
-            
-            return FatiguePrediction(
+            urgency, recommendation = FATIGUE_RULE_TIERS[tier[i]]
+            predictions.append(FatiguePrediction(
                 creative_id=creative_id,
                 campaign_id=campaign_id,
-                days_until_fatigue=int(days_until_fatigue),
-                confidence=confidence,
-                current_performance=recent_ctr,
-                predicted_performance=predicted_performance,
+                days_until_fatigue=int(days_until_fatigue[i]),
+                confidence=float(confidence[i]),
+                current_performance=float(recent_ctr[i]),
+                predicted_performance=float(predicted_performance[i]),
                 recommendation=recommendation,
                 urgency=urgency
-            )
-            
-        except Exception as e:
-            logger.error(f"Error predicting creative fatigue: {e}")
-            raise
+            ))
+        
+        return predictions
     
     async def forecast_ltv(
         self,
@@ -228,43 +313,25 @@ class OraclePredictiveService:
                 if not values or all(v == 0 for v in values):
                     continue
                 
-                # Use Isolation Forest for anomaly detection
-                if self.fatigue_model is None:
-                    # Simple statistical method
-                    mean_val = np.mean(values)
-                    std_val = np.std(values)
-                    
-                    if std_val == 0:
-                        continue
-                    
-                    # Z-score method
-                    recent_values = values[-3:]  # Last 3 days
-                    for i, val in enumerate(recent_values):
-                        z_score = abs((val - mean_val) / std_val)
-                        if z_score > 2.5:  # Significant anomaly
-                            anomalies.append({
-                                "metric": metric,
-                                "value": val,
-                                "expected": mean_val,
-                                "deviation": z_score,
-                                "severity": "high" if z_score > 3 else "medium",
-                                "date": performance_data[-(3-i)]["date"] if "date" in performance_data[-(3-i)] else None
-                            })
-                else:
-                    # Use ML model
-                    X = np.array(values).reshape(-1, 1)
-                    predictions = self.fatigue_model.predict(X)
-                    
-                    for i, (val, pred) in enumerate(zip(recent_values, predictions[-3:])):
-                        if pred == -1:  # Anomaly detected
-                            anomalies.append({
-                                "metric": metric,
-                                "value": val,
-                                "expected": mean_val,
-                                "deviation": abs(val - mean_val) / std_val if std_val > 0 else 0,
-                                "severity": "high",
-                                "date": performance_data[-(3-i)]["date"] if "date" in performance_data[-(3-i)] else None
-                            })
+                mean_val = np.mean(values)
+                std_val = np.std(values)
+                recent_values = values[-3:]  # Last 3 days
+                
+                if std_val == 0:
+                    continue
+                
+                # Z-score method
+                for i, val in enumerate(recent_values):
+                    z_score = abs((val - mean_val) / std_val)
+                    if z_score > 2.5:  # Significant anomaly
+                        anomalies.append({
+                            "metric": metric,
+                            "value": val,
+                            "expected": mean_val,
+                            "deviation": z_score,
+                            "severity": "high" if z_score > 3 else "medium",
+                            "date": performance_data[-(3-i)]["date"] if "date" in performance_data[-(3-i)] else None
+                        })
             
             return anomalies
             
@@ -302,16 +369,19 @@ class OraclePredictiveService:
             model.fit(X, y)
             
             # Save model
-            model_data = base64.b64encode(pickle.dumps(model)).decode()
+            version = await self.model_registry.register(
+                FATIGUE_MODEL_NAME, model, metrics={"training_samples": len(X)}
+            )
             await self.db.ml_models.update_one(
                 {"type": "fatigue_prediction"},
                 {
                     "$set": {
                         "type": "fatigue_prediction",
-                        "model_data": model_data,
+                        "registry_version": version,
                         "trained_at": datetime.utcnow(),
                         "training_samples": len(X)
-                    }
+                    },
+                    "$unset": {"model_data": ""}
                 },
                 upsert=True
             )
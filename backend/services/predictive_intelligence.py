@@ -18,16 +18,48 @@ from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import json
 import hashlib
-import pickle
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier, IsolationForest
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
 import warnings
 warnings.filterwarnings('ignore')
 
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from services.structured_logging import logger
 from services.real_agentkit_adapter import agentkit_adapter
+from services.ml_inference import MicroBatchPredictor
+from services.feature_pipeline import (
+    align_daily_metrics,
+    anomaly_feature_matrix,
+    creative_frames,
+    fatigue_feature_matrix,
+    ltv_feature_matrix
+)
+from services.model_registry import get_model_registry
+from services.training_jobs import get_training_job_manager
+
+# Rows per insert_many when persisting bulk predictions
+PREDICTION_INSERT_BATCH_SIZE = 1000
+
+# Registry model name -> engine attribute holding the loaded model
+MODEL_ATTRIBUTES = {
+    "fatigue_prediction": "fatigue_model",
+    "ltv_forecasting": "ltv_model",
+    "anomaly_detection": "anomaly_detector"
+}
+
+# Short prediction types used on predictions -> registry model name
+MODEL_NAMES = {
+    "fatigue": "fatigue_prediction",
+    "ltv": "ltv_forecasting",
+    "anomaly": "anomaly_detection"
+}
+
+
+def _fatigue_probabilities(model, X: np.ndarray) -> np.ndarray:
+    """7-day fatigue probability from a classifier, or a clipped regression output"""
+    if hasattr(model, 'predict_proba'):
+        return model.predict_proba(X)[:, 1]
+    # For regression model, normalize prediction to [0, 1]
+    return np.clip(model.predict(X), 0, 1)
 
 class PredictiveIntelligenceEngine:
     """
@@ -43,6 +75,25 @@ class PredictiveIntelligenceEngine:
         self.anomaly_detector = None
         self.scaler = StandardScaler()
 
+        # Versioned model artifacts; versions currently loaded by this engine
+        self.model_registry = get_model_registry(db)
+        self.model_versions: Dict[str, int] = {}
+
+        # Training runs in a process pool; model name -> active job id
+        self.training_jobs = get_training_job_manager(db)
+        self.active_training_jobs: Dict[str, str] = {}
+
+        # Micro-batched inference; concurrent requests share one model call
+        self.fatigue_predictor = MicroBatchPredictor(
+            lambda: self.fatigue_model, _fatigue_probabilities, name="fatigue_prediction"
+        )
+        self.ltv_predictor = MicroBatchPredictor(
+            lambda: self.ltv_model, "predict", name="ltv_forecasting"
+        )
+        self.anomaly_predictor = MicroBatchPredictor(
+            lambda: self.anomaly_detector, "decision_function", name="anomaly_detection"
+        )
+
         # Model performance tracking
         self.model_metrics = {
             "fatigue_prediction": {"accuracy": 0.0, "samples": 0, "last_trained": None},
@@ -61,17 +112,19 @@ class PredictiveIntelligenceEngine:
 
     async def initialize_models(self) -> Dict[str, Any]:
         """
-        Initialize and train ML models with historical data
+        Load the last registered ML models
+
+        Models that have never been trained are trained by background jobs
+        and swapped in when their job completes, so startup does not block.
         """
         try:
             logger.info("Initializing predictive models", extra={
                 "event_type": "model_initialization_start"
             })
 
-            # Load or train models
-            await self._initialize_fatigue_model()
-            await self._initialize_ltv_model()
-            await self._initialize_anomaly_detector()
+            # Load models, or queue training for missing ones
+            for model_name in MODEL_ATTRIBUTES:
+                await self._initialize_model(model_name)
 
             # Calculate compound intelligence score
             await self._calculate_compound_intelligence()
@@ -83,6 +136,7 @@ class PredictiveIntelligenceEngine:
                     "ltv_model": self.ltv_model is not None,
                     "anomaly_detector": self.anomaly_detector is not None
                 },
+                "training_jobs": dict(self.active_training_jobs),
                 "compound_intelligence_score": self.compound_intelligence_score,
                 "model_metrics": self.model_metrics
             }
@@ -102,6 +156,7 @@ class PredictiveIntelligenceEngine:
         Predict creative fatigue 7-14 days in advance
         """
         try:
+            await self._refresh_model("fatigue_prediction")
             if not self.fatigue_model:
                 return {
                     "status": "model_not_ready",
@@ -111,33 +166,9 @@ class PredictiveIntelligenceEngine:
             # Extract features from creative data
             features = self._extract_fatigue_features(creative_data)
 
-            # Make predictions
-            if hasattr(self.fatigue_model, 'predict_proba'):
-                fatigue_prob_7d = float(self.fatigue_model.predict_proba([features])[0][1])
-            else:
-                # For regression model, normalize prediction to [0, 1]
-                raw_pred = float(self.fatigue_model.predict([features])[0])
-                fatigue_prob_7d = np.clip(raw_pred, 0, 1)
-            fatigue_prob_14d = self._calculate_14d_prediction(features, fatigue_prob_7d)
-
-            # Calculate confidence and risk factors
-            confidence = self._calculate_prediction_confidence(features)
-            risk_factors = self._identify_risk_factors(features)
-
-            # Calculate recommended refresh date
-            refresh_date = self._calculate_refresh_date(fatigue_prob_7d, creative_data)
-
-            prediction = {
-                "creative_id": creative_data.get("creative_id"),
-                "fatigue_probability_7d": round(fatigue_prob_7d, 4),
-                "fatigue_probability_14d": round(fatigue_prob_14d, 4),
-                "predicted_performance_drop": round(fatigue_prob_7d * 0.3, 4),  # Estimated 30% drop
-                "confidence_interval": round(confidence, 4),
-                "key_risk_factors": risk_factors,
-                "recommended_refresh_date": refresh_date,
-                "model_accuracy": self.model_metrics["fatigue_prediction"]["accuracy"],
-                "prediction_timestamp": datetime.utcnow().isoformat()
-            }
+            # Make predictions (batched with concurrent requests, off the event loop)
+            fatigue_prob_7d = float(await self.fatigue_predictor.predict(features))
+            prediction = self._build_fatigue_prediction(creative_data, features, fatigue_prob_7d)
 
             # Store prediction for learning
             await self._store_prediction("fatigue", creative_data, prediction)
@@ -172,6 +203,7 @@ class PredictiveIntelligenceEngine:
         Forecast 90-day customer lifetime value
         """
         try:
+            await self._refresh_model("ltv_forecasting")
             if not self.ltv_model:
                 return {
                     "status": "model_not_ready",
@@ -182,21 +214,8 @@ class PredictiveIntelligenceEngine:
             features = self._extract_ltv_features(customer_data)
 
             # Make prediction
-            predicted_ltv = float(self.ltv_model.predict([features])[0])
-            confidence = self._calculate_ltv_confidence(features)
-
-            # Segment analysis
-            segment_analysis = await self._analyze_customer_segment(customer_data, predicted_ltv)
-
-            forecast = {
-                "customer_id": customer_data.get("customer_id"),
-                "predicted_90d_ltv": round(predicted_ltv, 2),
-                "ltv_confidence": round(confidence, 4),
-                "acquisition_cost_efficiency": round(predicted_ltv / max(customer_data.get("acquisition_cost", 1), 1), 2),
-                "segment_analysis": segment_analysis,
-                "forecast_timestamp": datetime.utcnow().isoformat(),
-                "model_accuracy": self.model_metrics["ltv_forecasting"]["accuracy"]
-            }
+            predicted_ltv = float(await self.ltv_predictor.predict(features))
+            forecast = await self._build_ltv_forecast(customer_data, features, predicted_ltv)
 
             # Store forecast for learning
             await self._store_prediction("ltv", customer_data, forecast)
@@ -227,6 +246,7 @@ class PredictiveIntelligenceEngine:
         Detect performance anomalies using isolation forest
         """
         try:
+            await self._refresh_model("anomaly_detection")
             if not self.anomaly_detector:
                 return {
                     "status": "model_not_ready",
@@ -237,21 +257,8 @@ class PredictiveIntelligenceEngine:
             features = self._extract_anomaly_features(performance_data)
 
             # Detect anomalies
-            anomaly_score = float(self.anomaly_detector.decision_function([features])[0])
-            is_anomaly = anomaly_score < -0.5  # Threshold for anomaly
-
-            anomaly_result = {
-                "campaign_id": performance_data.get("campaign_id"),
-                "is_anomaly": is_anomaly,
-                "anomaly_score": round(anomaly_score, 4),
-                "confidence": round(abs(anomaly_score), 4),
-                "detected_at": datetime.utcnow().isoformat(),
-                "model_precision": self.model_metrics["anomaly_detection"]["precision"]
-            }
-
-            # Analyze anomaly if detected
-            if is_anomaly:
-                anomaly_result["analysis"] = await self._analyze_anomaly(performance_data, anomaly_score)
+            anomaly_score = float(await self.anomaly_predictor.predict(features))
+            anomaly_result = await self._build_anomaly_result(performance_data, anomaly_score)
 
             # Store anomaly detection for learning
             await self._store_prediction("anomaly", performance_data, anomaly_result)
@@ -274,6 +281,198 @@ class PredictiveIntelligenceEngine:
                 "error": str(e)
             }
 
+    async def predict_many(
+        self,
+        prediction_type: str,
+        records: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Score many records in one vectorized model call
+
+        Used for bulk refreshes (e.g. re-scoring every active creative).
+        Features for all records are built in one columnar pass, predictions
+        are persisted with batched insert_many calls and fatigue alerts are
+        raised in bulk.
+
+        Args:
+            prediction_type: "fatigue", "ltv" or "anomaly"
+            records: Input documents, as passed to the single-record methods
+        """
+        if prediction_type not in MODEL_NAMES:
+            raise ValueError(f"Unknown prediction type: {prediction_type}")
+
+        predictor = await self._bulk_predictor(prediction_type)
+        if predictor is None:
+            return self._not_ready_results(prediction_type, len(records))
+        if not records:
+            return []
+
+        if prediction_type == "fatigue":
+            X = fatigue_feature_matrix(*creative_frames(records))
+        elif prediction_type == "ltv":
+            X = ltv_feature_matrix(records)
+        else:
+            X = anomaly_feature_matrix(records)
+
+        return await self._score_feature_matrix(prediction_type, predictor, records, X)
+
+    async def predict_creative_fatigue_frame(
+        self,
+        daily_metrics: pd.DataFrame,
+        creatives: pd.DataFrame
+    ) -> List[Dict[str, Any]]:
+        """
+        Score every creative from columnar performance history
+
+        Nightly refresh entry point: history is loaded once as a frame and
+        features for all creatives are computed in one pass.
+
+        Args:
+            daily_metrics: One row per creative per day (creative_id, date and
+                the daily metric columns)
+            creatives: One row per creative (creative_id, age_days, format,
+                audience_saturation, competing_creatives as a count, platform_load)
+        """
+        predictor = await self._bulk_predictor("fatigue")
+        if predictor is None:
+            return self._not_ready_results("fatigue", len(creatives))
+        if creatives.empty:
+            return []
+
+        metrics = align_daily_metrics(daily_metrics, creatives["creative_id"])
+        X = fatigue_feature_matrix(metrics, creatives)
+        return await self._score_feature_matrix("fatigue", predictor, creatives.to_dict("records"), X)
+
+    @staticmethod
+    def _not_ready_results(prediction_type: str, count: int) -> List[Dict[str, Any]]:
+        """One model_not_ready result per input, so results still line up with the inputs"""
+        return [
+            {"status": "model_not_ready", "error": f"{prediction_type} model not initialized"}
+            for _ in range(count)
+        ]
+
+    async def _bulk_predictor(self, prediction_type: str) -> Optional[MicroBatchPredictor]:
+        """Predictor for a prediction type, or None when its model is not loaded"""
+        await self._refresh_model(MODEL_NAMES[prediction_type])
+
+        if prediction_type == "fatigue":
+            model, predictor = self.fatigue_model, self.fatigue_predictor
+        elif prediction_type == "ltv":
+            model, predictor = self.ltv_model, self.ltv_predictor
+        else:
+            model, predictor = self.anomaly_detector, self.anomaly_predictor
+        return predictor if model is not None else None
+
+    async def _score_feature_matrix(
+        self,
+        prediction_type: str,
+        predictor: MicroBatchPredictor,
+        records: List[Dict[str, Any]],
+        X: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """Run the model over a feature matrix and persist the results"""
+        outputs = await predictor.predict_many(X)
+
+        results = []
+        for record, features, output in zip(records, X, outputs):
+            if prediction_type == "fatigue":
+                results.append(self._build_fatigue_prediction(record, features, float(output)))
+            elif prediction_type == "ltv":
+                results.append(await self._build_ltv_forecast(record, features, float(output)))
+            else:
+                results.append(await self._build_anomaly_result(record, float(output)))
+
+        await self._store_predictions(prediction_type, records, results)
+
+        if prediction_type == "fatigue":
+            alerts = [
+                self._build_fatigue_alert(prediction) for prediction in results
+                if prediction["fatigue_probability_7d"] > 0.7
+            ]
+            if alerts:
+                await self.db.alerts.insert_many(alerts, ordered=False)
+
+        logger.info("Bulk predictions completed", extra={
+            "event_type": "bulk_prediction_complete",
+            "prediction_type": prediction_type,
+            "count": len(results)
+        })
+
+        return results
+
+    def _build_fatigue_prediction(
+        self,
+        creative_data: Dict[str, Any],
+        features: List[float],
+        fatigue_prob_7d: float
+    ) -> Dict[str, Any]:
+        """Assemble a fatigue prediction from the model output"""
+        fatigue_prob_14d = self._calculate_14d_prediction(features, fatigue_prob_7d)
+
+        # Calculate confidence and risk factors
+        confidence = self._calculate_prediction_confidence(features)
+        risk_factors = self._identify_risk_factors(features)
+
+        # Calculate recommended refresh date
+        refresh_date = self._calculate_refresh_date(fatigue_prob_7d, creative_data)
+
+        return {
+            "creative_id": creative_data.get("creative_id"),
+            "fatigue_probability_7d": round(fatigue_prob_7d, 4),
+            "fatigue_probability_14d": round(fatigue_prob_14d, 4),
+            "predicted_performance_drop": round(fatigue_prob_7d * 0.3, 4),  # Estimated 30% drop
+            "confidence_interval": round(confidence, 4),
+            "key_risk_factors": risk_factors,
+            "recommended_refresh_date": refresh_date,
+            "model_accuracy": self.model_metrics["fatigue_prediction"]["accuracy"],
+            "prediction_timestamp": datetime.utcnow().isoformat()
+        }
+
+    async def _build_ltv_forecast(
+        self,
+        customer_data: Dict[str, Any],
+        features: List[float],
+        predicted_ltv: float
+    ) -> Dict[str, Any]:
+        """Assemble an LTV forecast from the model output"""
+        confidence = self._calculate_ltv_confidence(features)
+
+        # Segment analysis
+        segment_analysis = await self._analyze_customer_segment(customer_data, predicted_ltv)
+
+        return {
+            "customer_id": customer_data.get("customer_id"),
+            "predicted_90d_ltv": round(predicted_ltv, 2),
+            "ltv_confidence": round(confidence, 4),
+            "acquisition_cost_efficiency": round(predicted_ltv / max(customer_data.get("acquisition_cost", 1), 1), 2),
+            "segment_analysis": segment_analysis,
+            "forecast_timestamp": datetime.utcnow().isoformat(),
+            "model_accuracy": self.model_metrics["ltv_forecasting"]["accuracy"]
+        }
+
+    async def _build_anomaly_result(
+        self,
+        performance_data: Dict[str, Any],
+        anomaly_score: float
+    ) -> Dict[str, Any]:
+        """Assemble an anomaly result from the model output"""
+        is_anomaly = anomaly_score < -0.5  # Threshold for anomaly
+
+        anomaly_result = {
+            "campaign_id": performance_data.get("campaign_id"),
+            "is_anomaly": is_anomaly,
+            "anomaly_score": round(anomaly_score, 4),
+            "confidence": round(abs(anomaly_score), 4),
+            "detected_at": datetime.utcnow().isoformat(),
+            "model_precision": self.model_metrics["anomaly_detection"]["precision"]
+        }
+
+        # Analyze anomaly if detected
+        if is_anomaly:
+            anomaly_result["analysis"] = await self._analyze_anomaly(performance_data, anomaly_score)
+
+        return anomaly_result
+
     async def update_models_with_feedback(
         self,
         prediction_type: str,
@@ -610,264 +809,93 @@ class PredictiveIntelligenceEngine:
 
         return analysis
 
-    async def _initialize_fatigue_model(self):
-        """Initialize and train creative fatigue prediction model"""
+    async def _initialize_model(self, model_name: str):
+        """Load the latest registered version of a model, or queue its training"""
         try:
-            # Try to load existing model
-            existing_model = await self.db.ml_models.find_one({"model_type": "fatigue_prediction"})
-            if existing_model and existing_model.get("model_data"):
-                self.fatigue_model = pickle.loads(existing_model["model_data"])
-                self.model_metrics["fatigue_prediction"] = existing_model.get("metrics", {})
-                logger.info("Loaded existing fatigue prediction model")
+            if await self._load_registered_model(model_name):
+                logger.info(f"Loaded existing {model_name} model")
                 return
 
             # Train new model with synthetic data (in production, use real data)
-            await self._train_fatigue_model()
-
-        except Exception as e:
-            logger.warning("Failed to initialize fatigue model, using fallback", exc_info=e)
-            # Fallback: simple rule-based model
-            self.fatigue_model = None
-
-    async def _initialize_ltv_model(self):
-        """Initialize LTV forecasting model"""
-        try:
-            existing_model = await self.db.ml_models.find_one({"model_type": "ltv_forecasting"})
-            if existing_model and existing_model.get("model_data"):
-                self.ltv_model = pickle.loads(existing_model["model_data"])
-                self.model_metrics["ltv_forecasting"] = existing_model.get("metrics", {})
-                logger.info("Loaded existing LTV forecasting model")
-                return
-
-            await self._train_ltv_model()
+            await self.train_model(model_name, warm_start=False)
 
         except Exception as e:
-            logger.warning("Failed to initialize LTV model, using fallback", exc_info=e)
-            self.ltv_model = None
-
-    async def _initialize_anomaly_detector(self):
-        """Initialize anomaly detection model"""
-        try:
-            existing_model = await self.db.ml_models.find_one({"model_type": "anomaly_detection"})
-            if existing_model and existing_model.get("model_data"):
-                self.anomaly_detector = pickle.loads(existing_model["model_data"])
-                self.model_metrics["anomaly_detection"] = existing_model.get("metrics", {})
-                logger.info("Loaded existing anomaly detection model")
-                return
+            logger.warning(f"Failed to initialize {model_name} model, using fallback", exc_info=e)
+            setattr(self, MODEL_ATTRIBUTES[model_name], None)
 
-            await self._train_anomaly_detector()
-
-        except Exception as e:
-            logger.warning("Failed to initialize anomaly detector, using fallback", exc_info=e)
-            self.anomaly_detector = None
-
-    async def _train_fatigue_model(self):
-        """Train creative fatigue prediction model"""
-        # Generate synthetic training data (in production, use real historical data)
-        np.random.seed(42)
-        n_samples = 1000
-
-        # Generate features
-        X = []
-        y = []
-
-        for _ in range(n_samples):
-            age = np.random.uniform(0, 60)  # Days old
-            impressions = np.random.normal(1000, 200)
-            clicks = np.random.normal(50, 10)
-            frequency = np.random.normal(2.5, 0.5)
-            saturation = np.random.uniform(0, 100)
-
-            features = [
-                impressions, clicks, np.random.normal(50, 10), frequency,
-                np.random.normal(200, 50), np.random.normal(10, 2), age,
-                np.random.choice([0, 1]), np.random.choice([0, 1]),
-                np.random.randint(7, 30), impressions * 1.2, impressions * 0.8,
-                frequency * 1.1, frequency * 0.9, np.random.normal(100, 20),
-                np.random.normal(20, 5), saturation, np.random.randint(0, 10),
-                np.random.uniform(0, 10), np.random.uniform(0.005, 0.05)
-            ]
-
-            # Fatigue probability increases with age and saturation
-            fatigue_prob = min((age / 30.0) * 0.4 + (saturation / 100.0) * 0.6, 0.95)
-            fatigue_prob += np.random.normal(0, 0.1)  # Add noise
-            fatigue_prob = np.clip(fatigue_prob, 0, 1)
-
-            X.append(features[:20])
-            y.append(1 if fatigue_prob > 0.5 else 0)  # Binary classification
-
-        # Train model
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-        # Use classifier for probability predictions
-        self.fatigue_model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.fatigue_model.fit(X_train, y_train)
-
-        # Calculate accuracy
-        accuracy = self.fatigue_model.score(X_test, y_test)
-        self.model_metrics["fatigue_prediction"] = {
-            "accuracy": round(accuracy, 4),
-            "samples": len(X_train),
-            "last_trained": datetime.utcnow().isoformat()
-        }
+    async def train_model(self, model_name: str, warm_start: bool = True) -> str:
+        """
+        Train a model in a background job and swap it in when done
 
-        # Save model
-        model_data = pickle.dumps(self.fatigue_model)
-        await self.db.ml_models.update_one(
-            {"model_type": "fatigue_prediction"},
-            {
-                "$set": {
-                    "model_data": model_data,
-                    "metrics": self.model_metrics["fatigue_prediction"],
-                    "feature_count": len(X[0]),
-                    "updated_at": datetime.utcnow()
-                }
-            },
-            upsert=True
+        Returns the job id; if the model already has a job in flight, that
+        job's id is returned instead of queueing another.
+        """
+        if model_name not in MODEL_ATTRIBUTES:
+            raise ValueError(f"Unknown model: {model_name}")
+        active_job_id = self.active_training_jobs.get(model_name)
+        if active_job_id and self.training_jobs.is_running(active_job_id):
+            return active_job_id
+
+        job_id = await self.training_jobs.submit(
+            model_name,
+            trainer=model_name,
+            params={"seed": 42},
+            warm_start=warm_start,
+            on_success=self._on_model_trained
         )
+        self.active_training_jobs[model_name] = job_id
+        return job_id
 
-        logger.info("Trained fatigue prediction model", extra={
-            "accuracy": accuracy,
-            "samples": len(X_train)
-        })
+    async def _on_model_trained(self, job: Dict[str, Any]):
+        """Swap in a newly registered model version"""
+        model_name = job["model_name"]
+        await self.model_registry.get_latest(model_name, refresh=True)
+        await self._load_registered_model(model_name)
 
-    async def _train_ltv_model(self):
-        """Train LTV forecasting model"""
-        np.random.seed(42)
-        n_samples = 500
-
-        X = []
-        y = []
-
-        for _ in range(n_samples):
-            purchase_count = np.random.poisson(3)
-            total_spend = np.random.exponential(500)
-            avg_order = total_spend / max(purchase_count, 1)
-            days_since_first = np.random.uniform(0, 365)
-            days_since_last = np.random.uniform(0, 90)
-            email_open_rate = np.random.beta(2, 5)
-            click_rate = np.random.beta(1, 10)
-
-            features = [
-                purchase_count, total_spend, avg_order, days_since_first, days_since_last,
-                email_open_rate, click_rate, np.random.poisson(10), np.random.uniform(0, 1),
-                np.random.uniform(0, 1), np.random.choice([0, 1]), total_spend * 1.5,
-                np.random.uniform(0, 1), len(np.random.choice(['A', 'B', 'C'], np.random.randint(1, 4))),
-                np.random.uniform(0, 1), np.random.uniform(0, 1)
-            ]
-
-            # LTV correlates with spend and engagement
-            ltv = total_spend * (1 + email_open_rate + click_rate) * np.random.uniform(1, 3)
-
-            X.append(features[:16])
-            y.append(ltv)
-
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-        self.ltv_model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.ltv_model.fit(X_train, y_train)
-
-        accuracy = self.ltv_model.score(X_test, y_test)
-        self.model_metrics["ltv_forecasting"] = {
-            "accuracy": round(accuracy, 4),
-            "samples": len(X_train),
-            "last_trained": datetime.utcnow().isoformat()
-        }
-
-        # Save model
-        model_data = pickle.dumps(self.ltv_model)
+        # Keep the ml_models summary document; the artifact itself lives in the registry
         await self.db.ml_models.update_one(
-            {"model_type": "ltv_forecasting"},
+            {"model_type": model_name},
             {
                 "$set": {
-                    "model_data": model_data,
-                    "metrics": self.model_metrics["ltv_forecasting"],
+                    "metrics": job.get("metrics", {}),
+                    "registry_version": job.get("registry_version"),
                     "updated_at": datetime.utcnow()
-                }
+                },
+                "$unset": {"model_data": ""}
             },
             upsert=True
         )
 
-        logger.info("Trained LTV forecasting model", extra={
-            "accuracy": accuracy,
-            "samples": len(X_train)
+        logger.info(f"Trained {model_name} model", extra={
+            "model_name": model_name,
+            "model_version": job.get("registry_version"),
+            "warm_started": job.get("warm_started", False),
+            "metrics": job.get("metrics", {})
         })
 
-    async def _train_anomaly_detector(self):
-        """Train anomaly detection model"""
-        np.random.seed(42)
-        n_samples = 1000
-
-        # Generate normal performance data
-        X = []
-        for _ in range(n_samples):
-            features = [
-                np.random.normal(10000, 2000),  # impressions
-                np.random.normal(200, 50),      # clicks
-                np.random.normal(500, 100),     # spend
-                np.random.normal(10, 3),        # conversions
-                np.random.normal(0.02, 0.005),  # ctr
-                np.random.normal(2.5, 0.5),     # cpc
-                np.random.normal(25, 5),        # cpm
-                np.random.normal(2.0, 0.5),     # roas
-                np.random.normal(1.5, 0.3),     # frequency
-                np.random.uniform(0, 30),       # campaign age
-                np.random.uniform(0.1, 1.0),    # budget utilization
-                np.random.randint(1, 10),       # targeting criteria count
-                np.random.uniform(0, 1),        # competition level
-                np.random.uniform(0, 100)       # platform performance index
-            ]
-            X.append(features)
-
-        # Add some anomalies (outliers)
-        for _ in range(50):
-            anomaly_features = [
-                np.random.normal(5000, 5000),   # Very low impressions
-                np.random.normal(10, 20),       # Very low clicks
-                np.random.normal(1000, 500),    # High spend
-                np.random.normal(1, 2),         # Very low conversions
-                np.random.normal(0.002, 0.001), # Very low CTR
-                np.random.normal(10, 5),        # Very high CPC
-                np.random.normal(100, 50),      # Very high CPM
-                np.random.normal(0.5, 0.3),     # Very low ROAS
-                np.random.normal(5, 2),         # Very high frequency
-                np.random.uniform(0, 30),
-                np.random.uniform(0.1, 1.0),
-                np.random.randint(1, 10),
-                np.random.uniform(0, 1),
-                np.random.uniform(0, 100)
-            ]
-            X.append(anomaly_features)
-
-        self.anomaly_detector = IsolationForest(contamination=0.05, random_state=42)
-        self.anomaly_detector.fit(X)
-
-        # Calculate basic metrics (simplified)
-        self.model_metrics["anomaly_detection"] = {
-            "precision": 0.85,  # Estimated
-            "recall": 0.78,     # Estimated
-            "samples": len(X),
-            "last_trained": datetime.utcnow().isoformat()
-        }
-
-        # Save model
-        model_data = pickle.dumps(self.anomaly_detector)
-        await self.db.ml_models.update_one(
-            {"model_type": "anomaly_detection"},
-            {
-                "$set": {
-                    "model_data": model_data,
-                    "metrics": self.model_metrics["anomaly_detection"],
-                    "updated_at": datetime.utcnow()
-                }
-            },
-            upsert=True
-        )
+    async def _load_registered_model(self, model_name: str) -> bool:
+        """Load, or hot-swap to, the latest registered version of a model"""
+        registered = await self.model_registry.load(model_name)
+        if registered is None:
+            return False
+
+        if registered.version != self.model_versions.get(model_name):
+            setattr(self, MODEL_ATTRIBUTES[model_name], registered.model)
+            self.model_versions[model_name] = registered.version
+            if registered.metrics:
+                self.model_metrics[model_name] = registered.metrics
+            logger.info(f"Using {model_name} model version {registered.version}", extra={
+                "model_name": model_name,
+                "model_version": registered.version
+            })
+        return True
 
-        logger.info("Trained anomaly detection model", extra={
-            "samples": len(X),
-            "contamination_rate": 0.05
-        })
+    async def _refresh_model(self, model_name: str):
+        """Pick up a version registered by another replica (cheap between pointer refreshes)"""
+        try:
+            await self._load_registered_model(model_name)
+        except Exception as e:
+            logger.warning(f"Failed to refresh {model_name} model", exc_info=e)
 
     async def _store_prediction(
         self,
@@ -887,6 +915,32 @@ class PredictiveIntelligenceEngine:
 
         await self.db.ml_predictions.insert_one(record)
 
+    async def _store_predictions(
+        self,
+        prediction_type: str,
+        inputs: List[Dict[str, Any]],
+        results: List[Dict[str, Any]]
+    ):
+        """Store bulk predictions with batched insert_many calls"""
+        now = datetime.utcnow()
+        model_version = self._get_model_version(prediction_type)
+        records = [
+            {
+                "prediction_type": prediction_type,
+                "input_data_hash": hashlib.md5(str(input_data).encode()).hexdigest(),
+                "input_data": input_data,
+                "prediction_result": result,
+                "timestamp": now,
+                "model_version": model_version
+            }
+            for input_data, result in zip(inputs, results)
+        ]
+
+        for start in range(0, len(records), PREDICTION_INSERT_BATCH_SIZE):
+            await self.db.ml_predictions.insert_many(
+                records[start:start + PREDICTION_INSERT_BATCH_SIZE], ordered=False
+            )
+
     async def _get_recent_predictions(self, prediction_type: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent predictions for dashboard"""
         cursor = self.db.ml_predictions.find(
@@ -936,28 +990,34 @@ class PredictiveIntelligenceEngine:
                 "prediction_type": prediction_type
             })
 
-            # Implementation would retrain model with feedback data
-            # For now, just update timestamp
+            # Warm-start from the current version in a background job
+            model_name = MODEL_NAMES.get(prediction_type, prediction_type)
+            job_id = await self.train_model(model_name, warm_start=True)
+
             await self.db.ml_models.update_one(
-                {"model_type": prediction_type},
-                {"$set": {"last_retrained": datetime.utcnow()}}
+                {"model_type": model_name},
+                {"$set": {"last_retrained": datetime.utcnow(), "retraining_job_id": job_id}}
             )
 
         except Exception as e:
             logger.error(f"Failed to retrain {prediction_type} model", exc_info=e)
 
+    def _build_fatigue_alert(self, prediction: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the alert document for a high fatigue risk prediction"""
+        return {
+            "alert_type": "creative_fatigue",
+            "severity": "high" if prediction["fatigue_probability_7d"] > 0.8 else "medium",
+            "creative_id": prediction["creative_id"],
+            "fatigue_probability": prediction["fatigue_probability_7d"],
+            "recommended_action": "refresh_creative",
+            "recommended_date": prediction["recommended_refresh_date"],
+            "timestamp": datetime.utcnow()
+        }
+
     async def _trigger_fatigue_alert(self, prediction: Dict[str, Any]):
         """Trigger alert for high fatigue risk"""
         try:
-            alert = {
-                "alert_type": "creative_fatigue",
-                "severity": "high" if prediction["fatigue_probability_7d"] > 0.8 else "medium",
-                "creative_id": prediction["creative_id"],
-                "fatigue_probability": prediction["fatigue_probability_7d"],
-                "recommended_action": "refresh_creative",
-                "recommended_date": prediction["recommended_refresh_date"],
-                "timestamp": datetime.utcnow()
-            }
+            alert = self._build_fatigue_alert(prediction)
 
             await self.db.alerts.insert_one(alert)
 
@@ -971,13 +1031,9 @@ class PredictiveIntelligenceEngine:
             logger.error("Failed to trigger fatigue alert", exc_info=e)
 
     def _get_model_version(self, prediction_type: str) -> str:
-        """Get current model version"""
-        versions = {
-            "fatigue": "1.0.0",
-            "ltv": "1.0.0",
-            "anomaly": "1.0.0"
-        }
-        return versions.get(prediction_type, "1.0.0")
+        """Get the registry version of the model serving a prediction type"""
+        version = self.model_versions.get(MODEL_NAMES.get(prediction_type, prediction_type))
+        return str(version) if version is not None else "1.0.0"
 
 # Global predictive intelligence engine instance
 predictive_intelligence = None
@@ -3,14 +3,29 @@ Prometheus Metrics Export
 Exports application metrics for monitoring
 """
 
+import os
+import threading
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Set, Tuple
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
 from prometheus_client.openmetrics.exposition import CONTENT_TYPE_LATEST
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Label value used once a label's cardinality budget is exhausted
+OVERFLOW_LABEL = "__overflow__"
+
+# Maximum number of distinct endpoint label values exported for HTTP metrics
+MAX_ENDPOINT_LABELS = int(os.getenv("METRICS_MAX_ENDPOINT_LABELS", "500"))
+
+# Seconds a campaign snapshot is exported without being updated
+CAMPAIGN_METRICS_TTL = float(os.getenv("METRICS_CAMPAIGN_TTL", "86400"))
+
+# Campaign statuses that drop the campaign from the export
+FINISHED_CAMPAIGN_STATUSES = frozenset({"completed", "archived", "deleted"})
+
 # HTTP Metrics
 http_requests_total = Counter(
     'http_requests_total',
@@ -56,17 +71,36 @@ external_api_circuit_breaker_state = Gauge(
     ['service']
 )
 
-# Business Metrics
-campaigns_total = Gauge(
-    'campaigns_total',
-    'Total number of campaigns',
-    ['status', 'platform']
+metric_label_overflow_total = Counter(
+    'metric_label_overflow_total',
+    'Label values collapsed into the overflow bucket by the cardinality guard',
+    ['metric']
+)
+
+# Scheduler Metrics
+scheduled_workflow_runs_total = Counter(
+    'scheduled_workflow_runs_total',
+    'Scheduled workflow executions',
+    ['status']
+)
+
+scheduled_workflow_lag_seconds = Histogram(
+    'scheduled_workflow_lag_seconds',
+    'Delay between a workflow\'s scheduled time and its actual start',
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+)
+
+# LLM Cache Metrics
+llm_cache_requests_total = Counter(
+    'llm_cache_requests_total',
+    'LLM completions by where the response came from (memory, redis, coalesced, miss)',
+    ['module', 'result']
 )
 
-campaign_performance_roas = Gauge(
-    'campaign_performance_roas',
-    'Campaign ROAS',
-    ['campaign_id', 'platform']
+llm_cache_tokens_saved_total = Counter(
+    'llm_cache_tokens_saved_total',
+    'Estimated prompt and completion tokens not sent to the LLM provider',
+    ['module']
 )
 
 # System Metrics
@@ -89,12 +123,111 @@ errors_total = Counter(
 )
 
 
+class LabelCardinalityGuard:
+    """Caps the number of distinct values a metric label may take.
+
+    The first ``max_values`` distinct values are passed through unchanged;
+    anything after that is collapsed into ``OVERFLOW_LABEL`` so a misbehaving
+    label can never create an unbounded number of series.
+    """
+
+    def __init__(self, metric_name: str, max_values: int):
+        self.metric_name = metric_name
+        self.max_values = max_values
+        self._seen: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def guard(self, value: str) -> str:
+        """Return ``value`` if it fits within the budget, else the overflow label"""
+        if value in self._seen:
+            return value
+        with self._lock:
+            if value in self._seen:
+                return value
+            if len(self._seen) < self.max_values:
+                self._seen.add(value)
+                return value
+        metric_label_overflow_total.labels(metric=self.metric_name).inc()
+        return OVERFLOW_LABEL
+
+    def reset(self):
+        """Forget all admitted values"""
+        with self._lock:
+            self._seen.clear()
+
+
+class CampaignMetricsExporter:
+    """Aggregated exporter for per-campaign business metrics.
+
+    Keeps the latest status/platform/ROAS snapshot per campaign in memory and
+    exports it rolled up by (status, platform) at scrape time, so the number of
+    series depends on the number of platforms rather than campaigns. Finished
+    campaigns are dropped when they are recorded, and campaigns not updated
+    for ``ttl`` seconds are dropped at scrape time.
+    """
+
+    def __init__(self, ttl: float = CAMPAIGN_METRICS_TTL):
+        self.ttl = ttl
+        self._campaigns: Dict[str, Tuple[str, str, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def update(self, campaign_id: str, platform: str, status: str, roas: float):
+        """Record the latest snapshot for a campaign"""
+        if status in FINISHED_CAMPAIGN_STATUSES:
+            self.remove(campaign_id)
+            return
+        with self._lock:
+            self._campaigns[campaign_id] = (status, platform, float(roas), time.monotonic())
+
+    def remove(self, campaign_id: str):
+        """Drop a campaign from the export (e.g. after deletion)"""
+        with self._lock:
+            self._campaigns.pop(campaign_id, None)
+
+    def collect(self):
+        """Yield aggregated metric families (prometheus_client collector protocol)"""
+        expired_before = time.monotonic() - self.ttl
+        with self._lock:
+            for campaign_id in [cid for cid, entry in self._campaigns.items() if entry[3] < expired_before]:
+                del self._campaigns[campaign_id]
+            snapshot = list(self._campaigns.values())
+
+        counts: Dict[Tuple[str, str], int] = {}
+        roas_sum: Dict[str, float] = {}
+        roas_count: Dict[str, int] = {}
+        for status, platform, roas, _ in snapshot:
+            counts[(status, platform)] = counts.get((status, platform), 0) + 1
+            roas_sum[platform] = roas_sum.get(platform, 0.0) + roas
+            roas_count[platform] = roas_count.get(platform, 0) + 1
+
+        campaigns = GaugeMetricFamily(
+            'campaigns_total', 'Total number of campaigns', labels=['status', 'platform']
+        )
+        for (status, platform), count in counts.items():
+            campaigns.add_metric([status, platform], count)
+        yield campaigns
+
+        avg_roas = GaugeMetricFamily(
+            'campaign_performance_roas', 'Average campaign ROAS per platform', labels=['platform']
+        )
+        for platform, total in roas_sum.items():
+            avg_roas.add_metric([platform], total / roas_count[platform])
+        yield avg_roas
+
+
+endpoint_label_guard = LabelCardinalityGuard('http_requests_total', MAX_ENDPOINT_LABELS)
+
+campaign_metrics_exporter = CampaignMetricsExporter()
+REGISTRY.register(campaign_metrics_exporter)
+
+
 class MetricsCollector:
     """Collects and exports metrics"""
     
     @staticmethod
     def record_http_request(method: str, endpoint: str, status_code: int, duration: float):
         """Record HTTP request metrics"""
+        endpoint = endpoint_label_guard.guard(endpoint)
         http_requests_total.labels(method=method, endpoint=endpoint, status=str(status_code)).inc()
         http_request_duration_seconds.labels(method=method, endpoint=endpoint).observe(duration)
     
@@ -118,9 +251,26 @@ class MetricsCollector:
     
     @staticmethod
     def record_campaign_metrics(campaign_id: str, platform: str, status: str, roas: float):
-        """Record campaign metrics"""
-        campaigns_total.labels(status=status, platform=platform).inc()
-        campaign_performance_roas.labels(campaign_id=campaign_id, platform=platform).set(roas)
+        """Record campaign metrics (exported aggregated per platform)"""
+        campaign_metrics_exporter.update(campaign_id, platform, status, roas)
+    
+    @staticmethod
+    def remove_campaign_metrics(campaign_id: str):
+        """Stop exporting a campaign that was archived or deleted"""
+        campaign_metrics_exporter.remove(campaign_id)
+    
+    @staticmethod
+    def record_scheduled_workflow_run(status: str, lag_seconds: float):
+        """Record a scheduled workflow execution and its start lag"""
+        scheduled_workflow_runs_total.labels(status=status).inc()
+        scheduled_workflow_lag_seconds.observe(max(lag_seconds, 0.0))
+    
+    @staticmethod
+    def record_llm_cache(module: str, result: str, tokens_saved: int = 0):
+        """Record where an LLM completion was served from"""
+        llm_cache_requests_total.labels(module=module, result=result).inc()
+        if tokens_saved:
+            llm_cache_tokens_saved_total.labels(module=module).inc(tokens_saved)
     
     @staticmethod
     def record_error(error_type: str, severity: str):
@@ -4,16 +4,17 @@ Production-grade personalization with dynamic content, audience segmentation, an
 """
 
 import asyncio
-import json
 import logging
-from typing import Dict, List, Any, Optional, Union, Tuple
+import os
+from typing import Dict, Iterable, List, Any, Optional, Union, Tuple
 from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from enum import Enum
 import uuid
 import numpy as np
 import pandas as pd
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 from pydantic import BaseModel, Field
 import aiohttp
 from sklearn.cluster import KMeans, DBSCAN
@@ -22,8 +23,32 @@ from sklearn.metrics.pairwise import cosine_similarity
 import redis
 import hashlib
 
+from services.batch_writer import BatchInsertWriter
+from services.event_ingestion import EventIngestionBuffer
+from services.behavior_store import (
+    BEHAVIOR_HISTORY,
+    BehaviorCounts,
+    counts_from_document,
+    decode_profile,
+    encode_profile,
+    epoch_day,
+)
+from services.segment_engine import (
+    CompiledSegment,
+    UserSegmentsLookup,
+    get_segment_cache,
+    materialize_segment,
+    PROFILE_CRITERIA_PROJECTION,
+    queue_user_membership,
+    read_user_segments,
+    refresh_segment_members,
+)
+
 logger = logging.getLogger(__name__)
 
+# Record each personalized content response; disable to keep serving write-free
+SAVE_PERSONALIZED_CONTENT = os.getenv("SAVE_PERSONALIZED_CONTENT", "true").lower() == "true"
+
 class PersonalizationType(str, Enum):
     """Types of personalization"""
     CONTENT = "content"
@@ -33,7 +58,7 @@ class PersonalizationType(str, Enum):
     TIMING = "timing"
     CHANNEL = "channel"
 
-class AudienceSegment(str, Enum):
+class AudienceSegmentType(str, Enum):
     """Audience segment types"""
     DEMOGRAPHIC = "demographic"
     BEHAVIORAL = "behavioral"
@@ -51,7 +76,7 @@ class ContentType(str, Enum):
     NOTIFICATION = "notification"
     BANNER = "banner"
 
-class BehavioralEvent(str, Enum):
+class BehavioralEventType(str, Enum):
     """Behavioral events for tracking"""
     PAGE_VIEW = "page_view"
     CLICK = "click"
@@ -74,13 +99,14 @@ class UserProfile:
     segments: List[str]
     engagement_score: float
     last_updated: datetime
+    behavior_counts: BehaviorCounts = field(default_factory=BehaviorCounts)
 
 @dataclass
 class AudienceSegment:
     """Audience segment definition"""
     segment_id: str
     name: str
-    segment_type: AudienceSegment
+    segment_type: AudienceSegmentType
     criteria: Dict[str, Any]
     size: int
     description: str
@@ -102,7 +128,7 @@ class BehavioralEvent:
     """Behavioral event data"""
     event_id: str
     user_id: str
-    event_type: BehavioralEvent
+    event_type: BehavioralEventType
     properties: Dict[str, Any]
     timestamp: datetime
     session_id: str
@@ -115,6 +141,9 @@ class UserProfileManager:
         self.db = db
         self.redis = redis_client
         self.profile_cache_ttl = 3600  # 1 hour
+        self.segment_cache = get_segment_cache(db)
+        self.segment_lookup = UserSegmentsLookup(redis_client, self.segment_cache)
+        self.event_buffer = EventIngestionBuffer(db.behavioral_events, self._update_profile_with_events)
     
     async def create_user_profile(self, user_id: str, initial_data: Dict[str, Any]) -> UserProfile:
         """Create a new user profile"""
@@ -182,12 +211,23 @@ class UserProfileManager:
             
             if "behaviors" in updates:
                 profile.behaviors.extend(updates["behaviors"])
+                for behavior in updates["behaviors"]:
+                    profile.behavior_counts.add(
+                        behavior["event_type"], epoch_day(datetime.fromisoformat(behavior["timestamp"]))
+                    )
             
             profile.last_updated = datetime.utcnow()
             
             # Recalculate engagement score
             profile.engagement_score = await self._calculate_engagement_score(profile)
             
+            # Re-evaluate the segments that read the updated fields
+            await self._sync_segments(profile, await self._affected_segments(
+                profile,
+                event_types={b["event_type"] for b in updates.get("behaviors", [])},
+                fields=[f"demographics.{field}" for field in updates.get("demographics", {})] + ["engagement_score"]
+            ))
+            
             # Save updated profile
             await self._save_profile(profile)
             await self._cache_profile(profile)
@@ -200,9 +240,8 @@ class UserProfileManager:
             raise
     
     async def track_behavioral_event(self, user_id: str, event: BehavioralEvent) -> None:
-        """Track a behavioral event for a user"""
+        """Track a behavioral event for a user; it is stored and applied by the next buffer flush"""
         try:
-            # Save event to database
             event_doc = {
                 "event_id": event.event_id,
                 "user_id": user_id,
@@ -213,74 +252,123 @@ class UserProfileManager:
                 "page_url": event.page_url
             }
             
-            await self.db.behavioral_events.insert_one(event_doc)
-            
-            # Update user profile with event
-            await self._update_profile_with_event(user_id, event)
-            
-            # Update real-time segments
-            await self._update_real_time_segments(user_id, event)
+            self.event_buffer.submit(user_id, event_doc, event)
             
-            logger.info(f"Tracked behavioral event {event.event_type.value} for user {user_id}")
+            logger.debug(f"Accepted behavioral event {event.event_type.value} for user {user_id}")
             
         except Exception as e:
             logger.error(f"Error tracking behavioral event: {e}")
             raise
     
-    async def _update_profile_with_event(self, user_id: str, event: BehavioralEvent):
-        """Update user profile based on behavioral event"""
+    async def _update_profile_with_events(self, user_id: str, events: List[BehavioralEvent]):
+        """Update user profile based on a user's buffered behavioral events, in order"""
         try:
             profile = await self.get_user_profile(user_id)
             if not profile:
                 return
             
-            # Add event to behaviors
-            behavior_data = {
-                "event_type": event.event_type.value,
-                "timestamp": event.timestamp.isoformat(),
-                "properties": event.properties
-            }
+            # One partial update of the stored profile, mirrored on the loaded one
+            update = {"$push": {}, "$inc": {}, "$set": {}, "$unset": {}}
+            
+            # Add events to behaviors, keeping the most recent BEHAVIOR_HISTORY
+            behavior_data = [
+                {
+                    "event_type": event.event_type.value,
+                    "timestamp": event.timestamp.isoformat(),
+                    "properties": event.properties,
+                    "event_id": event.event_id
+                }
+                for event in events
+            ]
+            
+            profile.behaviors.extend(behavior_data)
+            if len(profile.behaviors) > BEHAVIOR_HISTORY:
+                profile.behaviors = profile.behaviors[-BEHAVIOR_HISTORY:]
+            update["$push"]["behaviors"] = {"$each": behavior_data, "$slice": -BEHAVIOR_HISTORY}
+            
+            for event in events:
+                # Count the event
+                day = epoch_day(event.timestamp)
+                profile.behavior_counts.add(event.event_type.value, day)
+                counter = f"behavior_counts.{event.event_type.value}.{day}"
+                update["$inc"][counter] = update["$inc"].get(counter, 0) + 1
+                
+                # Update preferences based on event
+                await self._update_preferences_from_event(profile, event, update)
             
-            profile.behaviors.append(behavior_data)
+            # Expire counters past the retention window
+            for event_type, stale_day in profile.behavior_counts.prune(epoch_day(events[-1].timestamp)):
+                update["$unset"][f"behavior_counts.{event_type}.{stale_day}"] = ""
             
-            # Keep only last 100 behaviors
-            if len(profile.behaviors) > 100:
-                profile.behaviors = profile.behaviors[-100:]
+            # Update real-time segments
+            await self._update_real_time_segments(profile, {event.event_type.value for event in events})
             
-            # Update preferences based on event
-            await self._update_preferences_from_event(profile, event)
+            profile.last_updated = datetime.utcnow()
+            update["$set"]["segments"] = profile.segments
+            update["$set"]["last_updated"] = profile.last_updated.isoformat()
             
             # Save updated profile
-            await self._save_profile(profile)
+            operations = {operator: fields for operator, fields in update.items() if fields}
+            result = await self.db.user_profiles.update_one(
+                {"user_id": user_id, "behavior_counts": {"$exists": True}}, operations
+            )
+            if not result.matched_count:
+                await self._save_with_seeded_counts(profile, operations)
             await self._cache_profile(profile)
             
         except Exception as e:
-            logger.error(f"Error updating profile with event: {e}")
+            logger.error(f"Error updating profile with events: {e}")
+            raise
+    
+    async def _save_with_seeded_counts(self, profile: UserProfile, operations: Dict[str, Dict[str, Any]]):
+        """
+        Save an event update to a profile stored before behavior counters
+        
+        Incrementing would start the counters from these events alone, so
+        the counters rebuilt from the profile's behaviors, which already
+        include the events, are stored whole instead.
+        """
+        seeded = {
+            operator: {path: value for path, value in fields.items() if not path.startswith("behavior_counts.")}
+            for operator, fields in operations.items()
+        }
+        seeded.setdefault("$set", {})["behavior_counts"] = profile.behavior_counts.to_document()
+        result = await self.db.user_profiles.update_one(
+            {"user_id": profile.user_id, "behavior_counts": {"$exists": False}},
+            {operator: fields for operator, fields in seeded.items() if fields}
+        )
+        if not result.matched_count:
+            # Counters were stored by another writer in the meantime
+            await self.db.user_profiles.update_one({"user_id": profile.user_id}, operations)
     
-    async def _update_preferences_from_event(self, profile: UserProfile, event: BehavioralEvent):
-        """Update user preferences based on behavioral event"""
+    async def _update_preferences_from_event(self, profile: UserProfile, event: BehavioralEvent, update: Dict[str, Dict[str, Any]]):
+        """Update user preferences based on behavioral event, adding the matching operators to ``update``"""
         try:
-            if event.event_type == BehavioralEvent.CLICK:
+            if event.event_type == BehavioralEventType.CLICK:
                 # Update click preferences
-                clicked_item = event.properties.get("item_type")
+                clicked_item = self._preference_key(event.properties.get("item_type"))
                 if clicked_item:
                     if "click_preferences" not in profile.preferences:
                         profile.preferences["click_preferences"] = {}
                     
                     profile.preferences["click_preferences"][clicked_item] = \
                         profile.preferences["click_preferences"].get(clicked_item, 0) + 1
+                    key = f"preferences.click_preferences.{clicked_item}"
+                    update["$inc"][key] = update["$inc"].get(key, 0) + 1
             
-            elif event.event_type == BehavioralEvent.CONVERSION:
+            elif event.event_type == BehavioralEventType.CONVERSION:
                 # Update conversion preferences
-                product_category = event.properties.get("product_category")
+                product_category = self._preference_key(event.properties.get("product_category"))
                 if product_category:
                     if "conversion_preferences" not in profile.preferences:
                         profile.preferences["conversion_preferences"] = {}
                     
                     profile.preferences["conversion_preferences"][product_category] = \
                         profile.preferences["conversion_preferences"].get(product_category, 0) + 1
+                    key = f"preferences.conversion_preferences.{product_category}"
+                    update["$inc"][key] = update["$inc"].get(key, 0) + 1
             
-            elif event.event_type == BehavioralEvent.SEARCH:
+            elif event.event_type == BehavioralEventType.SEARCH:
                 # Update search preferences
                 search_query = event.properties.get("query")
                 if search_query:
@@ -293,10 +381,18 @@ class UserProfileManager:
                     if len(profile.preferences["search_preferences"]) > 20:
                         profile.preferences["search_preferences"] = \
                             profile.preferences["search_preferences"][-20:]
+                    searches = update["$push"].setdefault("preferences.search_preferences", {"$each": [], "$slice": -20})
+                    searches["$each"].append(search_query)
             
         except Exception as e:
             logger.error(f"Error updating preferences from event: {e}")
     
+    def _preference_key(self, value: Any) -> Optional[str]:
+        """Preference value usable as a field name in an update path"""
+        if not value:
+            return None
+        return str(value).replace(".", "_").lstrip("$") or None
+    
     async def _calculate_engagement_score(self, profile: UserProfile) -> float:
         """Calculate user engagement score"""
         try:
@@ -309,16 +405,14 @@ class UserProfileManager:
                     score += 0.2  # Prime demographic
             
             # Behavioral score
-            recent_behaviors = [
-                b for b in profile.behaviors 
-                if datetime.fromisoformat(b["timestamp"]) > datetime.utcnow() - timedelta(days=30)
-            ]
+            today = epoch_day(datetime.utcnow())
+            recent_behaviors = profile.behavior_counts.total(30, today)
             
-            score += min(0.5, len(recent_behaviors) * 0.05)  # Activity score
+            score += min(0.5, recent_behaviors * 0.05)  # Activity score
             
             # Conversion score
-            conversions = [b for b in recent_behaviors if b["event_type"] == "conversion"]
-            score += min(0.3, len(conversions) * 0.1)
+            conversions = profile.behavior_counts.count("conversion", 30, today)
+            score += min(0.3, conversions * 0.1)
             
             return min(1.0, score)
             
@@ -326,80 +420,60 @@ class UserProfileManager:
             logger.error(f"Error calculating engagement score: {e}")
             return 0.0
     
-    async def _update_real_time_segments(self, user_id: str, event: BehavioralEvent):
-        """Update real-time audience segments"""
+    async def _update_real_time_segments(self, profile: UserProfile, event_types: Iterable[str]):
+        """Update real-time audience segments affected by events of the given types"""
         try:
-            # Get active segments
-            segments = await self.db.audience_segments.find({"active": True}).to_list(length=None)
-            
-            for segment_doc in segments:
-                segment = self._doc_to_segment(segment_doc)
-                
-                # Check if user matches segment criteria
-                if await self._user_matches_segment(user_id, segment):
-                    # Add user to segment
-                    await self.redis.sadd(f"segment:{segment.segment_id}", user_id)
-                else:
-                    # Remove user from segment
-                    await self.redis.srem(f"segment:{segment.segment_id}", user_id)
+            affected = await self._affected_segments(profile, event_types=event_types)
+            await self._sync_segments(profile, affected)
             
         except Exception as e:
             logger.error(f"Error updating real-time segments: {e}")
     
-    async def _user_matches_segment(self, user_id: str, segment: AudienceSegment) -> bool:
-        """Check if user matches segment criteria"""
-        try:
-            profile = await self.get_user_profile(user_id)
-            if not profile:
-                return False
-            
-            criteria = segment.criteria
-            
-            # Demographic criteria
-            if "demographics" in criteria:
-                demo_criteria = criteria["demographics"]
-                for field, value in demo_criteria.items():
-                    if profile.demographics.get(field) != value:
-                        return False
-            
-            # Behavioral criteria
-            if "behaviors" in criteria:
-                behavior_criteria = criteria["behaviors"]
-                for behavior in behavior_criteria:
-                    if not self._check_behavior_criteria(profile, behavior):
-                        return False
-            
-            # Engagement criteria
-            if "min_engagement_score" in criteria:
-                if profile.engagement_score < criteria["min_engagement_score"]:
-                    return False
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error checking user segment match: {e}")
-            return False
+    async def _affected_segments(
+        self,
+        profile: UserProfile,
+        event_types: Iterable[str] = (),
+        fields: Iterable[str] = ()
+    ) -> List[CompiledSegment]:
+        """
+        Segments to re-evaluate for a profile
+        
+        The profile's memberships are first refreshed from the user's
+        reverse set, which bulk materialization writes too, so members it
+        added are re-evaluated and dropped like any others.
+        """
+        profile.segments = await read_user_segments(self.redis, profile.user_id)
+        index = await self.segment_cache.get_index()
+        return index.affected(event_types=event_types, fields=fields, member_of=profile.segments)
     
-    def _check_behavior_criteria(self, profile: UserProfile, criteria: Dict[str, Any]) -> bool:
-        """Check if user meets behavioral criteria"""
-        try:
-            event_type = criteria.get("event_type")
-            min_count = criteria.get("min_count", 1)
-            time_window = criteria.get("time_window_days", 30)
-            
-            cutoff_date = datetime.utcnow() - timedelta(days=time_window)
-            
-            matching_behaviors = [
-                b for b in profile.behaviors
-                if b["event_type"] == event_type and
-                datetime.fromisoformat(b["timestamp"]) > cutoff_date
-            ]
-            
-            return len(matching_behaviors) >= min_count
-            
-        except Exception as e:
-            logger.error(f"Error checking behavior criteria: {e}")
-            return False
+    async def _sync_segments(self, profile: UserProfile, segments: List[CompiledSegment]):
+        """
+        Re-evaluate segments against the loaded profile and write membership
+        changes in one pipeline; ``profile.segments`` must hold the memberships
+        read by ``_affected_segments``
+        """
+        if not segments:
+            return
+        
+        today = epoch_day(datetime.utcnow())
+        current = set(profile.segments)
+        matched = {
+            segment.segment_id for segment in segments
+            if segment.matches(profile.demographics, profile.engagement_score, profile.behavior_counts, today)
+        }
+        evaluated = {segment.segment_id for segment in segments}
+        added = matched - current
+        removed = (current & evaluated) - matched
+        if not added and not removed:
+            return
+        
+        # Forward and reverse sets change together
+        async with self.redis.pipeline() as pipe:
+            queue_user_membership(pipe, profile.user_id, sorted(added), sorted(removed))
+            await pipe.execute()
+        
+        self.segment_lookup.invalidate(profile.user_id)
+        profile.segments = sorted((current - removed) | added)
     
     async def _save_profile(self, profile: UserProfile):
         """Save user profile to database"""
@@ -411,6 +485,7 @@ class UserProfileManager:
                 "preferences": profile.preferences,
                 "segments": profile.segments,
                 "engagement_score": profile.engagement_score,
+                "behavior_counts": profile.behavior_counts.to_document(),
                 "last_updated": profile.last_updated.isoformat(),
                 "created_at": datetime.utcnow().isoformat()
             }
@@ -428,7 +503,18 @@ class UserProfileManager:
     async def _cache_profile(self, profile: UserProfile):
         """Cache user profile in Redis"""
         try:
-            profile_data = json.dumps(profile.__dict__, default=str)
+            profile_data = encode_profile(
+                {
+                    "user_id": profile.user_id,
+                    "demographics": profile.demographics,
+                    "preferences": profile.preferences,
+                    "segments": profile.segments,
+                    "engagement_score": profile.engagement_score,
+                    "last_updated": profile.last_updated.isoformat()
+                },
+                profile.behaviors,
+                profile.behavior_counts
+            )
             await self.redis.setex(
                 f"profile:{profile.user_id}",
                 self.profile_cache_ttl,
@@ -442,9 +528,14 @@ class UserProfileManager:
         """Get cached user profile from Redis"""
         try:
             cached_data = await self.redis.get(f"profile:{user_id}")
-            if cached_data:
-                profile_dict = json.loads(cached_data)
-                return UserProfile(**profile_dict)
+            decoded = decode_profile(cached_data) if cached_data else None
+            if decoded:
+                fields, behaviors, behavior_counts = decoded
+                return UserProfile(
+                    behaviors=behaviors,
+                    behavior_counts=behavior_counts,
+                    **{**fields, "last_updated": datetime.fromisoformat(fields["last_updated"])}
+                )
             
             return None
             
@@ -461,20 +552,39 @@ class UserProfileManager:
             preferences=doc["preferences"],
             segments=doc["segments"],
             engagement_score=doc["engagement_score"],
-            last_updated=datetime.fromisoformat(doc["last_updated"])
+            last_updated=datetime.fromisoformat(doc["last_updated"]),
+            behavior_counts=counts_from_document(doc)
         )
     
-    def _doc_to_segment(self, doc: Dict[str, Any]) -> AudienceSegment:
-        """Convert database document to AudienceSegment"""
-        return AudienceSegment(
-            segment_id=doc["segment_id"],
-            name=doc["name"],
-            segment_type=AudienceSegment(doc["segment_type"]),
-            criteria=doc["criteria"],
-            size=doc["size"],
-            description=doc["description"],
-            created_at=datetime.fromisoformat(doc["created_at"])
-        )
+    async def backfill_behavior_counts(self, batch_size: int = 1000) -> int:
+        """Store behavior counters on profiles saved before they existed"""
+        try:
+            cursor = self.db.user_profiles.find(
+                {"behavior_counts": {"$exists": False}}, PROFILE_CRITERIA_PROJECTION
+            ).batch_size(batch_size)
+            
+            updates = []
+            updated = 0
+            async for doc in cursor:
+                updates.append(UpdateOne(
+                    {"user_id": doc["user_id"], "behavior_counts": {"$exists": False}},
+                    {"$set": {"behavior_counts": counts_from_document(doc).to_document()}}
+                ))
+                if len(updates) >= batch_size:
+                    await self.db.user_profiles.bulk_write(updates, ordered=False)
+                    updated += len(updates)
+                    updates = []
+            
+            if updates:
+                await self.db.user_profiles.bulk_write(updates, ordered=False)
+                updated += len(updates)
+            
+            logger.info(f"Backfilled behavior counters on {updated} profiles")
+            return updated
+            
+        except Exception as e:
+            logger.error(f"Error backfilling behavior counters: {e}")
+            raise
 
 class AudienceSegmentationEngine:
     """Engine for audience segmentation and analysis"""
@@ -492,21 +602,23 @@ class AudienceSegmentationEngine:
             segment = AudienceSegment(
                 segment_id=segment_id,
                 name=segment_data["name"],
-                segment_type=AudienceSegment(segment_data["segment_type"]),
+                segment_type=AudienceSegmentType(segment_data["segment_type"]),
                 criteria=segment_data["criteria"],
                 size=0,  # Will be calculated
                 description=segment_data.get("description", ""),
                 created_at=datetime.utcnow()
             )
             
-            # Calculate segment size
-            segment.size = await self._calculate_segment_size(segment)
+            # Populate segment with users and calculate its size in one pass
+            segment.size = await materialize_segment(
+                self.db, self.redis, CompiledSegment.compile(segment_id, segment.criteria), segment.created_at
+            )
             
             # Save segment
             await self._save_segment(segment)
             
-            # Populate segment with users
-            await self._populate_segment(segment)
+            # Make the segment visible to real-time evaluation
+            get_segment_cache(self.db).invalidate()
             
             logger.info(f"Created audience segment {segment_id}: {segment.name}")
             return segment_id
@@ -515,95 +627,40 @@ class AudienceSegmentationEngine:
             logger.error(f"Error creating audience segment: {e}")
             raise
     
-    async def _calculate_segment_size(self, segment: AudienceSegment) -> int:
-        """Calculate the size of an audience segment"""
-        try:
-            # Get all users
-            users = await self.db.user_profiles.find({}).to_list(length=None)
-            
-            matching_users = 0
-            for user_doc in users:
-                user_id = user_doc["user_id"]
-                if await self._user_matches_segment_criteria(user_id, segment.criteria):
-                    matching_users += 1
-            
-            return matching_users
-            
-        except Exception as e:
-            logger.error(f"Error calculating segment size: {e}")
-            return 0
-    
-    async def _user_matches_segment_criteria(self, user_id: str, criteria: Dict[str, Any]) -> bool:
-        """Check if user matches segment criteria"""
-        try:
-            profile_doc = await self.db.user_profiles.find_one({"user_id": user_id})
-            if not profile_doc:
-                return False
-            
-            # Check demographic criteria
-            if "demographics" in criteria:
-                demo_criteria = criteria["demographics"]
-                for field, value in demo_criteria.items():
-                    if profile_doc["demographics"].get(field) != value:
-                        return False
-            
-            # Check behavioral criteria
-            if "behaviors" in criteria:
-                behavior_criteria = criteria["behaviors"]
-                for behavior in behavior_criteria:
-                    if not self._check_behavior_criteria(profile_doc, behavior):
-                        return False
-            
-            # Check engagement criteria
-            if "min_engagement_score" in criteria:
-                if profile_doc["engagement_score"] < criteria["min_engagement_score"]:
-                    return False
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error checking user segment criteria: {e}")
-            return False
-    
-    def _check_behavior_criteria(self, profile_doc: Dict[str, Any], criteria: Dict[str, Any]) -> bool:
-        """Check if user meets behavioral criteria"""
-        try:
-            event_type = criteria.get("event_type")
-            min_count = criteria.get("min_count", 1)
-            time_window = criteria.get("time_window_days", 30)
-            
-            cutoff_date = datetime.utcnow() - timedelta(days=time_window)
-            
-            matching_behaviors = [
-                b for b in profile_doc["behaviors"]
-                if b["event_type"] == event_type and
-                datetime.fromisoformat(b["timestamp"]) > cutoff_date
-            ]
-            
-            return len(matching_behaviors) >= min_count
-            
-        except Exception as e:
-            logger.error(f"Error checking behavior criteria: {e}")
-            return False
-    
-    async def _populate_segment(self, segment: AudienceSegment):
-        """Populate segment with matching users"""
+    async def refresh_segment(self, segment_id: str, full: bool = False) -> Dict[str, Any]:
+        """
+        Refresh segment membership
+        
+        Incremental refreshes only re-evaluate profiles updated since the
+        last refresh; a full refresh rebuilds the segment from scratch.
+        """
         try:
-            # Get all users
-            users = await self.db.user_profiles.find({}).to_list(length=None)
-            
-            matching_users = []
-            for user_doc in users:
-                user_id = user_doc["user_id"]
-                if await self._user_matches_segment_criteria(user_id, segment.criteria):
-                    matching_users.append(user_id)
+            segment_doc = await self.db.audience_segments.find_one({"segment_id": segment_id})
+            if not segment_doc:
+                raise ValueError(f"Audience segment {segment_id} not found")
+            
+            segment = CompiledSegment.compile(segment_id, segment_doc["criteria"])
+            refreshed_at = datetime.utcnow()
+            since = segment_doc.get("refreshed_at")
+            
+            if full or not since:
+                size = await materialize_segment(self.db, self.redis, segment, refreshed_at)
+                result = {"mode": "full"}
+            else:
+                joined, left = await refresh_segment_members(self.db, self.redis, segment, since, refreshed_at)
+                size = await self.redis.scard(f"segment:{segment_id}")
+                result = {"mode": "incremental", "profiles_matched": joined, "profiles_unmatched": left}
+            
+            await self.db.audience_segments.update_one(
+                {"segment_id": segment_id},
+                {"$set": {"size": size, "refreshed_at": refreshed_at.isoformat()}}
+            )
             
-            # Store in Redis for fast access
-            if matching_users:
-                await self.redis.sadd(f"segment:{segment.segment_id}", *matching_users)
+            return {"segment_id": segment_id, "size": size, "refreshed_at": refreshed_at.isoformat(), **result}
             
         except Exception as e:
-            logger.error(f"Error populating segment: {e}")
+            logger.error(f"Error refreshing segment: {e}")
+            raise
     
     async def get_segment_users(self, segment_id: str) -> List[str]:
         """Get users in a segment"""
@@ -667,6 +724,7 @@ class AudienceSegmentationEngine:
                 "size": segment.size,
                 "description": segment.description,
                 "created_at": segment.created_at.isoformat(),
+                "refreshed_at": segment.created_at.isoformat(),
                 "active": True
             }
             
@@ -683,6 +741,7 @@ class ContentPersonalizationEngine:
         self.db = db
         self.redis = redis_client
         self.profile_manager = profile_manager
+        self.content_writer = BatchInsertWriter(db.personalized_content)
         self.content_templates = {}
         self.personalization_rules = {}
     
@@ -722,8 +781,9 @@ class ContentPersonalizationEngine:
                 created_at=datetime.utcnow()
             )
             
-            # Save personalized content
-            await self._save_personalized_content(personalized)
+            # Record personalized content
+            if SAVE_PERSONALIZED_CONTENT:
+                await self._save_personalized_content(personalized)
             
             return personalized
             
@@ -734,19 +794,7 @@ class ContentPersonalizationEngine:
     async def _get_user_segments(self, user_id: str) -> List[str]:
         """Get user's audience segments"""
         try:
-            # Get all active segments
-            segments = await self.db.audience_segments.find({"active": True}).to_list(length=None)
-            
-            user_segments = []
-            for segment_doc in segments:
-                segment_id = segment_doc["segment_id"]
-                
-                # Check if user is in segment
-                is_member = await self.redis.sismember(f"segment:{segment_id}", user_id)
-                if is_member:
-                    user_segments.append(segment_id)
-            
-            return user_segments
+            return await self.profile_manager.segment_lookup.get(user_id)
             
         except Exception as e:
             logger.error(f"Error getting user segments: {e}")
@@ -942,13 +990,10 @@ class ContentPersonalizationEngine:
             
             # Behavioral rules
             if profile.behaviors:
-                recent_behaviors = [
-                    b for b in profile.behaviors
-                    if datetime.fromisoformat(b["timestamp"]) > datetime.utcnow() - timedelta(days=30)
-                ]
+                recent_behaviors = profile.behavior_counts.total(30, epoch_day(datetime.utcnow()))
                 rules.append({
                     "type": "behavioral",
-                    "criteria": {"recent_behaviors": len(recent_behaviors)},
+                    "criteria": {"recent_behaviors": recent_behaviors},
                     "applied": True
                 })
             
@@ -1007,7 +1052,8 @@ class ContentPersonalizationEngine:
                 "created_at": personalized.created_at.isoformat()
             }
             
-            await self.db.personalized_content.insert_one(content_doc)
+            # Buffered; written in batches off the serving path
+            await self.content_writer.add(content_doc)
             
         except Exception as e:
             logger.error(f"Error saving personalized content: {e}")
@@ -1023,7 +1069,7 @@ class RealTimePersonalizationService:
         self.segmentation_engine = AudienceSegmentationEngine(db, redis_client)
         self.content_engine = ContentPersonalizationEngine(db, redis_client, self.profile_manager)
     
-    async def track_user_event(self, user_id: str, event_type: BehavioralEvent, properties: Dict[str, Any], session_id: str, page_url: Optional[str] = None) -> None:
+    async def track_user_event(self, user_id: str, event_type: BehavioralEventType, properties: Dict[str, Any], session_id: str, page_url: Optional[str] = None) -> None:
         """Track a user behavioral event"""
         try:
             event = BehavioralEvent(
@@ -1050,10 +1096,19 @@ class RealTimePersonalizationService:
         """Create a new audience segment"""
         return await self.segmentation_engine.create_audience_segment(segment_data)
     
+    async def refresh_audience_segment(self, segment_id: str, full: bool = False) -> Dict[str, Any]:
+        """Refresh audience segment membership"""
+        return await self.segmentation_engine.refresh_segment(segment_id, full)
+    
     async def get_user_profile(self, user_id: str) -> Optional[UserProfile]:
         """Get user profile"""
         return await self.profile_manager.get_user_profile(user_id)
     
+    async def close(self):
+        """Apply buffered events and write buffered records"""
+        await self.profile_manager.event_buffer.close()
+        await self.content_engine.content_writer.close()
+    
     async def get_personalization_dashboard(self, client_id: str) -> Dict[str, Any]:
         """Get comprehensive personalization dashboard"""
         try:
@@ -1112,3 +1167,10 @@ def get_real_time_personalization_service(db: AsyncIOMotorClient, redis_client:
     if real_time_personalization_service is None:
         real_time_personalization_service = RealTimePersonalizationService(db, redis_client)
     return real_time_personalization_service
+
+async def close_real_time_personalization_service():
+    """Close the service instance, if one was created, applying its buffered events"""
+    global real_time_personalization_service
+    if real_time_personalization_service is not None:
+        await real_time_personalization_service.close()
+        real_time_personalization_service = None
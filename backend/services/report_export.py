@@ -0,0 +1,206 @@
+"""
+Report Export
+Streams report rows to CSV and write-only XLSX with bounded memory,
+renders PDFs in a process pool and keeps report artifacts in a blob store
+"""
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from services.asset_pipeline import BlobStore, LocalBlobStore
+
+logger = logging.getLogger(__name__)
+
+REPORT_STORAGE_ROOT = os.environ.get('REPORT_STORAGE_ROOT', './storage/reports')
+
+# Rows formatted per step; at most this many are held in memory
+REPORT_EXPORT_CHUNK_ROWS = int(os.getenv("REPORT_EXPORT_CHUNK_ROWS", "1000"))
+
+# Bytes read from a stored artifact per response chunk
+ARTIFACT_READ_SIZE = 1024 * 1024
+
+_render_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_render_executor() -> ProcessPoolExecutor:
+    """Get the process pool used for rendering PDFs"""
+    global _render_executor
+    if _render_executor is None:
+        _render_executor = ProcessPoolExecutor(
+            max_workers=int(os.getenv("REPORT_RENDER_WORKERS", "2")),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _render_executor
+
+
+def get_report_blob_store() -> BlobStore:
+    return LocalBlobStore(REPORT_STORAGE_ROOT, url_prefix="/reports")
+
+
+def artifact_key(report_id: str, name: str) -> str:
+    return f"{report_id}/{name}"
+
+
+def _json_default(value: Any) -> Any:
+    # numpy scalars from DataFrame aggregates
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _cell(value: Any) -> Any:
+    """Spreadsheet-safe value; nested documents are written as JSON"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if value is None or isinstance(value, (str, int, float, bool, datetime)):
+        return value
+    return str(value)
+
+
+async def _chunks(rows: AsyncIterator[Dict[str, Any]], size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def iter_csv(
+    rows: AsyncIterator[Dict[str, Any]],
+    columns: Optional[List[str]] = None,
+    chunk_rows: int = REPORT_EXPORT_CHUNK_ROWS
+) -> AsyncIterator[bytes]:
+    """
+    Encode rows as CSV, one chunk of rows at a time
+
+    Columns default to the keys of the first row; fields missing from a
+    row are left empty and fields not in the header are skipped.
+    """
+    buffer = io.StringIO()
+    writer = None
+
+    async for chunk in _chunks(rows, chunk_rows):
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=columns or list(chunk[0]), extrasaction="ignore")
+            writer.writeheader()
+        writer.writerows({key: _cell(value) for key, value in row.items()} for row in chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if writer is None and columns:
+        csv.writer(buffer).writerow(columns)
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def write_xlsx(
+    path: str,
+    sheets: Dict[str, List[Dict[str, Any]]],
+    rows: Optional[AsyncIterator[Dict[str, Any]]] = None,
+    rows_sheet: str = "Data",
+    chunk_rows: int = REPORT_EXPORT_CHUNK_ROWS
+):
+    """
+    Write a workbook in openpyxl's write-only mode
+
+    ``sheets`` are small tables (summaries, KPIs). ``rows`` is streamed
+    into ``rows_sheet`` a chunk at a time; write-only worksheets flush
+    rows to disk as they are appended, so memory stays bounded.
+    """
+    from openpyxl import Workbook
+
+    loop = asyncio.get_running_loop()
+    workbook = Workbook(write_only=True)
+
+    def append(worksheet, header: List[str], chunk: List[Dict[str, Any]]):
+        for row in chunk:
+            worksheet.append([_cell(row.get(column)) for column in header])
+
+    for title, table in sheets.items():
+        worksheet = workbook.create_sheet(title[:31])
+        if table:
+            header = list(table[0])
+            worksheet.append(header)
+            append(worksheet, header, table)
+
+    if rows is not None:
+        worksheet = workbook.create_sheet(rows_sheet[:31])
+        header = None
+        async for chunk in _chunks(rows, chunk_rows):
+            if header is None:
+                header = list(chunk[0])
+                worksheet.append(header)
+            await loop.run_in_executor(None, append, worksheet, header, chunk)
+
+    await loop.run_in_executor(None, workbook.save, path)
+
+
+def render_pdf(html: str, output_path: str):
+    """Render HTML to a PDF file; runs in the render process pool"""
+    from weasyprint import HTML
+
+    HTML(string=html).write_pdf(output_path)
+
+
+async def store_artifact(store: BlobStore, key: str, build: Callable[[str], Awaitable[Any]], suffix: str = "") -> int:
+    """
+    Build an artifact in a spool file with ``build(path)`` and store it
+    under ``key``; returns its size in bytes
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        await build(path)
+        size = os.path.getsize(path)
+        await asyncio.get_running_loop().run_in_executor(None, store.put_file, key, path)
+        return size
+    except BaseException:
+        if os.path.exists(path):
+            os.unlink(path)
+        raise
+
+
+async def store_json(store: BlobStore, key: str, data: Any) -> int:
+    """Write ``data`` as a JSON artifact; returns its size in bytes"""
+    def dump(path: str):
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(data, handle, default=_json_default)
+
+    async def build(path: str):
+        await asyncio.get_running_loop().run_in_executor(None, dump, path)
+
+    return await store_artifact(store, key, build, ".json")
+
+
+async def load_json(store: BlobStore, key: str) -> Any:
+    def load():
+        with store.open(key) as handle:
+            return json.load(handle)
+
+    return await asyncio.get_running_loop().run_in_executor(None, load)
+
+
+async def iter_artifact(store: BlobStore, key: str, chunk_size: int = ARTIFACT_READ_SIZE) -> AsyncIterator[bytes]:
+    """Stream a stored artifact without loading it whole"""
+    loop = asyncio.get_running_loop()
+    handle = await loop.run_in_executor(None, store.open, key)
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, handle.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        handle.close()
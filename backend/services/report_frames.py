@@ -0,0 +1,156 @@
+"""
+Report Frames
+Column-pruned report queries, with campaign metrics joined in MongoDB, and
+loading of cursor results straight into typed NumPy-backed DataFrames
+"""
+
+import math
+from array import array
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+FLOAT = "float64"
+CATEGORY = "category"
+OBJECT = "object"
+
+METRIC_FIELDS = ("date", "spend", "revenue", "impressions", "clicks", "conversions")
+
+# Columns each report reads; nothing else is fetched
+CAMPAIGN_COLUMNS = {
+    "campaign_id": OBJECT,
+    "platform": CATEGORY,
+    "status": CATEGORY,
+    "campaign_type": CATEGORY,
+    "date": OBJECT,
+    "spend": FLOAT,
+    "revenue": FLOAT,
+    "impressions": FLOAT,
+    "clicks": FLOAT,
+    "conversions": FLOAT
+}
+
+FINANCIAL_COLUMNS = {
+    "date": OBJECT,
+    "category": CATEGORY,
+    "revenue": FLOAT,
+    "costs": FLOAT
+}
+
+AUDIENCE_COLUMNS = {
+    "reach": FLOAT,
+    "engagements": FLOAT,
+    "new_followers": FLOAT,
+    "total_followers": FLOAT
+}
+
+
+def projection(columns: Dict[str, str]) -> Dict[str, int]:
+    return {"_id": 0, **{name: 1 for name in columns}}
+
+
+def campaign_metrics_pipeline(query: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Campaigns matching ``query`` joined to their metrics, one row per
+    metrics document
+
+    Campaigns without metrics are kept with empty metric fields, as the
+    left merge this replaces did. The ``$unwind`` directly after the
+    ``$lookup`` lets the server stream the join instead of building a
+    metrics array per campaign.
+    """
+    campaign_fields = [name for name in CAMPAIGN_COLUMNS if name not in METRIC_FIELDS]
+    return [
+        {"$match": query},
+        {"$project": {"_id": 0, **{name: 1 for name in campaign_fields}}},
+        {"$lookup": {
+            "from": "campaign_metrics",
+            "localField": "campaign_id",
+            "foreignField": "campaign_id",
+            "as": "metrics"
+        }},
+        {"$unwind": {"path": "$metrics", "preserveNullAndEmptyArrays": True}},
+        {"$project": {
+            **{name: 1 for name in campaign_fields},
+            **{name: f"$metrics.{name}" for name in METRIC_FIELDS}
+        }}
+    ]
+
+
+class FrameBuilder:
+    """
+    Accumulates documents column by column
+
+    Numeric columns are packed into C double arrays and categorical ones
+    into integer codes as documents arrive, so no document outlives its
+    row and the frame is built without a list of dicts.
+    """
+
+    def __init__(self, columns: Dict[str, str]):
+        self.columns = columns
+        self.rows = 0
+        self._values: Dict[str, Any] = {}
+        self._categories: Dict[str, Dict[Any, int]] = {}
+        # (field, append, convert) per column, resolved once rather than per row
+        self._appenders: List[Tuple[str, Callable[[Any], None], Optional[Callable[[Any], Any]]]] = []
+        for name, dtype in columns.items():
+            if dtype == FLOAT:
+                values, convert = array("d"), _float
+            elif dtype == CATEGORY:
+                values, convert = array("i"), partial(self._code, self._categories.setdefault(name, {}))
+            else:
+                values, convert = [], None
+            self._values[name] = values
+            self._appenders.append((name, values.append, convert))
+
+    def append(self, document: Dict[str, Any]):
+        get = document.get
+        for name, append, convert in self._appenders:
+            append(convert(get(name)) if convert else get(name))
+        self.rows += 1
+
+    @staticmethod
+    def _code(categories: Dict[Any, int], value: Any) -> int:
+        if value is None:
+            return -1
+        if not isinstance(value, (str, int, float, bool)):
+            value = str(value)
+        code = categories.get(value)
+        if code is None:
+            code = categories[value] = len(categories)
+        return code
+
+    def build(self) -> pd.DataFrame:
+        data = {}
+        for name, dtype in self.columns.items():
+            values = self._values[name]
+            if dtype == FLOAT:
+                data[name] = np.frombuffer(values, dtype=np.float64).copy()
+            elif dtype == CATEGORY:
+                data[name] = pd.Categorical.from_codes(
+                    np.frombuffer(values, dtype=np.int32), categories=list(self._categories[name])
+                )
+            else:
+                data[name] = pd.Series(values, dtype=object)
+        return pd.DataFrame(data)
+
+
+def _float(value: Any) -> float:
+    if value is None:
+        return math.nan
+    if type(value) is float:
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+async def load_frame(cursor: AsyncIterator[Dict[str, Any]], columns: Dict[str, str]) -> pd.DataFrame:
+    """Load a cursor into a DataFrame of ``columns``, one batch at a time"""
+    builder = FrameBuilder(columns)
+    async for document in cursor:
+        builder.append(document)
+    return builder.build()
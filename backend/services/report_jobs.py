@@ -0,0 +1,298 @@
+"""
+Report Jobs
+Durable report generation queue on a MongoDB collection, with global and
+per-tenant concurrency caps, priorities, lease-based crash recovery and
+deduplication of identical requests
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Reports generated at once by one process
+REPORT_JOBS_CONCURRENCY = int(os.getenv("REPORT_JOBS_CONCURRENCY", "4"))
+
+# Reports generated at once by one process for a single tenant
+REPORT_JOBS_TENANT_CONCURRENCY = int(os.getenv("REPORT_JOBS_TENANT_CONCURRENCY", "2"))
+
+# Seconds a worker owns a job without renewing; expired jobs are picked up again
+REPORT_JOB_LEASE_SECONDS = float(os.getenv("REPORT_JOB_LEASE_SECONDS", "300"))
+
+REPORT_JOB_MAX_ATTEMPTS = int(os.getenv("REPORT_JOB_MAX_ATTEMPTS", "3"))
+
+# Seconds in which an identical request shares the earlier job and its result
+REPORT_JOB_DEDUPE_SECONDS = float(os.getenv("REPORT_JOB_DEDUPE_SECONDS", "300"))
+
+# Seconds between checks for jobs queued by other processes or recovered
+REPORT_JOB_POLL_SECONDS = float(os.getenv("REPORT_JOB_POLL_SECONDS", "5"))
+
+# Base delay before a failed job is retried, doubled per attempt
+REPORT_JOB_RETRY_SECONDS = 30
+
+
+class JobPriority:
+    """Lower runs first"""
+    INTERACTIVE = 0
+    SCHEDULED = 10
+
+
+class JobStatus:
+    """Job states, shared with the report status values"""
+    QUEUED = "queued"
+    RUNNING = "generating"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+def request_hash(*parts: Any) -> str:
+    """Stable hash of a request, independent of key order"""
+    canonical = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ReportJobQueue:
+    """
+    Report jobs stored in ``collection`` and run by ``run(job)``
+
+    ``run`` returns the fields to set on the job when it completes. Jobs
+    are claimed highest priority first, then oldest first, while this
+    process has fewer than ``concurrency`` running and the job's tenant
+    fewer than ``tenant_concurrency``. A running job holds a lease that is
+    renewed while it runs; jobs whose lease expired, because their worker
+    crashed or restarted, are queued again. Failures are retried with
+    backoff up to ``max_attempts``.
+    """
+
+    def __init__(
+        self,
+        collection,
+        run: Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]],
+        id_field: str = "report_id",
+        concurrency: int = REPORT_JOBS_CONCURRENCY,
+        tenant_concurrency: int = REPORT_JOBS_TENANT_CONCURRENCY,
+        lease_seconds: float = REPORT_JOB_LEASE_SECONDS,
+        max_attempts: int = REPORT_JOB_MAX_ATTEMPTS,
+        dedupe_seconds: float = REPORT_JOB_DEDUPE_SECONDS,
+        poll_interval: float = REPORT_JOB_POLL_SECONDS
+    ):
+        self.collection = collection
+        self.run = run
+        self.id_field = id_field
+        self.concurrency = concurrency
+        self.tenant_concurrency = tenant_concurrency
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.dedupe_seconds = dedupe_seconds
+        self.poll_interval = poll_interval
+        self.instance_id = str(uuid.uuid4())
+        self._running: Dict[str, asyncio.Task] = {}
+        self._tenant_running: Dict[str, int] = {}
+        self._wake = asyncio.Event()
+        self._dispatch_task: Optional[asyncio.Task] = None
+        self._indexes_ready = False
+
+    async def submit(
+        self,
+        job: Dict[str, Any],
+        tenant_id: str,
+        priority: int = JobPriority.INTERACTIVE,
+        dedupe_key: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Queue a job; returns it and whether an identical earlier job was
+        returned instead
+        """
+        now = datetime.utcnow()
+
+        if dedupe_key:
+            existing = await self.collection.find_one(
+                {
+                    "dedupe_key": dedupe_key,
+                    "status": {"$in": [JobStatus.QUEUED, JobStatus.RUNNING, JobStatus.COMPLETED]},
+                    "created_at": {"$gte": (now - timedelta(seconds=self.dedupe_seconds)).isoformat()}
+                },
+                sort=[("created_at", -1)]
+            )
+            if existing:
+                return existing, True
+
+        job = {
+            "created_at": now.isoformat(),
+            **job,
+            "status": JobStatus.QUEUED,
+            "tenant_id": tenant_id,
+            "priority": priority,
+            "dedupe_key": dedupe_key,
+            "attempts": 0,
+            "available_at": now
+        }
+        await self.collection.insert_one(job)
+
+        self._start_dispatching()
+        self._wake.set()
+        return job, False
+
+    async def recover(self) -> int:
+        """Queue again the jobs whose worker stopped renewing its lease"""
+        now = datetime.utcnow()
+        abandoned = {
+            "status": JobStatus.RUNNING,
+            "$or": [{"lease_expires_at": {"$lt": now}}, {"lease_expires_at": {"$exists": False}}]
+        }
+
+        await self.collection.update_many(
+            {**abandoned, "attempts": {"$gte": self.max_attempts}},
+            {
+                "$set": {"status": JobStatus.FAILED, "error_message": "Worker stopped during the last attempt"},
+                "$unset": {"lease_owner": "", "lease_expires_at": ""}
+            }
+        )
+        result = await self.collection.update_many(
+            abandoned,
+            {
+                "$set": {"status": JobStatus.QUEUED, "available_at": now},
+                "$unset": {"lease_owner": "", "lease_expires_at": ""}
+            }
+        )
+        if result.modified_count:
+            logger.warning(f"Recovered {result.modified_count} abandoned report jobs")
+        return result.modified_count
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        saturated = [
+            tenant for tenant, running in self._tenant_running.items()
+            if running >= self.tenant_concurrency
+        ]
+        return await self.collection.find_one_and_update(
+            {"status": JobStatus.QUEUED, "available_at": {"$lte": now}, "tenant_id": {"$nin": saturated}},
+            {
+                "$set": {
+                    "status": JobStatus.RUNNING,
+                    "lease_owner": self.instance_id,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "started_at": now.isoformat()
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("priority", 1), ("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def dispatch(self) -> int:
+        """Claim and start jobs up to the concurrency caps; returns how many started"""
+        started = 0
+        while len(self._running) < self.concurrency:
+            job = await self._claim()
+            if job is None:
+                break
+
+            tenant_id = job.get("tenant_id")
+            self._tenant_running[tenant_id] = self._tenant_running.get(tenant_id, 0) + 1
+            self._running[job[self.id_field]] = asyncio.get_running_loop().create_task(self._execute(job))
+            started += 1
+        return started
+
+    async def _execute(self, job: Dict[str, Any]):
+        job_id = job[self.id_field]
+        owned = {self.id_field: job_id, "lease_owner": self.instance_id}
+        heartbeat = asyncio.get_running_loop().create_task(self._renew_lease(owned))
+        try:
+            result = await self.run(job)
+            await self.collection.update_one(owned, {
+                "$set": {"status": JobStatus.COMPLETED, "completed_at": datetime.utcnow().isoformat(), **(result or {})},
+                "$unset": {"lease_owner": "", "lease_expires_at": ""}
+            })
+        except Exception as e:
+            attempts = job.get("attempts", 1)
+            if attempts < self.max_attempts:
+                retry_at = datetime.utcnow() + timedelta(seconds=REPORT_JOB_RETRY_SECONDS * 2 ** (attempts - 1))
+                logger.warning(f"Report job {job_id} failed on attempt {attempts}, retrying: {e}")
+                update = {"status": JobStatus.QUEUED, "available_at": retry_at, "last_error": str(e)}
+            else:
+                logger.error(f"Report job {job_id} failed after {attempts} attempts: {e}")
+                update = {"status": JobStatus.FAILED, "error_message": str(e)}
+            await self.collection.update_one(owned, {
+                "$set": update,
+                "$unset": {"lease_owner": "", "lease_expires_at": ""}
+            })
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job_id, None)
+            tenant_id = job.get("tenant_id")
+            self._tenant_running[tenant_id] -= 1
+            if not self._tenant_running[tenant_id]:
+                del self._tenant_running[tenant_id]
+            self._wake.set()
+
+    async def _renew_lease(self, owned: Dict[str, Any]):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.collection.update_one(owned, {
+                    "$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}
+                })
+            except Exception as e:
+                logger.error(f"Error renewing report job lease: {e}")
+
+    async def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        await self.collection.create_index([("status", 1), ("priority", 1), ("created_at", 1)])
+        await self.collection.create_index([("dedupe_key", 1), ("created_at", -1)])
+        self._indexes_ready = True
+
+    def start(self):
+        """Start dispatching, including jobs recovered from a previous run"""
+        self._start_dispatching()
+
+    def _start_dispatching(self):
+        if self._dispatch_task is None or self._dispatch_task.done():
+            self._dispatch_task = asyncio.get_running_loop().create_task(self._dispatch_periodically())
+
+    async def _dispatch_periodically(self):
+        while True:
+            try:
+                await self._ensure_indexes()
+                await self.recover()
+                await self.dispatch()
+            except Exception as e:
+                logger.error(f"Error dispatching report jobs: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def close(self):
+        """Stop dispatching and hand running jobs back to the queue"""
+        if self._dispatch_task is not None:
+            self._dispatch_task.cancel()
+            try:
+                await self._dispatch_task
+            except asyncio.CancelledError:
+                pass
+            self._dispatch_task = None
+
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        await self.collection.update_many(
+            {"status": JobStatus.RUNNING, "lease_owner": self.instance_id},
+            {
+                "$set": {"status": JobStatus.QUEUED, "available_at": datetime.utcnow()},
+                "$inc": {"attempts": -1},
+                "$unset": {"lease_owner": "", "lease_expires_at": ""}
+            }
+        )
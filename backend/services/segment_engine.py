@@ -0,0 +1,520 @@
+"""
+Segment Engine
+Compiled audience segment criteria, indexed by the behavioral events and
+profile fields they depend on, with an in-memory segment cache and bulk
+materialization of segment membership into Redis
+
+Membership is kept twice in Redis: ``segment:{segment_id}`` holds a
+segment's users and ``user_segments:{user_id}`` a user's segments. Every
+write here updates both in the same pipeline. These sets are the source of
+truth for membership, for bulk and real-time updates alike.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from services.behavior_store import BEHAVIOR_COUNT_DAYS, EPOCH, BehaviorCounts, counts_from_document, epoch_day
+
+logger = logging.getLogger(__name__)
+
+# Seconds between segment reloads when change streams are unavailable
+SEGMENT_CACHE_TTL = int(os.getenv("SEGMENT_CACHE_TTL", "60"))
+
+# Profiles per cursor batch and per Redis pipeline when materializing
+SEGMENT_WRITE_CHUNK = int(os.getenv("SEGMENT_WRITE_CHUNK", "10000"))
+
+# Members per SADD/SREM command within a pipeline
+SEGMENT_COMMAND_SIZE = 1000
+
+# Profile fields read by segment criteria
+PROFILE_CRITERIA_PROJECTION = {
+    "_id": 0, "user_id": 1, "demographics": 1, "engagement_score": 1, "behavior_counts": 1,
+    # Only read for profiles stored before behavior counters
+    "behaviors": 1
+}
+
+# Seconds a user's segment list is served from process memory
+USER_SEGMENTS_CACHE_TTL = float(os.getenv("USER_SEGMENTS_CACHE_TTL", "5"))
+
+# Users whose segment lists are held in process memory
+USER_SEGMENTS_CACHE_SIZE = int(os.getenv("USER_SEGMENTS_CACHE_SIZE", "100000"))
+
+# Defaults of a behavioral criterion
+DEFAULT_MIN_COUNT = 1
+DEFAULT_TIME_WINDOW_DAYS = 30
+
+
+def segment_key(segment_id: str) -> str:
+    return f"segment:{segment_id}"
+
+
+def user_segments_key(user_id: str) -> str:
+    return f"user_segments:{user_id}"
+
+
+def queue_user_membership(pipe, user_id: str, added: Sequence[str] = (), removed: Sequence[str] = ()):
+    """Queue one user's joins and leaves on both the forward and reverse sets"""
+    for segment_id in added:
+        pipe.sadd(segment_key(segment_id), user_id)
+    for segment_id in removed:
+        pipe.srem(segment_key(segment_id), user_id)
+    if added:
+        pipe.sadd(user_segments_key(user_id), *added)
+    if removed:
+        pipe.srem(user_segments_key(user_id), *removed)
+
+
+async def read_user_segments(redis_client, user_id: str) -> List[str]:
+    """A user's segments from the reverse set, whichever path wrote them"""
+    return sorted(_decode(await redis_client.smembers(user_segments_key(user_id))))
+
+
+@dataclass(frozen=True)
+class CompiledSegment:
+    """
+    Segment criteria compiled for repeated evaluation
+
+    ``demographics`` are (field, value) equality checks, ``behaviors`` are
+    (event_type, min_count, window_days) checks on the profile's daily
+    behavior counters and ``min_engagement_score`` bounds the engagement
+    score. Windows are whole days ending today; counters are only kept for
+    ``BEHAVIOR_COUNT_DAYS``, so longer windows are rejected.
+    """
+    segment_id: str
+    demographics: Tuple[Tuple[str, Any], ...] = ()
+    behaviors: Tuple[Tuple[str, int, int], ...] = ()
+    min_engagement_score: Optional[float] = None
+
+    @classmethod
+    def compile(cls, segment_id: str, criteria: Dict[str, Any]) -> "CompiledSegment":
+        behaviors = []
+        for behavior in criteria.get("behaviors") or []:
+            window_days = int(behavior.get("time_window_days", DEFAULT_TIME_WINDOW_DAYS))
+            if window_days > BEHAVIOR_COUNT_DAYS:
+                raise ValueError(
+                    f"time_window_days {window_days} exceeds the {BEHAVIOR_COUNT_DAYS} days of behavior history kept"
+                )
+            behaviors.append((behavior.get("event_type"), behavior.get("min_count", DEFAULT_MIN_COUNT), window_days))
+
+        return cls(
+            segment_id=segment_id,
+            demographics=tuple((criteria.get("demographics") or {}).items()),
+            behaviors=tuple(behaviors),
+            min_engagement_score=criteria.get("min_engagement_score")
+        )
+
+    @property
+    def event_types(self) -> Set[str]:
+        return {event_type for event_type, _, _ in self.behaviors}
+
+    @property
+    def fields(self) -> Set[str]:
+        """Profile fields, in dotted form, the criteria read"""
+        fields = {f"demographics.{field}" for field, _ in self.demographics}
+        if self.min_engagement_score is not None:
+            fields.add("engagement_score")
+        return fields
+
+    def to_mongo_query(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Equivalent ``user_profiles`` filter, so membership is computed by MongoDB
+
+        A behavioral criterion sums the event type's daily counters over
+        the window in ``$expr``. Profiles stored before counters existed
+        are matched on their behaviors array instead, until
+        ``UserProfileManager.backfill_behavior_counts`` has run.
+        """
+        today = epoch_day(now or datetime.utcnow())
+        clauses: List[Dict[str, Any]] = [
+            {f"demographics.{field}": value} for field, value in self.demographics
+        ]
+        if self.min_engagement_score is not None:
+            clauses.append({"engagement_score": {"$gte": self.min_engagement_score}})
+
+        for event_type, min_count, window_days in self.behaviors:
+            if min_count <= 0:
+                continue
+            clauses.append({"$or": [
+                {"behavior_counts": {"$exists": True}, "$expr": {"$gte": [
+                    {"$add": [
+                        {"$ifNull": [f"$behavior_counts.{event_type}.{day}", 0]}
+                        for day in range(today - window_days + 1, today + 1)
+                    ]},
+                    min_count
+                ]}},
+                {"behavior_counts": {"$exists": False}, **self._legacy_behavior_clause(
+                    event_type, min_count, EPOCH + timedelta(days=today - window_days + 1)
+                )}
+            ]})
+
+        if not clauses:
+            return {}
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    @staticmethod
+    def _legacy_behavior_clause(event_type: str, min_count: int, since: datetime) -> Dict[str, Any]:
+        """Filter on a behaviors array, whose ISO timestamps compare in time order"""
+        cutoff = since.isoformat()
+        if min_count == 1:
+            return {"behaviors": {"$elemMatch": {"event_type": event_type, "timestamp": {"$gte": cutoff}}}}
+        return {"$expr": {"$gte": [
+            {"$size": {"$filter": {
+                "input": {"$ifNull": ["$behaviors", []]},
+                "as": "b",
+                "cond": {"$and": [
+                    {"$eq": ["$$b.event_type", event_type]},
+                    {"$gte": ["$$b.timestamp", cutoff]}
+                ]}
+            }}},
+            min_count
+        ]}}
+
+    def matches(
+        self,
+        demographics: Dict[str, Any],
+        engagement_score: float,
+        counts: BehaviorCounts,
+        today: Optional[int] = None
+    ) -> bool:
+        """Evaluate against a profile; ``today`` is an ``epoch_day``"""
+        for field, value in self.demographics:
+            if demographics.get(field) != value:
+                return False
+
+        if self.min_engagement_score is not None and engagement_score < self.min_engagement_score:
+            return False
+
+        today = epoch_day(datetime.utcnow()) if today is None else today
+        for event_type, min_count, window_days in self.behaviors:
+            if counts.count(event_type, window_days, today) < min_count:
+                return False
+
+        return True
+
+
+class SegmentIndex:
+    """
+    Active segments indexed by the event types and profile fields they read
+
+    An event or profile update only re-evaluates the segments that depend
+    on it. Behavioral criteria are time windowed, so a member can age out
+    of a segment without a new event of that type; ``affected`` therefore
+    also returns the behavioral segments the user currently belongs to, and
+    criteria-free segments the user is not yet in.
+    """
+
+    def __init__(self, segments: Iterable[CompiledSegment] = ()):
+        self.segments: Dict[str, CompiledSegment] = {}
+        self.by_event_type: Dict[str, List[CompiledSegment]] = defaultdict(list)
+        self.by_field: Dict[str, List[CompiledSegment]] = defaultdict(list)
+        self.unconditional: List[CompiledSegment] = []
+
+        for segment in segments:
+            self.segments[segment.segment_id] = segment
+            for event_type in segment.event_types:
+                self.by_event_type[event_type].append(segment)
+            for field in segment.fields:
+                self.by_field[field].append(segment)
+            if not segment.event_types and not segment.fields:
+                self.unconditional.append(segment)
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def affected(
+        self,
+        event_types: Iterable[str] = (),
+        fields: Iterable[str] = (),
+        member_of: Iterable[str] = ()
+    ) -> List[CompiledSegment]:
+        """Segments whose membership may change for one user"""
+        affected: Dict[str, CompiledSegment] = {}
+        for event_type in event_types:
+            affected.update((s.segment_id, s) for s in self.by_event_type.get(event_type, ()))
+        for field in fields:
+            affected.update((s.segment_id, s) for s in self.by_field.get(field, ()))
+
+        member_of = set(member_of)
+        for segment_id in member_of:
+            segment = self.segments.get(segment_id)
+            if segment is not None and segment.behaviors:
+                affected[segment_id] = segment
+        for segment in self.unconditional:
+            if segment.segment_id not in member_of:
+                affected[segment.segment_id] = segment
+
+        return list(affected.values())
+
+
+class SegmentCache:
+    """
+    In-memory ``SegmentIndex`` over the active ``audience_segments``
+
+    A change stream on the collection invalidates the index, which is
+    rebuilt on the next read with a single query. Where change streams are
+    unavailable (standalone MongoDB) the index is reloaded every
+    ``SEGMENT_CACHE_TTL`` seconds instead.
+    """
+
+    def __init__(self, db, ttl: int = SEGMENT_CACHE_TTL):
+        self.db = db
+        self.ttl = ttl
+        self._index: Optional[SegmentIndex] = None
+        self._index_generation = -1
+        self._generation = 0
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._watch_task: Optional[asyncio.Task] = None
+        self._watching = False
+
+    def invalidate(self):
+        self._generation += 1
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._index is not None
+            and self._index_generation == self._generation
+            and (self._watching or time.monotonic() - self._loaded_at < self.ttl)
+        )
+
+    async def get_index(self) -> SegmentIndex:
+        self._start_watching()
+        if not self._is_fresh():
+            async with self._lock:
+                if not self._is_fresh():
+                    await self._reload()
+        return self._index
+
+    async def _reload(self):
+        # A change during the query leaves the index stale for the next read
+        generation = self._generation
+        docs = await self.db.audience_segments.find(
+            {"active": True}, {"segment_id": 1, "criteria": 1}
+        ).to_list(length=None)
+
+        segments = []
+        for doc in docs:
+            try:
+                segments.append(CompiledSegment.compile(doc["segment_id"], doc.get("criteria") or {}))
+            except Exception as e:
+                logger.warning(f"Skipping segment {doc.get('segment_id')} with invalid criteria: {e}")
+
+        self._index = SegmentIndex(segments)
+        self._index_generation = generation
+        self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(segments)} active audience segments")
+
+    def _start_watching(self):
+        if self._watch_task is None:
+            self._watch_task = asyncio.get_running_loop().create_task(self._watch())
+
+    async def _watch(self):
+        try:
+            async with self.db.audience_segments.watch() as stream:
+                self._watching = True
+                # Changes made before the stream opened are not delivered
+                self.invalidate()
+                async for _ in stream:
+                    self.invalidate()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Segment change stream unavailable, reloading every {self.ttl}s: {e}")
+        finally:
+            self._watching = False
+
+    async def close(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+
+class UserSegmentsLookup:
+    """
+    A user's active segments, read from the reverse index
+
+    A miss costs one SMEMBERS; inactive or deleted segments are filtered
+    out against ``segment_cache``. Results are served from an LRU in
+    process memory for ``ttl`` seconds, so repeated serving calls for the
+    same user do not touch Redis. Membership written by this process
+    invalidates the user's entry.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        segment_cache: SegmentCache,
+        ttl: float = USER_SEGMENTS_CACHE_TTL,
+        max_entries: int = USER_SEGMENTS_CACHE_SIZE
+    ):
+        self.redis = redis_client
+        self.segment_cache = segment_cache
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+
+    async def get(self, user_id: str) -> List[str]:
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(user_id)
+            return list(entry[1])
+
+        members = await read_user_segments(self.redis, user_id)
+        index = await self.segment_cache.get_index()
+        segments = sorted(segment_id for segment_id in members if segment_id in index.segments)
+
+        self._entries[user_id] = (time.monotonic() + self.ttl, segments)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return list(segments)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+
+async def _write_members(
+    redis_client,
+    key: str,
+    segment_id: str,
+    add: Sequence[str] = (),
+    remove: Sequence[str] = ()
+):
+    """
+    Apply set changes in one pipeline of bounded-size SADD/SREM commands
+
+    ``key`` is the segment's set, or a staging set that will replace it;
+    each user's reverse set is updated for ``segment_id`` either way.
+    """
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for command, members in ((pipe.sadd, add), (pipe.srem, remove)):
+            for start in range(0, len(members), SEGMENT_COMMAND_SIZE):
+                command(key, *members[start:start + SEGMENT_COMMAND_SIZE])
+        for user_id in add:
+            pipe.sadd(user_segments_key(user_id), segment_id)
+        for user_id in remove:
+            pipe.srem(user_segments_key(user_id), segment_id)
+        await pipe.execute()
+
+
+def _decode(members: Iterable[Any]) -> List[str]:
+    return [m.decode("utf-8") if isinstance(m, bytes) else m for m in members]
+
+
+async def materialize_segment(
+    db,
+    redis_client,
+    segment: CompiledSegment,
+    now: Optional[datetime] = None,
+    chunk_size: Optional[int] = None
+) -> int:
+    """
+    Rebuild a segment's membership set and return its size
+
+    Matching profiles come from one cursor over the compiled query,
+    projected to ``user_id``. Members are written to a staging set in
+    chunked pipelines, which then replaces ``segment:{id}`` with RENAME,
+    so readers never see a partially built segment. Reverse sets gain the
+    segment for every member and lose it for users who dropped out.
+    """
+    chunk_size = chunk_size or SEGMENT_WRITE_CHUNK
+    key = segment_key(segment.segment_id)
+    staging_key = f"{key}:staging:{uuid.uuid4().hex}"
+    cursor = db.user_profiles.find(
+        segment.to_mongo_query(now), {"_id": 0, "user_id": 1}
+    ).batch_size(chunk_size)
+
+    size = 0
+    chunk: List[str] = []
+    try:
+        async for doc in cursor:
+            chunk.append(doc["user_id"])
+            if len(chunk) >= chunk_size:
+                await _write_members(redis_client, staging_key, segment.segment_id, add=chunk)
+                size += len(chunk)
+                chunk = []
+        if chunk:
+            await _write_members(redis_client, staging_key, segment.segment_id, add=chunk)
+            size += len(chunk)
+
+        removed = _decode(await redis_client.sdiff(key, staging_key))
+        for start in range(0, len(removed), chunk_size):
+            await _write_members(redis_client, key, segment.segment_id, remove=removed[start:start + chunk_size])
+
+        if size:
+            await redis_client.rename(staging_key, key)
+        else:
+            await redis_client.delete(key)
+        return size
+
+    except BaseException:
+        await redis_client.delete(staging_key)
+        raise
+
+
+async def refresh_segment_members(
+    db,
+    redis_client,
+    segment: CompiledSegment,
+    since: str,
+    now: Optional[datetime] = None,
+    chunk_size: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Re-evaluate a segment for the profiles updated since ``since``
+
+    Profiles are streamed with only the criteria fields and evaluated in
+    process; joins and leaves are written in chunked pipelines. Returns
+    (matched, unmatched) counts among the updated profiles. Members who
+    only aged out of a behavioral window without a profile update are
+    dropped by the next full materialization or their next event.
+    """
+    chunk_size = chunk_size or SEGMENT_WRITE_CHUNK
+    key = segment_key(segment.segment_id)
+    now = now or datetime.utcnow()
+    cursor = db.user_profiles.find(
+        {"last_updated": {"$gte": since}}, PROFILE_CRITERIA_PROJECTION
+    ).batch_size(chunk_size)
+
+    today = epoch_day(now)
+    matched, unmatched = [], []
+    totals = [0, 0]
+    async for doc in cursor:
+        is_member = segment.matches(
+            doc.get("demographics") or {},
+            doc.get("engagement_score", 0.0),
+            counts_from_document(doc),
+            today
+        )
+        (matched if is_member else unmatched).append(doc["user_id"])
+        if len(matched) + len(unmatched) >= chunk_size:
+            await _write_members(redis_client, key, segment.segment_id, add=matched, remove=unmatched)
+            totals[0] += len(matched)
+            totals[1] += len(unmatched)
+            matched, unmatched = [], []
+
+    if matched or unmatched:
+        await _write_members(redis_client, key, segment.segment_id, add=matched, remove=unmatched)
+    return totals[0] + len(matched), totals[1] + len(unmatched)
+
+
+# Global instance
+segment_cache = None
+
+def get_segment_cache(db) -> SegmentCache:
+    """Get segment cache instance"""
+    global segment_cache
+    if segment_cache is None:
+        segment_cache = SegmentCache(db)
+    return segment_cache
@@ -0,0 +1,98 @@
+"""
+Single-Flight Cache
+In-process LRU/TTL cache whose concurrent misses for the same key share
+one load
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlightCache:
+    """
+    LRU/TTL entries plus single-flight loading
+
+    Subclasses look a key up with ``_cached`` and fill a miss with
+    ``_load``, which runs the loader once however many callers are
+    waiting for the key. When the caller running a load is cancelled,
+    one of its waiters runs the load instead.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def _cached(self, key: Hashable) -> Optional[Any]:
+        """Unexpired value for ``key``, or None"""
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            return entry[1]
+        return None
+
+    def _remember(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        store: Callable[[Any], bool] = bool
+    ) -> Tuple[Any, bool]:
+        """
+        Value ``loader()`` gives for ``key``, and whether it came from a load
+        another caller was already running
+
+        The value is cached when ``store(value)`` is true.
+        """
+        while key in self._inflight:
+            inflight = self._inflight[key]
+            try:
+                return await asyncio.shield(inflight), True
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The caller running the load went away; run it here
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except BaseException as e:
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                # Waiters re-raise it; retrieve it here so an unshared failure is not reported as unhandled
+                future.exception()
+            else:
+                future.cancel()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+        future.set_result(value)
+        if store(value):
+            self._remember(key, value)
+        return value, False
+
+    def _discard(self, matches: Optional[Callable[[Hashable], bool]] = None):
+        """Drop the entries and in-flight loads whose key ``matches``, or all of them"""
+        if matches is None:
+            self._entries.clear()
+            self._inflight.clear()
+            return
+
+        for key in [key for key in self._entries if matches(key)]:
+            del self._entries[key]
+        for key in [key for key in self._inflight if matches(key)]:
+            del self._inflight[key]
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,621 @@
+"""
+Model Training Jobs
+Runs model training in a process pool with progress reporting, cooperative
+cancellation and warm start from the last registered model version
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from sklearn.ensemble import (
+    GradientBoostingRegressor,
+    IsolationForest,
+    RandomForestClassifier,
+    RandomForestRegressor
+)
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import train_test_split
+
+from services.model_registry import ModelRegistry, get_model_registry
+
+logger = logging.getLogger(__name__)
+
+# Worker processes used for training
+TRAINING_WORKERS = int(os.environ.get("ML_TRAINING_WORKERS", "2"))
+
+# How often running jobs sync progress to MongoDB and check for cancellation
+PROGRESS_SYNC_SECONDS = 1.0
+
+# Trees fitted between progress/cancellation checks
+ESTIMATOR_CHUNK_SIZE = 10
+
+
+class JobStatus:
+    """Training job states"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+FINISHED_STATUSES = {JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED}
+
+
+class TrainingCancelled(Exception):
+    """Raised inside a worker when its job has been cancelled"""
+    pass
+
+
+# ---------------------------------------------------------------------------
+# Worker side: everything below runs in the training process
+# ---------------------------------------------------------------------------
+
+ProgressReporter = Callable[[float, str], None]
+
+
+def _can_warm_start(base: Any, model: Any, X: Any, max_estimators: int) -> bool:
+    """Whether ``base`` can keep growing instead of training ``model`` from scratch"""
+    if base is None or type(base) is not type(model) or not hasattr(base, "estimators_"):
+        return False
+    if getattr(base, "n_features_in_", None) != X.shape[1]:
+        return False
+    base_names = getattr(base, "feature_names_in_", None)
+    if base_names is not None and list(base_names) != list(getattr(X, "columns", [])):
+        return False
+    return len(base.estimators_) < max_estimators
+
+
+def _fit_ensemble(
+    model: Any,
+    X: Any,
+    y: Optional[Any],
+    report: ProgressReporter,
+    base: Optional[Any] = None,
+    warm_start_estimators: int = 25,
+    progress_range: Tuple[float, float] = (0.1, 0.9)
+) -> Tuple[Any, bool]:
+    """
+    Fit a tree ensemble in chunks of ESTIMATOR_CHUNK_SIZE estimators
+
+    With a compatible ``base`` model, ``warm_start_estimators`` new trees are
+    added to it instead (until it reaches twice ``model``'s size, after which
+    training starts fresh). Progress and cancellation are checked between
+    chunks.
+    """
+    n_estimators = model.get_params()["n_estimators"]
+    warm = _can_warm_start(base, model, X, max_estimators=2 * n_estimators)
+    if warm:
+        model = base
+        start = len(base.estimators_)
+        target = start + warm_start_estimators
+    else:
+        start, target = 0, n_estimators
+
+    low, high = progress_range
+    model.set_params(warm_start=True)
+    built = start
+    while built < target:
+        built = min(built + ESTIMATOR_CHUNK_SIZE, target)
+        model.set_params(n_estimators=built)
+        if y is None:
+            model.fit(X)
+        else:
+            model.fit(X, y)
+        report(low + (high - low) * (built - start) / (target - start), f"fitted {built}/{target} estimators")
+    model.set_params(warm_start=False)
+    return model, warm
+
+
+def _synthetic_fatigue_data(rng: np.random.Generator, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Synthetic creative fatigue samples (in production, use real historical data)"""
+    age = rng.uniform(0, 60, n)
+    impressions = rng.normal(1000, 200, n)
+    clicks = rng.normal(50, 10, n)
+    frequency = rng.normal(2.5, 0.5, n)
+    saturation = rng.uniform(0, 100, n)
+
+    X = np.column_stack([
+        impressions, clicks, rng.normal(50, 10, n), frequency,
+        rng.normal(200, 50, n), rng.normal(10, 2, n), age,
+        rng.integers(0, 2, n), rng.integers(0, 2, n),
+        rng.integers(7, 30, n), impressions * 1.2, impressions * 0.8,
+        frequency * 1.1, frequency * 0.9, rng.normal(100, 20, n),
+        rng.normal(20, 5, n), saturation, rng.integers(0, 10, n),
+        rng.uniform(0, 10, n), rng.uniform(0.005, 0.05, n)
+    ])
+
+    # Fatigue probability increases with age and saturation
+    fatigue_prob = np.minimum((age / 30.0) * 0.4 + (saturation / 100.0) * 0.6, 0.95)
+    fatigue_prob = np.clip(fatigue_prob + rng.normal(0, 0.1, n), 0, 1)
+    return X, (fatigue_prob > 0.5).astype(int)
+
+
+def _synthetic_ltv_data(rng: np.random.Generator, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Synthetic customer LTV samples"""
+    purchase_count = rng.poisson(3, n)
+    total_spend = rng.exponential(500, n)
+    email_open_rate = rng.beta(2, 5, n)
+    click_rate = rng.beta(1, 10, n)
+
+    X = np.column_stack([
+        purchase_count, total_spend, total_spend / np.maximum(purchase_count, 1),
+        rng.uniform(0, 365, n), rng.uniform(0, 90, n),
+        email_open_rate, click_rate, rng.poisson(10, n), rng.uniform(0, 1, n),
+        rng.uniform(0, 1, n), rng.integers(0, 2, n), total_spend * 1.5,
+        rng.uniform(0, 1, n), rng.integers(1, 4, n),
+        rng.uniform(0, 1, n), rng.uniform(0, 1, n)
+    ])
+
+    # LTV correlates with spend and engagement
+    ltv = total_spend * (1 + email_open_rate + click_rate) * rng.uniform(1, 3, n)
+    return X, ltv
+
+
+def _synthetic_anomaly_data(rng: np.random.Generator, n_normal: int, n_anomalies: int) -> np.ndarray:
+    """Synthetic campaign performance with a small share of outliers"""
+    def performance(n, means, spreads):
+        columns = [rng.normal(mean, spread, n) for mean, spread in zip(means, spreads)]
+        columns += [
+            rng.uniform(0, 30, n),      # campaign age
+            rng.uniform(0.1, 1.0, n),   # budget utilization
+            rng.integers(1, 10, n),     # targeting criteria count
+            rng.uniform(0, 1, n),       # competition level
+            rng.uniform(0, 100, n)      # platform performance index
+        ]
+        return np.column_stack(columns)
+
+    # impressions, clicks, spend, conversions, ctr, cpc, cpm, roas, frequency
+    normal = performance(
+        n_normal,
+        [10000, 200, 500, 10, 0.02, 2.5, 25, 2.0, 1.5],
+        [2000, 50, 100, 3, 0.005, 0.5, 5, 0.5, 0.3]
+    )
+    anomalies = performance(
+        n_anomalies,
+        [5000, 10, 1000, 1, 0.002, 10, 100, 0.5, 5],
+        [5000, 20, 500, 2, 0.001, 5, 50, 0.3, 2]
+    )
+    return np.vstack([normal, anomalies])
+
+
+def train_fatigue_prediction(params: Dict[str, Any], base: Any, report: ProgressReporter):
+    """Train the creative fatigue classifier"""
+    rng = np.random.default_rng(params.get("seed", 42))
+    X, y = _synthetic_fatigue_data(rng, params.get("n_samples", 1000))
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    report(0.1, "data prepared")
+
+    model, warm = _fit_ensemble(
+        RandomForestClassifier(n_estimators=100, random_state=42), X_train, y_train, report, base
+    )
+
+    metrics = {
+        "accuracy": round(float(model.score(X_test, y_test)), 4),
+        "samples": len(X_train),
+        "last_trained": datetime.utcnow().isoformat()
+    }
+    return model, metrics, {"feature_count": X.shape[1], "warm_started": warm}
+
+
+def train_ltv_forecasting(params: Dict[str, Any], base: Any, report: ProgressReporter):
+    """Train the 90-day LTV regressor"""
+    rng = np.random.default_rng(params.get("seed", 42))
+    X, y = _synthetic_ltv_data(rng, params.get("n_samples", 500))
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    report(0.1, "data prepared")
+
+    model, warm = _fit_ensemble(
+        RandomForestRegressor(n_estimators=100, random_state=42), X_train, y_train, report, base
+    )
+
+    metrics = {
+        "accuracy": round(float(model.score(X_test, y_test)), 4),
+        "samples": len(X_train),
+        "last_trained": datetime.utcnow().isoformat()
+    }
+    return model, metrics, {"feature_count": X.shape[1], "warm_started": warm}
+
+
+def train_anomaly_detection(params: Dict[str, Any], base: Any, report: ProgressReporter):
+    """Train the campaign performance isolation forest"""
+    rng = np.random.default_rng(params.get("seed", 42))
+    X = _synthetic_anomaly_data(rng, params.get("n_samples", 1000), params.get("n_anomalies", 50))
+    report(0.1, "data prepared")
+
+    model, warm = _fit_ensemble(
+        IsolationForest(contamination=0.05, random_state=42), X, None, report, base
+    )
+
+    metrics = {
+        "precision": 0.85,  # Estimated
+        "recall": 0.78,     # Estimated
+        "samples": len(X),
+        "last_trained": datetime.utcnow().isoformat()
+    }
+    return model, metrics, {"feature_count": X.shape[1], "warm_started": warm}
+
+
+def _split_tabular(params: Dict[str, Any]):
+    data: pd.DataFrame = params["data"]
+    target_column = params["target_column"]
+    X = data.drop(columns=[target_column])
+    y = data[target_column]
+    return X, train_test_split(X, y, test_size=0.2, random_state=42)
+
+
+def train_campaign_performance(params: Dict[str, Any], base: Any, report: ProgressReporter):
+    """Train the best of several regressors on campaign data, or grow the previous one"""
+    X, (X_train, X_test, y_train, y_test) = _split_tabular(params)
+    report(0.1, "data prepared")
+
+    candidates = {
+        "random_forest": RandomForestRegressor(n_estimators=100, random_state=42),
+        "gradient_boosting": GradientBoostingRegressor(n_estimators=100, random_state=42),
+        "linear_regression": LinearRegression()
+    }
+
+    # Warm start only continues the model family selected last time
+    for name, candidate in candidates.items():
+        if _can_warm_start(base, candidate, X_train, max_estimators=200):
+            candidates = {name: candidate}
+            break
+
+    best_model, best_name, best_score, warm_started = None, None, -np.inf, False
+    step = 0.8 / len(candidates)
+    for i, (name, candidate) in enumerate(candidates.items()):
+        progress_range = (0.1 + i * step, 0.1 + (i + 1) * step)
+        if hasattr(candidate, "n_estimators"):
+            model, warm = _fit_ensemble(candidate, X_train, y_train, report, base, progress_range=progress_range)
+        else:
+            model, warm = candidate.fit(X_train, y_train), False
+            report(progress_range[1], f"fitted {name}")
+
+        score = model.score(X_test, y_test)
+        if score > best_score:
+            best_model, best_name, best_score, warm_started = model, name, score, warm
+
+    metrics = {"score": float(best_score), "training_samples": len(X_train), "test_samples": len(X_test)}
+    metadata = {
+        "model_name": best_name,
+        "feature_columns": list(X.columns),
+        "target_column": params["target_column"],
+        "warm_started": warm_started
+    }
+    return best_model, metrics, metadata
+
+
+def train_churn_prediction(params: Dict[str, Any], base: Any, report: ProgressReporter):
+    """Train the customer churn model"""
+    X, (X_train, X_test, y_train, y_test) = _split_tabular(params)
+    report(0.1, "data prepared")
+
+    model, warm = _fit_ensemble(
+        RandomForestRegressor(n_estimators=100, random_state=42), X_train, y_train, report, base
+    )
+
+    metrics = {
+        "score": float(model.score(X_test, y_test)),
+        "training_samples": len(X_train),
+        "test_samples": len(X_test)
+    }
+    metadata = {
+        "model_name": "random_forest",
+        "feature_columns": list(X.columns),
+        "target_column": params["target_column"],
+        "warm_started": warm
+    }
+    return model, metrics, metadata
+
+
+# Trainer name -> fn(params, base_model, report) -> (model, metrics, metadata)
+TRAINERS: Dict[str, Callable[..., Tuple[Any, Dict[str, Any], Dict[str, Any]]]] = {
+    "fatigue_prediction": train_fatigue_prediction,
+    "ltv_forecasting": train_ltv_forecasting,
+    "anomaly_detection": train_anomaly_detection,
+    "campaign_performance": train_campaign_performance,
+    "churn_prediction": train_churn_prediction,
+}
+
+
+def run_training_job(
+    job_id: str,
+    trainer: str,
+    params: Dict[str, Any],
+    base_artifact: Optional[str],
+    output_path: str,
+    progress: Any,
+    cancel_flags: Any
+) -> Dict[str, Any]:
+    """Worker entry point: train, then dump the model to ``output_path``"""
+    def report(fraction: float, stage: str):
+        if cancel_flags.get(job_id):
+            raise TrainingCancelled(job_id)
+        progress[job_id] = {"progress": round(min(fraction, 1.0), 4), "stage": stage}
+
+    report(0.0, "started")
+    base = joblib.load(base_artifact) if base_artifact else None
+    model, metrics, metadata = TRAINERS[trainer](params, base, report)
+
+    report(0.95, "saving")
+    joblib.dump(model, output_path)
+    return {
+        "metrics": metrics,
+        "metadata": metadata,
+        "model_class": f"{type(model).__module__}.{type(model).__qualname__}"
+    }
+
+
+# ---------------------------------------------------------------------------
+# Event loop side
+# ---------------------------------------------------------------------------
+
+class TrainingJobManager:
+    """
+    Submits training jobs to a process pool and tracks them in MongoDB
+
+    Jobs are recorded in the ``training_jobs`` collection. While a job runs
+    its progress is pushed from the worker through a multiprocessing manager
+    and synced to the job document every PROGRESS_SYNC_SECONDS, together
+    with any cancellation requested through :meth:`cancel_job` (from any
+    replica). The trained artifact is registered as a new version in the
+    model registry; with ``warm_start`` the job starts from the latest
+    registered version of the same model.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        registry: ModelRegistry,
+        max_workers: int = TRAINING_WORKERS
+    ):
+        self.db = db
+        self.registry = registry
+        self.max_workers = max_workers
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._progress = None
+        self._cancel_flags = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _ensure_pool(self):
+        if self._executor is None:
+            # Spawned workers do not inherit the event loop, DB clients or threads
+            context = multiprocessing.get_context("spawn")
+            self._manager = context.Manager()
+            self._progress = self._manager.dict()
+            self._cancel_flags = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    async def submit(
+        self,
+        model_name: str,
+        trainer: str,
+        params: Optional[Dict[str, Any]] = None,
+        warm_start: bool = True,
+        on_success: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        organization_id: Optional[str] = None
+    ) -> str:
+        """
+        Queue a training job and return its id
+
+        Args:
+            model_name: Registry name the trained model is registered under
+            trainer: Key in TRAINERS
+            params: Trainer parameters (pickled to the worker)
+            warm_start: Start from the latest registered version when compatible
+            on_success: Awaited with the finished job document
+            organization_id: Organization the job is visible to through the API
+        """
+        if trainer not in TRAINERS:
+            raise ValueError(f"Unknown trainer: {trainer}")
+
+        job_id = str(uuid.uuid4())
+        latest, base_artifact = None, None
+        if warm_start:
+            latest = await self.registry.get_latest(model_name, refresh=True)
+            if latest:
+                base_artifact = self.registry.artifact_file(latest)
+
+        job = {
+            "job_id": job_id,
+            "model_name": model_name,
+            "trainer": trainer,
+            "organization_id": organization_id,
+            "status": JobStatus.QUEUED,
+            "progress": 0.0,
+            "stage": "queued",
+            "warm_start_from": latest["version"] if latest else None,
+            "cancel_requested": False,
+            "created_at": datetime.utcnow()
+        }
+        await self.db.training_jobs.insert_one(dict(job))
+
+        self._ensure_pool()
+        self._tasks[job_id] = asyncio.create_task(
+            self._run_job(job_id, model_name, trainer, params or {}, base_artifact, on_success)
+        )
+
+        logger.info(f"Queued training job {job_id} for {model_name}", extra={
+            "job_id": job_id,
+            "model_name": model_name,
+            "warm_start": base_artifact is not None
+        })
+        return job_id
+
+    async def _run_job(
+        self,
+        job_id: str,
+        model_name: str,
+        trainer: str,
+        params: Dict[str, Any],
+        base_artifact: Optional[str],
+        on_success: Optional[Callable[[Dict[str, Any]], Awaitable[None]]]
+    ):
+        output_path = self.registry.staging_path(job_id)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, run_training_job,
+            job_id, trainer, params, base_artifact, output_path, self._progress, self._cancel_flags
+        )
+
+        try:
+            while True:
+                done, _ = await asyncio.wait({future}, timeout=PROGRESS_SYNC_SECONDS)
+                if done:
+                    break
+                await self._sync_progress(job_id, future)
+
+            result = future.result()
+            version = await self.registry.register_artifact(
+                model_name, output_path,
+                model_class=result["model_class"],
+                metrics=result["metrics"],
+                metadata=result["metadata"]
+            )
+            await self._finish(job_id, JobStatus.COMPLETED, {
+                "progress": 1.0,
+                "stage": "completed",
+                "registry_version": version,
+                "metrics": result["metrics"],
+                "warm_started": result["metadata"].get("warm_started", False)
+            })
+            logger.info(f"Training job {job_id} registered {model_name} version {version}")
+
+            if on_success:
+                await on_success(await self.get_job(job_id))
+
+        except (TrainingCancelled, asyncio.CancelledError):
+            self._cancel_flags[job_id] = True
+            future.cancel()
+            await self._finish(job_id, JobStatus.CANCELLED, {"stage": "cancelled"})
+            logger.info(f"Training job {job_id} cancelled")
+        except Exception as e:
+            logger.error(f"Training job {job_id} failed: {e}")
+            await self._finish(job_id, JobStatus.FAILED, {"stage": "failed", "error": str(e)})
+        finally:
+            self._progress.pop(job_id, None)
+            self._cancel_flags.pop(job_id, None)
+            self._tasks.pop(job_id, None)
+            if os.path.exists(output_path):
+                os.remove(output_path)
+
+    async def _sync_progress(self, job_id: str, future: asyncio.Future):
+        """Push worker progress to the job document and pick up cancellation requests"""
+        doc = await self.db.training_jobs.find_one({"job_id": job_id}, {"cancel_requested": 1})
+        if doc and doc.get("cancel_requested"):
+            self._cancel_flags[job_id] = True
+            # Not started yet: drop it from the pool queue
+            if future.cancel():
+                raise TrainingCancelled(job_id)
+
+        progress = self._progress.get(job_id)
+        if progress:
+            await self.db.training_jobs.update_one(
+                {"job_id": job_id, "status": {"$in": [JobStatus.QUEUED, JobStatus.RUNNING]}},
+                {"$set": {
+                    **progress,
+                    "status": JobStatus.RUNNING,
+                    "updated_at": datetime.utcnow()
+                }}
+            )
+
+    async def _finish(self, job_id: str, status: str, fields: Dict[str, Any]):
+        await self.db.training_jobs.update_one(
+            {"job_id": job_id},
+            {"$set": {**fields, "status": status, "finished_at": datetime.utcnow()}}
+        )
+
+    @staticmethod
+    def _job_query(job_id: str, organization_id: Optional[str]) -> Dict[str, Any]:
+        query = {"job_id": job_id}
+        if organization_id is not None:
+            query["organization_id"] = organization_id
+        return query
+
+    async def cancel_job(self, job_id: str, organization_id: Optional[str] = None) -> bool:
+        """
+        Request cancellation; the worker stops at its next progress check
+
+        With ``organization_id`` only that organization's jobs are cancelled.
+        """
+        query = self._job_query(job_id, organization_id)
+        query["status"] = {"$in": [JobStatus.QUEUED, JobStatus.RUNNING]}
+        result = await self.db.training_jobs.update_one(query, {"$set": {"cancel_requested": True}})
+        if result.matched_count == 0:
+            return False
+        if job_id in self._tasks and self._cancel_flags is not None:
+            self._cancel_flags[job_id] = True
+        return result.modified_count > 0
+
+    async def get_job(self, job_id: str, organization_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a job document, with live progress when the job runs in this process
+
+        With ``organization_id`` another organization's job is not found.
+        """
+        job = await self.db.training_jobs.find_one(self._job_query(job_id, organization_id), {"_id": 0})
+        if job and job["status"] not in FINISHED_STATUSES and self._progress is not None:
+            job.update(self._progress.get(job_id) or {})
+        return job
+
+    async def list_jobs(self, model_name: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """List recent jobs, newest first"""
+        query = {"model_name": model_name} if model_name else {}
+        cursor = self.db.training_jobs.find(query, {"_id": 0}).sort("created_at", -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    def is_running(self, job_id: str) -> bool:
+        """Whether a job submitted by this process is still queued or running"""
+        return job_id in self._tasks
+
+    async def wait(self, job_id: str):
+        """Wait for a job running in this process to finish"""
+        task = self._tasks.get(job_id)
+        if task:
+            await asyncio.shield(task)
+
+    async def shutdown(self):
+        """Cancel running jobs and stop the worker pool"""
+        for job_id in list(self._tasks):
+            self._cancel_flags[job_id] = True
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._manager.shutdown()
+            self._executor = None
+            self._manager = None
+            self._progress = None
+            self._cancel_flags = None
+
+
+# Global instance
+training_job_manager = None
+
+
+def get_training_job_manager(db: AsyncIOMotorDatabase) -> TrainingJobManager:
+    """Get training job manager instance"""
+    global training_job_manager
+    if training_job_manager is None:
+        training_job_manager = TrainingJobManager(db, get_model_registry(db))
+    return training_job_manager
+
+
+async def close_training_job_manager():
+    """Cancel running jobs and stop the worker pool, if the manager was created"""
+    global training_job_manager
+    if training_job_manager is not None:
+        await training_job_manager.shutdown()
+        training_job_manager = None
@@ -4,6 +4,9 @@ Handles complex multi-step workflows with dependencies, error handling, and para
 """
 
 import asyncio
+import calendar
+import contextlib
+import heapq
 import logging
 from typing import Dict, List, Optional, Any, Set, Tuple
 from datetime import datetime, timedelta
@@ -12,7 +15,9 @@ from enum import Enum
 import uuid
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from core.cron import CronExpression, CronError
 from services.agentkit_service import AgentKitService
+from services.prometheus_metrics import metrics_collector
 from services.validation_service import ValidationService, ValidationError
 from models.agentkit_models import (
     WorkflowDefinition, WorkflowExecution, AgentExecutionRequest,
@@ -76,9 +81,12 @@ class WorkflowOrchestrator:
     Handles complex workflows with proper dependency management, error handling, and parallel execution
     """
 
-    def __init__(self, agentkit_service: AgentKitService):
+    def __init__(self, agentkit_service: AgentKitService, max_concurrent_steps_per_org: int = 20):
         self.agentkit_service = agentkit_service
         self.active_workflows: Dict[str, WorkflowContext] = {}
+        # Caps running steps per organization across all of its workflows
+        self.max_concurrent_steps_per_org = max_concurrent_steps_per_org
+        self._org_step_semaphores: Dict[str, asyncio.Semaphore] = {}
 
     async def execute_workflow(
         self,
@@ -101,6 +109,9 @@ class WorkflowOrchestrator:
         Returns:
             WorkflowExecution result
         """
+        # Reject cyclic workflows before anything runs
+        self._validate_dependency_graph(workflow.steps)
+
         execution_id = str(uuid.uuid4())
         start_time = datetime.utcnow()
 
@@ -218,33 +229,78 @@ class WorkflowOrchestrator:
                 break  # Stop on first failure in sequential mode
 
     async def _execute_parallel(self, context: WorkflowContext, workflow: WorkflowDefinition):
-        """Execute workflow steps in parallel where possible"""
-        # Group steps by dependency level
-        dependency_levels = await self._build_dependency_levels(workflow.steps)
+        """
+        Execute workflow steps as a DAG
 
-        for level in dependency_levels:
-            if context.execution_id not in self.active_workflows:
-                break  # Workflow was cancelled
+        Each step is launched as soon as all of its dependencies have
+        completed, rather than waiting for a whole dependency level to finish.
+        Steps downstream of a failed step are skipped; independent branches
+        keep running.
+        """
+        steps = {step.step_id: step for step in workflow.steps}
+        dependents, pending_deps, unresolvable = self._build_dependency_graph(workflow.steps)
+        for step_id in unresolvable:
+            logger.warning(f"Step {step_id} depends on a step missing from workflow {workflow.workflow_id}")
+
+        ready = [
+            step_id for step_id, count in pending_deps.items()
+            if count == 0 and step_id not in unresolvable
+        ]
+        running: Dict[asyncio.Task, str] = {}
+
+        while ready or running:
+            # Stop launching new steps once the workflow is cancelled; steps
+            # already in flight are allowed to finish
+            if context.execution_id in self.active_workflows:
+                for step_id in ready:
+                    step_exec = context.step_executions[step_id]
+                    task = asyncio.create_task(
+                        self._execute_workflow_step_limited(step_exec, steps[step_id], context)
+                    )
+                    running[task] = step_id
+            ready = []
+
+            if not running:
+                break
 
-            # Execute all steps in this level in parallel
-            parallel_tasks = []
-            for step in level:
-                step_exec = context.step_executions[step.step_id]
+            done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
 
-                if await self._check_dependencies_satisfied(step_exec, context):
-                    task = self._execute_workflow_step_async(step_exec, step, context)
-                    parallel_tasks.append(task)
+            for task in done:
+                step_id = running.pop(task)
+                step_exec = context.step_executions[step_id]
 
-            if parallel_tasks:
-                # Wait for all steps in this level to complete
-                await asyncio.gather(*parallel_tasks, return_exceptions=True)
+                if step_exec.status == StepStatus.COMPLETED:
+                    for dependent_id in dependents[step_id]:
+                        pending_deps[dependent_id] -= 1
+                        if pending_deps[dependent_id] == 0 and dependent_id not in unresolvable:
+                            ready.append(dependent_id)
+                else:
+                    # In parallel mode, continue with other branches
+                    context.failed_steps.add(step_id)
+
+        # Anything never launched had a failed, missing or cancelled dependency
+        for step_exec in context.step_executions.values():
+            if step_exec.status == StepStatus.PENDING:
+                step_exec.status = StepStatus.SKIPPED
+
+    def _get_org_step_semaphore(self, organization_id: str) -> asyncio.Semaphore:
+        """Get the step concurrency limiter for an organization"""
+        semaphore = self._org_step_semaphores.get(organization_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrent_steps_per_org)
+            self._org_step_semaphores[organization_id] = semaphore
+        return semaphore
 
-                # Check for failures
-                for step in level:
-                    step_exec = context.step_executions[step.step_id]
-                    if step_exec.status == StepStatus.FAILED:
-                        context.failed_steps.add(step.step_id)
-                        # In parallel mode, continue with other steps
+    async def _execute_workflow_step_limited(
+        self,
+        step_exec: WorkflowStepExecution,
+        step: Any,
+        context: WorkflowContext
+    ):
+        """Execute a step, holding one of the organization's step slots per attempt"""
+        await self._execute_workflow_step_async(
+            step_exec, step, context, limiter=self._get_org_step_semaphore(context.organization_id)
+        )
 
     async def _execute_conditional(self, context: WorkflowContext, workflow: WorkflowDefinition):
         """Execute workflow with conditional logic based on step results"""
@@ -258,9 +314,15 @@ class WorkflowOrchestrator:
         self,
         step_exec: WorkflowStepExecution,
         step: Any,
-        context: WorkflowContext
+        context: WorkflowContext,
+        limiter: Optional[asyncio.Semaphore] = None
     ):
-        """Execute a single workflow step with retry logic"""
+        """
+        Execute a single workflow step with retry logic
+
+        ``limiter`` is held for each agent call only, so a step backing off
+        between retries does not keep other steps waiting.
+        """
         step_exec.status = StepStatus.RUNNING
         step_exec.started_at = datetime.utcnow()
 
@@ -281,7 +343,8 @@ class WorkflowOrchestrator:
                 )
 
                 # Execute the agent
-                agent_response = await self.agentkit_service.execute_agent(agent_request)
+                async with limiter or contextlib.nullcontext():
+                    agent_response = await self.agentkit_service.execute_agent(agent_request)
 
                 if agent_response.status == AgentStatus.COMPLETED:
                     # Success - update step execution
@@ -326,11 +389,12 @@ class WorkflowOrchestrator:
         self,
         step_exec: WorkflowStepExecution,
         step: Any,
-        context: WorkflowContext
+        context: WorkflowContext,
+        limiter: Optional[asyncio.Semaphore] = None
     ):
         """Execute a workflow step asynchronously (for parallel execution)"""
         try:
-            await self._execute_workflow_step(step_exec, step, context)
+            await self._execute_workflow_step(step_exec, step, context, limiter)
         except Exception as e:
             logger.error(f"Async step execution failed for {step_exec.step_id}: {str(e)}")
             step_exec.status = StepStatus.FAILED
@@ -393,48 +457,49 @@ class WorkflowOrchestrator:
                 if source_key in step_exec.output_data:
                     context.current_data[target_key] = step_exec.output_data[source_key]
 
-    async def _build_dependency_levels(self, steps: List[Any]) -> List[List[Any]]:
-        """Build dependency levels for parallel execution"""
-        # Simple topological sort for dependency ordering
-        step_map = {step.step_id: step for step in steps}
-        in_degree = {step.step_id: 0 for step in steps}
-        levels = []
+    def _build_dependency_graph(
+        self,
+        steps: List[Any]
+    ) -> Tuple[Dict[str, List[str]], Dict[str, int], Set[str]]:
+        """
+        Build adjacency lists for the step DAG in O(steps + edges)
 
-        # Calculate in-degrees
-        for step in steps:
-            if hasattr(step, 'depends_on') and step.depends_on:
-                for dep in step.depends_on:
-                    if dep in in_degree:
-                        in_degree[step.step_id] += 1
-
-        # Build levels
-        while step_map:
-            # Find steps with no dependencies
-            current_level = [
-                step for step_id, step in step_map.items()
-                if in_degree[step_id] == 0
-            ]
+        Returns:
+            (dependents by step, number of unmet dependencies by step,
+             steps depending on a step that is not part of the workflow)
+        """
+        dependents: Dict[str, List[str]] = {step.step_id: [] for step in steps}
+        pending_deps: Dict[str, int] = {step.step_id: 0 for step in steps}
+        unresolvable: Set[str] = set()
 
-            if not current_level:
-                # Handle circular dependencies or missing dependencies
-                logger.warning("Circular dependency or missing dependency detected in workflow")
-                break
+        for step in steps:
+            for dep in (getattr(step, 'depends_on', None) or []):
+                if dep in dependents:
+                    dependents[dep].append(step.step_id)
+                    pending_deps[step.step_id] += 1
+                else:
+                    unresolvable.add(step.step_id)
 
-            levels.append(current_level)
+        return dependents, pending_deps, unresolvable
 
-            # Remove current level from step_map and update in_degrees
-            for step in current_level:
-                step_id = step.step_id
-                del step_map[step_id]
+    def _validate_dependency_graph(self, steps: List[Any]):
+        """Raise ValidationError if the step dependencies contain a cycle"""
+        dependents, pending_deps, _ = self._build_dependency_graph(steps)
+        pending_deps = dict(pending_deps)
 
-                # Update in-degrees for dependent steps
-                for other_step in steps:
-                    if (hasattr(other_step, 'depends_on') and
-                        other_step.step_id in step_map and
-                        step_id in (other_step.depends_on or [])):
-                        in_degree[other_step.step_id] -= 1
+        queue = [step_id for step_id, count in pending_deps.items() if count == 0]
+        visited = 0
+        while queue:
+            step_id = queue.pop()
+            visited += 1
+            for dependent_id in dependents[step_id]:
+                pending_deps[dependent_id] -= 1
+                if pending_deps[dependent_id] == 0:
+                    queue.append(dependent_id)
 
-        return levels
+        if visited < len(pending_deps):
+            cyclic = sorted(step_id for step_id, count in pending_deps.items() if count > 0)
+            raise ValidationError(f"Circular dependency detected between workflow steps: {', '.join(cyclic)}")
 
     async def cancel_workflow(self, execution_id: str) -> bool:
         """Cancel a running workflow"""
@@ -463,12 +528,86 @@ class WorkflowOrchestrator:
 
 
 class WorkflowScheduler:
-    """Workflow scheduling and management system"""
+    """
+    Workflow scheduling and management system
+
+    Due schedules are kept in a min-heap keyed on schedule time so each tick
+    only looks at schedules that are actually due. Schedules are persisted in
+    ``scheduled_workflows`` and rehydrated on startup; replicas coordinate
+    through a lease on the schedule document so a schedule runs only once.
+    The lease is taken once an execution slot is free and renewed while the
+    workflow runs; only the replica still holding it queues the next
+    recurrence.
+    """
+
+    # Named recurrence patterns kept for backwards compatibility
+    NAMED_RECURRENCES = ('daily', 'weekly', 'monthly')
 
-    def __init__(self, orchestrator: WorkflowOrchestrator, db: AsyncIOMotorDatabase):
+    def __init__(
+        self,
+        orchestrator: WorkflowOrchestrator,
+        db: AsyncIOMotorDatabase,
+        max_concurrent_executions: int = 10,
+        lease_seconds: int = 600,
+        instance_id: Optional[str] = None
+    ):
         self.orchestrator = orchestrator
         self.db = db
         self.scheduled_workflows: Dict[str, Dict[str, Any]] = {}
+        self.max_concurrent_executions = max_concurrent_executions
+        self.lease_seconds = lease_seconds
+        self.instance_id = instance_id or str(uuid.uuid4())
+
+        # (schedule_time, schedule_id) entries; stale entries are skipped lazily
+        self._due_heap: List[Tuple[datetime, str]] = []
+        self._execution_semaphore = asyncio.Semaphore(max_concurrent_executions)
+        self._running_tasks: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._stopped = False
+
+        self.stats: Dict[str, Any] = {
+            'executed': 0,
+            'failed': 0,
+            'lease_conflicts': 0,
+            'last_lag_seconds': 0.0,
+            'max_lag_seconds': 0.0
+        }
+
+    def _push_schedule(self, schedule: Dict[str, Any]):
+        """Track a schedule in memory and in the due heap"""
+        self.scheduled_workflows[schedule['schedule_id']] = schedule
+        heapq.heappush(self._due_heap, (schedule['schedule_time'], schedule['schedule_id']))
+        self._wakeup.set()
+
+    async def load_schedules(self) -> int:
+        """
+        Rehydrate pending schedules from the database
+
+        Picks up schedules that are waiting to run as well as runs whose lease
+        expired (e.g. the replica executing them crashed).
+        """
+        now = datetime.utcnow()
+        cursor = self.db.scheduled_workflows.find({
+            '$or': [
+                {'status': 'scheduled'},
+                {'status': 'running', 'lease_expires_at': {'$lt': now}}
+            ]
+        })
+
+        loaded = 0
+        async for schedule in cursor:
+            schedule.pop('_id', None)
+            # Expired leases are reclaimed through the normal claim path
+            schedule['status'] = 'scheduled'
+            known = self.scheduled_workflows.get(schedule['schedule_id'])
+            if known and known['schedule_time'] == schedule['schedule_time']:
+                continue
+            self._push_schedule(schedule)
+            loaded += 1
+
+        if loaded:
+            logger.info(f"Loaded {loaded} pending workflow schedules")
+        return loaded
 
     async def schedule_workflow(
         self,
@@ -478,9 +617,21 @@ class WorkflowScheduler:
         user_id: str,
         organization_id: str,
         recurring: bool = False,
-        recurrence_pattern: Optional[str] = None
+        recurrence_pattern: Optional[str] = None,
+        recurrence_anchor: Optional[datetime] = None
     ) -> str:
-        """Schedule a workflow for future execution"""
+        """
+        Schedule a workflow for future execution
+
+        ``recurrence_pattern`` is either one of ``daily``, ``weekly``,
+        ``monthly`` or a 5-field cron expression (e.g. ``0 9 * * 1-5``).
+        ``recurrence_anchor`` is the first occurrence of a recurring
+        schedule; monthly runs keep its day of month.
+        """
+        if recurring and recurrence_pattern and recurrence_pattern not in self.NAMED_RECURRENCES:
+            if not CronExpression.is_valid(recurrence_pattern):
+                raise ValidationError(f"Invalid recurrence pattern: {recurrence_pattern}")
+
         schedule_id = str(uuid.uuid4())
 
         schedule_data = {
@@ -492,29 +643,120 @@ class WorkflowScheduler:
             'organization_id': organization_id,
             'recurring': recurring,
             'recurrence_pattern': recurrence_pattern,
+            'recurrence_anchor': recurrence_anchor or schedule_time,
             'status': 'scheduled',
             'created_at': datetime.utcnow()
         }
 
-        self.scheduled_workflows[schedule_id] = schedule_data
+        # Store in database (insert_one adds _id to the dict it is given)
+        await self.db.scheduled_workflows.insert_one(dict(schedule_data))
 
-        # Store in database
-        await self.db.scheduled_workflows.insert_one(schedule_data)
+        self._push_schedule(schedule_data)
 
         logger.info(f"Scheduled workflow {workflow_id} for execution at {schedule_time}")
         return schedule_id
 
-    async def process_scheduled_workflows(self):
-        """Process and execute scheduled workflows"""
+    def next_due_time(self) -> Optional[datetime]:
+        """Return the time of the earliest pending schedule"""
+        while self._due_heap:
+            schedule_time, schedule_id = self._due_heap[0]
+            if self._is_current_heap_entry(schedule_time, schedule_id):
+                return schedule_time
+            heapq.heappop(self._due_heap)
+        return None
+
+    def _is_current_heap_entry(self, schedule_time: datetime, schedule_id: str) -> bool:
+        schedule = self.scheduled_workflows.get(schedule_id)
+        return (
+            schedule is not None and
+            schedule['status'] == 'scheduled' and
+            schedule['schedule_time'] == schedule_time
+        )
+
+    def _pop_due_schedules(self, now: datetime) -> List[Dict[str, Any]]:
+        """Pop every schedule whose time has come (O(k log n) for k due)"""
+        due = []
+        while self._due_heap and self._due_heap[0][0] <= now:
+            schedule_time, schedule_id = heapq.heappop(self._due_heap)
+            if self._is_current_heap_entry(schedule_time, schedule_id):
+                due.append(self.scheduled_workflows[schedule_id])
+        return due
+
+    async def _claim_schedule(self, schedule: Dict[str, Any]) -> bool:
+        """Take a lease on a schedule so no other replica runs it"""
         now = datetime.utcnow()
+        claimed = await self.db.scheduled_workflows.find_one_and_update(
+            {
+                'schedule_id': schedule['schedule_id'],
+                '$or': [
+                    {'status': 'scheduled'},
+                    {'status': 'running', 'lease_expires_at': {'$lt': now}}
+                ]
+            },
+            {'$set': {
+                'status': 'running',
+                'lease_owner': self.instance_id,
+                'lease_expires_at': now + timedelta(seconds=self.lease_seconds),
+                'claimed_at': now
+            }}
+        )
+        return claimed is not None
 
-        # Find workflows ready for execution
-        ready_workflows = [
-            schedule for schedule in self.scheduled_workflows.values()
-            if schedule['schedule_time'] <= now and schedule['status'] == 'scheduled'
-        ]
+    async def process_scheduled_workflows(self, wait: bool = True) -> int:
+        """
+        Execute scheduled workflows that are due
 
-        for schedule in ready_workflows:
+        Executions run concurrently, bounded by ``max_concurrent_executions``;
+        each schedule is claimed once it has an execution slot, so a lease
+        never expires while the run waits for one. With ``wait=False`` the
+        executions are left running in the background (used by :meth:`run`)
+        so a slow workflow never delays the next tick.
+
+        Returns:
+            Number of schedules dispatched
+        """
+        now = datetime.utcnow()
+        tasks = []
+
+        for schedule in self._pop_due_schedules(now):
+            # Off the heap until it is claimed or given up
+            schedule['status'] = 'queued'
+            task = asyncio.create_task(self._run_schedule(schedule))
+            self._running_tasks.add(task)
+            task.add_done_callback(self._running_tasks.discard)
+            tasks.append(task)
+
+        if wait and tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return len(tasks)
+
+    async def _run_schedule(self, schedule: Dict[str, Any]):
+        """Claim a due schedule, execute it and record the outcome"""
+        async with self._execution_semaphore:
+            try:
+                claimed = await self._claim_schedule(schedule)
+            except Exception as e:
+                logger.error(f"Failed to claim schedule {schedule['schedule_id']}: {str(e)}")
+                # Leave it for the next rehydration
+                self.scheduled_workflows.pop(schedule['schedule_id'], None)
+                return
+
+            if not claimed:
+                # Another replica owns this run
+                self.stats['lease_conflicts'] += 1
+                self.scheduled_workflows.pop(schedule['schedule_id'], None)
+                return
+
+            schedule['status'] = 'running'
+            heartbeat = asyncio.create_task(self._renew_lease(schedule['schedule_id']))
+            started_at = datetime.utcnow()
+            lag_seconds = (started_at - schedule['schedule_time']).total_seconds()
+            self.stats['last_lag_seconds'] = lag_seconds
+            self.stats['max_lag_seconds'] = max(self.stats['max_lag_seconds'], lag_seconds)
+
+            status = 'failed'
+            error = None
             try:
                 # Get workflow definition
                 workflow_data = await self.db.agentkit_workflows.find_one({
@@ -522,43 +764,129 @@ class WorkflowScheduler:
                 })
 
                 if not workflow_data:
-                    logger.error(f"Scheduled workflow {schedule['workflow_id']} not found")
-                    continue
+                    error = f"Scheduled workflow {schedule['workflow_id']} not found"
+                    logger.error(error)
+                else:
+                    workflow = WorkflowDefinition(**workflow_data)
+
+                    # Execute workflow
+                    await self.orchestrator.execute_workflow(
+                        workflow=workflow,
+                        input_data=schedule['input_data'],
+                        user_id=schedule['user_id'],
+                        organization_id=schedule['organization_id']
+                    )
+                    status = 'completed'
+
+            except Exception as e:
+                logger.error(f"Failed to execute scheduled workflow {schedule['workflow_id']}: {str(e)}")
+                error = str(e)
+            finally:
+                heartbeat.cancel()
+
+            self.stats['executed' if status == 'completed' else 'failed'] += 1
+            try:
+                metrics_collector.record_scheduled_workflow_run(status, lag_seconds)
+            except Exception as e:
+                logger.error(f"Error recording scheduler metrics: {e}")
 
-                workflow = WorkflowDefinition(**workflow_data)
+        await self._finish_schedule(schedule, status, error, started_at)
 
-                # Execute workflow
-                await self.orchestrator.execute_workflow(
-                    workflow=workflow,
-                    input_data=schedule['input_data'],
-                    user_id=schedule['user_id'],
-                    organization_id=schedule['organization_id']
+    async def _renew_lease(self, schedule_id: str):
+        """Keep extending the lease on a running schedule until cancelled"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                result = await self.db.scheduled_workflows.update_one(
+                    {'schedule_id': schedule_id, 'lease_owner': self.instance_id},
+                    {'$set': {'lease_expires_at': datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
                 )
+                if not result.matched_count:
+                    logger.warning(f"Lost the lease on schedule {schedule_id}")
+                    return
+            except Exception as e:
+                logger.error(f"Error renewing schedule lease: {str(e)}")
+
+    async def _finish_schedule(
+        self,
+        schedule: Dict[str, Any],
+        status: str,
+        error: Optional[str],
+        started_at: datetime
+    ):
+        """
+        Persist the outcome, release the lease and queue the next recurrence
 
-                # Update schedule status
-                schedule['status'] = 'completed'
-                schedule['executed_at'] = datetime.utcnow()
+        The recurrence is only queued while this replica still holds the
+        lease; otherwise whoever took it over queues it.
+        """
+        schedule['status'] = status
+        schedule['executed_at'] = started_at
+        update = {
+            'status': status,
+            'executed_at': started_at,
+            'completed_at': datetime.utcnow(),
+            'lag_seconds': (started_at - schedule['schedule_time']).total_seconds()
+        }
+        if error:
+            schedule['error'] = error
+            update['error'] = error
+
+        owned = False
+        try:
+            result = await self.db.scheduled_workflows.update_one(
+                {'schedule_id': schedule['schedule_id'], 'lease_owner': self.instance_id},
+                {'$set': update, '$unset': {'lease_owner': '', 'lease_expires_at': ''}}
+            )
+            owned = result.matched_count > 0
+            if not owned:
+                self.stats['lease_conflicts'] += 1
+                logger.warning(f"Schedule {schedule['schedule_id']} was taken over before it finished")
+        except Exception as e:
+            logger.error(f"Failed to update schedule {schedule['schedule_id']}: {str(e)}")
 
-                # Handle recurring workflows
-                if schedule['recurring'] and schedule['recurrence_pattern']:
-                    await self._schedule_next_recurrence(schedule)
+        self.scheduled_workflows.pop(schedule['schedule_id'], None)
 
+        # Handle recurring workflows (failed runs still recur)
+        if owned and schedule['recurring'] and schedule['recurrence_pattern']:
+            try:
+                await self._schedule_next_recurrence(schedule)
             except Exception as e:
-                logger.error(f"Failed to execute scheduled workflow {schedule['workflow_id']}: {str(e)}")
-                schedule['status'] = 'failed'
-                schedule['error'] = str(e)
+                logger.error(f"Failed to schedule next recurrence of {schedule['schedule_id']}: {str(e)}")
+
+    def _advance_recurrence(self, pattern: str, previous: datetime, anchor_day: Optional[int] = None) -> datetime:
+        """Return the occurrence following ``previous`` for a recurrence pattern"""
+        if pattern == 'daily':
+            return previous + timedelta(days=1)
+        if pattern == 'weekly':
+            return previous + timedelta(weeks=1)
+        if pattern == 'monthly':
+            return _add_months(previous, 1, anchor_day)
+        return CronExpression(pattern).next_after(previous)
+
+    def _next_recurrence_time(self, schedule: Dict[str, Any]) -> Optional[datetime]:
+        """Compute the next fire time for a recurring schedule"""
+        pattern = schedule['recurrence_pattern']
+        anchor_day = (schedule.get('recurrence_anchor') or schedule['schedule_time']).day
+        now = datetime.utcnow()
+
+        try:
+            next_time = self._advance_recurrence(pattern, schedule['schedule_time'], anchor_day)
+            # Skip occurrences missed while the scheduler was down instead of
+            # replaying them back to back
+            while next_time <= now:
+                next_time = self._advance_recurrence(pattern, next_time, anchor_day)
+        except CronError as e:
+            logger.error(f"Invalid recurrence pattern for schedule {schedule['schedule_id']}: {str(e)}")
+            return None
+
+        return next_time
 
     async def _schedule_next_recurrence(self, schedule: Dict[str, Any]):
         """Schedule next recurrence for recurring workflows"""
-        # Simple implementation - can be extended with cron-like patterns
-        if schedule['recurrence_pattern'] == 'daily':
-            next_time = schedule['schedule_time'] + timedelta(days=1)
-        elif schedule['recurrence_pattern'] == 'weekly':
-            next_time = schedule['schedule_time'] + timedelta(weeks=1)
-        elif schedule['recurrence_pattern'] == 'monthly':
-            next_time = schedule['schedule_time'] + timedelta(days=30)
-        else:
-            return  # Unknown pattern
+        next_time = self._next_recurrence_time(schedule)
+        if next_time is None:
+            return
 
         await self.schedule_workflow(
             workflow_id=schedule['workflow_id'],
@@ -567,5 +895,74 @@ class WorkflowScheduler:
             user_id=schedule['user_id'],
             organization_id=schedule['organization_id'],
             recurring=True,
-            recurrence_pattern=schedule['recurrence_pattern']
+            recurrence_pattern=schedule['recurrence_pattern'],
+            recurrence_anchor=schedule.get('recurrence_anchor') or schedule['schedule_time']
         )
+
+    async def run(self, poll_interval: float = 30.0, refresh_interval: float = 60.0):
+        """
+        Scheduler loop: rehydrate, then sleep until the next due schedule
+
+        ``refresh_interval`` controls how often schedules created by other
+        replicas (and expired leases) are picked up from the database.
+        """
+        self._stopped = False
+        await self.load_schedules()
+        last_refresh = datetime.utcnow()
+
+        while not self._stopped:
+            try:
+                if (datetime.utcnow() - last_refresh).total_seconds() >= refresh_interval:
+                    await self.load_schedules()
+                    last_refresh = datetime.utcnow()
+
+                await self.process_scheduled_workflows(wait=False)
+            except Exception as e:
+                logger.error(f"Workflow scheduler tick failed: {str(e)}")
+
+            timeout = poll_interval
+            next_due = self.next_due_time()
+            if next_due is not None:
+                timeout = min(poll_interval, max((next_due - datetime.utcnow()).total_seconds(), 0.0))
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self, wait: bool = True):
+        """Stop the scheduler loop, optionally waiting for running executions"""
+        self._stopped = True
+        self._wakeup.set()
+        if wait and self._running_tasks:
+            await asyncio.gather(*list(self._running_tasks), return_exceptions=True)
+
+    def get_scheduler_stats(self) -> Dict[str, Any]:
+        """Return scheduler health and lag statistics"""
+        next_due = self.next_due_time()
+        now = datetime.utcnow()
+        return {
+            **self.stats,
+            'pending_schedules': sum(
+                1 for s in self.scheduled_workflows.values() if s['status'] == 'scheduled'
+            ),
+            'running_executions': len(self._running_tasks),
+            'next_due_at': next_due.isoformat() if next_due else None,
+            'current_lag_seconds': max((now - next_due).total_seconds(), 0.0) if next_due else 0.0
+        }
+
+
+def _add_months(dt: datetime, months: int, day: Optional[int] = None) -> datetime:
+    """
+    Add calendar months, on ``day`` (default: the day of ``dt``) clamped to
+    the end of the target month
+
+    Passing the original day keeps a series anchored: Jan 31 -> Feb 29 ->
+    Mar 31, rather than drifting to the 29th.
+    """
+    month_index = dt.month - 1 + months
+    year = dt.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(day or dt.day, calendar.monthrange(year, month)[1])
+    return dt.replace(year=year, month=month, day=day)
@@ -0,0 +1,99 @@
+"""
+Tests for the real-time personalization event and segment refresh routes
+"""
+
+from datetime import datetime
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from services import segment_engine
+
+routes = pytest.importorskip("api.real_time_personalization_routes")
+
+EVENT = {"user_id": "u1", "event_type": "click", "properties": {"item_type": "shoes"}, "session_id": "s1"}
+
+
+@pytest.fixture
+def service(fake_db, fake_redis, monkeypatch):
+    monkeypatch.setattr(segment_engine, "segment_cache", None)
+    fake_db.user_profiles.docs.append({
+        "user_id": "u1",
+        "demographics": {"country": "US"},
+        "behaviors": [],
+        "preferences": {},
+        "segments": [],
+        "engagement_score": 0.0,
+        "last_updated": datetime.utcnow().isoformat(),
+        "behavior_counts": {},
+    })
+    return routes.RealTimePersonalizationService(fake_db, fake_redis)
+
+
+def client_for(service):
+    app = FastAPI()
+    app.include_router(routes.router)
+    app.dependency_overrides[routes.get_personalization_service] = lambda: service
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+class TestEventRoute:
+    @pytest.mark.asyncio
+    async def test_event_is_accepted_then_applied(self, service, fake_db):
+        async with client_for(service) as client:
+            response = await client.post("/api/personalization/events", json=EVENT)
+        await service.close()
+
+        assert response.status_code == 202
+        assert response.json()["status"] == "accepted"
+        assert service.profile_manager.event_buffer.applied == 1
+        profile = await fake_db.user_profiles.find_one({"user_id": "u1"})
+        assert [b["event_type"] for b in profile["behaviors"]] == ["click"]
+        assert profile["preferences"] == {"click_preferences": {"shoes": 1}}
+        assert len(fake_db.behavioral_events.docs) == 1
+
+    @pytest.mark.asyncio
+    async def test_full_buffer_is_rejected_with_503(self, service):
+        service.profile_manager.event_buffer.max_pending = 1
+        async with client_for(service) as client:
+            accepted = await client.post("/api/personalization/events", json=EVENT)
+            rejected = await client.post("/api/personalization/events", json=EVENT)
+        await service.close()
+
+        assert (accepted.status_code, rejected.status_code) == (202, 503)
+        assert service.profile_manager.event_buffer.applied == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_event_type_is_rejected(self, service):
+        async with client_for(service) as client:
+            response = await client.post("/api/personalization/events", json={**EVENT, "event_type": "hover"})
+
+        assert response.status_code == 400
+
+
+class TestSegmentRefreshRoute:
+    @pytest.mark.asyncio
+    async def test_refresh_rebuilds_then_reevaluates_updated_profiles(self, service, fake_db, fake_redis):
+        fake_db.audience_segments.docs.append(
+            {"segment_id": "us", "criteria": {"demographics": {"country": "US"}}, "active": True}
+        )
+
+        async with client_for(service) as client:
+            full = await client.post("/api/personalization/segments/us/refresh")
+            incremental = await client.post("/api/personalization/segments/us/refresh")
+            rebuilt = await client.post("/api/personalization/segments/us/refresh", params={"full": "true"})
+
+        assert full.status_code == 200
+        assert (full.json()["mode"], full.json()["size"]) == ("full", 1)
+        assert incremental.json()["mode"] == "incremental"
+        assert rebuilt.json()["mode"] == "full"
+        assert fake_redis.sets["segment:us"] == {"u1"}
+        assert (await fake_db.audience_segments.find_one({"segment_id": "us"}))["size"] == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_segment_is_404(self, service):
+        async with client_for(service) as client:
+            response = await client.post("/api/personalization/segments/missing/refresh")
+
+        assert response.status_code == 404
@@ -4,10 +4,13 @@ Pytest configuration and fixtures for all tests
 
 import pytest
 import asyncio
+import copy
+from types import SimpleNamespace
 from typing import AsyncGenerator, Generator
 from unittest.mock import AsyncMock, MagicMock
 from motor.motor_asyncio import AsyncIOMotorClient
 from fastapi.testclient import TestClient
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
 import os
 
 # Set test environment variables
@@ -113,3 +116,592 @@ async def mock_integration() -> dict:
         }
     }
 
+
+# In-memory stand-ins for Motor and redis.asyncio, for tests that need
+# state to persist between calls rather than canned return values
+
+_MISSING = object()
+
+
+def _get_path(doc, path):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def _set_path(doc, path, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _unset_path(doc, path):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+def _value_matches(value, expected):
+    if value is _MISSING:
+        return expected is None
+    if isinstance(value, list) and not isinstance(expected, list):
+        return expected in value
+    return value == expected
+
+
+def _condition_matches(value, op, operand):
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if op == "$eq":
+        return _value_matches(value, operand)
+    if op == "$ne":
+        return not _value_matches(value, operand)
+    if op == "$in":
+        return any(_value_matches(value, candidate) for candidate in operand)
+    if op == "$nin":
+        return not any(_value_matches(value, candidate) for candidate in operand)
+    if op in ("$lt", "$lte", "$gt", "$gte"):
+        if value is _MISSING or value is None:
+            return False
+        try:
+            return {
+                "$lt": value < operand,
+                "$lte": value <= operand,
+                "$gt": value > operand,
+                "$gte": value >= operand
+            }[op]
+        except TypeError:
+            return False
+    raise NotImplementedError(f"FakeCollection does not support {op}")
+
+
+def matches_query(doc, query):
+    """Whether ``doc`` matches a MongoDB filter, for the operators tests use"""
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches_query(doc, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(matches_query(doc, clause) for clause in condition):
+                return False
+        elif key.startswith("$"):
+            raise NotImplementedError(f"FakeCollection does not support {key}")
+        elif isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            value = _get_path(doc, key)
+            if not all(_condition_matches(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif not _value_matches(_get_path(doc, key), condition):
+            return False
+    return True
+
+
+def apply_update(doc, update, inserting=False):
+    """Apply MongoDB update operators to ``doc`` in place"""
+    for op, fields in update.items():
+        if op == "$setOnInsert" and not inserting:
+            continue
+        for path, value in fields.items():
+            current = _get_path(doc, path)
+            if op in ("$set", "$setOnInsert"):
+                _set_path(doc, path, copy.deepcopy(value))
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                _set_path(doc, path, (0 if current is _MISSING else current) + value)
+            elif op in ("$min", "$max"):
+                if current is _MISSING or (value < current if op == "$min" else value > current):
+                    _set_path(doc, path, value)
+            elif op in ("$push", "$addToSet"):
+                items = list(current) if isinstance(current, list) else []
+                each = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                for item in each:
+                    if op == "$push" or item not in items:
+                        items.append(copy.deepcopy(item))
+                if op == "$push" and isinstance(value, dict) and "$slice" in value:
+                    limit = value["$slice"]
+                    items = items[limit:] if limit < 0 else items[:limit]
+                _set_path(doc, path, items)
+            elif op == "$pull":
+                if isinstance(current, list):
+                    removed = value["$in"] if isinstance(value, dict) and "$in" in value else [value]
+                    _set_path(doc, path, [item for item in current if item not in removed])
+            else:
+                raise NotImplementedError(f"FakeCollection does not support {op}")
+
+
+def _project(doc, projection):
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    included = [field for field, flag in projection.items() if flag and field != "_id"]
+    if included:
+        projected = {}
+        for field in included:
+            value = _get_path(doc, field)
+            if value is not _MISSING:
+                _set_path(projected, field, value)
+        if projection.get("_id", 1) and "_id" in doc:
+            projected["_id"] = doc["_id"]
+        return projected
+    for field, flag in projection.items():
+        if not flag:
+            _unset_path(doc, field)
+    return doc
+
+
+def _sort_documents(docs, sort):
+    for key, direction in reversed(list(sort or [])):
+        present = [d for d in docs if _get_path(d, key) not in (_MISSING, None)]
+        absent = [d for d in docs if _get_path(d, key) in (_MISSING, None)]
+        present.sort(key=lambda d: _get_path(d, key), reverse=direction < 0)
+        docs = absent + present if direction > 0 else present + absent
+    return docs
+
+
+class FakeCursor:
+    """Async cursor over a list of documents; ``read`` counts documents returned"""
+
+    def __init__(self, docs, before_read=None):
+        self.docs = list(docs)
+        self.before_read = before_read
+        self.read = 0
+        self.batch = None
+
+    def sort(self, key, direction=None):
+        self.docs = _sort_documents(self.docs, [(key, direction or 1)] if isinstance(key, str) else key)
+        return self
+
+    def skip(self, n):
+        self.docs = self.docs[n:]
+        return self
+
+    def limit(self, n):
+        if n:
+            self.docs = self.docs[:n]
+        return self
+
+    def batch_size(self, size):
+        self.batch = size
+        return self
+
+    async def to_list(self, length=None):
+        if self.before_read is not None:
+            await self.before_read()
+        docs = self.docs if length is None else self.docs[:length]
+        self.read += len(docs)
+        return list(docs)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        if self.before_read is not None:
+            await self.before_read()
+        for doc in self.docs:
+            self.read += 1
+            yield doc
+
+
+class FakeChangeStream:
+    """Change stream fed through ``changes``"""
+
+    def __init__(self):
+        self.changes = asyncio.Queue()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.changes.get()
+
+
+class FakeCollection:
+    """
+    In-memory Motor collection
+
+    ``queries`` records each find filter and projection, ``pipelines``
+    each aggregation and ``bulk_writes`` the size of each bulk write.
+    ``aggregate`` returns ``aggregate_results``; ``before_read``, when set,
+    is awaited before any query returns.
+    """
+
+    def __init__(self, docs=()):
+        self.docs = [copy.deepcopy(doc) for doc in docs]
+        self.queries = []
+        self.pipelines = []
+        self.inserted_batches = []
+        self.bulk_writes = []
+        self.indexes = []
+        self.aggregate_results = []
+        self.before_read = None
+        self.change_stream = None
+
+    def _matching(self, query, sort=None):
+        return _sort_documents([doc for doc in self.docs if matches_query(doc, query)], sort)
+
+    def _result(self, **values):
+        result = {"matched_count": 0, "modified_count": 0, "upserted_id": None, "deleted_count": 0}
+        result.update(values)
+        return SimpleNamespace(**result)
+
+    def _upsert(self, query, update):
+        doc = {
+            key: value for key, value in (query or {}).items()
+            if not key.startswith("$") and not (isinstance(value, dict) and any(k.startswith("$") for k in value))
+        }
+        apply_update(doc, update, inserting=True)
+        self.docs.append(doc)
+        return doc
+
+    def find(self, query=None, projection=None, sort=None, **kwargs):
+        self.queries.append((query, projection))
+        docs = [_project(doc, projection) for doc in self._matching(query, sort)]
+        return FakeCursor(docs, self.before_read)
+
+    async def find_one(self, query=None, projection=None, sort=None, **kwargs):
+        self.queries.append((query, projection))
+        if self.before_read is not None:
+            await self.before_read()
+        found = self._matching(query, sort)
+        return _project(found[0], projection) if found else None
+
+    async def count_documents(self, query=None, **kwargs):
+        if self.before_read is not None:
+            await self.before_read()
+        return len(self._matching(query))
+
+    def aggregate(self, pipeline, **kwargs):
+        self.pipelines.append(pipeline)
+        return FakeCursor(self.aggregate_results, self.before_read)
+
+    async def insert_one(self, doc, **kwargs):
+        self.docs.append(copy.deepcopy(doc))
+        return self._result(inserted_id=doc.get("_id"))
+
+    async def insert_many(self, documents, ordered=True, **kwargs):
+        documents = list(documents)
+        self.inserted_batches.append(documents)
+        self.docs.extend(copy.deepcopy(doc) for doc in documents)
+        return self._result(inserted_ids=[doc.get("_id") for doc in documents])
+
+    async def update_one(self, query, update, upsert=False, **kwargs):
+        found = self._matching(query)
+        if found:
+            apply_update(found[0], update)
+            return self._result(matched_count=1, modified_count=1)
+        if upsert:
+            return self._result(upserted_id=self._upsert(query, update).get("_id", True))
+        return self._result()
+
+    async def update_many(self, query, update, upsert=False, **kwargs):
+        found = self._matching(query)
+        for doc in found:
+            apply_update(doc, update)
+        if not found and upsert:
+            self._upsert(query, update)
+        return self._result(matched_count=len(found), modified_count=len(found))
+
+    async def replace_one(self, query, replacement, upsert=False, **kwargs):
+        found = self._matching(query)
+        if found:
+            self.docs[self.docs.index(found[0])] = copy.deepcopy(replacement)
+            return self._result(matched_count=1, modified_count=1)
+        if upsert:
+            self.docs.append(copy.deepcopy(replacement))
+        return self._result()
+
+    async def find_one_and_update(
+        self, query, update, projection=None, sort=None, upsert=False, return_document=False, **kwargs
+    ):
+        found = self._matching(query, sort)
+        if not found:
+            if not upsert:
+                return None
+            doc = self._upsert(query, update)
+            return _project(doc, projection) if return_document else None
+        before = copy.deepcopy(found[0])
+        apply_update(found[0], update)
+        return _project(found[0] if return_document else before, projection)
+
+    async def delete_one(self, query, **kwargs):
+        found = self._matching(query)[:1]
+        for doc in found:
+            self.docs.remove(doc)
+        return self._result(deleted_count=len(found))
+
+    async def delete_many(self, query, **kwargs):
+        found = self._matching(query)
+        for doc in found:
+            self.docs.remove(doc)
+        return self._result(deleted_count=len(found))
+
+    async def bulk_write(self, requests, ordered=True, **kwargs):
+        requests = list(requests)
+        self.bulk_writes.append(len(requests))
+        modified = 0
+        for request in requests:
+            if isinstance(request, InsertOne):
+                await self.insert_one(request._doc)
+            elif isinstance(request, (UpdateOne, UpdateMany)):
+                write = self.update_one if isinstance(request, UpdateOne) else self.update_many
+                modified += (await write(request._filter, request._doc, upsert=request._upsert)).modified_count
+            elif isinstance(request, ReplaceOne):
+                modified += (await self.replace_one(request._filter, request._doc, upsert=request._upsert)).modified_count
+            elif isinstance(request, DeleteOne):
+                await self.delete_one(request._filter)
+            else:
+                raise NotImplementedError(f"FakeCollection does not support {type(request).__name__}")
+        return self._result(modified_count=modified)
+
+    async def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+        return str(keys)
+
+    def stream_changes(self):
+        """Let ``watch`` open a change stream, as on a replica set; returns the stream to feed"""
+        self.change_stream = FakeChangeStream()
+        return self.change_stream
+
+    def watch(self, *args, **kwargs):
+        if self.change_stream is None:
+            raise RuntimeError("The $changeStream stage is only supported on replica sets")
+        return self.change_stream
+
+
+class FakeDatabase:
+    """In-memory Motor database; collections are created on first access"""
+
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+class FakePipeline:
+    """Queues commands and runs them in one round trip on ``execute``"""
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, f"_{name}")
+
+        def queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self):
+        self.redis._round_trip()
+        commands, self.commands = self.commands, []
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+class FakeRedis:
+    """
+    In-memory redis.asyncio client
+
+    Every command and pipeline execution counts one of ``round_trips``;
+    with ``fail`` set they raise ``ConnectionError`` instead. Values come
+    back as bytes unless ``decode_responses`` is set, as with redis-py.
+    """
+
+    def __init__(self, decode_responses=False):
+        self.decode_responses = decode_responses
+        self.fail = False
+        self.round_trips = 0
+        self.values = {}
+        self.expiry = {}
+        self.sets = {}
+        self.lists = {}
+        self.hashes = {}
+        self._pushed = asyncio.Event()
+
+    def _round_trip(self):
+        if self.fail:
+            raise ConnectionError("redis unavailable")
+        self.round_trips += 1
+
+    def _out(self, value):
+        if value is None or self.decode_responses or not isinstance(value, str):
+            return value
+        return value.encode()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        command = getattr(self, f"_{name}")
+
+        async def call(*args, **kwargs):
+            self._round_trip()
+            return command(*args, **kwargs)
+
+        return call
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def _get(self, key):
+        return self._out(self.values.get(key))
+
+    def _set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        self.expiry[key] = ex
+        return True
+
+    def _setex(self, key, seconds, value):
+        return self._set(key, value, ex=seconds)
+
+    def _exists(self, *keys):
+        return sum(any(key in store for store in (self.values, self.sets, self.lists, self.hashes)) for key in keys)
+
+    def _delete(self, *keys):
+        removed = 0
+        for key in keys:
+            for store in (self.values, self.sets, self.lists, self.hashes):
+                removed += store.pop(key, None) is not None
+        return removed
+
+    def _expire(self, key, seconds):
+        self.expiry[key] = seconds
+        return True
+
+    def _rename(self, source, destination):
+        for store in (self.values, self.sets, self.lists, self.hashes):
+            if source in store:
+                store[destination] = store.pop(source)
+        return True
+
+    def _sadd(self, key, *members):
+        added = set(members) - self.sets.get(key, set())
+        self.sets.setdefault(key, set()).update(added)
+        return len(added)
+
+    def _srem(self, key, *members):
+        current = self.sets.get(key, set())
+        removed = current & set(members)
+        current -= removed
+        if not current:
+            self.sets.pop(key, None)
+        return len(removed)
+
+    def _smembers(self, key):
+        return {self._out(member) for member in self.sets.get(key, set())}
+
+    def _scard(self, key):
+        return len(self.sets.get(key, set()))
+
+    def _sismember(self, key, member):
+        return member in self.sets.get(key, set())
+
+    def _sdiff(self, key, *others):
+        members = self.sets.get(key, set()).difference(*(self.sets.get(other, set()) for other in others))
+        return {self._out(member) for member in members}
+
+    def _hset(self, key, field=None, value=None, mapping=None):
+        fields = dict(mapping or {})
+        if field is not None:
+            fields[field] = value
+        self.hashes.setdefault(key, {}).update(fields)
+        return len(fields)
+
+    def _hget(self, key, field):
+        return self._out(self.hashes.get(key, {}).get(field))
+
+    def _hgetall(self, key):
+        return {self._out(field): self._out(value) for field, value in self.hashes.get(key, {}).items()}
+
+    def _rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+        self._pushed.set()
+        return len(self.lists[key])
+
+    def _lpush(self, key, *values):
+        self.lists.setdefault(key, [])[:0] = reversed(values)
+        self._pushed.set()
+        return len(self.lists[key])
+
+    def _lrange(self, key, start, end):
+        values = self.lists.get(key, [])
+        return [self._out(value) for value in values[start:None if end == -1 else end + 1]]
+
+    def _llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def _lpop(self, key):
+        values = self.lists.get(key)
+        if not values:
+            return None
+        value = values.pop(0)
+        if not values:
+            del self.lists[key]
+        return self._out(value)
+
+    async def blpop(self, keys, timeout=0):
+        """Pop from the first non-empty list; ``None`` after ``timeout`` seconds"""
+        self._round_trip()
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout else None
+        while True:
+            for key in keys:
+                if self.lists.get(key):
+                    return (self._out(key), self._lpop(key))
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                return None
+            self._pushed.clear()
+            try:
+                await asyncio.wait_for(self._pushed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def fake_db() -> FakeDatabase:
+    """In-memory Motor database"""
+    return FakeDatabase()
+
+
+@pytest.fixture
+def fake_redis() -> FakeRedis:
+    """In-memory Redis client"""
+    return FakeRedis()
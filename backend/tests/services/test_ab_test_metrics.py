@@ -0,0 +1,39 @@
+"""
+Tests for recording A/B test variant metrics
+"""
+
+import pytest
+
+from services.campaign_management_service import A_BTestingManager
+
+
+@pytest.fixture
+def manager(fake_db):
+    fake_db.ab_tests.docs.append({
+        "test_id": "t1",
+        "client_id": "client1",
+        "is_active": True,
+        "variants": [{"variant_id": "a", "name": "A"}, {"variant_id": "b", "name": "B"}]
+    })
+    return A_BTestingManager(fake_db)
+
+
+@pytest.mark.asyncio
+async def test_records_observations_for_a_known_variant(manager, fake_db):
+    result = await manager.record_metrics("t1", "client1", "a", [{"impressions": 1, "clicks": 1}])
+
+    assert result["recorded"] == 1
+    assert [doc["variant_id"] for doc in fake_db.ab_test_variant_stats.docs] == ["a"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("test_id, client_id, variant_id", [
+    ("missing", "client1", "a"),
+    ("t1", "client2", "a"),
+    ("t1", "client1", "c"),
+])
+async def test_unknown_test_or_variant_is_rejected(manager, fake_db, test_id, client_id, variant_id):
+    with pytest.raises(ValueError):
+        await manager.record_metrics(test_id, client_id, variant_id, [{"impressions": 1}])
+
+    assert fake_db.ab_test_variant_stats.docs == []
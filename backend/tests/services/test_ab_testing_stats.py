@@ -0,0 +1,115 @@
+"""
+Tests for A/B test statistics
+"""
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from services.ab_testing_stats import (
+    VariantStats,
+    evaluate,
+    obrien_fleming_boundary,
+    observation_increments,
+)
+
+
+def stats_from_samples(samples, metric="conversions"):
+    """Build sufficient statistics from raw per-observation samples"""
+    metrics = [metric]
+    return VariantStats(
+        metrics=metrics,
+        n=np.array([len(s) for s in samples], dtype=np.float64),
+        sums=np.array([[np.sum(s)] for s in samples]),
+        sums_sq=np.array([[np.sum(np.square(s))] for s in samples])
+    )
+
+
+def test_observation_increments():
+    increments = observation_increments([
+        {"impressions": 1, "clicks": 1, "revenue": 3.0},
+        {"impressions": 1, "revenue": 4.0},
+    ])
+
+    assert increments["n"] == 2
+    assert increments["sum.impressions"] == 2 and increments["sum.clicks"] == 1
+    assert increments["sum.revenue"] == 7.0 and increments["sum_sq.revenue"] == 25.0
+    assert increments["sum.conversions"] == 0
+
+
+def test_mean_and_variance_from_sufficient_statistics():
+    rng = np.random.default_rng(0)
+    samples = [rng.exponential(20, 500), rng.exponential(25, 700)]
+
+    variant_stats = stats_from_samples(samples, "revenue")
+
+    np.testing.assert_allclose(variant_stats.mean("revenue"), [s.mean() for s in samples])
+    np.testing.assert_allclose(variant_stats.variance("revenue"), [s.var(ddof=1) for s in samples])
+
+
+def test_proportion_test_matches_chi_square():
+    rng = np.random.default_rng(1)
+    samples = [rng.random(4000) < 0.05, rng.random(4000) < 0.065]
+
+    result = evaluate(stats_from_samples([s.astype(float) for s in samples]), "conversions")
+
+    table = [[s.sum(), len(s) - s.sum()] for s in samples]
+    _, expected_p, _, _ = stats.chi2_contingency(table, correction=False)
+    assert result["method"] == "two_proportion_z_test"
+    assert result["p_values"][1] == pytest.approx(expected_p)
+    assert result["p_values"][0] == 1.0
+
+
+def test_continuous_metric_matches_welch():
+    rng = np.random.default_rng(2)
+    samples = [rng.normal(10, 3, 300), rng.normal(10.8, 5, 250)]
+
+    result = evaluate(stats_from_samples(samples, "revenue"), "roas")
+
+    expected = stats.ttest_ind(samples[1], samples[0], equal_var=False)
+    assert result["metric"] == "revenue" and result["method"] == "welch_t_test"
+    assert result["statistic"][1] == pytest.approx(expected.statistic)
+    assert result["p_values"][1] == pytest.approx(expected.pvalue)
+
+
+def test_bayesian_and_bonferroni_over_many_variants():
+    n = np.full(4, 5000.0)
+    successes = np.array([250.0, 250.0, 400.0, 260.0])
+    variant_stats = VariantStats(["conversions"], n, successes[:, None], successes[:, None])
+
+    result = evaluate(variant_stats, "conversions", alpha=0.05)
+
+    assert result["corrected_alpha"] == pytest.approx(0.05 / 3)
+    assert result["significant"].tolist() == [False, False, True, False]
+    assert result["bayesian"]["prob_beats_control"][2] > 0.99
+    assert result["bayesian"]["prob_best"].argmax() == 2
+
+
+class TestSequentialTesting:
+    """Test early stopping against the O'Brien-Fleming boundary"""
+
+    def test_boundary_is_strict_early_and_nominal_at_the_end(self):
+        assert obrien_fleming_boundary(0.05, 1.0) == pytest.approx(1.959964, rel=1e-5)
+        assert obrien_fleming_boundary(0.05, 0.25) == pytest.approx(2 * 1.959964, rel=1e-5)
+
+    def test_large_effect_stops_early(self):
+        n = np.array([2000.0, 2000.0])
+        successes = np.array([100.0, 200.0])
+        variant_stats = VariantStats(["conversions"], n, successes[:, None], successes[:, None])
+
+        result = evaluate(variant_stats, "conversions", planned_n=10000)
+
+        assert result["information_fraction"] == 0.2
+        assert result["stopped_early"] and result["complete"]
+
+    def test_marginal_effect_waits_for_planned_sample(self):
+        n = np.array([2000.0, 2000.0])
+        successes = np.array([100.0, 130.0])
+        variant_stats = VariantStats(["conversions"], n, successes[:, None], successes[:, None])
+
+        sequential = evaluate(variant_stats, "conversions", planned_n=10000)
+        fixed = evaluate(variant_stats, "conversions")
+
+        # p < 0.05 at this look, but not past the interim boundary
+        assert fixed["p_values"][1] < 0.05 and fixed["significant"][1]
+        assert not sequential["significant"][1] and not sequential["complete"]
@@ -0,0 +1,102 @@
+"""
+Tests for refreshing the anomaly baseline from stored performance data
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+advanced_ai = pytest.importorskip("services.advanced_ai_service")
+
+CLIENT_ID = "client-1"
+
+
+class Clock(datetime):
+    """datetime whose utcnow() is set by the test"""
+
+    current = datetime(2026, 3, 10, 15, 30)
+
+    @classmethod
+    def utcnow(cls):
+        return cls.current
+
+
+def daily_row(day, impressions=10000):
+    return {
+        "_id": day.isoformat(),
+        "client_id": CLIENT_ID,
+        "date": day.isoformat(),
+        "impressions": impressions,
+        "clicks": impressions // 25,
+        "conversions": impressions // 500,
+        "cost": impressions / 100,
+        "revenue": impressions / 40,
+        "ctr": 0.04,
+        "conversion_rate": 0.05,
+    }
+
+
+def serve_daily_rollup(collection):
+    """Answer the daily rollup with the stored rows its $match selects (one row per day)"""
+
+    def aggregate(pipeline, **kwargs):
+        collection.pipelines.append(pipeline)
+        return collection.find(pipeline[0]["$match"]).sort("date", 1)
+
+    collection.aggregate = aggregate
+
+
+@pytest.fixture
+def engine(fake_db, monkeypatch):
+    monkeypatch.setattr(advanced_ai, "datetime", Clock)
+    Clock.current = datetime(2026, 3, 10, 15, 30)
+    fake_db.performance_metrics.docs.extend(
+        daily_row(date(2026, 2, 20) + timedelta(days=n)) for n in range(19)
+    )
+    serve_daily_rollup(fake_db.performance_metrics)
+    return advanced_ai.AnomalyDetectionEngine(fake_db)
+
+
+async def stored_baseline(db):
+    return await db.anomaly_baselines.find_one({"client_id": CLIENT_ID})
+
+
+@pytest.mark.asyncio
+async def test_only_complete_days_are_folded_in(engine, fake_db):
+    await engine.detect_anomalies(CLIENT_ID)
+
+    match = fake_db.performance_metrics.pipelines[-1][0]["$match"]
+    assert match["date"] == {"$gte": "2026-02-08", "$lt": "2026-03-10"}
+    baseline = await stored_baseline(fake_db)
+    assert (baseline["count"], baseline["last_date"]) == (18, "2026-03-09")
+
+
+@pytest.mark.asyncio
+async def test_repeated_reads_leave_the_baseline_alone(engine, fake_db):
+    await engine.detect_anomalies(CLIENT_ID)
+    written = await stored_baseline(fake_db)
+
+    Clock.current += timedelta(hours=6)
+    await engine.detect_anomalies(CLIENT_ID)
+    await engine.detect_anomalies(CLIENT_ID)
+
+    assert len(fake_db.performance_metrics.pipelines) == 1
+    assert await stored_baseline(fake_db) == written
+
+
+@pytest.mark.asyncio
+async def test_partial_day_is_scored_once_it_is_complete(engine, fake_db):
+    await engine.detect_anomalies(CLIENT_ID)
+
+    # The rest of March 10th arrives, then the day is over
+    await fake_db.performance_metrics.update_one(
+        {"date": "2026-03-10"}, {"$set": {"impressions": 90000, "clicks": 3600}}
+    )
+    Clock.current = datetime(2026, 3, 11, 0, 5)
+    anomalies = await engine.detect_anomalies(CLIENT_ID)
+
+    match = fake_db.performance_metrics.pipelines[-1][0]["$match"]
+    assert match["date"] == {"$gt": "2026-03-09", "$lt": "2026-03-11"}
+    baseline = await stored_baseline(fake_db)
+    assert (baseline["count"], baseline["last_date"]) == (19, "2026-03-10")
+    assert len(anomalies) == 1 and "impressions" in anomalies[0].affected_metrics
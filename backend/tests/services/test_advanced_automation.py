@@ -0,0 +1,286 @@
+"""
+Tests for the advanced automation workflow engine and event triggers
+"""
+
+import asyncio
+from collections import Counter
+
+import pytest
+
+automation = pytest.importorskip("services.advanced_automation_service")
+
+WORKFLOW_ID = "wf-1"
+
+
+def step(step_id, action_type="send_email", max_retries=0):
+    return {
+        "step_id": step_id,
+        "name": step_id,
+        "action_type": action_type,
+        "config": {"to": f"{step_id}@example.com"},
+        "conditions": [],
+        "retry_config": {"max_retries": max_retries, "retry_delay": 0},
+        "timeout": 30,
+        "depends_on": [],
+    }
+
+
+def make_engine(db, *steps, updated_at="v1"):
+    db.workflows.docs.append({
+        "workflow_id": WORKFLOW_ID,
+        "status": "active",
+        "updated_at": updated_at,
+        "steps": list(steps),
+    })
+    engine = automation.WorkflowEngine()
+    engine.db = db
+    return engine
+
+
+def steps_read(db):
+    return sum(1 for _, projection in db.workflows.queries if projection and "steps" in projection)
+
+
+class TestStepWrites:
+    @pytest.mark.asyncio
+    async def test_completed_workflow_writes_step_states_in_one_batch(self, fake_db):
+        engine = make_engine(fake_db, step("a"), step("b"), step("c"))
+
+        execution_id = await engine.execute_workflow(WORKFLOW_ID)
+
+        assert fake_db.step_executions.bulk_writes == [3]
+        assert {doc["step_id"]: doc["status"] for doc in fake_db.step_executions.docs} == {
+            "a": "completed", "b": "completed", "c": "completed"
+        }
+        execution = await fake_db.workflow_executions.find_one({"execution_id": execution_id})
+        assert execution["status"] == "completed"
+        assert execution["completed_steps"] == ["a", "b", "c"]
+        assert engine._pending_step_writes == {}
+
+    @pytest.mark.asyncio
+    async def test_full_batch_is_flushed_before_the_workflow_ends(self, fake_db):
+        engine = make_engine(fake_db, step("a"), step("b"), step("c"))
+        engine.STEP_WRITE_BATCH_SIZE = 2
+
+        await engine.execute_workflow(WORKFLOW_ID)
+
+        # a and b, then b and c, then c again: each write carries the latest state
+        assert fake_db.step_executions.bulk_writes == [2, 2, 1]
+        assert len(fake_db.step_executions.docs) == 3
+
+    @pytest.mark.asyncio
+    async def test_failed_step_flushes_and_saves_failed_execution(self, fake_db):
+        engine = make_engine(fake_db, step("a"), step("b"), step("c"))
+
+        async def bounce(config, context):
+            if config["to"].startswith("b"):
+                raise RuntimeError("mailbox full")
+            return {"email_sent": True}
+
+        engine.action_handlers[automation.ActionType.SEND_EMAIL] = bounce
+
+        execution_id = await engine.execute_workflow(WORKFLOW_ID)
+
+        assert fake_db.step_executions.bulk_writes == [2]
+        assert {doc["step_id"]: doc["status"] for doc in fake_db.step_executions.docs} == {
+            "a": "completed", "b": "failed"
+        }
+        execution = await fake_db.workflow_executions.find_one({"execution_id": execution_id})
+        assert execution["status"] == "failed" and execution["error_message"] == "mailbox full"
+        assert execution["completed_steps"] == ["a"]
+
+    @pytest.mark.asyncio
+    async def test_step_error_still_flushes_queued_states(self, fake_db):
+        engine = make_engine(fake_db, step("a"), step("b", action_type="call_api"))
+        del engine.action_handlers[automation.ActionType.CALL_API]
+
+        execution_id = await engine.execute_workflow(WORKFLOW_ID)
+
+        assert fake_db.step_executions.bulk_writes == [2]
+        assert {doc["step_id"]: doc["status"] for doc in fake_db.step_executions.docs} == {
+            "a": "completed", "b": "running"
+        }
+        execution = await fake_db.workflow_executions.find_one({"execution_id": execution_id})
+        assert execution["status"] == "failed" and "No handler" in execution["error_message"]
+        assert engine._pending_step_writes == {}
+
+
+class TestCompiledWorkflows:
+    @pytest.mark.asyncio
+    async def test_steps_are_compiled_once_per_version(self, fake_db):
+        engine = make_engine(fake_db, step("a"))
+
+        await engine.execute_workflow(WORKFLOW_ID)
+        await engine.execute_workflow(WORKFLOW_ID)
+        assert steps_read(fake_db) == 1
+
+        await fake_db.workflows.update_one(
+            {"workflow_id": WORKFLOW_ID},
+            {"$set": {"updated_at": "v2", "steps": [step("a"), step("b")]}}
+        )
+        await engine.execute_workflow(WORKFLOW_ID)
+
+        assert steps_read(fake_db) == 2
+        assert [s.step_id for s in engine._compiled_workflows[WORKFLOW_ID][1]] == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_invalidate_drops_compiled_steps(self, fake_db):
+        engine = make_engine(fake_db, step("a"))
+        await engine.execute_workflow(WORKFLOW_ID)
+
+        engine.invalidate_workflow_cache("other")
+        await engine.execute_workflow(WORKFLOW_ID)
+        assert steps_read(fake_db) == 1
+
+        engine.invalidate_workflow_cache(WORKFLOW_ID)
+        await engine.execute_workflow(WORKFLOW_ID)
+        assert steps_read(fake_db) == 2
+
+        engine.invalidate_workflow_cache()
+        assert engine._compiled_workflows == {}
+
+
+class Engine:
+    """Records workflow runs; runs wait for ``release`` when it is given"""
+
+    def __init__(self, release=None):
+        self.release = release
+        self.runs = []
+        self.running = Counter()
+        self.peak = Counter()
+
+    async def execute_workflow(self, workflow_id, event_data):
+        self.runs.append((workflow_id, event_data))
+        self.running[workflow_id] += 1
+        self.peak[workflow_id] = max(self.peak[workflow_id], self.running[workflow_id])
+        try:
+            if self.release is not None:
+                await self.release.wait()
+        finally:
+            self.running[workflow_id] -= 1
+
+
+def make_manager(db, redis_client, engine, **kwargs):
+    manager = automation.WorkflowTriggerManager(redis_client=redis_client, workflow_engine=engine, **kwargs)
+    manager.db = db
+    return manager
+
+
+async def add_trigger(manager, event_type, workflow_id, **config):
+    return await manager.create_trigger({
+        "trigger_type": "event_based",
+        "name": f"{event_type} -> {workflow_id}",
+        "workflow_id": workflow_id,
+        "config": {"event_type": event_type, "workflow_id": workflow_id, **config},
+    })
+
+
+async def settle(predicate=lambda: False):
+    for _ in range(50):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+
+
+class TestEventDispatch:
+    @pytest.mark.asyncio
+    async def test_one_reader_routes_events_to_their_triggers(self, fake_db, fake_redis):
+        engine = Engine()
+        manager = make_manager(fake_db, fake_redis, engine)
+        try:
+            await add_trigger(manager, "signup", "welcome")
+            await add_trigger(manager, "signup", "crm_sync")
+            await add_trigger(manager, "purchase", "receipt")
+            dispatcher = manager._dispatcher_task
+
+            await manager.publish_event("purchase", {"order": 7})
+            await manager.publish_event("signup", {"user": 1})
+            await manager.publish_event("refund", {"order": 7})
+            await settle(lambda: len(engine.runs) == 3)
+
+            assert manager._dispatcher_task is dispatcher
+            assert sorted(engine.runs, key=lambda run: run[0]) == [
+                ("crm_sync", {"user": 1}), ("receipt", {"order": 7}), ("welcome", {"user": 1})
+            ]
+            # Nothing listens for refunds, so they are left in Redis
+            assert list(fake_redis.lists) == ["workflow_events:refund"]
+        finally:
+            await manager.stop_event_dispatcher()
+
+    @pytest.mark.asyncio
+    async def test_each_trigger_runs_within_its_own_limit(self, fake_db, fake_redis):
+        engine = Engine(release=asyncio.Event())
+        manager = make_manager(fake_db, fake_redis, engine)
+        try:
+            await add_trigger(manager, "click", "serial", max_concurrency=1)
+            await add_trigger(manager, "click", "fanout", max_concurrency=3)
+
+            for n in range(4):
+                await manager.publish_event("click", {"n": n})
+            await settle(lambda: engine.running["fanout"] == 3)
+
+            assert engine.running == Counter(serial=1, fanout=3)
+
+            engine.release.set()
+            await settle(lambda: len(engine.runs) == 8)
+            assert engine.peak == Counter(serial=1, fanout=3)
+            assert len(engine.runs) == 8
+        finally:
+            await manager.stop_event_dispatcher()
+
+    @pytest.mark.asyncio
+    async def test_reading_stops_while_in_flight_budget_is_used(self, fake_db, fake_redis):
+        engine = Engine(release=asyncio.Event())
+        manager = make_manager(fake_db, fake_redis, engine, max_in_flight_dispatches=2)
+        try:
+            await add_trigger(manager, "click", "track")
+
+            for n in range(4):
+                await manager.publish_event("click", {"n": n})
+            await settle(lambda: engine.running["track"] == 2)
+            await settle()
+
+            # Two runs in flight, one event read and waiting for a slot, one still queued
+            assert engine.running["track"] == 2
+            assert len(fake_redis.lists["workflow_events:click"]) == 1
+
+            engine.release.set()
+            await settle(lambda: len(engine.runs) == 4)
+            assert [run[1]["n"] for run in engine.runs] == [0, 1, 2, 3]
+        finally:
+            await manager.stop_event_dispatcher()
+
+    @pytest.mark.asyncio
+    async def test_deactivated_trigger_stops_receiving_events(self, fake_db, fake_redis):
+        engine = Engine()
+        manager = make_manager(fake_db, fake_redis, engine)
+        try:
+            kept = await add_trigger(manager, "signup", "welcome")
+            dropped = await add_trigger(manager, "signup", "crm_sync")
+
+            await manager.deactivate_trigger(dropped)
+            await manager.publish_event("signup", {"user": 1})
+            await settle(lambda: engine.runs)
+
+            assert engine.runs == [("welcome", {"user": 1})]
+            assert list(manager.active_triggers) == [kept]
+            assert (await fake_db.workflow_triggers.find_one({"trigger_id": dropped}))["enabled"] is False
+        finally:
+            await manager.stop_event_dispatcher()
+
+    @pytest.mark.asyncio
+    async def test_stop_cancels_runs_in_flight(self, fake_db, fake_redis):
+        engine = Engine(release=asyncio.Event())
+        manager = make_manager(fake_db, fake_redis, engine)
+        await add_trigger(manager, "click", "track")
+
+        for n in range(2):
+            await manager.publish_event("click", {"n": n})
+        await settle(lambda: engine.running["track"] == 2)
+        assert len(manager._dispatches) == 2
+
+        await manager.stop_event_dispatcher()
+
+        assert engine.running["track"] == 0
+        assert manager._dispatches == set()
+        assert manager._dispatch_slots._value == manager.max_in_flight_dispatches
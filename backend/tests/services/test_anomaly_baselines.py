@@ -0,0 +1,79 @@
+"""
+Tests for streaming anomaly baselines
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from services.anomaly_baselines import MIN_BASELINE_POINTS, EWMABaseline
+
+METRICS = ["impressions", "clicks", "ctr"]
+
+
+def make_points(n, rng):
+    return [
+        {
+            "date": (date(2024, 1, 1) + timedelta(days=day)).isoformat(),
+            "impressions": rng.normal(10000, 300),
+            "clicks": rng.normal(400, 20),
+            "ctr": rng.normal(0.04, 0.002)
+        }
+        for day in range(n)
+    ]
+
+
+class TestEWMABaseline:
+    """Test incremental baseline statistics and scoring"""
+
+    def test_matches_pandas_ewm(self):
+        points = make_points(60, np.random.default_rng(0))
+        baseline = EWMABaseline(metrics=METRICS)
+        for point in points:
+            baseline.observe(point)
+
+        ewm = pd.DataFrame(points)[METRICS].ewm(alpha=baseline.alpha, adjust=False)
+        np.testing.assert_allclose(baseline.mean, ewm.mean().iloc[-1])
+        np.testing.assert_allclose(baseline.var, ewm.var(bias=True).iloc[-1])
+        assert baseline.count == 60 and baseline.last_date == "2024-02-29"
+
+    def test_flags_spike_only_after_warm_up(self):
+        rng = np.random.default_rng(1)
+        baseline = EWMABaseline(metrics=METRICS)
+
+        spike = {"impressions": 10000, "clicks": 400, "ctr": 0.2}
+        # A baseline that is still warming up never flags
+        for point in make_points(MIN_BASELINE_POINTS - 1, rng):
+            baseline.observe(point)
+        assert baseline.observe(dict(spike)) is None
+
+        flagged = [baseline.observe(point) for point in make_points(30, rng)]
+        assert all(z is None for z in flagged)
+
+        z_scores = baseline.observe(spike)
+        assert z_scores is not None
+        assert np.argmax(np.abs(z_scores)) == METRICS.index("ctr")
+
+    def test_flat_history_tolerates_small_changes(self):
+        baseline = EWMABaseline(metrics=METRICS)
+        for _ in range(20):
+            baseline.observe({"impressions": 1000, "clicks": 50, "ctr": 0.05})
+
+        assert baseline.observe({"impressions": 1001, "clicks": 50, "ctr": 0.05}) is None
+        assert baseline.observe({"impressions": 1500, "clicks": 50, "ctr": 0.05}) is not None
+
+    def test_document_round_trip(self):
+        baseline = EWMABaseline(metrics=METRICS)
+        for point in make_points(15, np.random.default_rng(2)):
+            baseline.observe(point)
+
+        restored = EWMABaseline.from_document(baseline.to_document(), METRICS)
+
+        np.testing.assert_array_equal(restored.mean, baseline.mean)
+        np.testing.assert_array_equal(restored.var, baseline.var)
+        assert (restored.count, restored.last_date) == (15, baseline.last_date)
+
+        # Changing the tracked metrics discards the stored statistics
+        fresh = EWMABaseline.from_document(baseline.to_document(), METRICS + ["cost"])
+        assert fresh.count == 0 and fresh.last_date is None
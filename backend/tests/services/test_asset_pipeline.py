@@ -0,0 +1,148 @@
+"""
+Tests for the streaming asset ingestion pipeline
+"""
+
+import hashlib
+import io
+import os
+import tracemalloc
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.asset_pipeline import (
+    AssetIngestor,
+    LocalBlobStore,
+    iter_bytes,
+    spool_upload,
+)
+
+
+def pil_image():
+    """The real PIL.Image module; other test modules replace PIL with mocks"""
+    Image = pytest.importorskip("PIL.Image")
+    if not isinstance(Image, types.ModuleType):
+        pytest.skip("PIL is mocked")
+    return Image
+
+
+def png_bytes(width=2000, height=1000):
+    Image = pil_image()
+    output = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 30, 30, 128)).save(output, format="PNG")
+    return output.getvalue()
+
+
+@pytest.fixture
+def ingestor(tmp_path):
+    return AssetIngestor(
+        LocalBlobStore(str(tmp_path / "blobs")),
+        spool_dir=str(tmp_path / "spool"),
+        executor=ThreadPoolExecutor(max_workers=1)
+    )
+
+
+@pytest.mark.asyncio
+async def test_spool_hashes_while_streaming(tmp_path):
+    data = os.urandom(3 * 1024 * 1024 + 17)
+
+    upload = await spool_upload(iter_bytes(data), tmp_path, max_size=len(data))
+
+    assert upload.size == len(data)
+    assert upload.sha256 == hashlib.sha256(data).hexdigest()
+    with open(upload.path, "rb") as handle:
+        assert handle.read() == data
+
+
+@pytest.mark.asyncio
+async def test_oversized_upload_is_rejected_and_removed(tmp_path):
+    with pytest.raises(ValueError):
+        await spool_upload(iter_bytes(b"x" * 5000, chunk_size=1000), tmp_path, max_size=2500)
+
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_spool_memory_stays_flat(tmp_path):
+    """Peak allocation is bounded by the chunk size, not the upload size"""
+    chunk = b"\0" * (256 * 1024)
+
+    async def chunks():
+        for _ in range(256):  # 64MB
+            yield chunk
+
+    tracemalloc.start()
+    try:
+        upload = await spool_upload(chunks(), tmp_path, max_size=1 << 30)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert upload.size == 64 * 1024 * 1024
+    assert peak < 4 * 1024 * 1024
+
+
+@pytest.mark.asyncio
+async def test_image_ingest_stores_original_and_variants(ingestor):
+    Image = pil_image()
+    data = png_bytes()
+
+    upload, stored = await ingestor.ingest(iter_bytes(data), "png", "image", max_size=len(data))
+
+    blobs = ingestor.blob_store
+    assert stored["key"] == f"{upload.sha256[:2]}/{upload.sha256}/original.png"
+    assert stored["dimensions"] == {"width": 2000, "height": 1000}
+    assert set(stored["variants"]) == {"thumbnail", "preview"}
+    with Image.open(blobs.path(stored["variants"]["thumbnail"])) as thumbnail:
+        assert thumbnail.size == (300, 150)
+    with Image.open(blobs.path(stored["variants"]["preview"])) as preview:
+        assert preview.size == (1080, 540)
+    assert blobs.path(stored["key"]).read_bytes() == data
+    assert os.listdir(ingestor.spool_dir) == []
+
+
+@pytest.mark.asyncio
+async def test_duplicate_content_is_not_processed_again(ingestor):
+    data = png_bytes(400, 400)
+    _, first = await ingestor.ingest(iter_bytes(data), "png", "image", max_size=len(data))
+
+    async def find_processed(content_hash):
+        return {"dimensions": first["dimensions"], "variants": first["variants"]}
+
+    # Any processing would fail on a shut-down pool
+    ingestor.executor.shutdown()
+    _, second = await ingestor.ingest(iter_bytes(data), "png", "image", max_size=len(data), find_processed=find_processed)
+
+    assert second["deduplicated"]
+    assert second["key"] == first["key"] and second["variants"] == first["variants"]
+
+
+@pytest.mark.asyncio
+async def test_undecodable_image_is_stored_without_variants(ingestor):
+    pil_image()
+    data = b"<svg xmlns='http://www.w3.org/2000/svg'/>"
+
+    _, stored = await ingestor.ingest(iter_bytes(data), "svg", "image", max_size=1024)
+
+    assert stored["dimensions"] is None and stored["variants"] == {}
+    assert ingestor.blob_store.exists(stored["key"])
+
+
+@pytest.mark.asyncio
+async def test_processing_runs_in_process_pool(tmp_path):
+    """The media worker is importable and picklable for a spawn-context pool"""
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    ingestor = AssetIngestor(LocalBlobStore(str(tmp_path / "blobs")), str(tmp_path / "spool"), executor)
+    data = png_bytes(640, 480)
+
+    try:
+        _, stored = await ingestor.ingest(iter_bytes(data), "png", "image", max_size=len(data))
+    finally:
+        executor.shutdown()
+
+    assert stored["dimensions"] == {"width": 640, "height": 480}
+    assert ingestor.blob_store.exists(stored["variants"]["thumbnail"])
@@ -0,0 +1,77 @@
+"""
+Tests for the batched insert writer
+"""
+
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from services.batch_writer import BatchInsertWriter
+
+
+def failing(collection, error, times=1):
+    """Make the next ``times`` inserts into ``collection`` raise ``error``"""
+    insert_many = collection.insert_many
+
+    async def flaky(documents, ordered=True):
+        nonlocal times
+        if times:
+            times -= 1
+            raise error
+        return await insert_many(documents, ordered=ordered)
+
+    collection.insert_many = flaky
+    return collection
+
+
+@pytest.mark.asyncio
+async def test_writes_full_batches_and_flushes_remainder_on_close(fake_db):
+    collection = fake_db.events
+    writer = BatchInsertWriter(collection, batch_size=3, flush_interval=60)
+
+    for i in range(7):
+        await writer.add({"i": i})
+    assert [len(b) for b in collection.inserted_batches] == [3, 3] and writer.pending == 1
+
+    await writer.close()
+    assert [len(b) for b in collection.inserted_batches] == [3, 3, 1] and writer.written == 7
+
+
+@pytest.mark.asyncio
+async def test_background_flush_writes_partial_batch(fake_db):
+    collection = fake_db.events
+    writer = BatchInsertWriter(collection, batch_size=100, flush_interval=0.01)
+
+    await writer.add({"i": 0})
+    await asyncio.sleep(0.05)
+
+    assert collection.inserted_batches == [[{"i": 0}]]
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_retried_within_bound(fake_db):
+    collection = failing(fake_db.events, ConnectionError("connection reset"))
+    writer = BatchInsertWriter(collection, batch_size=10, flush_interval=60, max_pending=3)
+
+    for i in range(4):
+        await writer.add({"i": i})
+    await writer.flush()
+    assert collection.inserted_batches == [] and writer.pending == 3 and writer.dropped == 1
+
+    await writer.close()
+    assert collection.inserted_batches == [[{"i": 0}, {"i": 1}, {"i": 2}]]
+
+
+@pytest.mark.asyncio
+async def test_rejected_documents_are_not_retried(fake_db):
+    rejected = BulkWriteError({"nInserted": 1, "writeErrors": [{"index": 1, "code": 11000}]})
+    collection = failing(fake_db.events, rejected, times=2)
+    writer = BatchInsertWriter(collection, batch_size=10, flush_interval=60)
+    await writer.add({"i": 0})
+    await writer.add({"i": 1})
+
+    await writer.close()
+
+    assert writer.written == 1 and writer.dropped == 1 and writer.pending == 0
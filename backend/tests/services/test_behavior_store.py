@@ -0,0 +1,79 @@
+"""
+Tests for behavior counters and the binary profile cache encoding
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import services.behavior_store as behavior_store
+from services.behavior_store import BehaviorCounts, decode_profile, encode_profile, epoch_day
+
+NOW = datetime(2024, 6, 1, 12, 0)
+TODAY = epoch_day(NOW)
+
+
+def behaviors(n, event_types=("page_view", "click", "conversion")):
+    return [
+        {
+            "event_type": event_types[i % len(event_types)],
+            "timestamp": (NOW - timedelta(hours=7 * i, microseconds=i)).isoformat(),
+            "properties": {"item_type": f"item-{i % 5}"},
+            "event_id": f"event-{i}"
+        }
+        for i in range(n)
+    ]
+
+
+def test_windowed_counts_match_timestamp_scan():
+    history = behaviors(300)
+    counts = BehaviorCounts.from_behaviors(history)
+
+    for event_type in ("page_view", "click", "conversion", "search"):
+        for window in (1, 7, 30, 90):
+            expected = sum(
+                1 for b in history
+                if b["event_type"] == event_type
+                and epoch_day(datetime.fromisoformat(b["timestamp"])) > TODAY - window
+            )
+            assert counts.count(event_type, window, TODAY) == expected
+
+
+def test_counts_follow_additions_and_document_round_trip():
+    counts = BehaviorCounts()
+    counts.add("click", TODAY - 1)
+    assert counts.count("click", 7, TODAY) == 1
+
+    counts.add("click", TODAY, 2)
+    restored = BehaviorCounts.from_document(json.loads(json.dumps(counts.to_document())))
+
+    assert restored.count("click", 7, TODAY) == 3
+    assert restored.count("click", 1, TODAY) == 2
+    assert restored.total(7, TODAY + 7) == 0
+
+
+def test_prune_drops_counters_past_retention(monkeypatch):
+    monkeypatch.setattr(behavior_store, "BEHAVIOR_COUNT_DAYS", 10)
+    counts = BehaviorCounts({"click": {TODAY - 10: 1, TODAY - 9: 1}, "search": {TODAY - 20: 4}})
+
+    stale = counts.prune(TODAY)
+
+    assert sorted(stale) == [("click", TODAY - 10), ("search", TODAY - 20)]
+    assert counts.counts == {"click": {TODAY - 9: 1}}
+
+
+def test_profile_encoding_round_trips_and_is_compact():
+    fields = {"user_id": "u1", "demographics": {"age": 30}, "segments": ["a"], "engagement_score": 0.4}
+    history = behaviors(100)
+    counts = BehaviorCounts.from_behaviors(history)
+
+    encoded = encode_profile(fields, history, counts)
+    decoded_fields, decoded_behaviors, decoded_counts = decode_profile(encoded)
+
+    assert decoded_fields == fields
+    assert decoded_behaviors == history
+    assert decoded_counts.counts == counts.counts
+    assert len(encoded) < len(json.dumps({**fields, "behaviors": history}))
+
+
+def test_other_cache_formats_are_ignored():
+    assert decode_profile(json.dumps({"user_id": "u1"}).encode()) is None
@@ -0,0 +1,115 @@
+"""
+Tests for chart downsampling and the rendered chart cache
+"""
+
+import asyncio
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.chart_render import (
+    ChartCache,
+    chart_key,
+    columnar,
+    downsample_frame,
+    figure_spec,
+    frame_version,
+    lttb_indices,
+)
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = np.arange(10000, dtype=np.float64)
+    y = np.sin(x / 500)
+    y[4321] = 50.0
+
+    indices = lttb_indices(x, y, 200)
+
+    assert len(indices) == 200
+    assert indices[0] == 0 and indices[-1] == 9999
+    assert np.all(np.diff(indices) > 0)
+    assert 4321 in indices
+
+
+def test_lttb_leaves_small_series():
+    np.testing.assert_array_equal(lttb_indices(np.arange(5), np.arange(5), 10), np.arange(5))
+
+
+def test_downsample_frame_sorts_and_splits_points_between_groups():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        "date": pd.date_range("2024-01-01", periods=5000, freq="min").astype(str),
+        "value": rng.normal(size=5000),
+        "platform": np.repeat(["google", "meta"], 2500)
+    }).sample(frac=1, random_state=2)
+
+    single = downsample_frame(df, "date", "value", threshold=100)
+    grouped = downsample_frame(df, "date", "value", threshold=100, group_col="platform")
+
+    assert len(single) == 100 and single["date"].is_monotonic_increasing
+    assert grouped.groupby("platform").size().to_dict() == {"google": 50, "meta": 50}
+    assert downsample_frame(df, "date", "missing", threshold=100) is df
+
+
+def test_frame_version_tracks_content():
+    df = pd.DataFrame({"date": ["2024-01-01", "2024-01-02"], "value": [1.0, 2.0]})
+    changed = df.assign(value=[1.0, 3.0])
+    nested = pd.DataFrame({"value": [{"a": 1}]})
+
+    assert frame_version(df) == frame_version(df.copy())
+    assert frame_version(df) != frame_version(changed)
+    assert frame_version(nested) == frame_version(pd.DataFrame({"value": [{"a": 1}]}))
+    assert chart_key({"type": "line", "x": "date"}, "v1") == chart_key({"x": "date", "type": "line"}, "v1")
+
+
+def test_columnar_payload():
+    df = pd.DataFrame({"date": ["d1", "d2"], "value": [1.5, np.nan], "extra": [1, 2]})
+
+    assert columnar(df, ["date", "value", "missing"]) == {"date": ["d1", "d2"], "value": [1.5, None]}
+
+
+def test_figure_spec_drops_per_point_arrays():
+    class Figure:
+        def to_plotly_json(self):
+            return {
+                "data": [{"type": "scatter", "name": "google", "mode": "lines", "x": [1, 2], "y": [3, 4]}],
+                "layout": {"title": {"text": "ROAS"}}
+            }
+
+    assert figure_spec(Figure()) == {
+        "data": [{"type": "scatter", "name": "google", "mode": "lines"}],
+        "layout": {"title": {"text": "ROAS"}}
+    }
+
+
+@pytest.mark.asyncio
+async def test_cache_renders_once_off_the_event_loop():
+    cache = ChartCache(ttl=60)
+    renders = []
+
+    def render():
+        renders.append(threading.current_thread())
+        return '{"data": []}'
+
+    results = await asyncio.gather(*(cache.get("k", render) for _ in range(5)))
+    await cache.get("k", render)
+
+    assert results == ['{"data": []}'] * 5
+    assert len(renders) == 1 and renders[0] is not threading.main_thread()
+    assert (cache.hits, cache.misses) == (5, 1)
+
+
+@pytest.mark.asyncio
+async def test_failed_and_empty_renders_are_not_cached():
+    cache = ChartCache(ttl=60)
+
+    def fail():
+        raise ValueError("bad column")
+
+    with pytest.raises(ValueError):
+        await cache.get("k", fail)
+    assert await cache.get("k", lambda: "") == ""
+    assert await cache.get("k", lambda: "chart") == "chart"
+    assert cache.misses == 3
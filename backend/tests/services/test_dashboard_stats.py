@@ -0,0 +1,135 @@
+"""
+Tests for dashboard statistics aggregation and caching
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from services.dashboard_stats import (
+    DashboardStatsCache,
+    campaign_rollup_pipeline,
+    compute_dashboard_stats,
+)
+
+NOW = datetime(2024, 6, 1)
+
+
+class Gate:
+    """Counts started queries; none completes until all three have started"""
+
+    def __init__(self):
+        self.started = 0
+        self.all_started = asyncio.Event()
+
+    async def wait(self):
+        self.started += 1
+        if self.started == 3:
+            self.all_started.set()
+        await asyncio.wait_for(self.all_started.wait(), 1)
+
+
+def seed(db, rollup, active_users=0, activity=()):
+    """Seed the collections the stats read, gating each query behind ``Gate``"""
+    gate = Gate()
+    db.campaigns.aggregate_results = rollup
+    db.users.docs = [{"organization_id": "org1", "last_login": NOW.isoformat()} for _ in range(active_users)]
+    db.activity_logs.docs = [{"organization_id": "org1", **entry} for entry in activity]
+    for collection in (db.campaigns, db.users, db.activity_logs):
+        collection.before_read = gate.wait
+    return db
+
+
+def group(**values):
+    return {"campaigns": 0, "spend": 0, "revenue": 0, "impressions": 0, "clicks": 0, "conversions": 0, **values}
+
+
+def test_pipeline_projects_before_faceting():
+    pipeline = campaign_rollup_pipeline("org1", NOW, 30)
+
+    assert [next(iter(stage)) for stage in pipeline] == ["$match", "$project", "$facet"]
+    assert pipeline[0]["$match"] == {"organization_id": "org1", "created_at": {"$gte": NOW.isoformat()}}
+    assert pipeline[1]["$project"]["spend"] == {"$multiply": [{"$ifNull": ["$budget.daily_budget", 0]}, 30]}
+    assert set(pipeline[2]["$facet"]) == {"totals", "platforms"}
+
+
+@pytest.mark.asyncio
+async def test_stats_are_derived_from_rollup_and_queried_concurrently(fake_db):
+    db = seed(
+        fake_db,
+        [{
+            "totals": [group(campaigns=3, active=2, paused=1, spend=300, revenue=600,
+                             impressions=1000, clicks=50, conversions=10)],
+            "platforms": [group(_id="google", campaigns=3, spend=300, revenue=600, impressions=1000, clicks=50)]
+        }],
+        active_users=4,
+        activity=[{"type": "login", "timestamp": "t", "user_id": "u1"}]
+    )
+
+    stats = await compute_dashboard_stats(db, "org1", 30, now=NOW)
+
+    assert stats["total_campaigns"] == 3 and stats["active_campaigns"] == 2 and stats["paused_campaigns"] == 1
+    assert stats["roas"] == 2.0 and stats["avg_ctr"] == 5.0 and stats["avg_cpa"] == 30.0
+    assert stats["platform_breakdown"]["google"]["roas"] == 2.0
+    assert stats["platform_breakdown"]["google"]["ctr"] == 5.0
+    assert stats["active_users"] == 4
+    assert stats["recent_activity"] == [{"type": "login", "description": "", "timestamp": "t", "user": "u1"}]
+
+
+@pytest.mark.asyncio
+async def test_empty_organization_has_zero_stats(fake_db):
+    stats = await compute_dashboard_stats(seed(fake_db, [{"totals": [], "platforms": []}]), "org1", 30, now=NOW)
+
+    assert stats["total_campaigns"] == 0 and stats["roas"] == 0.0 and stats["platform_breakdown"] == {}
+
+
+class TestDashboardStatsCache:
+    """Test hits, shared misses and invalidation"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_computation(self):
+        cache = DashboardStatsCache(ttl=60)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"n": len(calls)}
+
+        results = await asyncio.gather(*(cache.get("org1", 30, compute) for _ in range(5)))
+        await cache.get("org1", 30, compute)
+
+        assert results == [{"n": 1}] * 5 and len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidation_during_computation_is_not_cached(self):
+        cache = DashboardStatsCache(ttl=60)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"n": len(calls)}
+
+        pending = asyncio.ensure_future(cache.get("org1", 30, compute))
+        await asyncio.sleep(0)
+        cache.invalidate("org1")
+        assert await pending == {"n": 1}
+
+        assert await cache.get("org1", 30, compute) == {"n": 2}
+        assert await cache.get("org1", 30, compute) == {"n": 2}
+
+    @pytest.mark.asyncio
+    async def test_invalidation_is_scoped_to_organization(self):
+        cache = DashboardStatsCache(ttl=60)
+        values = iter(range(10))
+
+        async def compute():
+            return next(values)
+
+        assert [await cache.get(org, 30, compute) for org in ("a", "b")] == [0, 1]
+        cache.invalidate("a")
+        assert [await cache.get(org, 30, compute) for org in ("a", "b")] == [2, 1]
+        cache.invalidate()
+        assert await cache.get("b", 30, compute) == 3
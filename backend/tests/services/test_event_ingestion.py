@@ -0,0 +1,85 @@
+"""
+Tests for buffered event ingestion
+"""
+
+import asyncio
+
+import pytest
+
+from services.event_ingestion import EventIngestionBuffer, IngestionBufferFull
+
+
+class Recorder:
+    """Records the events applied per call; can be slowed to interleave users"""
+
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+
+    async def __call__(self, user_id, events):
+        await asyncio.sleep(self.delay)
+        if user_id == "broken":
+            raise RuntimeError("profile update failed")
+        self.calls.append((user_id, list(events)))
+
+
+def submit(buffer, user_id, n):
+    for i in range(n):
+        buffer.submit(user_id, {"user_id": user_id, "i": i}, f"{user_id}-{i}")
+
+
+@pytest.mark.asyncio
+async def test_flush_groups_events_per_user_in_order(fake_db):
+    collection = fake_db.behavioral_events
+    recorder = Recorder()
+    buffer = EventIngestionBuffer(collection, recorder, flush_interval=60)
+
+    for i in range(3):
+        buffer.submit("a", {"i": i}, f"a-{i}")
+        buffer.submit("b", {"i": i}, f"b-{i}")
+    await buffer.close()
+
+    assert sorted(recorder.calls) == [("a", ["a-0", "a-1", "a-2"]), ("b", ["b-0", "b-1", "b-2"])]
+    assert [len(batch) for batch in collection.inserted_batches] == [6]
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_wakes_background_flush(fake_db):
+    recorder = Recorder()
+    buffer = EventIngestionBuffer(fake_db.behavioral_events, recorder, batch_size=4, flush_interval=60)
+
+    submit(buffer, "a", 4)
+    await asyncio.sleep(0.05)
+
+    assert recorder.calls == [("a", ["a-0", "a-1", "a-2", "a-3"])] and buffer.pending == 0
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_events_arriving_during_a_flush_apply_after_it(fake_db):
+    recorder = Recorder(delay=0.01)
+    buffer = EventIngestionBuffer(fake_db.behavioral_events, recorder, flush_interval=60)
+
+    submit(buffer, "a", 2)
+    flushing = asyncio.ensure_future(buffer.flush())
+    await asyncio.sleep(0)
+    buffer.submit("a", {}, "a-late")
+    await flushing
+    await buffer.close()
+
+    assert recorder.calls == [("a", ["a-0", "a-1"]), ("a", ["a-late"])]
+
+
+@pytest.mark.asyncio
+async def test_rejects_when_full_and_isolates_failures(fake_db):
+    recorder = Recorder()
+    buffer = EventIngestionBuffer(fake_db.behavioral_events, recorder, flush_interval=60, max_pending=3)
+
+    submit(buffer, "broken", 2)
+    buffer.submit("a", {}, "a-0")
+    with pytest.raises(IngestionBufferFull):
+        buffer.submit("a", {}, "a-1")
+    await buffer.close()
+
+    assert recorder.calls == [("a", ["a-0"])]
+    assert buffer.applied == 1 and buffer.failed == 2
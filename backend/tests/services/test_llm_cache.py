@@ -0,0 +1,115 @@
+"""
+Tests for the LLM response cache
+"""
+
+import asyncio
+
+import pytest
+
+from services.llm_cache import LLM_CACHE_PREFIX, LlmResponseCache, prompt_key
+
+MODEL = "openai/gpt-4o-mini"
+
+
+class Model:
+    """Counts calls; optionally waits to be released"""
+
+    def __init__(self, response="analysis", release=None):
+        self.response = response
+        self.release = release
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+def test_key_ignores_prompt_formatting():
+    indented = """Analyze the following content:
+                Content to analyze:
+                hello   world"""
+    flat = "Analyze the following content: Content to analyze: hello world"
+
+    assert prompt_key(MODEL, " analyst ", indented) == prompt_key(MODEL, "analyst", flat)
+    assert prompt_key(MODEL, "analyst", flat) != prompt_key("openai/gpt-4o", "analyst", flat)
+    assert prompt_key(MODEL, "analyst", flat) != prompt_key(MODEL, "editor", flat)
+
+
+@pytest.mark.asyncio
+async def test_identical_prompts_call_model_once():
+    cache = LlmResponseCache(ttl=60, redis_url=None)
+    model = Model("x" * 400)
+
+    first = await cache.complete("creative", MODEL, "system", "prompt", model)
+    second = await cache.complete("creative", MODEL, "system", "  prompt ", model)
+
+    assert first == second and model.calls == 1
+    assert cache.stats["memory"] == 1 and cache.stats["miss"] == 1
+    assert cache.hit_rate == 0.5
+    assert cache.stats["tokens_saved"] == (6 + 6 + 400) // 4
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_prompts_are_coalesced():
+    cache = LlmResponseCache(ttl=60, redis_url=None)
+    model = Model(release=asyncio.Event())
+
+    pending = [asyncio.ensure_future(cache.complete("market", MODEL, "s", "p", model)) for _ in range(5)]
+    await asyncio.sleep(0)
+    model.release.set()
+
+    assert await asyncio.gather(*pending) == ["analysis"] * 5
+    assert model.calls == 1 and cache.stats["coalesced"] == 4
+
+
+@pytest.mark.asyncio
+async def test_redis_tier_is_shared_between_processes(fake_redis):
+    redis_client = fake_redis
+    redis_client.decode_responses = True
+    model = Model()
+    first = LlmResponseCache(ttl=120, redis_client=redis_client)
+    second = LlmResponseCache(ttl=120, redis_client=redis_client)
+
+    await first.complete("creative", MODEL, "s", "p", model)
+    assert await second.complete("creative", MODEL, "s", "p", model) == "analysis"
+
+    assert model.calls == 1 and second.stats["redis"] == 1
+    assert redis_client.expiry == {LLM_CACHE_PREFIX + prompt_key(MODEL, "s", "p"): 120}
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_fall_back_to_the_model(fake_redis):
+    fake_redis.fail = True
+    cache = LlmResponseCache(ttl=60, redis_client=fake_redis)
+    model = Model()
+
+    assert await cache.complete("creative", MODEL, "s", "p", model) == "analysis"
+    assert await cache.complete("creative", MODEL, "s", "p", model) == "analysis"
+    assert model.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_and_empty_responses_are_not_cached():
+    cache = LlmResponseCache(ttl=60, redis_url=None)
+
+    with pytest.raises(TimeoutError):
+        await cache.complete("creative", MODEL, "s", "p", Model(TimeoutError("slow")))
+    assert await cache.complete("creative", MODEL, "s", "p", Model("")) == ""
+    assert await cache.complete("creative", MODEL, "s", "p", Model("ok")) == "ok"
+    assert cache.stats["miss"] == 2
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entries_are_evicted():
+    cache = LlmResponseCache(ttl=60, max_entries=2, redis_url=None)
+    model = Model()
+
+    for prompt in ("a", "b", "a", "c", "a", "b"):
+        await cache.complete("creative", MODEL, "s", prompt, model)
+
+    # "b" was evicted by "c"; "a" stayed as it was used more recently
+    assert model.calls == 4
@@ -0,0 +1,107 @@
+"""
+Tests for micro-batched model inference
+"""
+
+import asyncio
+import os
+import time
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from services.ml_inference import MicroBatchPredictor
+
+# Concurrent requests in the benchmark; raise (e.g. to 2000) for a longer run
+BENCHMARK_REQUESTS = int(os.environ.get("ML_INFERENCE_BENCHMARK_REQUESTS", "100"))
+
+@pytest.fixture(scope="module")
+def fatigue_like_model():
+    """100-tree forest over 20 features, shaped like the fatigue model"""
+    rng = np.random.default_rng(42)
+    X = rng.normal(size=(2000, 20))
+    y = (X[:, 6] + X[:, 16] > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=1)
+    model.fit(X, y)
+    return model, rng.normal(size=(20000, 20))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_batched(fatigue_like_model):
+    """Concurrent single-row requests share model calls and keep row order"""
+    model, rows = fatigue_like_model
+    predictor = MicroBatchPredictor(lambda: model, "predict_proba", max_batch_size=64, max_wait_ms=20)
+
+    outputs = await asyncio.gather(*(predictor.predict(row) for row in rows[:200]))
+
+    expected = model.predict_proba(rows[:200])
+    np.testing.assert_allclose(np.vstack(outputs), expected)
+    stats = predictor.get_stats()
+    assert stats["requests"] == 200
+    assert stats["batches"] < 200
+    await predictor.close()
+
+
+@pytest.mark.asyncio
+async def test_callable_method(fatigue_like_model):
+    """A fn(model, X) callable can be used instead of a method name"""
+    model, rows = fatigue_like_model
+    predictor = MicroBatchPredictor(lambda: model, lambda m, X: m.predict_proba(X)[:, 1])
+
+    result = await predictor.predict_many(rows[:10])
+
+    np.testing.assert_allclose(result, model.predict_proba(rows[:10])[:, 1])
+
+
+@pytest.mark.asyncio
+async def test_missing_model_fails_pending_requests():
+    """Requests fail cleanly when no model is loaded"""
+    predictor = MicroBatchPredictor(lambda: None, "predict")
+
+    with pytest.raises(RuntimeError):
+        await predictor.predict([0.0] * 20)
+    await predictor.close()
+
+
+@pytest.mark.asyncio
+async def test_inference_latency_and_throughput_benchmark(fatigue_like_model, record_property):
+    """
+    p50/p95 latency of requests arriving together, served one row per call
+    vs micro-batched, and bulk throughput; latencies are recorded as test
+    properties (e.g. in --junitxml reports)
+    """
+    model, rows = fatigue_like_model
+    n_requests = min(BENCHMARK_REQUESTS, len(rows))
+
+    # Baseline: one synchronous predict_proba call per request, in arrival order
+    per_row = []
+    start = time.perf_counter()
+    for row in rows[:n_requests]:
+        model.predict_proba([row])
+        per_row.append(time.perf_counter() - start)
+
+    # Micro-batched concurrent requests
+    predictor = MicroBatchPredictor(lambda: model, "predict_proba", max_batch_size=256, max_wait_ms=5)
+
+    async def timed_predict(row):
+        await predictor.predict(row)
+        return time.perf_counter() - batched_start
+
+    batched_start = time.perf_counter()
+    batched = await asyncio.gather(*(timed_predict(row) for row in rows[:n_requests]))
+    batched_seconds = time.perf_counter() - batched_start
+
+    # Bulk refresh
+    start = time.perf_counter()
+    await predictor.predict_many(rows)
+    bulk_seconds = time.perf_counter() - start
+    await predictor.close()
+
+    for name, latencies in (("per_row", per_row), ("batched", batched)):
+        for q in (50, 95):
+            record_property(f"{name}_p{q}_ms", round(float(np.percentile(latencies, q)) * 1000, 2))
+
+    assert np.percentile(batched, 50) < np.percentile(per_row, 50)
+    assert np.percentile(batched, 95) < np.percentile(per_row, 95)
+    assert batched_seconds < per_row[-1]
+    assert len(rows) / bulk_seconds > n_requests / per_row[-1]
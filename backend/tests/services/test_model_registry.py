@@ -0,0 +1,83 @@
+"""
+Tests for the versioned Model Registry
+"""
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from services.model_registry import LoadedModelCache, ModelRegistry
+
+
+@pytest.fixture
+def model():
+    X = np.random.default_rng(0).normal(size=(200, 500))
+    return LinearRegression().fit(X, X[:, 0] * 2.0), X
+
+
+@pytest.mark.asyncio
+async def test_register_and_load_latest(fake_db, tmp_path, model):
+    """Versions increment and the latest one is loaded"""
+    estimator, X = model
+    registry = ModelRegistry(fake_db, root=str(tmp_path), cache=LoadedModelCache())
+
+    assert await registry.register("ltv", estimator, metrics={"r2": 1.0}) == 1
+    assert await registry.register("ltv", estimator) == 2
+
+    registered = await registry.load("ltv")
+    assert registered.version == 2
+    assert (tmp_path / "ltv" / "2" / "model.joblib").exists()
+    assert (await registry.load("ltv", version=1)).metrics == {"r2": 1.0}
+    assert await registry.load("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_other_replica_loads_memory_mapped_artifact(fake_db, tmp_path, model):
+    """A registry with a cold cache reads the artifact from disk via mmap"""
+    estimator, X = model
+    await ModelRegistry(fake_db, root=str(tmp_path), cache=LoadedModelCache()).register("ltv", estimator)
+
+    replica = ModelRegistry(fake_db, root=str(tmp_path), cache=LoadedModelCache())
+    registered = await replica.load("ltv")
+
+    assert isinstance(registered.model.coef_, np.memmap)
+    np.testing.assert_allclose(registered.model.predict(X), estimator.predict(X))
+    # Second load is served from the process cache
+    assert (await replica.load("ltv")).model is registered.model
+
+
+@pytest.mark.asyncio
+async def test_hot_swap_after_pointer_ttl(fake_db, tmp_path, model):
+    """A version registered elsewhere is picked up once the pointer expires"""
+    estimator, _ = model
+    trainer = ModelRegistry(fake_db, root=str(tmp_path), cache=LoadedModelCache())
+    server = ModelRegistry(fake_db, root=str(tmp_path), pointer_ttl_seconds=3600, cache=LoadedModelCache())
+
+    await trainer.register("fatigue", estimator)
+    assert (await server.load("fatigue")).version == 1
+
+    await trainer.register("fatigue", estimator)
+    assert (await server.load("fatigue")).version == 1
+
+    server.pointer_ttl_seconds = 0
+    assert (await server.load("fatigue")).version == 2
+
+
+def test_cache_evicts_least_recently_used():
+    cache = LoadedModelCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+@pytest.mark.asyncio
+async def test_rejects_path_like_names(fake_db, tmp_path, model):
+    registry = ModelRegistry(fake_db, root=str(tmp_path), cache=LoadedModelCache())
+
+    with pytest.raises(ValueError):
+        await registry.register("../escape", model[0])
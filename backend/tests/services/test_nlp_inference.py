@@ -0,0 +1,149 @@
+"""
+Tests for batched transformer inference
+"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+import services.nlp_inference as nlp_inference
+from services.nlp_inference import BatchedTextPipeline, transformers_pipeline_factory
+
+# Set to 1000 or 10000 to benchmark the real sentiment model on CPU
+BENCHMARK_TEXTS = int(os.environ.get("NLP_BENCHMARK_TEXTS", "0"))
+
+
+class RecordingPipeline:
+    """Stands in for a HuggingFace pipeline and records how it is called"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, **kwargs):
+        self.calls.append((list(texts), kwargs))
+        return [{"label": "POSITIVE" if "good" in text else "NEGATIVE", "score": 0.9} for text in texts]
+
+
+class TestBatchedTextPipeline:
+    """Test lazy loading, batching and caching"""
+
+    @pytest.mark.asyncio
+    async def test_loads_lazily_once(self):
+        loads = []
+        pipe = RecordingPipeline()
+
+        def loader():
+            loads.append(1)
+            return pipe
+
+        batched = BatchedTextPipeline(loader)
+        assert not loads and not batched.loaded
+
+        await asyncio.gather(batched.run(["good one"]), batched.run(["bad one"]))
+
+        assert len(loads) == 1 and batched.loaded
+
+    @pytest.mark.asyncio
+    async def test_batches_distinct_misses_with_limits(self):
+        pipe = RecordingPipeline()
+        batched = BatchedTextPipeline(lambda: pipe, batch_size=16, max_length=128)
+
+        results = await batched.run(["good", "bad", "good", "fine"])
+
+        assert [r["label"] for r in results] == ["POSITIVE", "NEGATIVE", "POSITIVE", "NEGATIVE"]
+        assert pipe.calls == [(["good", "bad", "fine"], {"batch_size": 16, "truncation": True, "max_length": 128})]
+
+    @pytest.mark.asyncio
+    async def test_cache_skips_inference(self):
+        pipe = RecordingPipeline()
+        batched = BatchedTextPipeline(lambda: pipe, cache_size=2)
+
+        await batched.run(["a", "b"])
+        await batched.run(["b", "a"])
+        assert len(pipe.calls) == 1
+        assert batched.stats["cache_hits"] == 2
+
+        # Least recently used entry ("b") is evicted
+        await batched.run(["c"])
+        await batched.run(["a", "b"])
+        assert pipe.calls[-1][0] == ["b"]
+
+    @pytest.mark.asyncio
+    async def test_failed_load_falls_back(self):
+        attempts = []
+
+        def loader():
+            attempts.append(1)
+            raise OSError("model not available")
+
+        batched = BatchedTextPipeline(loader)
+
+        assert await batched.run(["x", "y"]) == [None, None]
+        assert await batched.run(["x"]) == [None]
+        assert len(attempts) == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_load_is_retried_with_backoff(self, monkeypatch):
+        monkeypatch.setattr(nlp_inference, "NLP_LOAD_RETRY_SECONDS", 10.0)
+        pipe = RecordingPipeline()
+        attempts = []
+
+        def loader():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise OSError("model not available")
+            return pipe
+
+        batched = BatchedTextPipeline(loader)
+
+        assert await batched.run(["good"]) == [None]
+        assert batched._retry_load_at - time.monotonic() == pytest.approx(10, abs=1)
+
+        # Once the retry delay has passed; the second failure doubles it
+        batched._retry_load_at = 0.0
+        assert await batched.run(["good"]) == [None]
+        assert batched._retry_load_at - time.monotonic() == pytest.approx(20, abs=1)
+        assert len(attempts) == 2
+
+        batched._retry_load_at = 0.0
+        assert await batched.run(["good"]) == [{"label": "POSITIVE", "score": 0.9}]
+        assert len(attempts) == 3
+        assert batched.get_stats()["load_failures"] == 0
+
+
+@pytest.mark.skipif(not BENCHMARK_TEXTS, reason="set NLP_BENCHMARK_TEXTS to run the CPU benchmark")
+@pytest.mark.asyncio
+async def test_sentiment_throughput_benchmark():
+    """Benchmark one-text-at-a-time vs batched sentiment inference on CPU"""
+    pytest.importorskip("transformers")
+    loader = transformers_pipeline_factory("sentiment-analysis")
+    pipe = loader()
+
+    words = ["great", "terrible", "campaign", "results", "creative", "budget", "launch", "audience"]
+    texts = [" ".join(words[(i + j) % len(words)] for j in range(8 + i % 24)) + f" #{i}" for i in range(BENCHMARK_TEXTS)]
+
+    sample = texts[:min(len(texts), 500)]
+    start = time.perf_counter()
+    for text in sample:
+        pipe(text)
+    single_rate = len(sample) / (time.perf_counter() - start)
+
+    batched = BatchedTextPipeline(lambda: pipe)
+    start = time.perf_counter()
+    results = await batched.run(texts)
+    batched_seconds = time.perf_counter() - start
+    batched_rate = len(texts) / batched_seconds
+
+    start = time.perf_counter()
+    await batched.run(texts)
+    cached_seconds = time.perf_counter() - start
+
+    print(
+        f"\n{len(texts):,} texts | batch size 1: {single_rate:,.0f} texts/s | "
+        f"batch size {batched.batch_size}: {batched_rate:,.0f} texts/s ({batched_seconds:.1f}s) | "
+        f"cached: {cached_seconds * 1000:.0f}ms"
+    )
+    assert all(results)
+    assert batched_rate > single_rate
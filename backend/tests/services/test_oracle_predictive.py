@@ -0,0 +1,70 @@
+"""
+Tests for ORACLE loading its registered models before predicting
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from services.oracle_predictive_service import FATIGUE_MODEL_NAME, LTV_MODEL_NAME, OraclePredictiveService
+
+
+class FatigueModel:
+    def predict(self, X):
+        return np.full(len(X), 9.4)
+
+
+class Registry:
+    """Model registry whose loads are counted and can be made to fail"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.loads = []
+
+    async def load(self, name):
+        self.loads.append(name)
+        await asyncio.sleep(0)
+        if self.fail:
+            raise ConnectionError("registry unavailable")
+        return SimpleNamespace(model=FatigueModel()) if name == FATIGUE_MODEL_NAME else None
+
+
+def creative(creative_id, days=10):
+    history = [{"ctr": 0.05, "conversion_rate": 0.02, "impressions": 1000} for _ in range(days)]
+    return {"creative_id": creative_id, "campaign_id": "c1", "performance_history": history}
+
+
+@pytest.fixture
+def oracle(fake_db):
+    return OraclePredictiveService(fake_db)
+
+
+@pytest.mark.asyncio
+async def test_models_are_loaded_once_before_the_first_prediction(oracle):
+    oracle.model_registry = Registry()
+
+    batches = await asyncio.gather(*(oracle.predict_creative_fatigue_many([creative(f"cr{n}")]) for n in range(3)))
+
+    assert sorted(oracle.model_registry.loads) == sorted([FATIGUE_MODEL_NAME, LTV_MODEL_NAME])
+    assert [batch[0].days_until_fatigue for batch in batches] == [9, 9, 9]
+
+
+@pytest.mark.asyncio
+async def test_failed_load_falls_back_to_rules_and_is_retried(oracle):
+    oracle.model_registry = Registry(fail=True)
+
+    prediction = await oracle.predict_creative_fatigue("cr1", "c1", creative("cr1")["performance_history"])
+    await oracle.predict_creative_fatigue("cr1", "c1", creative("cr1")["performance_history"])
+
+    # Stable creative, 10 days active: max(7, 14 - 10 // 3)
+    assert prediction.days_until_fatigue == 11
+    assert len(oracle.model_registry.loads) == 1
+
+    # Once the retry delay has passed
+    oracle._retry_load_at = 0.0
+    oracle.model_registry.fail = False
+    prediction = await oracle.predict_creative_fatigue("cr1", "c1", creative("cr1")["performance_history"])
+
+    assert prediction.days_until_fatigue == 9
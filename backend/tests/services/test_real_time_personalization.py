@@ -0,0 +1,124 @@
+"""
+Tests for real-time profile updates and segment membership
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import segment_engine
+from services.behavior_store import epoch_day
+from services.segment_engine import CompiledSegment, materialize_segment
+
+personalization = pytest.importorskip("services.real_time_personalization_service")
+EventType = personalization.BehavioralEventType
+
+
+def profile_doc(user_id, country="US", behavior_counts=None):
+    return {
+        "user_id": user_id,
+        "demographics": {"country": country},
+        "behaviors": [],
+        "preferences": {},
+        "segments": [],
+        "engagement_score": 0.0,
+        "last_updated": datetime.utcnow().isoformat(),
+        "behavior_counts": behavior_counts or {},
+    }
+
+
+def event(user_id, event_type, timestamp):
+    return personalization.BehavioralEvent(
+        event_id=str(uuid.uuid4()),
+        user_id=user_id,
+        event_type=event_type,
+        properties={},
+        timestamp=timestamp,
+        session_id="s1",
+        page_url=None
+    )
+
+
+@pytest.fixture
+def profiles(fake_db, fake_redis, monkeypatch):
+    monkeypatch.setattr(segment_engine, "segment_cache", None)
+    return personalization.UserProfileManager(fake_db, fake_redis)
+
+
+class TestSegmentMembership:
+    """Membership is read from the Redis reverse sets, whichever path wrote it"""
+
+    @pytest.mark.asyncio
+    async def test_materialized_member_leaves_when_it_stops_matching(self, profiles, fake_db, fake_redis):
+        fake_db.audience_segments.docs.append(
+            {"segment_id": "us", "criteria": {"demographics": {"country": "US"}}, "active": True}
+        )
+        fake_db.user_profiles.docs.extend([profile_doc("u1"), profile_doc("u2")])
+        await materialize_segment(fake_db, fake_redis, CompiledSegment.compile("us", {"demographics": {"country": "US"}}))
+        assert fake_redis.sets["user_segments:u1"] == {"us"}
+
+        profile = await profiles.update_user_profile("u1", {"demographics": {"country": "CA"}})
+
+        assert profile.segments == []
+        assert fake_redis.sets["segment:us"] == {"u2"}
+        assert "user_segments:u1" not in fake_redis.sets
+        assert (await fake_db.user_profiles.find_one({"user_id": "u1"}))["segments"] == []
+
+    @pytest.mark.asyncio
+    async def test_materialized_behavioral_membership_ages_out_on_any_activity(self, profiles, fake_db, fake_redis):
+        today = epoch_day(datetime.utcnow())
+        fake_db.audience_segments.docs.append({
+            "segment_id": "clickers",
+            "criteria": {"behaviors": [{"event_type": "click", "time_window_days": 7}]},
+            "active": True,
+        })
+        fake_db.user_profiles.docs.append(profile_doc("u1", behavior_counts={"click": {str(today - 10): 3}}))
+        # As left by the last bulk materialization, while the clicks were recent
+        fake_redis.sets.update({"segment:clickers": {"u1"}, "user_segments:u1": {"clickers"}})
+
+        profile = await profiles.update_user_profile("u1", {"behaviors": [
+            {"event_type": "page_view", "timestamp": datetime.utcnow().isoformat()}
+        ]})
+
+        assert profile.segments == []
+        assert fake_redis.sets == {}
+
+
+class TestBehaviorCounts:
+    """Event updates keep the stored daily counters complete"""
+
+    @pytest.mark.asyncio
+    async def test_profile_stored_before_counters_is_seeded_with_its_history(self, profiles, fake_db):
+        now = datetime.utcnow()
+        today = epoch_day(now)
+        legacy = profile_doc("u1")
+        del legacy["behavior_counts"]
+        legacy["behaviors"] = [
+            {"event_type": "click", "timestamp": (now - timedelta(days=2)).isoformat()} for _ in range(3)
+        ]
+        fake_db.user_profiles.docs.append(legacy)
+
+        await profiles._update_profile_with_events("u1", [event("u1", EventType.PAGE_VIEW, now)])
+        stored = await fake_db.user_profiles.find_one({"user_id": "u1"})
+        assert stored["behavior_counts"] == {"click": {str(today - 2): 3}, "page_view": {str(today): 1}}
+
+        # Later updates increment the seeded counters
+        await profiles._update_profile_with_events("u1", [event("u1", EventType.CLICK, now)])
+        stored = await fake_db.user_profiles.find_one({"user_id": "u1"})
+        assert stored["behavior_counts"] == {"click": {str(today - 2): 3, str(today): 1}, "page_view": {str(today): 1}}
+        assert len(stored["behaviors"]) == 5
+
+
+@pytest.mark.asyncio
+async def test_failed_profile_updates_are_counted(profiles, fake_db, monkeypatch):
+    fake_db.user_profiles.docs.append(profile_doc("u1"))
+
+    async def unavailable(user_id):
+        raise RuntimeError("profile store unavailable")
+
+    monkeypatch.setattr(profiles, "get_user_profile", unavailable)
+    await profiles.track_behavioral_event("u1", event("u1", EventType.CLICK, datetime.utcnow()))
+    await profiles.event_buffer.close()
+
+    assert (profiles.event_buffer.applied, profiles.event_buffer.failed) == (0, 1)
@@ -0,0 +1,102 @@
+"""
+Tests for streaming report exports and the report artifact store
+"""
+
+import csv
+import io
+import os
+
+import numpy as np
+import pytest
+
+from services.asset_pipeline import LocalBlobStore
+from services.report_export import iter_artifact, iter_csv, load_json, store_artifact, store_json, write_xlsx
+
+
+def cursor(collection, docs):
+    collection.docs = docs
+    return collection.find({}, {"_id": 0})
+
+
+def rows(n):
+    return [{"campaign_id": f"c{i}", "spend": i * 1.5, "targeting": {"age": [18, 34]}} for i in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_csv_is_streamed_in_row_chunks(fake_db):
+    campaigns = cursor(fake_db.campaigns, rows(25))
+    chunks = []
+
+    async for chunk in iter_csv(campaigns, chunk_rows=10):
+        chunks.append(chunk)
+        # Only one chunk of rows ahead of what has been sent
+        assert campaigns.read <= len(chunks) * 10
+
+    assert len(chunks) == 3
+    parsed = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert len(parsed) == 25
+    assert parsed[3] == {"campaign_id": "c3", "spend": "4.5", "targeting": '{"age": [18, 34]}'}
+
+
+@pytest.mark.asyncio
+async def test_csv_columns_are_fixed_by_header(fake_db):
+    data = [{"a": 1}, {"a": 2, "b": 3}]
+
+    output = b"".join([chunk async for chunk in iter_csv(cursor(fake_db.data, data), columns=["a", "c"])])
+    empty = b"".join([chunk async for chunk in iter_csv(cursor(fake_db.empty, []), columns=["a"])])
+
+    assert output.decode().splitlines() == ["a,c", "1,", "2,"]
+    assert empty.decode().splitlines() == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_json_artifact_round_trip(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+
+    size = await store_json(store, "r1/data.json", {"total": np.int64(7), "mean": np.float64(0.5)})
+
+    assert size == (tmp_path / "r1" / "data.json").stat().st_size
+    assert await load_json(store, "r1/data.json") == {"total": 7, "mean": 0.5}
+
+
+@pytest.mark.asyncio
+async def test_failed_build_leaves_no_artifact(tmp_path):
+    store = LocalBlobStore(str(tmp_path / "store"))
+    spooled = []
+
+    async def build(path):
+        spooled.append(path)
+        raise RuntimeError("render failed")
+
+    with pytest.raises(RuntimeError):
+        await store_artifact(store, "r1/export.pdf", build)
+
+    assert not store.exists("r1/export.pdf")
+    assert not os.path.exists(spooled[0])
+
+
+@pytest.mark.asyncio
+async def test_artifact_is_streamed_in_chunks(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+
+    async def build(path):
+        with open(path, "wb") as handle:
+            handle.write(b"x" * 2500)
+
+    await store_artifact(store, "r1/export.xlsx", build)
+
+    chunks = [chunk async for chunk in iter_artifact(store, "r1/export.xlsx", chunk_size=1000)]
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+
+
+@pytest.mark.asyncio
+async def test_xlsx_streams_rows_into_data_sheet(fake_db, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    path = str(tmp_path / "report.xlsx")
+
+    await write_xlsx(path, {"Summary": [{"total_spend": 10.0}]}, cursor(fake_db.campaigns, rows(25)), chunk_rows=10)
+
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    assert workbook.sheetnames == ["Summary", "Data"]
+    data = list(workbook["Data"].iter_rows(values_only=True))
+    assert data[0] == ("campaign_id", "spend", "targeting") and len(data) == 26
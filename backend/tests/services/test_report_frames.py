@@ -0,0 +1,158 @@
+"""
+Tests for column-pruned report queries and typed frame loading
+"""
+
+import asyncio
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.report_frames import (
+    CAMPAIGN_COLUMNS,
+    CATEGORY,
+    FLOAT,
+    OBJECT,
+    FrameBuilder,
+    campaign_metrics_pipeline,
+    load_frame,
+)
+
+# 100k campaigns is the nightly-scale run; keep CI fast by default
+BENCHMARK_CAMPAIGNS = int(os.environ.get("REPORT_FRAMES_BENCHMARK_CAMPAIGNS", "10000"))
+
+
+def test_builder_types_columns():
+    builder = FrameBuilder({"platform": CATEGORY, "spend": FLOAT, "date": OBJECT})
+    for doc in [
+        {"platform": "google", "spend": 10, "date": "2024-01-01", "ignored": {"nested": True}},
+        {"platform": "meta", "spend": "12.5", "date": "2024-01-02"},
+        {"spend": None},
+        {"platform": "google", "spend": "n/a"},
+    ]:
+        builder.append(doc)
+
+    df = builder.build()
+
+    assert list(df.columns) == ["platform", "spend", "date"]
+    assert df["spend"].dtype == np.float64
+    assert isinstance(df["platform"].dtype, pd.CategoricalDtype)
+    assert df["platform"].tolist()[:2] == ["google", "meta"] and pd.isna(df["platform"][2])
+    np.testing.assert_array_equal(df["spend"].to_numpy(), [10.0, 12.5, np.nan, np.nan])
+    assert df["date"].tolist() == ["2024-01-01", "2024-01-02", None, None]
+
+
+@pytest.mark.asyncio
+async def test_empty_cursor_gives_empty_typed_frame(fake_db):
+    df = await load_frame(fake_db.campaigns.aggregate([]), CAMPAIGN_COLUMNS)
+
+    assert df.empty and list(df.columns) == list(CAMPAIGN_COLUMNS)
+    assert df["spend"].dtype == np.float64
+
+
+def test_pipeline_prunes_and_joins_in_database():
+    pipeline = campaign_metrics_pipeline({"platform": "google"})
+
+    assert pipeline[0] == {"$match": {"platform": "google"}}
+    assert pipeline[1]["$project"] == {"_id": 0, "campaign_id": 1, "platform": 1, "status": 1, "campaign_type": 1}
+    assert pipeline[2]["$lookup"]["from"] == "campaign_metrics"
+    # The unwind must follow the lookup directly for the server to coalesce them
+    assert pipeline[3] == {"$unwind": {"path": "$metrics", "preserveNullAndEmptyArrays": True}}
+    assert set(pipeline[4]["$project"]) == set(CAMPAIGN_COLUMNS)
+    assert pipeline[4]["$project"]["spend"] == "$metrics.spend"
+
+
+def campaign_documents(n, rng):
+    """Campaigns as stored, with the fields reports never read"""
+    platforms = np.array(["google", "meta", "linkedin", "tiktok"])[rng.integers(0, 4, n)]
+    for i in range(n):
+        yield {
+            "_id": f"oid{i}",
+            "campaign_id": f"c{i}",
+            "name": f"Campaign {i}",
+            "platform": str(platforms[i]),
+            "status": "active",
+            "campaign_type": "conversion",
+            "created_at": "2024-01-01T00:00:00",
+            "budget": {"daily_budget": 100.0, "total_budget": 3000.0},
+            "targeting": {"countries": ["US", "CA"], "age_range": [25, 54], "interests": ["sports", "travel"]},
+            "creatives": [{"creative_id": f"cr{i}", "headline": "Try it today", "body": "x" * 120}]
+        }
+
+
+def metrics_documents(n, values):
+    for i in range(n):
+        yield {
+            "_id": f"mid{i}",
+            "campaign_id": f"c{i}",
+            "date": "2024-01-01",
+            "spend": values[i, 0],
+            "revenue": values[i, 1],
+            "impressions": values[i, 2],
+            "clicks": values[i, 3],
+            "conversions": values[i, 4],
+            "updated_at": "2024-01-02T00:00:00"
+        }
+
+
+def joined_documents(n, values, rng):
+    """The pipeline's output rows for the same campaigns and metrics"""
+    pruned = list(CAMPAIGN_COLUMNS)
+    for campaign, metrics in zip(campaign_documents(n, rng), metrics_documents(n, values)):
+        yield {name: campaign.get(name, metrics.get(name)) for name in pruned}
+
+
+def list_of_dicts_frame(n, values, rng):
+    """Full documents materialized with to_list and merged in pandas, as before"""
+    campaigns = list(campaign_documents(n, rng))
+    metrics = list(metrics_documents(n, values))
+    return pd.DataFrame(campaigns).merge(pd.DataFrame(metrics), on="campaign_id", how="left")
+
+
+async def stream(documents):
+    for document in documents:
+        yield document
+
+
+async def columnar_frame(n, values, rng):
+    return await load_frame(stream(joined_documents(n, values, rng)), CAMPAIGN_COLUMNS)
+
+
+def measure(run):
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    df = run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return df, seconds, peak
+
+
+def test_campaign_frame_benchmark():
+    """Benchmark list-of-dicts merge vs pruned, columnar loading (campaigns x 1 metrics row)"""
+    n = BENCHMARK_CAMPAIGNS
+    values = np.random.default_rng(7).uniform(1, 1000, (n, 5))
+
+    before, before_seconds, before_peak = measure(lambda: list_of_dicts_frame(n, values, np.random.default_rng(3)))
+    after, after_seconds, after_peak = measure(
+        lambda: asyncio.run(columnar_frame(n, values, np.random.default_rng(3)))
+    )
+
+    for column in ("spend", "revenue", "impressions", "clicks", "conversions"):
+        assert after[column].sum() == pytest.approx(before[column].sum())
+    assert after.groupby("platform")["spend"].sum().to_dict() == pytest.approx(
+        before.groupby("platform")["spend"].sum().to_dict()
+    )
+    resident = after.memory_usage(deep=True).sum()
+
+    print(
+        f"\n{n:,} campaigns | list of dicts + merge: {before_seconds:.2f}s, peak {before_peak / 2**20:,.0f} MiB, "
+        f"frame {before.memory_usage(deep=True).sum() / 2**20:,.0f} MiB | pruned columnar: {after_seconds:.2f}s, "
+        f"peak {after_peak / 2**20:,.0f} MiB, frame {resident / 2**20:,.0f} MiB"
+    )
+    assert after_peak < before_peak
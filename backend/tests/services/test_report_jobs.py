@@ -0,0 +1,163 @@
+"""
+Tests for the durable report job queue
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.report_jobs import JobPriority, JobStatus, ReportJobQueue, request_hash
+
+def seed(collection, docs=()):
+    collection.docs = list(docs)
+    return collection
+
+
+def get(collection, report_id):
+    return next(doc for doc in collection.docs if doc["report_id"] == report_id)
+
+
+def job(report_id, tenant, priority=JobPriority.SCHEDULED, minutes_ago=0):
+    return {
+        "report_id": report_id,
+        "tenant_id": tenant,
+        "priority": priority,
+        "status": JobStatus.QUEUED,
+        "attempts": 0,
+        "available_at": datetime.utcnow() - timedelta(minutes=1),
+        "created_at": (datetime.utcnow() - timedelta(minutes=minutes_ago)).isoformat()
+    }
+
+
+class Runner:
+    """Job runner whose jobs finish when released"""
+
+    def __init__(self, error=None):
+        self.started = []
+        self.release = asyncio.Event()
+        self.error = error
+
+    async def __call__(self, job):
+        self.started.append(job["report_id"])
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return {"file_size": 10}
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_interactive_jobs_claimed_first_within_global_cap(fake_db):
+    collection = seed(fake_db.reports, [
+        job("old-scheduled", "a", minutes_ago=10),
+        job("scheduled", "a", minutes_ago=5),
+        job("interactive-b", "b", JobPriority.INTERACTIVE, minutes_ago=1),
+        job("interactive-a", "a", JobPriority.INTERACTIVE, minutes_ago=2),
+    ])
+    runner = Runner()
+    queue = ReportJobQueue(collection, runner, concurrency=3, tenant_concurrency=2)
+
+    assert await queue.dispatch() == 3
+    await settle()
+    assert runner.started == ["interactive-a", "interactive-b", "old-scheduled"]
+    assert get(collection, "scheduled")["status"] == JobStatus.QUEUED
+
+    runner.release.set()
+    await settle()
+    assert get(collection, "interactive-a")["status"] == JobStatus.COMPLETED
+    assert get(collection, "interactive-a")["file_size"] == 10
+    assert "lease_owner" not in get(collection, "interactive-a")
+
+    assert await queue.dispatch() == 1
+    await settle()
+    assert get(collection, "scheduled")["status"] == JobStatus.COMPLETED
+
+
+@pytest.mark.asyncio
+async def test_tenant_cap_leaves_room_for_other_tenants(fake_db):
+    collection = seed(fake_db.reports, [job("a1", "a", minutes_ago=3), job("a2", "a", minutes_ago=2), job("b1", "b", minutes_ago=1)])
+    runner = Runner()
+    queue = ReportJobQueue(collection, runner, concurrency=3, tenant_concurrency=1)
+
+    await queue.dispatch()
+    await settle()
+
+    assert runner.started == ["a1", "b1"]
+    runner.release.set()
+    await settle()
+
+
+@pytest.mark.asyncio
+async def test_failed_jobs_retry_with_backoff_then_fail(fake_db):
+    collection = seed(fake_db.reports, [job("r1", "a")])
+    runner = Runner(error=RuntimeError("database timeout"))
+    runner.release.set()
+    queue = ReportJobQueue(collection, runner, max_attempts=2)
+
+    await queue.dispatch()
+    await settle()
+    retried = get(collection, "r1")
+    assert retried["status"] == JobStatus.QUEUED and retried["attempts"] == 1
+    assert retried["available_at"] > datetime.utcnow()
+    assert await queue.dispatch() == 0
+
+    retried["available_at"] = datetime.utcnow()
+    await queue.dispatch()
+    await settle()
+    assert get(collection, "r1")["status"] == JobStatus.FAILED
+    assert get(collection, "r1")["error_message"] == "database timeout"
+
+
+@pytest.mark.asyncio
+async def test_recover_requeues_jobs_with_expired_leases(fake_db):
+    now = datetime.utcnow()
+    collection = seed(fake_db.reports, [
+        {**job("crashed", "a"), "status": JobStatus.RUNNING, "attempts": 1, "lease_expires_at": now - timedelta(seconds=1)},
+        {**job("legacy", "a"), "status": JobStatus.RUNNING},
+        {**job("poison", "a"), "status": JobStatus.RUNNING, "attempts": 3, "lease_expires_at": now - timedelta(seconds=1)},
+        {**job("alive", "a"), "status": JobStatus.RUNNING, "attempts": 1, "lease_expires_at": now + timedelta(minutes=1)},
+    ])
+    queue = ReportJobQueue(collection, Runner(), max_attempts=3)
+
+    assert await queue.recover() == 2
+
+    assert get(collection, "crashed")["status"] == JobStatus.QUEUED
+    assert get(collection, "legacy")["status"] == JobStatus.QUEUED
+    assert get(collection, "poison")["status"] == JobStatus.FAILED
+    assert get(collection, "alive")["status"] == JobStatus.RUNNING
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_share_one_job(fake_db):
+    collection = seed(fake_db.reports)
+    queue = ReportJobQueue(collection, Runner(), poll_interval=60)
+    key = request_hash("template", {"start_date": "2024-01-01", "filters": {"a": 1, "b": 2}}, "org1")
+
+    first, shared_first = await queue.submit({"report_id": "r1"}, "org1", dedupe_key=key)
+    second, shared_second = await queue.submit(
+        {"report_id": "r2"}, "org1",
+        dedupe_key=request_hash("template", {"filters": {"b": 2, "a": 1}, "start_date": "2024-01-01"}, "org1")
+    )
+    other, shared_other = await queue.submit({"report_id": "r3"}, "org2", dedupe_key=request_hash("template", {}, "org2"))
+
+    assert (shared_first, shared_second, shared_other) == (False, True, False)
+    assert second["report_id"] == "r1" and other["report_id"] == "r3"
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_close_hands_running_jobs_back(fake_db):
+    collection = seed(fake_db.reports, [job("r1", "a")])
+    queue = ReportJobQueue(collection, Runner())
+
+    await queue.dispatch()
+    await settle()
+    await queue.close()
+
+    assert get(collection, "r1")["status"] == JobStatus.QUEUED
+    assert get(collection, "r1")["attempts"] == 0
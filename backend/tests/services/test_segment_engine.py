@@ -0,0 +1,260 @@
+"""
+Tests for compiled segment evaluation and the segment cache
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.behavior_store import BehaviorCounts, epoch_day
+from services.segment_engine import (
+    CompiledSegment,
+    SegmentCache,
+    SegmentIndex,
+    UserSegmentsLookup,
+    materialize_segment,
+    queue_user_membership,
+    refresh_segment_members,
+)
+
+NOW = datetime(2024, 6, 1, 12, 0)
+TODAY = epoch_day(NOW)
+
+
+def behavior(event_type, days_ago):
+    return {"event_type": event_type, "timestamp": (NOW - timedelta(days=days_ago)).isoformat()}
+
+
+def test_compiled_segment_matches_criteria():
+    segment = CompiledSegment.compile("s1", {
+        "demographics": {"country": "US"},
+        "behaviors": [{"event_type": "click", "min_count": 2, "time_window_days": 7}],
+        "min_engagement_score": 0.3
+    })
+    counts = BehaviorCounts.from_behaviors([behavior("click", 1), behavior("click", 6), behavior("click", 9)])
+
+    assert segment.matches({"country": "US"}, 0.5, counts, TODAY)
+    assert not segment.matches({"country": "CA"}, 0.5, counts, TODAY)
+    assert not segment.matches({"country": "US"}, 0.1, counts, TODAY)
+    # One click ages out of the window
+    assert not segment.matches({"country": "US"}, 0.5, counts, TODAY + 2)
+
+
+class TestSegmentIndex:
+    """Test which segments an event or update re-evaluates"""
+
+    def build(self):
+        return SegmentIndex([
+            CompiledSegment.compile("clickers", {"behaviors": [{"event_type": "click"}]}),
+            CompiledSegment.compile("buyers", {"behaviors": [{"event_type": "conversion"}]}),
+            CompiledSegment.compile("us", {"demographics": {"country": "US"}}),
+            CompiledSegment.compile("engaged", {"min_engagement_score": 0.5}),
+            CompiledSegment.compile("everyone", {}),
+        ])
+
+    def ids(self, segments):
+        return {segment.segment_id for segment in segments}
+
+    def test_event_only_reaches_dependent_segments(self):
+        index = self.build()
+
+        assert self.ids(index.affected(event_types=["click"], member_of=["everyone"])) == {"clickers"}
+
+    def test_fields_reach_dependent_segments(self):
+        index = self.build()
+
+        affected = index.affected(fields=["demographics.country", "engagement_score"], member_of=["everyone"])
+
+        assert self.ids(affected) == {"us", "engaged"}
+
+    def test_windowed_memberships_and_unconditional_segments(self):
+        index = self.build()
+
+        # Buyers can age out on any event; "everyone" is joined once
+        assert self.ids(index.affected(event_types=["page_view"], member_of=["buyers", "us"])) == {"buyers", "everyone"}
+
+
+class TestSegmentCache:
+    """Test reload and invalidation of the in-memory index"""
+
+    @pytest.mark.asyncio
+    async def test_ttl_reload_without_change_streams(self, fake_db):
+        segments = fake_db.audience_segments
+        segments.docs = [
+            {"segment_id": "a", "criteria": {}, "active": True},
+            {"segment_id": "b", "criteria": {}, "active": False},
+        ]
+        cache = SegmentCache(fake_db, ttl=60)
+
+        index = await cache.get_index()
+        await cache.get_index()
+        assert list(index.segments) == ["a"] and len(segments.queries) == 1
+
+        cache._loaded_at -= 61
+        await cache.get_index()
+        assert len(segments.queries) == 2
+        await cache.close()
+
+    @pytest.mark.asyncio
+    async def test_change_stream_invalidates_index(self, fake_db):
+        segments = fake_db.audience_segments
+        segments.docs = [{"segment_id": "a", "criteria": {}, "active": True}]
+        stream = segments.stream_changes()
+        cache = SegmentCache(fake_db, ttl=0)
+
+        await cache.get_index()
+        await asyncio.sleep(0)
+        assert cache._watching
+
+        # No TTL reloads while the stream is open
+        await cache.get_index()
+        finds = len(segments.queries)
+
+        segments.docs.append({"segment_id": "b", "criteria": {}, "active": True})
+        await stream.changes.put({"operationType": "insert"})
+        await asyncio.sleep(0)
+
+        index = await cache.get_index()
+        assert set(index.segments) == {"a", "b"} and len(segments.queries) == finds + 1
+        await cache.close()
+
+
+def test_mongo_query_compiles_all_criteria():
+    segment = CompiledSegment.compile("s1", {
+        "demographics": {"country": "US"},
+        "behaviors": [{"event_type": "click", "min_count": 2, "time_window_days": 3}],
+        "min_engagement_score": 0.3
+    })
+
+    query = segment.to_mongo_query(NOW)
+
+    assert query == {"$and": [
+        {"demographics.country": "US"},
+        {"engagement_score": {"$gte": 0.3}},
+        {"$or": [
+            {"behavior_counts": {"$exists": True}, "$expr": {"$gte": [
+                {"$add": [
+                    {"$ifNull": [f"$behavior_counts.click.{day}", 0]}
+                    for day in (TODAY - 2, TODAY - 1, TODAY)
+                ]},
+                2
+            ]}},
+            {"behavior_counts": {"$exists": False}, "$expr": {"$gte": [
+                {"$size": {"$filter": {
+                    "input": {"$ifNull": ["$behaviors", []]},
+                    "as": "b",
+                    "cond": {"$and": [
+                        {"$eq": ["$$b.event_type", "click"]},
+                        {"$gte": ["$$b.timestamp", "2024-05-30T00:00:00"]}
+                    ]}
+                }}},
+                2
+            ]}}
+        ]}
+    ]}
+    assert CompiledSegment.compile("all", {}).to_mongo_query(NOW) == {}
+
+
+def test_mongo_query_matches_profiles_stored_before_counters():
+    query = CompiledSegment.compile("s1", {"behaviors": [{"event_type": "click"}]}).to_mongo_query(NOW)
+
+    legacy = query["$or"][1]
+    assert legacy == {
+        "behavior_counts": {"$exists": False},
+        "behaviors": {"$elemMatch": {"event_type": "click", "timestamp": {"$gte": "2024-05-03T00:00:00"}}}
+    }
+
+
+def test_window_longer_than_kept_history_is_rejected():
+    with pytest.raises(ValueError):
+        CompiledSegment.compile("s1", {"behaviors": [{"event_type": "click", "time_window_days": 91}]})
+
+
+class TestMaterialization:
+    """Test bulk membership writes"""
+
+    @pytest.mark.asyncio
+    async def test_materialize_streams_chunks_and_swaps_set(self, fake_db, fake_redis):
+        redis_client = fake_redis
+        redis_client.sets.update({"segment:s1": {"stale", "u0"}, "user_segments:stale": {"s1", "s2"}})
+        profiles = fake_db.user_profiles
+        profiles.docs = [{"user_id": f"u{i}", "demographics": {"country": "US"}} for i in range(25)]
+        profiles.docs.append({"user_id": "ca", "demographics": {"country": "CA"}})
+        segment = CompiledSegment.compile("s1", {"demographics": {"country": "US"}})
+
+        size = await materialize_segment(fake_db, redis_client, segment, NOW, chunk_size=10)
+
+        assert size == 25
+        assert redis_client.sets.pop("segment:s1") == {f"u{i}" for i in range(25)}
+        assert redis_client.sets.pop("user_segments:stale") == {"s2"}
+        assert redis_client.sets == {f"user_segments:u{i}": {"s1"} for i in range(25)}
+        # Three pipelines, the diff, one pipeline of leaves and the rename
+        assert redis_client.round_trips == 6
+        assert profiles.queries == [({"demographics.country": "US"}, {"_id": 0, "user_id": 1})]
+
+    @pytest.mark.asyncio
+    async def test_empty_segment_is_removed(self, fake_db, fake_redis):
+        fake_redis.sets["segment:s1"] = {"stale"}
+
+        size = await materialize_segment(fake_db, fake_redis, CompiledSegment("s1"), NOW)
+
+        assert size == 0 and fake_redis.sets == {}
+
+    @pytest.mark.asyncio
+    async def test_incremental_refresh_reevaluates_updated_profiles(self, fake_db, fake_redis):
+        redis_client = fake_redis
+        redis_client.sets["segment:s1"] = {"left", "kept"}
+        profiles = fake_db.user_profiles
+        profiles.docs = [
+            {"user_id": "left", "demographics": {"country": "US"}, "behavior_counts": {}, "engagement_score": 0.0,
+             "last_updated": "2024-06-01T10:00:00"},
+            {"user_id": "joined", "demographics": {"country": "US"}, "engagement_score": 0.0,
+             "behavior_counts": {"click": {str(TODAY): 1}}, "last_updated": "2024-06-01T11:00:00"},
+            {"user_id": "kept", "last_updated": "2024-05-01T00:00:00"},
+        ]
+        segment = CompiledSegment.compile("s1", {
+            "demographics": {"country": "US"}, "behaviors": [{"event_type": "click"}]
+        })
+
+        counts = await refresh_segment_members(
+            fake_db, redis_client, segment, since="2024-05-31T00:00:00", now=NOW
+        )
+
+        assert counts == (1, 1)
+        assert redis_client.sets["segment:s1"] == {"kept", "joined"}
+        assert redis_client.sets["user_segments:joined"] == {"s1"}
+        assert redis_client.round_trips == 1
+        assert profiles.queries[0][0] == {"last_updated": {"$gte": "2024-05-31T00:00:00"}}
+
+
+def test_user_membership_updates_forward_and_reverse_sets(fake_redis):
+    redis_client = fake_redis
+    redis_client.sets.update({"segment:old": {"u1"}, "user_segments:u1": {"old"}})
+    pipe = redis_client.pipeline()
+
+    queue_user_membership(pipe, "u1", added=["a", "b"], removed=["old"])
+    asyncio.run(pipe.execute())
+
+    assert redis_client.sets == {"segment:a": {"u1"}, "segment:b": {"u1"}, "user_segments:u1": {"a", "b"}}
+
+
+@pytest.mark.asyncio
+async def test_user_segments_lookup_caches_and_filters_inactive(fake_db, fake_redis):
+    redis_client = fake_redis
+    redis_client.sets["user_segments:u1"] = {"a", "inactive"}
+    fake_db.audience_segments.docs = [
+        {"segment_id": "a", "criteria": {}, "active": True},
+        {"segment_id": "inactive", "criteria": {}, "active": False},
+    ]
+    lookup = UserSegmentsLookup(redis_client, SegmentCache(fake_db), ttl=60)
+
+    assert await lookup.get("u1") == ["a"]
+    assert await lookup.get("u1") == ["a"]
+    assert redis_client.round_trips == 1
+
+    redis_client.sets["user_segments:u1"].add("b")
+    lookup.invalidate("u1")
+    await lookup.get("u1")
+    assert redis_client.round_trips == 2
+    await lookup.segment_cache.close()
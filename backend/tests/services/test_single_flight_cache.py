@@ -0,0 +1,63 @@
+"""
+Tests for the single-flight LRU/TTL cache
+"""
+
+import asyncio
+
+import pytest
+
+from services.single_flight_cache import SingleFlightCache
+
+
+class Cache(SingleFlightCache):
+    def __init__(self):
+        super().__init__(ttl=60, max_entries=10)
+        self.loads = 0
+
+    async def get(self, key, release):
+        value = self._cached(key)
+        if value is not None:
+            return value, False
+
+        async def load():
+            self.loads += 1
+            await release.wait()
+            return f"value-{self.loads}"
+
+        return await self._load(key, load)
+
+
+@pytest.mark.asyncio
+async def test_waiter_loads_the_key_when_the_loading_caller_is_cancelled():
+    cache = Cache()
+    release = asyncio.Event()
+    leader = asyncio.create_task(cache.get("k", release))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get("k", release))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await waiter == ("value-2", False)
+    assert cache.loads == 2
+    assert await cache.get("k", release) == ("value-2", False)
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+@pytest.mark.asyncio
+async def test_failure_is_shared_with_waiters_and_not_cached():
+    cache = Cache()
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise RuntimeError("backend down")
+
+    results = await asyncio.gather(
+        cache._load("k", fail), cache._load("k", fail), return_exceptions=True
+    )
+
+    assert [str(result) for result in results] == ["backend down", "backend down"]
+    assert cache._entries == {} and cache._inflight == {}
@@ -0,0 +1,144 @@
+"""
+Tests for background model training jobs
+"""
+
+import asyncio
+
+import joblib
+import pytest
+
+import services.training_jobs as training_jobs
+from services.model_registry import LoadedModelCache, ModelRegistry
+from services.training_jobs import (
+    JobStatus,
+    TrainingCancelled,
+    TrainingJobManager,
+    run_training_job,
+)
+
+
+class TestWorker:
+    """Test the worker entry point in-process"""
+
+    def test_trains_reports_progress_and_saves(self, tmp_path):
+        progress, output = {}, tmp_path / "model.joblib"
+
+        result = run_training_job("job1", "ltv_forecasting", {"n_samples": 200}, None, str(output), progress, {})
+
+        model = joblib.load(output)
+        assert len(model.estimators_) == 100
+        assert progress["job1"]["stage"] == "saving"
+        assert result["metadata"]["warm_started"] is False
+        assert "accuracy" in result["metrics"]
+
+    def test_warm_start_adds_trees_to_base_model(self, tmp_path):
+        base_path, output = tmp_path / "base.joblib", tmp_path / "model.joblib"
+        run_training_job("base", "fatigue_prediction", {"n_samples": 300}, None, str(base_path), {}, {})
+
+        result = run_training_job(
+            "warm", "fatigue_prediction", {"n_samples": 300, "seed": 7}, str(base_path), str(output), {}, {}
+        )
+
+        assert result["metadata"]["warm_started"] is True
+        assert len(joblib.load(output).estimators_) == 125
+
+    def test_incompatible_base_trains_from_scratch(self, tmp_path):
+        base_path, output = tmp_path / "base.joblib", tmp_path / "model.joblib"
+        run_training_job("base", "ltv_forecasting", {"n_samples": 200}, None, str(base_path), {}, {})
+
+        # Regressor on 16 features cannot seed the 20-feature fatigue classifier
+        result = run_training_job("job", "fatigue_prediction", {"n_samples": 300}, str(base_path), str(output), {}, {})
+
+        assert result["metadata"]["warm_started"] is False
+        assert len(joblib.load(output).estimators_) == 100
+
+    def test_cancel_flag_stops_training(self, tmp_path):
+        with pytest.raises(TrainingCancelled):
+            run_training_job(
+                "job1", "anomaly_detection", {}, None, str(tmp_path / "m.joblib"), {}, {"job1": True}
+            )
+        assert not (tmp_path / "m.joblib").exists()
+
+
+@pytest.fixture
+def manager(fake_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(training_jobs, "PROGRESS_SYNC_SECONDS", 0.1)
+    registry = ModelRegistry(fake_db, root=str(tmp_path), cache=LoadedModelCache())
+    return TrainingJobManager(fake_db, registry, max_workers=1)
+
+
+@pytest.mark.asyncio
+async def test_job_runs_in_process_pool_and_registers_model(manager):
+    """Jobs train in a worker process, register a version and call back"""
+    finished = []
+
+    async def on_success(job):
+        finished.append(job)
+
+    try:
+        first = await manager.submit("anomaly_detection", "anomaly_detection", {"n_samples": 300}, on_success=on_success)
+        await manager.wait(first)
+        second = await manager.submit("anomaly_detection", "anomaly_detection", {"n_samples": 300})
+        await manager.wait(second)
+    finally:
+        await manager.shutdown()
+
+    job = await manager.get_job(first)
+    assert job["status"] == JobStatus.COMPLETED
+    assert job["registry_version"] == 1
+    assert finished and finished[0]["job_id"] == first
+
+    retrained = await manager.get_job(second)
+    assert retrained["warm_start_from"] == 1
+    assert retrained["warm_started"] is True
+    registered = await manager.registry.load("anomaly_detection")
+    assert registered.version == 2
+    assert len(registered.model.estimators_) == 125
+
+
+@pytest.mark.asyncio
+async def test_running_job_can_be_cancelled(manager):
+    """Cancellation stops a running job between estimator chunks"""
+    try:
+        job_id = await manager.submit("fatigue_prediction", "fatigue_prediction", {"n_samples": 60000})
+
+        # Wait until the worker reports progress, then cancel
+        for _ in range(200):
+            job = await manager.get_job(job_id)
+            if job.get("stage", "").startswith("fitted"):
+                break
+            await asyncio.sleep(0.05)
+
+        assert await manager.cancel_job(job_id)
+        await asyncio.wait_for(manager.wait(job_id), timeout=30)
+    finally:
+        await manager.shutdown()
+
+    job = await manager.get_job(job_id)
+    assert job["status"] == JobStatus.CANCELLED
+    assert await manager.registry.load("fatigue_prediction") is None
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_scoped_to_their_organization(manager, fake_db):
+    """Another organization's job is neither found nor cancelled"""
+    fake_db.training_jobs.docs.append(
+        {"job_id": "job1", "organization_id": "org1", "status": JobStatus.RUNNING, "cancel_requested": False}
+    )
+
+    assert await manager.get_job("job1", "org2") is None
+    assert not await manager.cancel_job("job1", "org2")
+
+    assert await manager.cancel_job("job1", "org1")
+    assert (await manager.get_job("job1", "org1"))["cancel_requested"] is True
+
+
+@pytest.mark.asyncio
+async def test_close_shuts_down_the_global_manager(manager, monkeypatch):
+    monkeypatch.setattr(training_jobs, "training_job_manager", manager)
+    manager._ensure_pool()
+
+    await training_jobs.close_training_job_manager()
+
+    assert training_jobs.training_job_manager is None
+    assert manager._executor is None
@@ -0,0 +1,329 @@
+"""
+Tests for DAG workflow execution and the workflow scheduler
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+workflow_orchestrator = pytest.importorskip("services.workflow_orchestrator")
+agentkit_models = pytest.importorskip("models.agentkit_models")
+
+StepStatus = workflow_orchestrator.StepStatus
+WorkflowContext = workflow_orchestrator.WorkflowContext
+WorkflowOrchestrator = workflow_orchestrator.WorkflowOrchestrator
+WorkflowScheduler = workflow_orchestrator.WorkflowScheduler
+WorkflowStepExecution = workflow_orchestrator.WorkflowStepExecution
+
+WORKFLOW = {
+    "workflow_id": "wf1",
+    "name": "Weekly report",
+    "description": "Builds the weekly report",
+    "organization_id": "org1",
+    "steps": []
+}
+
+
+class AgentKit:
+    """
+    Agent runner recording call order
+
+    ``plan`` gives per step the outcome of each attempt in turn (True for
+    success) and optionally how long the attempt takes.
+    """
+
+    def __init__(self, plan=None, delays=None):
+        self.plan = {step_id: list(outcomes) for step_id, outcomes in (plan or {}).items()}
+        self.delays = delays or {}
+        self.calls = []
+
+    async def execute_agent(self, request):
+        step_id = request.context["step_id"]
+        self.calls.append(step_id)
+        await asyncio.sleep(self.delays.get(step_id, 0))
+        outcomes = self.plan.get(step_id)
+        succeeded = outcomes.pop(0) if outcomes else True
+        status = agentkit_models.AgentStatus.COMPLETED if succeeded else agentkit_models.AgentStatus.FAILED
+        return SimpleNamespace(
+            status=status, output_data={step_id: True}, duration_seconds=0.0, error=None if succeeded else "agent error"
+        )
+
+
+def workflow(*steps):
+    """Workflow of (step_id, depends_on) pairs"""
+    return agentkit_models.WorkflowDefinition(
+        workflow_id="wf1", name="DAG", description="", organization_id="org1",
+        steps=[
+            agentkit_models.WorkflowStep(
+                step_id=step_id, agent_type=agentkit_models.AgentType.ANALYTICS,
+                input_mapping={}, output_mapping={}, depends_on=depends_on
+            )
+            for step_id, depends_on in steps
+        ]
+    )
+
+
+async def run_parallel(orchestrator, definition, max_retries=0):
+    context = WorkflowContext(
+        workflow_id=definition.workflow_id, execution_id="e1", organization_id="org1",
+        user_id="u1", start_time=datetime.utcnow()
+    )
+    for step in definition.steps:
+        context.step_executions[step.step_id] = WorkflowStepExecution(
+            step_id=step.step_id, agent_type=step.agent_type, depends_on=step.depends_on, max_retries=max_retries
+        )
+    orchestrator.active_workflows[context.execution_id] = context
+    await orchestrator._execute_parallel(context, definition)
+    return context
+
+
+class TestParallelExecution:
+    """Test the ready-queue DAG executor"""
+
+    @pytest.mark.asyncio
+    async def test_steps_start_once_their_own_dependencies_complete(self):
+        agentkit = AgentKit(delays={"slow": 0.05})
+        orchestrator = WorkflowOrchestrator(agentkit)
+
+        context = await run_parallel(orchestrator, workflow(
+            ("root", []), ("slow", ["root"]), ("fast", ["root"]), ("after_fast", ["fast"]), ("join", ["slow", "after_fast"])
+        ))
+
+        # after_fast does not wait for slow, which is in the same level as fast
+        assert agentkit.calls == ["root", "slow", "fast", "after_fast", "join"]
+        assert context.completed_steps == {"root", "slow", "fast", "after_fast", "join"}
+
+    @pytest.mark.asyncio
+    async def test_failed_dependency_skips_only_its_branch(self):
+        orchestrator = WorkflowOrchestrator(AgentKit(plan={"broken": [False]}))
+
+        context = await run_parallel(orchestrator, workflow(
+            ("broken", []), ("downstream", ["broken"]), ("independent", []), ("missing_dep", ["nowhere"])
+        ))
+
+        steps = context.step_executions
+        assert steps["broken"].status == StepStatus.FAILED and context.failed_steps == {"broken"}
+        assert steps["downstream"].status == StepStatus.SKIPPED
+        assert steps["missing_dep"].status == StepStatus.SKIPPED
+        assert steps["independent"].status == StepStatus.COMPLETED
+
+    @pytest.mark.asyncio
+    async def test_cyclic_workflow_is_rejected_before_running(self):
+        agentkit = AgentKit()
+        orchestrator = WorkflowOrchestrator(agentkit)
+        cyclic = workflow(("a", ["c"]), ("b", ["a"]), ("c", ["b"]), ("free", []))
+
+        with pytest.raises(workflow_orchestrator.ValidationError, match="a, b, c"):
+            await orchestrator.execute_workflow(cyclic, {}, "u1", "org1", workflow_orchestrator.ExecutionMode.PARALLEL)
+        assert agentkit.calls == []
+
+    def test_dependency_graph(self):
+        dependents, pending, unresolvable = WorkflowOrchestrator(AgentKit())._build_dependency_graph(
+            workflow(("a", []), ("b", ["a"]), ("c", ["a", "b"]), ("d", ["x"])).steps
+        )
+
+        assert dependents == {"a": ["b", "c"], "b": ["c"], "c": [], "d": []}
+        assert pending == {"a": 0, "b": 1, "c": 2, "d": 0}
+        assert unresolvable == {"d"}
+
+    @pytest.mark.asyncio
+    async def test_step_slot_is_released_during_retry_backoff(self):
+        agentkit = AgentKit(plan={"flaky": [False, True]})
+        orchestrator = WorkflowOrchestrator(agentkit, max_concurrent_steps_per_org=1)
+
+        context = await run_parallel(orchestrator, workflow(("flaky", []), ("other", [])), max_retries=1)
+
+        # other runs while flaky backs off instead of queueing behind it
+        assert agentkit.calls == ["flaky", "other", "flaky"]
+        assert context.completed_steps == {"flaky", "other"}
+
+
+class Orchestrator:
+    """Records workflow runs; runs finish when released"""
+
+    def __init__(self, released=True):
+        self.runs = []
+        self.running = 0
+        self.peak = 0
+        self.release = asyncio.Event()
+        if released:
+            self.release.set()
+
+    async def execute_workflow(self, workflow, input_data, user_id, organization_id):
+        self.runs.append(input_data["n"])
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await self.release.wait()
+        finally:
+            self.running -= 1
+
+
+def make_scheduler(db, orchestrator=None, **kwargs):
+    db.agentkit_workflows.docs = [WORKFLOW]
+    return WorkflowScheduler(orchestrator or Orchestrator(), db, **kwargs)
+
+
+async def schedule(scheduler, n, seconds_ago=1, **kwargs):
+    return await scheduler.schedule_workflow(
+        "wf1", datetime.utcnow() - timedelta(seconds=seconds_ago), {"n": n}, "user1", "org1", **kwargs
+    )
+
+
+def stored(db, schedule_id):
+    return next(doc for doc in db.scheduled_workflows.docs if doc["schedule_id"] == schedule_id)
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class TestDueHeap:
+    """Test which schedules each tick picks up"""
+
+    @pytest.mark.asyncio
+    async def test_due_schedules_pop_in_time_order(self, fake_db):
+        scheduler = make_scheduler(fake_db)
+        later = await schedule(scheduler, 1, seconds_ago=10)
+        earlier = await schedule(scheduler, 2, seconds_ago=20)
+        future = await schedule(scheduler, 3, seconds_ago=-3600)
+
+        due = scheduler._pop_due_schedules(datetime.utcnow())
+
+        assert [s["schedule_id"] for s in due] == [earlier, later]
+        assert scheduler.next_due_time() == scheduler.scheduled_workflows[future]["schedule_time"]
+
+    @pytest.mark.asyncio
+    async def test_rescheduled_entries_are_skipped(self, fake_db):
+        scheduler = make_scheduler(fake_db)
+        schedule_id = await schedule(scheduler, 1)
+        moved = dict(scheduler.scheduled_workflows[schedule_id], schedule_time=datetime.utcnow() + timedelta(hours=1))
+        scheduler._push_schedule(moved)
+
+        assert scheduler._pop_due_schedules(datetime.utcnow()) == []
+        assert scheduler.next_due_time() == moved["schedule_time"]
+
+
+class TestLeases:
+    """Test coordination between replicas through the schedule lease"""
+
+    @pytest.mark.asyncio
+    async def test_schedule_runs_once_across_replicas(self, fake_db):
+        orchestrator = Orchestrator()
+        first = make_scheduler(fake_db, orchestrator, instance_id="a")
+        second = make_scheduler(fake_db, orchestrator, instance_id="b")
+        schedule_id = await schedule(first, 1)
+        await second.load_schedules()
+
+        await asyncio.gather(first.process_scheduled_workflows(), second.process_scheduled_workflows())
+
+        assert orchestrator.runs == [1]
+        assert first.stats["lease_conflicts"] + second.stats["lease_conflicts"] == 1
+        assert stored(fake_db, schedule_id)["status"] == "completed"
+        assert "lease_owner" not in stored(fake_db, schedule_id)
+
+    @pytest.mark.asyncio
+    async def test_claim_waits_for_an_execution_slot(self, fake_db):
+        orchestrator = Orchestrator(released=False)
+        scheduler = make_scheduler(fake_db, orchestrator, max_concurrent_executions=1)
+        running = await schedule(scheduler, 1, seconds_ago=2)
+        waiting = await schedule(scheduler, 2)
+
+        assert await scheduler.process_scheduled_workflows(wait=False) == 2
+        await settle()
+
+        # The waiting run holds no lease that could expire before it starts
+        assert stored(fake_db, running)["status"] == "running"
+        assert stored(fake_db, waiting)["status"] == "scheduled"
+        assert "lease_owner" not in stored(fake_db, waiting)
+
+        orchestrator.release.set()
+        await scheduler.stop()
+        assert orchestrator.runs == [1, 2] and orchestrator.peak == 1
+        assert stored(fake_db, waiting)["status"] == "completed"
+
+    @pytest.mark.asyncio
+    async def test_lease_is_renewed_while_running(self, fake_db):
+        orchestrator = Orchestrator(released=False)
+        scheduler = make_scheduler(fake_db, orchestrator, lease_seconds=0.3)
+        schedule_id = await schedule(scheduler, 1)
+
+        await scheduler.process_scheduled_workflows(wait=False)
+        await settle()
+        claimed_until = stored(fake_db, schedule_id)["lease_expires_at"]
+        await asyncio.sleep(0.25)
+
+        assert stored(fake_db, schedule_id)["lease_expires_at"] > claimed_until
+        orchestrator.release.set()
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_only_the_lease_owner_queues_the_next_recurrence(self, fake_db):
+        orchestrator = Orchestrator(released=False)
+        scheduler = make_scheduler(fake_db, orchestrator, instance_id="a")
+        taken_over = await schedule(scheduler, 1, recurring=True, recurrence_pattern="daily")
+        owned = await schedule(scheduler, 2, recurring=True, recurrence_pattern="daily")
+
+        await scheduler.process_scheduled_workflows(wait=False)
+        await settle()
+        # Another replica reclaimed one of the runs
+        stored(fake_db, taken_over)["lease_owner"] = "b"
+        orchestrator.release.set()
+        await scheduler.stop()
+
+        recurrences = [doc for doc in fake_db.scheduled_workflows.docs if doc["schedule_id"] not in (taken_over, owned)]
+        assert [doc["input_data"]["n"] for doc in recurrences] == [2]
+        assert recurrences[0]["recurrence_anchor"] == stored(fake_db, owned)["schedule_time"]
+        assert stored(fake_db, taken_over)["status"] == "running"
+        assert scheduler.stats["lease_conflicts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_claim_is_left_for_rehydration(self, fake_db):
+        fake_db.scheduled_workflows.find_one_and_update = AsyncMock(side_effect=ConnectionError("primary stepped down"))
+        orchestrator = Orchestrator()
+        scheduler = WorkflowScheduler(orchestrator, fake_db)
+        schedule_id = await schedule(scheduler, 1)
+
+        assert await scheduler.process_scheduled_workflows() == 1
+
+        assert orchestrator.runs == [] and scheduler.scheduled_workflows == {}
+        assert stored(fake_db, schedule_id)["status"] == "scheduled"
+
+
+@pytest.mark.asyncio
+async def test_rehydration_loads_pending_and_expired_runs(fake_db):
+    now = datetime.utcnow()
+    base = {"workflow_id": "wf1", "schedule_time": now, "input_data": {}, "user_id": "u1",
+            "organization_id": "org1", "recurring": False, "recurrence_pattern": None}
+    fake_db.scheduled_workflows.docs = [
+        {**base, "schedule_id": "pending", "status": "scheduled"},
+        {**base, "schedule_id": "crashed", "status": "running", "lease_expires_at": now - timedelta(seconds=1)},
+        {**base, "schedule_id": "alive", "status": "running", "lease_expires_at": now + timedelta(minutes=5)},
+        {**base, "schedule_id": "done", "status": "completed"},
+    ]
+    scheduler = make_scheduler(fake_db)
+
+    assert await scheduler.load_schedules() == 2
+    assert await scheduler.load_schedules() == 0
+    assert set(scheduler.scheduled_workflows) == {"pending", "crashed"}
+    assert scheduler.scheduled_workflows["crashed"]["status"] == "scheduled"
+
+
+def test_monthly_recurrence_keeps_day_of_month(fake_db):
+    scheduler = make_scheduler(fake_db)
+    anchor = datetime(2099, 1, 31, 9, 0)
+    series = [anchor]
+    for _ in range(3):
+        series.append(scheduler._next_recurrence_time({
+            "schedule_id": "s1",
+            "recurrence_pattern": "monthly",
+            "schedule_time": series[-1],
+            "recurrence_anchor": anchor
+        }))
+
+    assert [d.date().isoformat() for d in series] == ["2099-01-31", "2099-02-28", "2099-03-31", "2099-04-30"]
+    assert workflow_orchestrator._add_months(datetime(2099, 2, 28), 1) == datetime(2099, 3, 28)
@@ -0,0 +1,84 @@
+"""
+Tests for Cron Expression Support
+"""
+
+import pytest
+from datetime import datetime
+
+from core.cron import CronExpression, CronError
+
+
+class TestCronParsing:
+    """Test cron expression parsing"""
+
+    def test_parses_lists_ranges_and_steps(self):
+        cron = CronExpression("*/15 9-17 * * 1-5")
+
+        assert cron.minutes == {0, 15, 30, 45}
+        assert cron.hours == set(range(9, 18))
+        assert cron.weekdays == {1, 2, 3, 4, 5}
+
+    def test_sunday_as_seven(self):
+        assert CronExpression("0 0 * * 7").weekdays == {0}
+
+    def test_aliases(self):
+        assert CronExpression("@daily").minutes == {0}
+        assert CronExpression("@daily").hours == {0}
+
+    @pytest.mark.parametrize("expression", [
+        "* * * *",
+        "60 * * * *",
+        "* 24 * * *",
+        "*/0 * * * *",
+        "a * * * *",
+        "5-1 * * * *",
+    ])
+    def test_invalid_expressions(self, expression):
+        with pytest.raises(CronError):
+            CronExpression(expression)
+        assert not CronExpression.is_valid(expression)
+
+
+class TestCronNextAfter:
+    """Test next fire time computation"""
+
+    def test_next_minute_step(self):
+        cron = CronExpression("*/15 * * * *")
+
+        assert cron.next_after(datetime(2025, 1, 1, 10, 7, 30)) == datetime(2025, 1, 1, 10, 15)
+
+    def test_strictly_after(self):
+        cron = CronExpression("0 9 * * *")
+
+        assert cron.next_after(datetime(2025, 1, 1, 9, 0)) == datetime(2025, 1, 2, 9, 0)
+
+    def test_weekdays_only(self):
+        cron = CronExpression("0 9 * * 1-5")
+        # 2025-01-03 is a Friday
+        assert cron.next_after(datetime(2025, 1, 3, 10, 0)) == datetime(2025, 1, 6, 9, 0)
+
+    def test_month_boundaries(self):
+        cron = CronExpression("0 0 31 * *")
+
+        assert cron.next_after(datetime(2025, 1, 31, 12, 0)) == datetime(2025, 3, 31, 0, 0)
+
+    def test_year_rollover(self):
+        cron = CronExpression("30 6 1 1 *")
+
+        assert cron.next_after(datetime(2025, 6, 1)) == datetime(2026, 1, 1, 6, 30)
+
+    def test_day_of_month_or_weekday(self):
+        # Either the 15th or any Monday
+        cron = CronExpression("0 0 15 * 1")
+
+        times = cron.next_times(datetime(2025, 1, 7), 3)
+
+        assert times == [
+            datetime(2025, 1, 13),
+            datetime(2025, 1, 15),
+            datetime(2025, 1, 20),
+        ]
+
+    def test_never_fires(self):
+        with pytest.raises(CronError):
+            CronExpression("0 0 30 2 *").next_after(datetime(2025, 1, 1))
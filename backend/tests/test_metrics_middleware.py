@@ -0,0 +1,124 @@
+"""
+Tests for Metrics Middleware and metric label cardinality
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from middleware.metrics_middleware import MetricsMiddleware, UNMATCHED_ROUTE
+from services.prometheus_metrics import (
+    LabelCardinalityGuard,
+    CampaignMetricsExporter,
+    OVERFLOW_LABEL,
+    metrics_collector,
+)
+
+
+def _request_count(method: str, endpoint: str, status: str) -> float:
+    value = REGISTRY.get_sample_value(
+        'http_requests_total',
+        {'method': method, 'endpoint': endpoint, 'status': status}
+    )
+    return value or 0.0
+
+
+@pytest.fixture
+def client():
+    """App with a parametrised route behind the metrics middleware"""
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/api/shops/{shop_handle}")
+    async def get_shop(shop_handle: str):
+        return {"shop": shop_handle}
+
+    return TestClient(app)
+
+
+class TestRouteTemplating:
+    """Test endpoint labels come from the matched route"""
+
+    def test_path_params_use_route_template(self, client):
+        """Slugs and ObjectIds collapse onto the route template"""
+        before = _request_count('GET', '/api/shops/{shop_handle}', '200')
+
+        client.get("/api/shops/my-cool-shop")
+        client.get("/api/shops/652f1c2e9b1e8a3d4c5b6a79")
+
+        assert _request_count('GET', '/api/shops/{shop_handle}', '200') == before + 2
+        assert _request_count('GET', '/api/shops/my-cool-shop', '200') == 0
+
+    def test_unmatched_paths_share_one_label(self, client):
+        """404s do not create a label per requested path"""
+        before = _request_count('GET', UNMATCHED_ROUTE, '404')
+
+        client.get("/wp-admin/login.php")
+        client.get("/random/probe")
+
+        assert _request_count('GET', UNMATCHED_ROUTE, '404') == before + 2
+
+
+class TestLabelCardinalityGuard:
+    """Test label cardinality guard"""
+
+    def test_values_within_budget_pass_through(self):
+        guard = LabelCardinalityGuard('test_metric', max_values=2)
+
+        assert guard.guard('a') == 'a'
+        assert guard.guard('b') == 'b'
+        assert guard.guard('a') == 'a'
+
+    def test_overflow_values_collapse(self):
+        guard = LabelCardinalityGuard('test_metric', max_values=2)
+        guard.guard('a')
+        guard.guard('b')
+
+        assert guard.guard('c') == OVERFLOW_LABEL
+        assert guard.guard('d') == OVERFLOW_LABEL
+        # Previously admitted values keep their label
+        assert guard.guard('b') == 'b'
+
+
+class TestCampaignMetricsExporter:
+    """Test aggregated campaign metric export"""
+
+    def test_rolls_up_by_platform(self):
+        exporter = CampaignMetricsExporter()
+        exporter.update('c1', 'google_ads', 'active', 2.0)
+        exporter.update('c2', 'google_ads', 'active', 4.0)
+        exporter.update('c3', 'meta_ads', 'paused', 1.5)
+        # A later snapshot replaces the earlier one
+        exporter.update('c3', 'meta_ads', 'active', 3.0)
+
+        families = {family.name: family for family in exporter.collect()}
+
+        counts = {tuple(s.labels.values()): s.value for s in families['campaigns_total'].samples}
+        assert counts == {('active', 'google_ads'): 2, ('active', 'meta_ads'): 1}
+
+        roas = {s.labels['platform']: s.value for s in families['campaign_performance_roas'].samples}
+        assert roas == {'google_ads': 3.0, 'meta_ads': 3.0}
+
+    def test_finished_and_stale_campaigns_are_dropped(self):
+        exporter = CampaignMetricsExporter(ttl=60)
+        exporter.update('c1', 'google_ads', 'active', 2.0)
+        exporter.update('c2', 'google_ads', 'active', 4.0)
+        exporter.update('c3', 'meta_ads', 'active', 1.0)
+        exporter.update('c1', 'google_ads', 'completed', 2.0)
+        exporter.remove('c2')
+        # c3 has not been updated for longer than the TTL
+        status, platform, roas, updated_at = exporter._campaigns['c3']
+        exporter._campaigns['c3'] = (status, platform, roas, updated_at - 61)
+
+        families = {family.name: family for family in exporter.collect()}
+
+        assert families['campaigns_total'].samples == []
+        assert exporter._campaigns == {}
+
+    def test_no_campaign_id_label(self):
+        metrics_collector.record_campaign_metrics('camp_123', 'tiktok', 'active', 1.0)
+
+        for family in REGISTRY.collect():
+            for sample in family.samples:
+                assert 'campaign_id' not in sample.labels
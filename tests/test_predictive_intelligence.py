@@ -170,6 +170,14 @@ class TestPredictiveIntelligenceEngine:
         assert result["status"] == "model_not_ready"
         assert "error" in result
 
+    @pytest.mark.asyncio
+    async def test_predict_many_model_not_ready_has_one_result_per_record(self, engine):
+        """Test bulk prediction results line up with the inputs when model not ready"""
+        with patch.object(engine, "_refresh_model", AsyncMock()):
+            results = await engine.predict_many("ltv", [{"customer_id": "a"}, {"customer_id": "b"}])
+
+        assert [result["status"] for result in results] == ["model_not_ready", "model_not_ready"]
+
     @pytest.mark.asyncio
     async def test_predict_creative_fatigue_success(self, engine, sample_creative_data):
         """Test successful creative fatigue prediction"""